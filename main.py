@@ -4,9 +4,13 @@ entry point for running code
 """
 
 from argparse import ArgumentParser
+from mips.cli.asm import asm
+from mips.cli.cosim import cosim
+from mips.cli.disasm import disasm
 from mips.cli.sim import simulate
 from mips.cli.flash import flash
 from mips.cli.synth import synth
+from mips.util.flow import FlowError
 
 ap = ArgumentParser(
     prog="Amaranth Mips",
@@ -26,27 +30,461 @@ sim_parser = parsers.add_parser(
 
 sim_parser.add_argument(
     "--out",
-    help="output file to store simulation",
+    help="trace to write: .vcd, .vcd.gz or .vcd.zst (streamed), or .fst with the verilator backend",
     default="simulation.vcd"
 )
 
+sim_parser.add_argument(
+    "--no-trace",
+    help="do not write a trace",
+    action="store_true"
+)
+
+sim_parser.add_argument(
+    "--trace-signals",
+    help="trace only the signals whose hierarchical name matches this pattern, "
+         "e.g. 'regfile.*' (repeatable)",
+    action="append",
+    default=None
+)
+
+sim_parser.add_argument(
+    "--trace-start",
+    help="start tracing at cycle=N or when the instruction at pc=ADDR retires",
+    default=None
+)
+
+sim_parser.add_argument(
+    "--trace-stop",
+    help="stop tracing at cycle=N or when the instruction at pc=ADDR retires",
+    default=None
+)
+
+sim_parser.add_argument(
+    "--trace-ring",
+    help="only keep the last N traced cycles, written when the simulation ends or crashes",
+    type=int,
+    default=None
+)
+
+sim_parser.add_argument(
+    "--program",
+    help="image or .s source to run (defaults to a built-in demo)",
+    default=None
+)
+
+sim_parser.add_argument(
+    "--cycles",
+    help="maximum number of cycles to simulate",
+    type=int,
+    default=1000
+)
+
+sim_parser.add_argument(
+    "--core",
+    help="core to simulate",
+    choices=["single", "pipeline", "dual"],
+    default="single"
+)
+
+sim_parser.add_argument(
+    "--predictor",
+    help="branch predictor of the pipelined core",
+    choices=["static", "bimodal", "gshare"],
+    default=None
+)
+
+sim_parser.add_argument(
+    "--bht-entries",
+    help="number of 2-bit counters of the branch predictor",
+    type=int,
+    default=64
+)
+
+sim_parser.add_argument(
+    "--btb-entries",
+    help="number of entries of the branch target buffer",
+    type=int,
+    default=16
+)
+
+sim_parser.add_argument(
+    "--icache",
+    help="instruction cache of the pipelined core, as SETSxWAYSxWORDS",
+    default=None
+)
+
+sim_parser.add_argument(
+    "--dcache",
+    help="data cache of the pipelined core, as SETSxWAYSxWORDS",
+    default=None
+)
+
+sim_parser.add_argument(
+    "--replacement",
+    help="replacement policy of the caches",
+    choices=["lru", "plru"],
+    default="lru"
+)
+
+sim_parser.add_argument(
+    "--mem-latency",
+    help="cycles per word of the memories behind the caches",
+    type=int,
+    default=8
+)
+
+sim_parser.add_argument(
+    "--muldiv",
+    help="latency versus area of the multiply/divide unit",
+    choices=["fast", "balanced", "small"],
+    default="balanced"
+)
+
+sim_parser.add_argument(
+    "--predecode",
+    help="keep predecoded fields next to the program of the pipelined core",
+    action="store_true"
+)
+
+sim_parser.add_argument(
+    "--backend",
+    help="simulator to run the core on (verilator needs yosys and verilator)",
+    choices=["python", "verilator"],
+    default="python"
+)
+
+asm_parser = parsers.add_parser(
+    "asm",
+    help="Assemble a program into images"
+)
+
+asm_parser.add_argument(
+    "source",
+    help=".s file to assemble"
+)
+
+asm_parser.add_argument(
+    "--out",
+    help="program image to write",
+    default="program.hex"
+)
+
+asm_parser.add_argument(
+    "--data-out",
+    help="data image to write",
+    default=None
+)
+
+asm_parser.add_argument(
+    "--format",
+    help="image format (defaults to the file extension: .bin, .ihex, else $readmemh)",
+    choices=["readmemh", "ihex", "bin"],
+    default=None
+)
+
+disasm_parser = parsers.add_parser(
+    "disasm",
+    help="List a program image as assembly"
+)
+
+disasm_parser.add_argument(
+    "image",
+    help="image to list ($readmemh, Intel HEX or .bin)"
+)
+
+disasm_parser.add_argument(
+    "--base",
+    help="address of the first word",
+    type=lambda v: int(v, 0),
+    default=0
+)
+
+cosim_parser = parsers.add_parser(
+    "cosim",
+    help="Run programs on the core and the reference ISS in lockstep"
+)
+
+cosim_parser.add_argument(
+    "programs",
+    help="images or .s sources to run",
+    nargs="*"
+)
+
+cosim_parser.add_argument(
+    "--random",
+    help="number of random programs to run as well",
+    type=int,
+    default=0
+)
+
+cosim_parser.add_argument(
+    "--mix",
+    help="instruction mix of the random programs",
+    choices=["balanced", "alu", "memory", "branch", "hazard"],
+    default="balanced"
+)
+
+cosim_parser.add_argument(
+    "--seed",
+    help="seed of the first random program",
+    type=int,
+    default=0
+)
+
+cosim_parser.add_argument(
+    "--length",
+    help="instructions in the loop of a random program",
+    type=int,
+    default=200
+)
+
+cosim_parser.add_argument(
+    "--iterations",
+    help="times the loop of a random program runs",
+    type=int,
+    default=2
+)
+
+cosim_parser.add_argument(
+    "--jobs",
+    help="programs run in parallel, 0 for one per CPU",
+    type=int,
+    default=0
+)
+
+cosim_parser.add_argument(
+    "--core",
+    help="core to check",
+    choices=["single", "pipeline", "dual"],
+    default="single"
+)
+
+cosim_parser.add_argument(
+    "--cycles",
+    help="maximum number of cycles per program",
+    type=int,
+    default=100_000
+)
+
+cosim_parser.add_argument(
+    "--window",
+    help="number of commits listed before a divergence",
+    type=int,
+    default=8
+)
+
+cosim_parser.add_argument(
+    "--stop",
+    help="stop at the first divergence",
+    action="store_true"
+)
+
+cosim_parser.add_argument(
+    "--predictor",
+    help="branch predictor of the pipelined core",
+    choices=["static", "bimodal", "gshare"],
+    default=None
+)
+
+cosim_parser.add_argument(
+    "--icache",
+    help="instruction cache of the pipelined core, as SETSxWAYSxWORDS",
+    default=None
+)
+
+cosim_parser.add_argument(
+    "--dcache",
+    help="data cache of the pipelined core, as SETSxWAYSxWORDS",
+    default=None
+)
+
+cosim_parser.add_argument(
+    "--muldiv",
+    help="latency versus area of the multiply/divide unit",
+    choices=["fast", "balanced", "small"],
+    default="balanced"
+)
+
+cosim_parser.add_argument(
+    "--predecode",
+    help="keep predecoded fields next to the program of the pipelined core",
+    action="store_true"
+)
+
 synth_parser = parsers.add_parser(
     "synth",
     help="Synthesize code and save to file"
 )
 
+synth_parser.add_argument(
+    "targets",
+    help="designs to synthesize",
+    nargs="*",
+    choices=["core", "pipeline", "pipeline_predecode", "dual", "alu", "alu_registered", "alu_switch",
+             "decoder", "regfile", "imem", "muldiv"],
+    default="core"
+)
+
+synth_parser.add_argument(
+    "--family",
+    help="FPGA family to target",
+    choices=["ice40", "ecp5"],
+    default="ecp5"
+)
+
+synth_parser.add_argument(
+    "--no-pnr",
+    help="skip place and route (no fmax)",
+    action="store_true"
+)
+
+synth_parser.add_argument(
+    "--freq",
+    help="clock constraint in MHz",
+    type=float,
+    default=12.0
+)
+
+synth_parser.add_argument(
+    "--build-dir",
+    help="where to keep the RTLIL, Verilog and netlists",
+    default="build"
+)
+
+synth_parser.add_argument(
+    "--report",
+    help="JSON report to write",
+    default="synth.json"
+)
+
+synth_parser.add_argument(
+    "--history",
+    help="JSON lines file tracking reports across commits",
+    default=None
+)
+
+synth_parser.add_argument(
+    "--max-regression",
+    help="fail if a metric regresses by more than this percentage against the history",
+    type=float,
+    default=None
+)
+
 flash_parser = parsers.add_parser(
     "flash",
     help="Synthesize and flash code to device"
 )
 
+flash_parser.add_argument(
+    "program",
+    help="program image or .s source to run, the demo program if omitted",
+    nargs="?",
+    default=None
+)
+
+flash_parser.add_argument(
+    "--core",
+    help="core to build",
+    choices=["single", "pipeline", "dual"],
+    default="pipeline"
+)
+
+flash_parser.add_argument(
+    "--predictor",
+    help="branch predictor of the pipelined core",
+    choices=["static", "bimodal", "gshare"],
+    default=None
+)
+
+flash_parser.add_argument(
+    "--muldiv",
+    help="latency versus area of the multiply/divide unit",
+    choices=["fast", "balanced", "small"],
+    default="balanced"
+)
+
+flash_parser.add_argument(
+    "--predecode",
+    help="store predecoded fields next to the program (pipelined core)",
+    action="store_true"
+)
+
+flash_parser.add_argument(
+    "--family",
+    help="FPGA family to target",
+    choices=["ice40", "ecp5"],
+    default="ice40"
+)
+
+flash_parser.add_argument(
+    "--freq",
+    help="clock constraint in MHz",
+    type=float,
+    default=12.0
+)
+
+flash_parser.add_argument(
+    "--constraints",
+    help="pin constraints of the board (.pcf or .lpf)",
+    default=None
+)
+
+flash_parser.add_argument(
+    "--programmer",
+    help="command programming the board, given the bitstream as its last argument",
+    default=None
+)
+
+flash_parser.add_argument(
+    "--cache-dir",
+    help="where to keep the builds (~/.cache/amaranth-mips/flash by default)",
+    default=None
+)
+
+flash_parser.add_argument(
+    "--rebuild",
+    help="build the design even if it is in the cache",
+    action="store_true"
+)
+
 args = ap.parse_args()
 
 if args.command == "sim":
-    simulate(args.out)
+    try:
+        simulate(None if args.no_trace else args.out, args.program, args.cycles, args.core,
+                 args.predictor, args.bht_entries, args.btb_entries,
+                 args.icache, args.dcache, args.replacement, args.mem_latency,
+                 args.muldiv, args.backend, args.trace_signals, args.trace_start,
+                 args.trace_stop, args.trace_ring, args.predecode)
+    except (FlowError, ValueError) as e:
+        raise SystemExit(str(e))
+elif args.command == "asm":
+    asm(args.source, args.out, args.data_out, args.format)
+elif args.command == "disasm":
+    disasm(args.image, args.base)
+elif args.command == "cosim":
+    if not cosim(args.programs, args.core, args.cycles, args.window, args.stop,
+                 args.random, args.mix, args.seed, args.length, args.iterations, args.jobs,
+                 predictor=args.predictor, icache=args.icache, dcache=args.dcache,
+                 muldiv=args.muldiv, predecode=args.predecode):
+        raise SystemExit(1)
 elif args.command == "synth":
-    synth()
+    max_regression = None if args.max_regression is None else args.max_regression / 100
+    try:
+        targets = [args.targets] if isinstance(args.targets, str) else args.targets
+        ok = synth(targets, args.family, not args.no_pnr, args.freq, args.build_dir,
+                   args.report, args.history, max_regression)
+    except FlowError as e:
+        raise SystemExit(str(e))
+    if not ok:
+        raise SystemExit(1)
 elif args.command == "flash":
-    flash()
+    try:
+        flash(args.program, args.core, args.family, args.freq, args.constraints, args.programmer,
+              args.cache_dir, args.rebuild, predictor=args.predictor, muldiv=args.muldiv,
+              predecode=args.predecode)
+    except FlowError as e:
+        raise SystemExit(str(e))
 else:
     ap.print_help()
\ No newline at end of file
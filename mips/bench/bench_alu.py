@@ -0,0 +1,70 @@
+"""
+Benchmark of ALU test vector throughput: one ``Simulator`` per vector (as
+the ALU tests used to do) against streaming every vector through a single
+simulation.
+
+Run with ``python3 -m mips.bench.bench_alu``.
+"""
+
+from amaranth.sim import Simulator, Delay, Settle
+
+from mips.cpu.alu import ALU
+from mips.cpu.isa import Funct
+from mips.sim.harness import run_vectors
+
+import numpy as np
+
+import time
+import warnings
+
+def vectors(count: int):
+    rng = np.random.default_rng(0)
+    rs = rng.integers(0, 1 << 32, count, dtype=np.uint32).tolist()
+    rt = rng.integers(0, 1 << 32, count, dtype=np.uint32).tolist()
+    return rs, rt
+
+
+def bench_per_vector(count: int = 200) -> float:
+    rs, rt = vectors(count)
+    start = time.perf_counter()
+    for a, b in zip(rs, rt):
+        alu = ALU()
+        sim = Simulator(alu)
+
+        def bench():
+            yield alu.func.eq(Funct.ADD)
+            yield alu.rs.eq(a)
+            yield alu.rt.eq(b)
+            yield Settle()
+            yield alu.rd
+            yield Delay(1e-6)
+
+        sim.add_process(bench)
+        sim.run()
+    return count / (time.perf_counter() - start)
+
+
+def bench_streaming(count: int = 20_000) -> float:
+    rs, rt = vectors(count)
+    start = time.perf_counter()
+    alu = ALU()
+    run_vectors(
+        alu,
+        [(alu.func, [Funct.ADD.value] * count), (alu.rs, rs), (alu.rt, rt)],
+        [alu.rd, alu.ovf],
+    )
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        before = bench_per_vector()
+        after = bench_streaming()
+    print(f"one simulator per vector: {before:,.0f} vectors/sec")
+    print(f"streaming:                {after:,.0f} vectors/sec")
+    print(f"speedup: {after / before:,.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Resource and timing comparison of the ALU datapaths: one datapath per
+function (``SwitchALU``) against the shared adder and shifter of ``ALU``,
+with and without its output register stage.
+
+Needs Yosys and nextpnr on the ``PATH``. Run with
+``python3 -m mips.bench.bench_alu_synth [--family ice40|ecp5] [--no-pnr]``.
+"""
+
+from argparse import ArgumentParser
+
+from mips.cli.synth import TARGETS, compare
+from mips.util.flow import FAMILIES, FlowError, have_tools, synthesize
+
+import sys
+
+BASELINE = "alu_switch"
+"Target the others are compared against"
+
+CONFIGS = [BASELINE, "alu", "alu_registered"]
+"Targets of ``mips.cli.synth.TARGETS`` to compare"
+
+
+def main():
+    ap = ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--family", choices=FAMILIES, default="ecp5")
+    ap.add_argument("--no-pnr", action="store_true", help="skip place and route (no fmax)")
+    args = ap.parse_args()
+    pnr = not args.no_pnr
+
+    if not have_tools(args.family, pnr=pnr):
+        print(f"Yosys{' and nextpnr' if pnr else ''} are needed for {args.family}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{'target':15} {'LUT':>6} {'FF':>6} {'fmax':>8}  vs {BASELINE}")
+    baseline = None
+    for target in CONFIGS:
+        design, ports = TARGETS[target]()
+        try:
+            res = synthesize(design, ports, family=args.family, pnr=pnr)
+        except FlowError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+        baseline = baseline or res
+        fmax = f"{res['fmax_mhz']:.1f}" if res["fmax_mhz"] else "-"
+        # ``compare`` counts a lower fmax as positive, shown here as a drop
+        changes = compare(baseline, res)
+        moved = []
+        if changes.get("lut"):
+            moved.append(f"LUT {100 * changes['lut']:+.1f}%")
+        if changes.get("fmax_mhz"):
+            moved.append(f"fmax {-100 * changes['fmax_mhz']:+.1f}%")
+        moved = ", ".join(moved)
+        print(f"{target:15} {res['lut']:6} {res['ff']:6} {fmax:>8}  {moved or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Source lines per second assembled by ``assemble``, and words per second
+written and read back in every image format.
+
+Run with ``python3 -m mips.bench.bench_asm [--blocks N]``.
+"""
+
+from argparse import ArgumentParser
+
+from mips.util.asm import assemble
+from mips.util.image import FORMATS, read_image, write_image
+
+import os
+import random
+import tempfile
+import time
+
+
+def large_source(blocks: int) -> str:
+    """
+    Source of ``blocks`` blocks of five instructions, each with a label and
+    branches and jumps to labels, ending with a ``trap``.
+    """
+    lines = []
+    for i in range(blocks):
+        lines += [
+            f"l{i}: addiu $t0, $t0, {i % 100}",
+            "    lw $t1, 8($sp)",
+            f"    beq $t0, $t1, l{i + 1}",
+            "    sll $t2, $t1, 3",
+            f"    jal l{i}",
+        ]
+    lines.append(f"l{blocks}: trap")
+    return "\n".join(lines)
+
+
+def main():
+    ap = ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--blocks", type=int, default=20_000, help="blocks of five instructions")
+    args = ap.parse_args()
+
+    source = large_source(args.blocks)
+    lines = 5 * args.blocks + 1
+    start = time.perf_counter()
+    program = assemble(source)
+    seconds = time.perf_counter() - start
+    print(f"assemble {lines:,} lines: {seconds:.2f}s, {lines / seconds:,.0f} lines/sec")
+
+    rng = random.Random(0)
+    words = [rng.getrandbits(32) for _ in range(len(program.text))]
+    print(f"{'format':10} {'write words/sec':>16} {'read words/sec':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in FORMATS:
+            path = os.path.join(tmp, f"image.{fmt}")
+            start = time.perf_counter()
+            write_image(path, words, fmt)
+            written = time.perf_counter() - start
+            start = time.perf_counter()
+            read_image(path)
+            read = time.perf_counter() - start
+            print(f"{fmt:10} {len(words) / written:16,.0f} {len(words) / read:16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+CPI of the pipelined core and hit rates of its caches for several cache
+geometries, on a few programs.
+
+Run with ``python3 -m mips.bench.bench_cache [--mem-latency N]``.
+"""
+
+from argparse import ArgumentParser
+
+from mips.bench.bench_predictor import SORT, SORT_DATA
+from mips.cli.sim import build_core, run
+import mips.util.encode as encode
+
+STRIDE = [
+    encode.ADDIU(rs=0, rt=1, imm=4)[0],         # 0: passes = 4
+    encode.ADDIU(rs=0, rt=2, imm=0)[0],         # 4: outer: p = 0
+    encode.LW(rs=2, rt=3, imm=0)[0],            # 8: inner: x = *p
+    encode.ADDU(rs=4, rt=3, rd=4)[0],           # 12: sum += x
+    encode.SW(rs=2, rt=4, imm=0)[0],            # 16: *p = sum
+    encode.ADDIU(rs=2, rt=2, imm=32)[0],        # 20: p += 8 words
+    encode.SLTI(rs=2, rt=5, imm=256)[0],        # 24
+    encode.BNE(rs=5, rt=0, imm=0xfffa)[0],      # 28: if p < 256 goto inner
+    encode.ADDIU(rs=1, rt=1, imm=0xffff)[0],    # 32: passes -= 1
+    encode.BNE(rs=1, rt=0, imm=0xfff7)[0],      # 36: if passes != 0 goto outer
+    encode.TRAP(0)[0],                          # 40
+]
+"Read-modify-write of every 8th word of 256 bytes, several times"
+
+PROGRAMS = {
+    "sort": (SORT, SORT_DATA),
+    "stride": (STRIDE, list(range(64))),
+}
+
+CONFIGS = [
+    (None, None, "lru"),
+    ("4x1x4", "4x1x4", "lru"),
+    ("4x1x4", "16x1x4", "lru"),
+    ("4x1x4", "2x4x4", "lru"),
+    ("4x1x4", "2x4x4", "plru"),
+    ("4x1x4", "8x1x1", "lru"),
+    ("4x1x4", "1x8x1", "lru"),
+]
+"(icache, dcache, replacement) to compare, as SETSxWAYSxWORDS"
+
+
+def main():
+    ap = ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--mem-latency", type=int, default=8, help="cycles per word of main memory")
+    args = ap.parse_args()
+
+    print(f"{'program':8} {'icache':8} {'dcache':8} {'repl':5} {'CPI':>7} {'I hit':>7} {'D hit':>7} {'WB':>4}")
+    for name, (program, data) in PROGRAMS.items():
+        for icache, dcache, replacement in CONFIGS:
+            core = build_core(program, data, "pipeline", "bimodal", icache=icache, dcache=dcache,
+                              replacement=replacement, mem_latency=args.mem_latency)
+            res = run(core, cycles=100_000)
+            assert res.halted, f"{name} did not halt"
+            rates = {}
+            writebacks = 0
+            for cache, hits, misses, wb in res.caches:
+                rates[cache] = f"{100 * hits / (hits + misses):.1f}%" if hits + misses else "-"
+                writebacks += wb
+            print(f"{name:8} {icache or '-':8} {dcache or '-':8} {replacement if icache else '-':5} "
+                  f"{1 / res.ipc:7.3f} {rates.get('icache', '-'):>7} {rates.get('dcache', '-'):>7} "
+                  f"{writebacks:4}")
+
+
+if __name__ == "__main__":
+    main()
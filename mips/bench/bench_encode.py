@@ -0,0 +1,62 @@
+"""
+Instructions encoded per second by the tuple encoders, their ``word`` and
+``into`` fast paths, and ``encode_many``.
+
+Run with ``python3 -m mips.bench.bench_encode [--count N]``.
+"""
+
+from argparse import ArgumentParser
+
+from mips.cpu.isa import Opcode
+import mips.util.encode as encode
+
+from array import array
+
+import numpy as np
+import time
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    ap = ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--count", type=int, default=1_000_000, help="instructions to encode")
+    args = ap.parse_args()
+    n = args.count
+
+    def tuples():
+        for i in range(n):
+            encode.ADDIU(rs=1, rt=2, imm=i & 0xffff)[0]
+
+    def words():
+        word = encode.ADDIU.word
+        for i in range(n):
+            word(1, 2, i)
+
+    def into_array():
+        buf = array("I", bytes(4 * n))
+        into = encode.ADDIU.into
+        for i in range(n):
+            into(buf, i, 1, 2, i)
+
+    def into_bytearray():
+        buf = encode.word_view(bytearray(4 * n))
+        into = encode.ADDIU.into
+        for i in range(n):
+            into(buf, i, 1, 2, i)
+
+    def many():
+        encode.encode_many(Opcode.ADDIU, 1, 2, imm=np.arange(n) & 0xffff, out=bytearray(4 * n))
+
+    print(f"{'path':16} {'words/sec':>14}")
+    for name, fn in [("tuple", tuples), ("word", words), ("into array", into_array),
+                     ("into bytearray", into_bytearray), ("encode_many", many)]:
+        print(f"{name:16} {n / timed(fn):14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
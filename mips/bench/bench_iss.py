@@ -0,0 +1,60 @@
+"""
+Benchmark of the instruction set simulator against the RTL simulation
+of the core.
+
+Run with ``python3 -m mips.bench.bench_iss``.
+"""
+
+from amaranth.sim import Simulator
+
+from mips.cpu.core import Core
+from mips.model.iss import ISS
+import mips.util.encode as encode
+
+import time
+
+LOOP = [
+    encode.ADDIU(rs=0, rt=1, imm=1)[0],
+    encode.ADDU(rs=2, rt=1, rd=2)[0],           # loop:
+    encode.XOR(rs=2, rt=1, rd=3)[0],
+    encode.SLL(rs=0, rt=3, shamt=3, rd=4)[0],
+    encode.SW(rs=0, rt=4, imm=16)[0],
+    encode.LW(rs=0, rt=5, imm=16)[0],
+    encode.BNE(rs=2, rt=0, imm=0xfffa)[0],      # goto loop
+    encode.TRAP(0)[0],
+]
+"Endless ALU/memory loop"
+
+
+def bench_iss(steps: int = 2_000_000) -> float:
+    iss = ISS(LOOP)
+    start = time.perf_counter()
+    ran = iss.run(steps)
+    return ran / (time.perf_counter() - start)
+
+
+def bench_rtl(cycles: int = 500) -> float:
+    core = Core(LOOP)
+    sim = Simulator(core)
+    sim.add_clock(1e-6)
+
+    def bench():
+        for _ in range(cycles):
+            yield
+
+    sim.add_sync_process(bench)
+    start = time.perf_counter()
+    sim.run()
+    return cycles / (time.perf_counter() - start)
+
+
+def main():
+    iss = bench_iss()
+    rtl = bench_rtl()
+    print(f"ISS: {iss:,.0f} instructions/sec")
+    print(f"RTL: {rtl:,.0f} cycles/sec")
+    print(f"speedup: {iss / rtl:,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
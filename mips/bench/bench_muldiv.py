@@ -0,0 +1,86 @@
+"""
+Cycles taken by multiply and divide heavy programs on both cores for each
+configuration of the multiply/divide unit.
+
+Run with ``python3 -m mips.bench.bench_muldiv [--synth] [--family ice40|ecp5]``.
+With ``--synth`` the unit is also synthesized (Yosys needed) to report the
+LUT and FF counts of each configuration next to the cycles it takes.
+"""
+
+from argparse import ArgumentParser
+
+from mips.cli.sim import build_core, run
+from mips.cpu.muldiv import MULDIV_CONFIGS, MulDiv
+from mips.util.flow import FAMILIES, FlowError, have_tools, synthesize
+import mips.util.encode as encode
+
+import sys
+
+DIGITS = [
+    encode.LHI(rs=0, rt=1, imm=0x7fff)[0],      # 0: n = 2**31 - 1
+    encode.LLO(rs=0, rt=1, imm=0xffff)[0],      # 4
+    encode.ADDIU(rs=0, rt=2, imm=10)[0],        # 8
+    encode.DIVU(rs=1, rt=2, rd=0)[0],           # 12: loop: n / 10
+    encode.MFHI(rs=0, rt=0, rd=3)[0],           # 16: digit
+    encode.MFLO(rs=0, rt=0, rd=1)[0],           # 20: n //= 10
+    encode.ADDU(rs=4, rt=3, rd=4)[0],           # 24: sum += digit
+    encode.BNE(rs=1, rt=0, imm=0xfffb)[0],      # 28: if n != 0 goto loop
+    encode.TRAP(0)[0],                          # 32
+]
+"Sum of the decimal digits of a number, every divide is read at once"
+
+DOT = [
+    encode.ADDIU(rs=0, rt=1, imm=0)[0],         # 0: p = 0
+    encode.LW(rs=1, rt=2, imm=0)[0],            # 4: loop: a = x[p]
+    encode.LW(rs=1, rt=3, imm=32)[0],           # 8: b = y[p]
+    encode.MULT(rs=2, rt=3, rd=0)[0],           # 12
+    encode.ADDIU(rs=1, rt=1, imm=4)[0],         # 16: p += 1
+    encode.SLTI(rs=1, rt=7, imm=32)[0],         # 20
+    encode.MFLO(rs=0, rt=0, rd=4)[0],           # 24
+    encode.ADDU(rs=6, rt=4, rd=6)[0],           # 28: acc += a * b
+    encode.BNE(rs=7, rt=0, imm=0xfff8)[0],      # 32: if p < 8 goto loop
+    encode.TRAP(0)[0],                          # 36
+]
+"Dot product of two 8 word vectors, each multiply overlaps two instructions"
+
+PROGRAMS = {
+    "digits": (DIGITS, []),
+    "dot": (DOT, [3, -1 & 0xffff_ffff, 4, 1, 5, -9 & 0xffff_ffff, 2, 6, 5, 3, 5, 8, 9, 7, 9, 3]),
+}
+
+
+def main():
+    ap = ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--synth", action="store_true", help="also report the area of each configuration")
+    ap.add_argument("--family", choices=FAMILIES, default="ecp5")
+    args = ap.parse_args()
+
+    if args.synth and not have_tools(args.family, pnr=False):
+        print("Yosys is needed for --synth", file=sys.stderr)
+        sys.exit(1)
+
+    areas = {}
+    if args.synth:
+        for config, kwargs in MULDIV_CONFIGS.items():
+            muldiv = MulDiv(**kwargs)
+            try:
+                areas[config] = synthesize(muldiv, muldiv.ports(), family=args.family, pnr=False)
+            except FlowError as e:
+                print(e, file=sys.stderr)
+                sys.exit(1)
+
+    print(f"{'program':8} {'core':9} {'muldiv':9} {'cycles':>7} {'CPI':>6}"
+          + (f" {'LUT':>6} {'FF':>6}" if args.synth else ""))
+    for name, (program, data) in PROGRAMS.items():
+        for core in ("single", "pipeline"):
+            for config in MULDIV_CONFIGS:
+                res = run(build_core(program, data, core, muldiv=config), cycles=10_000)
+                assert res.halted, f"{name} did not halt"
+                line = f"{name:8} {core:9} {config:9} {res.cycles:7} {1 / res.ipc:6.3f}"
+                if args.synth:
+                    line += f" {areas[config]['lut']:6} {areas[config]['ff']:6}"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Mispredict rate and CPI of the pipelined core for each branch predictor
+and table size, on a few programs.
+
+Run with ``python3 -m mips.bench.bench_predictor [--synth] [--family ice40|ecp5]``.
+With ``--synth`` the predictors are also synthesized (Yosys needed) to
+report their LUT and FF counts next to the CPI they buy.
+"""
+
+from argparse import ArgumentParser
+
+from mips.cli.sim import DEMO_PROGRAM, build_core, run
+from mips.cpu.predictor import BranchPredictor, PREDICTORS
+from mips.util.flow import FAMILIES, FlowError, Registered, have_tools, synthesize
+import mips.util.encode as encode
+
+import sys
+
+SORT_DATA = [23, 5, 42, 8, 16, 4, 15, 99]
+
+SORT = [
+    encode.ADDIU(rs=0, rt=1, imm=len(SORT_DATA) - 1)[0],   # 0: passes
+    encode.ADDIU(rs=0, rt=2, imm=0)[0],         # 4: outer: p = 0
+    encode.ADDU(rs=1, rt=0, rd=3)[0],           # 8: i = passes
+    encode.LW(rs=2, rt=4, imm=0)[0],            # 12: inner: a = p[0]
+    encode.LW(rs=2, rt=5, imm=4)[0],            # 16: b = p[1]
+    encode.SLT(rs=5, rt=4, rd=6)[0],            # 20
+    encode.BEQ(rs=6, rt=0, imm=2)[0],           # 24: if b >= a goto 36
+    encode.SW(rs=2, rt=5, imm=0)[0],            # 28: swap
+    encode.SW(rs=2, rt=4, imm=4)[0],            # 32
+    encode.ADDIU(rs=2, rt=2, imm=4)[0],         # 36: p += 1
+    encode.ADDIU(rs=3, rt=3, imm=0xffff)[0],    # 40: i -= 1
+    encode.BGTZ(rs=3, rt=0, imm=0xfff7)[0],     # 44: if i > 0 goto inner
+    encode.ADDIU(rs=1, rt=1, imm=0xffff)[0],    # 48: passes -= 1
+    encode.BGTZ(rs=1, rt=0, imm=0xfff3)[0],     # 52: if passes > 0 goto outer
+    encode.TRAP(0)[0],                          # 56
+]
+"Bubble sort of ``SORT_DATA``, whose swap branch depends on the data"
+
+CALLS = [
+    encode.ADDIU(rs=0, rt=1, imm=20)[0],        # 0: n = 20
+    encode.JAL(5)[0],                           # 4: loop: call 20
+    encode.ADDIU(rs=1, rt=1, imm=0xffff)[0],    # 8: n -= 1
+    encode.BNE(rs=1, rt=0, imm=0xfffd)[0],      # 12: if n != 0 goto loop
+    encode.TRAP(0)[0],                          # 16
+    encode.ANDI(rs=1, rt=2, imm=1)[0],          # 20: odd = n & 1
+    encode.BEQ(rs=2, rt=0, imm=1)[0],           # 24: if even goto 32
+    encode.ADDIU(rs=3, rt=3, imm=1)[0],         # 28: odds += 1
+    encode.JR(rs=31, rt=0, rd=0)[0],            # 32: return
+]
+"Loop calling a function with an alternating branch"
+
+PROGRAMS = {
+    "demo": (DEMO_PROGRAM, []),
+    "sort": (SORT, SORT_DATA),
+    "calls": (CALLS, []),
+}
+
+SIZES = [4, 16, 64, 256]
+"Number of 2-bit counters tried for each dynamic predictor"
+
+
+def configs():
+    yield None, 0
+    yield "static", 0
+    for kind in PREDICTORS[1:]:
+        for entries in SIZES:
+            yield kind, entries
+
+
+def area(kind: str, entries: int, family: str):
+    predictor = BranchPredictor(kind, entries=max(entries, 4))
+    top = Registered(
+        predictor,
+        [predictor.pc, predictor.update, predictor.update_pc, predictor.update_index,
+         predictor.update_cond, predictor.update_taken, predictor.update_target,
+         predictor.update_miss],
+        [predictor.taken, predictor.target, predictor.index],
+    )
+    return synthesize(top, top.ports(), family=family, pnr=False)
+
+
+def main():
+    ap = ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--synth", action="store_true", help="also report the area of each predictor")
+    ap.add_argument("--family", choices=FAMILIES, default="ecp5")
+    args = ap.parse_args()
+
+    if args.synth and not have_tools(args.family, pnr=False):
+        print("Yosys is needed for --synth", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{'program':8} {'predictor':10} {'entries':>7} {'misses':>9} {'rate':>7} {'CPI':>6}"
+          + (f" {'LUT':>6} {'FF':>6}" if args.synth else ""))
+    for name, (program, data) in PROGRAMS.items():
+        for kind, entries in configs():
+            core = build_core(program, data, "pipeline", kind, bht_entries=max(entries, 4))
+            res = run(core, cycles=10_000)
+            assert res.halted, f"{name} did not halt"
+            total = res.hits + res.misses
+            misses = f"{res.misses}/{total}" if kind else "-"
+            rate = f"{100 * res.mispredict_rate:.1f}%" if kind else "-"
+            line = (f"{name:8} {kind or 'none':10} {entries or '-':>7} {misses:>9} {rate:>7} "
+                    f"{1 / res.ipc:6.3f}")
+            if args.synth and kind:
+                try:
+                    rep = area(kind, entries, args.family)
+                except FlowError as e:
+                    print(e, file=sys.stderr)
+                    sys.exit(1)
+                line += f" {rep['lut']:6} {rep['ff']:6}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
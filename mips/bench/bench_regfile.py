@@ -0,0 +1,59 @@
+"""
+Resource and timing comparison of register file configurations:
+flip-flop against memory-inferred storage, for several port counts.
+
+Needs Yosys and nextpnr on the ``PATH``. Run with
+``python3 -m mips.bench.bench_regfile [--family ice40|ecp5] [--no-pnr]``.
+"""
+
+from argparse import ArgumentParser
+
+from mips.cpu.regfile import RegisterFile
+from mips.util.flow import FAMILIES, FlowError, Registered, have_tools, synthesize
+
+import sys
+
+CONFIGS = [
+    (2, 1),
+    (4, 2),
+    (6, 3),
+]
+"(read ports, write ports) to compare"
+
+
+def build(read_ports: int, write_ports: int, memory: bool, family: str, pnr: bool):
+    regfile = RegisterFile(read_ports=read_ports, write_ports=write_ports, memory=memory)
+    top = Registered(
+        regfile,
+        regfile.raddr + regfile.waddr + regfile.wen + regfile.wdata,
+        regfile.rdata,
+    )
+    return synthesize(top, top.ports(), family=family, pnr=pnr)
+
+
+def main():
+    ap = ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--family", choices=FAMILIES, default="ecp5")
+    ap.add_argument("--no-pnr", action="store_true", help="skip place and route (no fmax)")
+    args = ap.parse_args()
+    pnr = not args.no_pnr
+
+    if not have_tools(args.family, pnr=pnr):
+        print(f"Yosys{' and nextpnr' if pnr else ''} are needed for {args.family}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{'ports':8} {'storage':8} {'LUT':>6} {'FF':>6} {'LUTRAM':>6} {'BRAM':>6} {'fmax':>8}")
+    for read_ports, write_ports in CONFIGS:
+        for memory in (False, True):
+            try:
+                res = build(read_ports, write_ports, memory, args.family, pnr)
+            except FlowError as e:
+                print(e, file=sys.stderr)
+                sys.exit(1)
+            fmax = f"{res['fmax_mhz']:.1f}" if res["fmax_mhz"] else "-"
+            print(f"{read_ports}R{write_ports}W{'':4} {'memory' if memory else 'ff':8} "
+                  f"{res['lut']:6} {res['ff']:6} {res['lutram']:6} {res['bram']:6} {fmax:>8}")
+
+
+if __name__ == "__main__":
+    main()
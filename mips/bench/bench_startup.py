@@ -0,0 +1,59 @@
+"""
+Benchmark of simulation startup: building a new ``Simulator`` for every
+simulation against reusing a cached one.
+
+Run with ``python3 -m mips.bench.bench_startup``.
+"""
+
+from amaranth.sim import Simulator, Settle
+
+from mips.cpu.alu import ALU
+from mips.cpu.core import Core
+from mips.cpu.decoder import Decoder
+from mips.sim.cache import cached_simulator
+from mips.sim.cores import DEMO_PROGRAM
+
+import time
+import warnings
+
+DESIGNS = {
+    "ALU": (ALU, ()),
+    "Decoder": (Decoder, ()),
+    "Core": (Core, (DEMO_PROGRAM,)),
+}
+
+def settle():
+    yield Settle()
+
+
+def bench_fresh(factory, args, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        sim = Simulator(factory(*args))
+        sim.add_process(settle)
+        sim.run()
+    return (time.perf_counter() - start) / runs
+
+
+def bench_cached(factory, args, runs: int) -> float:
+    cached_simulator(factory, *args)
+    start = time.perf_counter()
+    for _ in range(runs):
+        sim = cached_simulator(factory, *args)
+        sim.add_process(settle)
+        sim.run()
+    return (time.perf_counter() - start) / runs
+
+
+def main(runs: int = 50):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        for name, (factory, args) in DESIGNS.items():
+            fresh = bench_fresh(factory, args, runs)
+            cached = bench_cached(factory, args, runs)
+            print(f"{name:8} fresh: {fresh * 1e3:8.2f} ms  cached: {cached * 1e3:8.2f} ms"
+                  f"  ({fresh / cached:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
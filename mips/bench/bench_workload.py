@@ -0,0 +1,52 @@
+"""
+Generation rate of the random instruction streams of ``mips.util.generate``,
+and CPI of the cores on a workload of every mix.
+
+Run with ``python3 -m mips.bench.bench_workload [--length N] [--iterations N] [--seed N]``.
+"""
+
+from argparse import ArgumentParser
+
+from mips.cli.sim import build_core, run
+from mips.util.generate import MIXES, generate, workload
+
+import numpy as np
+
+import time
+
+CONFIGS = {
+    "single": dict(core="single"),
+    "dual": dict(core="dual"),
+    "pipeline": dict(core="pipeline"),
+    "gshare": dict(core="pipeline", predictor="gshare"),
+    "cached": dict(core="pipeline", predictor="gshare", icache="16x1x4", dcache="16x2x4"),
+}
+"Core configurations compared, passed to ``build_core``"
+
+
+def main():
+    ap = ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--length", type=int, default=300, help="instructions in the loop of a workload")
+    ap.add_argument("--iterations", type=int, default=4, help="times the loop runs")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    count = 2_000_000
+    out = np.zeros(count, dtype=np.uint32)
+    print(f"{'mix':9} {'inst/sec':>12}" + "".join(f" {name:>9}" for name in CONFIGS))
+    for mix in MIXES:
+        start = time.perf_counter()
+        generate(count, mix, seed=args.seed, out=out)
+        rate = count / (time.perf_counter() - start)
+
+        program, data = workload(args.length, mix, iterations=args.iterations, seed=args.seed)
+        line = f"{mix:9} {rate:12,.0f}"
+        for config in CONFIGS.values():
+            res = run(build_core(program, data, **config), cycles=100_000)
+            assert res.halted, f"{mix} did not halt"
+            line += f" {1 / res.ipc:9.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
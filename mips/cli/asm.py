@@ -0,0 +1,23 @@
+from mips.util.asm import assemble_file
+from mips.util.image import write_image
+
+from typing import *
+
+def asm(source: str, out: str, data_out: Optional[str] = None, fmt: Optional[str] = None):
+    """
+    Assemble ``source`` and write its program image to ``out``, and its
+    data image to ``data_out`` if given.
+
+    Arguments:
+        source (str):   ``.s`` file to assemble
+        out (str):      program image to write
+        data_out (str): data image to write, or ``None``
+        fmt (str):      image format, one of ``FORMATS``, or ``None`` to
+                        follow the extension of each file
+    """
+    program = assemble_file(source)
+    write_image(out, program.text, fmt)
+    if data_out is not None:
+        write_image(data_out, program.data, fmt)
+    print(f"{len(program.text)} program words, {len(program.data)} data words")
+    return program
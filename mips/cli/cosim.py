@@ -0,0 +1,55 @@
+from mips.sim.cores import load_program
+from mips.sim.cosim import cosim_many, format_divergence
+from mips.util.generate import workload
+
+from typing import *
+
+import itertools
+import sys
+import time
+
+def cosim(programs: List[str], core: str = "single", cycles: int = 100_000, window: int = 8,
+          stop: bool = False, random: int = 0, mix: str = "balanced", seed: int = 0,
+          length: int = 200, iterations: int = 2, jobs: int = 1, **options) -> bool:
+    """
+    Co-simulate every program on the core and on the ISS in lockstep,
+    printing one line per program and the commits leading up to each
+    divergence. ``random`` more programs are drawn from ``workload``,
+    with seeds ``seed``, ``seed + 1``, ...
+
+    Arguments:
+        programs (list[str]):   images or ``.s`` sources to run
+        core (str):             core to simulate, a key of ``CORES``
+        cycles (int):           maximum number of cycles per program
+        window (int):           number of commits listed before a divergence
+        stop (bool):            stop at the first divergence
+        random (int):           number of random programs to run
+        mix (str):              mix of the random programs, a key of ``MIXES``
+        seed (int):             seed of the first random program
+        length (int):           instructions in the loop of a random program
+        iterations (int):       times the loop of a random program runs
+        jobs (int):             worker processes, 0 for one per CPU
+        options:                core configuration, see ``build_core``
+
+    Returns whether every program matched.
+    """
+    batch = itertools.chain(
+        ((path, *load_program(path)) for path in programs),
+        ((f"{mix}-{seed + i}", *workload(length, mix, iterations=iterations, seed=seed + i))
+         for i in range(random)),
+    )
+    ran = failed = 0
+    start = time.perf_counter()
+    for name, res in cosim_many(batch, core, cycles=cycles, window=window, stop=stop,
+                                     jobs=jobs, **options):
+        ran += 1
+        if res.ok:
+            status = "ok" if res.halted else "ok (did not halt)"
+            print(f"{name}: {status}, {res.retired} instructions in {res.cycles} cycles")
+        else:
+            failed += 1
+            print(f"{name}: DIVERGED")
+            print(format_divergence(res.divergence))
+        sys.stdout.flush()
+    print(f"{failed} of {ran} programs diverged in {time.perf_counter() - start:.1f}s")
+    return not failed
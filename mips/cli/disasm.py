@@ -0,0 +1,15 @@
+from mips.util.disasm import disassemble
+from mips.util.image import read_image
+
+def disasm(image: str, base: int = 0):
+    """
+    Print the listing of a program image, one ``address: word  text`` line
+    per word.
+
+    Arguments:
+        image (str):    image to list, see ``read_image``
+        base (int):     address of the first word
+    """
+    words = read_image(image)
+    for i, (word, text) in enumerate(zip(words, disassemble(words, base))):
+        print(f"{base + 4 * i:08x}: {word:08x}  {text}")
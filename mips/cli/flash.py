@@ -1,3 +1,252 @@
+"""
+Build the bitstream of a core running a program and program the board.
 
-def flash(*args):
-    raise NotImplementedError()
\ No newline at end of file
+Synthesis and place and route take minutes, while a firmware change only
+changes the initial contents of the memories. The design is therefore
+built once with random placeholder contents in its program and data
+memories (``PATCHED``), and the placed design is cached by a hash of its
+RTLIL. Flashing another program on the same design only swaps the
+placeholders for the program in the block RAM initialization (``icebram``
+or ``ecpbram``) and packs the bitstream again.
+
+Memories that do not end up in block RAM, such as the program memory of
+the single cycle core, which is read combinatorially, cannot be patched:
+the placeholders are then not found, and the design is built again with
+the program, cached by its own hash.
+"""
+
+from amaranth import *
+from amaranth.back import rtlil
+
+from mips.cpu.imem import InstructionMemory
+from mips.cpu.predecode import predecode_program
+from mips.sim.cores import build_core, load_program
+from mips.util.flow import FAMILIES, FlowError, run_tool
+
+from pathlib import Path
+from typing import *
+
+import hashlib
+import numpy as np
+import os
+import shlex
+import zlib
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "amaranth-mips" / "flash"
+
+PATCHED = {
+    "imem": lambda words, data: words,
+    "imem_predecode": lambda words, data: predecode_program(words),
+    "dmem": lambda words, data: data,
+}
+"Memories of a core whose contents come from the program, and these contents"
+
+
+class PlaceholderNotFound(FlowError):
+    "Raised when the placeholder contents of a memory are not in the placed design"
+
+
+class Board(Elaboratable):
+    """
+    Top level flashed onto the board: the core, with the low byte of the
+    last word it stored on ``leds``.
+
+    Arguments:
+        core (Elaboratable): core with the commit port of ``Core``
+
+    Attributes:
+        leds (Signal[8]):   output low byte of the last word stored
+        halt (Signal):      output, the core halted
+    """
+    def __init__(self, core):
+        self.core = core
+        self.leds = Signal(8)
+        self.halt = Signal()
+
+    def ports(self):
+        return [self.leds, self.halt]
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.core = core = self.core
+        m.d.comb += self.halt.eq(core.halt)
+        for port in ["retire", "retire2"]:
+            if hasattr(core, port):
+                with m.If(getattr(core, port) & getattr(core, f"{port}_store")[0]):
+                    m.d.sync += self.leds.eq(getattr(core, f"{port}_data")[:8])
+        return m
+
+
+def placeholder(name: str, width: int, depth: int) -> List[int]:
+    """
+    Random contents standing for the program in the memory ``name`` while
+    the design is built, the same for every build, and unlikely to show up
+    anywhere else in the bitstream.
+    """
+    rng = np.random.default_rng(zlib.crc32(name.encode()))
+    return [int(word) for word in rng.integers(0, 1 << width, depth, dtype=np.uint64)]
+
+
+def memories(core) -> Dict[str, Memory]:
+    """
+    The memories of ``PATCHED`` that ``core`` has, the ``memory`` of an
+    ``InstructionMemory``.
+    """
+    found = {}
+    for name in PATCHED:
+        memory = getattr(core, name, None)
+        if isinstance(memory, InstructionMemory):
+            memory = memory.memory
+        if memory is not None:
+            found[name] = memory
+    return found
+
+
+def to_hex(words: List[int], width: int) -> str:
+    "Image of ``words`` of ``width`` bits, one per line, as read by the BRAM tools"
+    return "".join(f"{word:0{(width + 3) // 4}x}\n" for word in words)
+
+
+def build(top: Board, family: str = "ice40", freq_mhz: float = 12.0,
+          constraints: Optional[str] = None, cache_dir: Optional[str] = None,
+          rebuild: bool = False) -> Path:
+    """
+    Synthesize, place and route ``top`` unless it was already, and return
+    the build directory holding the placed design (``top.asc`` or
+    ``top.config``). Builds are cached in ``cache_dir`` by a hash of the
+    RTLIL, the family, the clock and the constraints.
+
+    Arguments:
+        top (Board):        design to build
+        family (str):       FPGA family, a key of ``FAMILIES``
+        freq_mhz (float):   clock constraint given to nextpnr
+        constraints (str):  pin constraints file (``.pcf`` or ``.lpf``)
+        cache_dir (str):    where to keep the builds, ``CACHE_DIR`` if ``None``
+        rebuild (bool):     build even if the design is in the cache
+    """
+    if family not in FAMILIES:
+        raise FlowError(f"unknown family {family!r}, expected one of {', '.join(FAMILIES)}")
+    config = FAMILIES[family]
+    flag, suffix = config["placed"]
+
+    text = rtlil.convert(top, name="top", ports=top.ports())
+    pins = Path(constraints).read_text() if constraints else ""
+    key = hashlib.sha256(f"{family}\n{freq_mhz}\n{pins}\n{text}".encode()).hexdigest()[:16]
+    path = Path(cache_dir or CACHE_DIR) / key
+    placed = path / f"top.{suffix}"
+    if placed.exists() and not rebuild:
+        print(f"reusing placed design {key}")
+        return path
+
+    print(f"building {key}")
+    path.mkdir(parents=True, exist_ok=True)
+    placed.unlink(missing_ok=True)
+    (path / "top.il").write_text(text)
+    run_tool(["yosys", "-q", "-p", f"read_rtlil top.il; {config['synth']} -top top -json top.json"],
+             cwd=path)
+    pin_args = [config["constraints"], str(Path(constraints).resolve())] if constraints else \
+        [config["unconstrained"]]
+    run_tool([
+        config["nextpnr"], *config["device"], *pin_args,
+        "--json", "top.json", "--freq", str(freq_mhz), flag, placed.name,
+    ], cwd=path)
+    return path
+
+
+def patch(path: Path, family: str, images: Dict[str, Tuple[int, List[int], List[int]]]) -> Path:
+    """
+    Replace the placeholder contents of every memory in the placed design
+    of the build directory ``path`` with the program, and return the
+    patched placed design. Raises ``PlaceholderNotFound`` if a placeholder
+    is not found, and ``FlowError`` if a tool is missing or fails.
+
+    Arguments:
+        path (Path):    build directory
+        family (str):   FPGA family, a key of ``FAMILIES``
+        images (dict):  ``(width, placeholder, contents)`` of each memory
+    """
+    config = FAMILIES[family]
+    suffix = config["placed"][1]
+    placed = path / f"top.{suffix}"
+    for name, (width, before, after) in images.items():
+        (path / f"{name}.placeholder.hex").write_text(to_hex(before, width))
+        (path / f"{name}.hex").write_text(to_hex(after, width))
+        patched = path / f"top.{name}.{suffix}"
+        if config["bram"] == "icebram":
+            # icebram fails when it replaced nothing
+            try:
+                result = run_tool(["icebram", f"{name}.placeholder.hex", f"{name}.hex"], cwd=path,
+                                  input=placed.read_text())
+            except FlowError as e:
+                if "No memory instances were replaced" in str(e):
+                    raise PlaceholderNotFound(f"{name} is not in block RAM")
+                raise
+            patched.write_text(result.stdout)
+        else:
+            # and ecpbram is checked by what it wrote
+            run_tool(["ecpbram", "-i", placed.name, "-o", patched.name,
+                      "-f", f"{name}.placeholder.hex", "-t", f"{name}.hex"], cwd=path)
+            if patched.read_text() == placed.read_text():
+                raise PlaceholderNotFound(f"{name} is not in block RAM")
+        placed = patched
+    return placed
+
+
+def flash(program: Optional[str] = None, core: str = "pipeline", family: str = "ice40",
+          freq_mhz: float = 12.0, constraints: Optional[str] = None,
+          programmer: Optional[str] = None, cache_dir: Optional[str] = None,
+          rebuild: bool = False, **options) -> Path:
+    """
+    Build the bitstream of ``core`` running ``program`` and program the
+    board with it. Only the memories are patched if the core was built
+    before, see the module documentation.
+
+    Arguments:
+        program (str):      image or ``.s`` source, the demo program if ``None``
+        core (str):         core to build, a key of ``CORES``
+        family (str):       FPGA family, a key of ``FAMILIES``
+        freq_mhz (float):   clock constraint given to nextpnr
+        constraints (str):  pin constraints file (``.pcf`` or ``.lpf``)
+        programmer (str):   command programming the board, given the path of
+                            the bitstream as its last argument, the
+                            programmer of ``family`` if ``None``
+        cache_dir (str):    where to keep the builds, ``CACHE_DIR`` if ``None``
+        rebuild (bool):     build the design even if it is in the cache
+        options:            options of ``build_core``
+
+    Returns the path of the bitstream.
+    """
+    if family not in FAMILIES:
+        raise FlowError(f"unknown family {family!r}, expected one of {', '.join(FAMILIES)}")
+    config = FAMILIES[family]
+    words, data = load_program(program)
+    kwargs = dict(family=family, freq_mhz=freq_mhz, constraints=constraints, cache_dir=cache_dir)
+
+    # the program does not change the design built with placeholders
+    template = Board(build_core(words, data, core=core, **options))
+    images = {}
+    for name, memory in memories(template.core).items():
+        contents = list(PATCHED[name](words, data))
+        before = placeholder(name, memory.width, memory.depth)
+        memory.init = before
+        images[name] = (memory.width, before, contents + [0] * (memory.depth - len(contents)))
+    path = build(template, rebuild=rebuild, **kwargs)
+
+    placed = None
+    if rebuild:
+        (path / "unpatchable").unlink(missing_ok=True)
+    if not (path / "unpatchable").exists():
+        try:
+            placed = patch(path, family, images)
+        except PlaceholderNotFound:
+            (path / "unpatchable").touch()
+    if placed is None:
+        print("memories not in block RAM, building with the program")
+        path = build(Board(build_core(words, data, core=core, **options)), rebuild=rebuild, **kwargs)
+        placed = path / f"top.{config['placed'][1]}"
+
+    bitstream = path / f"top.{config['bitstream']}"
+    run_tool([config["pack"], placed.name, bitstream.name], cwd=path)
+    run_tool(shlex.split(programmer or config["programmer"]) + [str(bitstream)], cwd=path)
+    print(f"flashed {bitstream}")
+    return bitstream
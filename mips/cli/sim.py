@@ -1,2 +1,242 @@
-def simulate(filename: str):
-    raise NotImplementedError()
\ No newline at end of file
+from amaranth.sim import Simulator
+
+from mips.sim.cores import CORES, DEMO_PROGRAM, build_core, load_program, parse_cache
+from mips.sim.internals import simulated_design
+from mips.sim.trace import TraceWriter, Trigger
+from mips.sim.verilator import VerilatorSimulator
+
+from typing import *
+
+import contextlib
+import time
+
+DEFAULT_CYCLES = 1000
+
+BACKENDS = ["python", "verilator"]
+"Simulators a core can run on"
+
+class SimResult(NamedTuple):
+    cycles: int
+    seconds: float
+    halted: bool
+    retired: int = 0
+    hits: int = 0
+    misses: int = 0
+    caches: Tuple[Tuple[str, int, int, int], ...] = ()
+    counters: Dict[str, int] = {}
+
+    @property
+    def rate(self) -> float:
+        "simulated cycles per wall-clock second"
+        return self.cycles / self.seconds if self.seconds else 0.0
+
+    @property
+    def ipc(self) -> float:
+        "instructions retired per simulated cycle"
+        return self.retired / self.cycles if self.cycles else 0.0
+
+    @property
+    def mispredict_rate(self) -> float:
+        "fraction of the resolved branches and jumps that were mispredicted"
+        total = self.hits + self.misses
+        return self.misses / total if total else 0.0
+
+
+def streaming(vcd: Optional[str], signals: Optional[Sequence[str]] = None,
+              start: Optional[Trigger] = None, stop: Optional[Trigger] = None,
+              ring: Optional[int] = None) -> bool:
+    """
+    Whether a trace to ``vcd`` with these options is written by
+    ``TraceWriter`` rather than by the simulator: it is when any option is
+    given, or when ``vcd`` is compressed (``.vcd.gz``, ``.vcd.zst``).
+    """
+    if vcd is None:
+        return False
+    plain = vcd.endswith(".vcd") or vcd.endswith(".fst")
+    return not plain or any(option is not None for option in (signals, start, stop, ring))
+
+
+def run(core, cycles: int = DEFAULT_CYCLES, vcd: Optional[str] = None,
+        backend: str = "python", *, signals: Optional[Sequence[str]] = None,
+        start: Optional[Trigger] = None, stop: Optional[Trigger] = None,
+        ring: Optional[int] = None) -> SimResult:
+    """
+    Simulate ``core`` until it halts or for at most ``cycles`` cycles,
+    writing the trace to ``vcd`` if given.
+
+    ``backend`` is one of ``BACKENDS``: the Amaranth simulator, or the
+    design compiled by Verilator (see ``mips.sim.verilator``), whose build
+    time is not counted.
+
+    ``signals``, ``start``, ``stop`` and ``ring`` select what is traced,
+    see ``TraceWriter``. With any of them, or a compressed ``vcd``, the
+    trace is streamed by ``TraceWriter`` instead of the simulator, which
+    with the verilator backend calls back into Python every cycle.
+    Only the verilator backend writes FST traces, without these options.
+    """
+    if vcd is not None and vcd.endswith(".fst") and backend != "verilator":
+        raise ValueError(f"{vcd}: FST traces are only written by the verilator backend")
+    trace = None
+    if streaming(vcd, signals, start, stop, ring):
+        trace = dict(path=vcd, signals=signals or ("*",), start=start, stop=stop, ring=ring)
+        vcd = None
+    if backend == "verilator":
+        return _run_verilator(core, cycles, vcd, trace)
+    return _run_python(core, cycles, vcd, trace)
+
+
+def _writer(core, design, trace: Optional[dict]) -> Optional[TraceWriter]:
+    # the writer must name the signals of the design being simulated, as
+    # elaborating the core again makes new internal signals
+    if trace is None:
+        return None
+    return TraceWriter(design, **trace, pc=core.retire_pc, retire=core.retire)
+
+
+def _run_python(core, cycles: int, vcd: Optional[str], trace: Optional[dict]) -> SimResult:
+    sim = Simulator(core)
+    sim.add_clock(1e-6)
+    writer = _writer(core, simulated_design(sim), trace)
+
+    ran = 0
+    retired = 0
+    halted = False
+    hits = misses = 0
+    caches = []
+    counters = {}
+    retire2 = getattr(core, "retire2", None)
+
+    def bench():
+        nonlocal ran, retired, halted, hits, misses
+        for _ in range(cycles):
+            if writer is not None:
+                writer.sample(ran, (yield writer.value))
+            retired += yield core.retire
+            if retire2 is not None:
+                retired += yield retire2
+            yield
+            ran += 1
+            if (yield core.halt):
+                halted = True
+                break
+        predictor = getattr(core, "predictor", None)
+        if predictor is not None:
+            hits = yield predictor.hits
+            misses = yield predictor.misses
+        for name in ("icache", "dcache"):
+            cache = getattr(core, name, None)
+            if cache is not None:
+                caches.append((name, (yield cache.hits), (yield cache.misses),
+                               (yield cache.writebacks)))
+        counters.update((yield from core.perf.peek()))
+
+    sim.add_sync_process(bench)
+
+    start = time.perf_counter()
+    with sim.write_vcd(vcd) if vcd is not None else writer or contextlib.nullcontext():
+        sim.run()
+    return SimResult(ran, time.perf_counter() - start, halted, retired, hits, misses,
+                     tuple(caches), counters)
+
+
+def _run_verilator(core, cycles: int, vcd: Optional[str], trace: Optional[dict]) -> SimResult:
+    sim = VerilatorSimulator(core)
+    writer = _writer(core, sim.design.prepared, trace)
+    with sim.write_vcd(vcd) if vcd is not None else writer or contextlib.nullcontext():
+        sim.build()
+        start = time.perf_counter()
+        if writer is None:
+            ran, retired = sim.run_cycles(cycles, stop=core.halt, count=core.retire)
+        else:
+            ran = retired = 0
+            while ran < cycles:
+                writer.sample(ran, sim.peek(writer.value))
+                retired += sim.peek(core.retire)
+                if hasattr(core, "retire2"):
+                    retired += sim.peek(core.retire2)
+                sim.tick()
+                ran += 1
+                if sim.peek(core.halt):
+                    break
+        seconds = time.perf_counter() - start
+    hits = misses = 0
+    predictor = getattr(core, "predictor", None)
+    if predictor is not None:
+        hits = sim.peek(predictor.hits)
+        misses = sim.peek(predictor.misses)
+    caches = []
+    for name in ("icache", "dcache"):
+        cache = getattr(core, name, None)
+        if cache is not None:
+            caches.append((name, sim.peek(cache.hits), sim.peek(cache.misses),
+                           sim.peek(cache.writebacks)))
+    counters = {name: sim.peek(counter) for name, counter in core.perf.counters.items()}
+    if writer is None and hasattr(core, "retire2"):
+        # the second instructions of the pairs were not counted
+        retired += counters["dual_issue"]
+    res = SimResult(ran, seconds, bool(sim.peek(core.halt)), retired, hits, misses, tuple(caches),
+                    counters)
+    sim.close()
+    return res
+
+
+def simulate(filename: str, program: Optional[str] = None, cycles: int = DEFAULT_CYCLES,
+             core: str = "single", predictor: Optional[str] = None,
+             bht_entries: int = 64, btb_entries: int = 16,
+             icache: Optional[str] = None, dcache: Optional[str] = None,
+             replacement: str = "lru", mem_latency: int = 8, muldiv: str = "balanced",
+             backend: str = "python", signals: Optional[Sequence[str]] = None,
+             start: Optional[str] = None, stop: Optional[str] = None,
+             ring: Optional[int] = None, predecode: bool = False):
+    """
+    Run a program on the core and write the trace to ``filename``.
+
+    The simulation stops after ``cycles`` cycles or once the core halts,
+    and then reports the throughput of the simulator, the IPC, the
+    mispredict rate of the branch predictor and hit rates of the caches
+    if there are any, and the performance counters of the core.
+
+    Arguments:
+        filename (str):     VCD file to write, or ``None`` for no trace
+        program (str):      image (see ``read_image``) or ``.s`` source to
+                            run, defaults to ``DEMO_PROGRAM``
+        cycles (int):       maximum number of cycles to simulate
+        core (str):         core to simulate, a key of ``CORES``
+        predictor (str):    branch predictor of the pipelined core, one of
+                            ``PREDICTORS`` or ``None``
+        bht_entries (int):  number of 2-bit counters of the predictor
+        btb_entries (int):  number of BTB entries of the predictor
+        icache (str):       instruction cache as ``SETSxWAYSxWORDS``, or ``None``
+        dcache (str):       data cache as ``SETSxWAYSxWORDS``, or ``None``
+        replacement (str):  replacement policy of the caches
+        mem_latency (int):  cycles per word of the memories behind the caches
+        muldiv (str):       multiply/divide unit, a key of ``MULDIV_CONFIGS``
+        backend (str):      simulator, one of ``BACKENDS``; with
+                            ``verilator`` a ``.fst`` trace is written as FST
+        signals (list[str]): patterns of the signal names to trace
+        start (str):        trigger starting the trace, see ``Trigger.parse``
+        stop (str):         trigger stopping the trace
+        ring (int):         only trace the last ``ring`` cycles
+        predecode (bool):   keep predecoded fields next to the program of
+                            the pipelined core
+    """
+    words, data = load_program(program)
+    res = run(build_core(words, data, core, predictor, bht_entries, btb_entries,
+                         icache, dcache, replacement, mem_latency, muldiv, predecode), cycles, filename,
+              backend, signals=signals,
+              start=Trigger.parse(start) if start is not None else None,
+              stop=Trigger.parse(stop) if stop is not None else None, ring=ring)
+
+    status = "halted" if res.halted else "stopped"
+    print(f"{status} after {res.cycles} cycles in {res.seconds:.3f}s "
+          f"({res.rate:.1f} cycles/sec)")
+    print(f"retired {res.retired} instructions (IPC {res.ipc:.3f})")
+    if predictor is not None:
+        print(f"{predictor} predictor: {res.hits} hits, {res.misses} misses "
+              f"({100 * res.mispredict_rate:.1f}% mispredicted)")
+    for name, hits, misses, writebacks in res.caches:
+        rate = hits / (hits + misses) if hits + misses else 0.0
+        print(f"{name}: {hits} hits, {misses} misses ({100 * rate:.1f}% hit rate), "
+              f"{writebacks} write backs")
+    print("counters: " + ", ".join(f"{name} {count}" for name, count in res.counters.items()))
+    return res
@@ -1,3 +1,198 @@
+from amaranth import Value
 
-def synth(*args):
-    raise NotImplementedError()
\ No newline at end of file
+from mips.cpu.alu import ALU, SwitchALU
+from mips.cpu.decoder import Decoder
+from mips.cpu.imem import InstructionMemory
+from mips.cpu.muldiv import MULDIV_CONFIGS, MulDiv
+from mips.cpu.regfile import RegisterFile
+from mips.sim.cores import DEMO_PROGRAM, build_core
+from mips.util.flow import FlowError, Registered, synthesize
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import *
+
+import json
+import subprocess
+
+METRICS = ["lut", "ff", "lutram", "bram", "dsp"]
+"Resource counts reported and tracked, ``fmax_mhz`` is tracked as well"
+
+
+def _alu(design=ALU, **kwargs):
+    def build():
+        alu = design(**kwargs)
+        inputs = [alu.rs, alu.rt, alu.shamt, alu.func]
+        if kwargs.get("registered"):
+            # the outputs already come out of flip-flops
+            top = Registered(alu, inputs, [])
+            return top, top.ports() + [alu.rd, alu.ovf]
+        top = Registered(alu, inputs, [alu.rd, alu.ovf])
+        return top, top.ports()
+    return build
+
+
+def _decoder():
+    decoder = Decoder()
+    top = Registered(decoder, [decoder.inst], [
+        decoder.opcode, decoder.rs, decoder.rt, decoder.rd,
+        decoder.funct, decoder.shamt, decoder.imm, decoder.addr,
+    ])
+    return top, top.ports()
+
+
+def _regfile():
+    regfile = RegisterFile()
+    top = Registered(regfile, regfile.raddr + regfile.waddr + regfile.wen + regfile.wdata,
+                     regfile.rdata)
+    return top, top.ports()
+
+
+def _imem():
+    imem = InstructionMemory(DEMO_PROGRAM, data_port=True)
+    return imem, imem.ports()
+
+
+def _muldiv():
+    muldiv = MulDiv(**MULDIV_CONFIGS["balanced"])
+    return muldiv, [Value.cast(port) for port in muldiv.ports()]
+
+
+def _core(core: str, **options):
+    def build():
+        top = build_core(DEMO_PROGRAM, core=core, **options)
+        return top, top.ports()
+    return build
+
+
+TARGETS = {
+    "core": _core("single"),
+    "pipeline": _core("pipeline"),
+    "pipeline_predecode": _core("pipeline", predecode=True),
+    "dual": _core("dual"),
+    "alu": _alu(),
+    "alu_registered": _alu(registered=True),
+    "alu_switch": _alu(SwitchALU),
+    "decoder": _decoder,
+    "regfile": _regfile,
+    "imem": _imem,
+    "muldiv": _muldiv,
+}
+"""
+Designs that can be synthesized, by name: each builds ``(design, ports)``.
+The combinatorial units are wrapped in ``Registered`` to get an fmax.
+``alu_switch`` is the ALU before its datapath was shared, to compare with.
+"""
+
+
+def git_commit() -> Optional[str]:
+    """
+    Hash of the checked out commit, followed by ``-dirty`` if the tree has
+    changes, or ``None`` outside of a git repository.
+    """
+    try:
+        head = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return head.stdout.strip() + ("-dirty" if status.stdout.strip() else "")
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Relative change of every tracked metric from ``before`` to ``after``,
+    signed so that a positive value is a regression: more resources, or a
+    lower fmax. Metrics missing from either report are left out.
+    """
+    changes = {}
+    for metric in METRICS + ["fmax_mhz"]:
+        old, new = before.get(metric), after.get(metric)
+        if old is None or new is None:
+            continue
+        if old == 0:
+            change = float("inf") if new > 0 else 0.0
+        else:
+            change = (new - old) / old
+        changes[metric] = -change if metric == "fmax_mhz" else change
+    return changes
+
+
+def last_entry(history: str, target: str, family: str) -> Optional[Dict[str, Any]]:
+    """
+    Most recent report of ``target`` on ``family`` in the ``history`` file,
+    one JSON report per line.
+    """
+    path = Path(history)
+    if not path.exists():
+        return None
+    last = None
+    for line in path.read_text().splitlines():
+        if line.strip():
+            entry = json.loads(line)
+            if entry.get("target") == target and entry.get("family") == family:
+                last = entry
+    return last
+
+
+def _format(report: Dict[str, Any]) -> str:
+    fmax = f"{report['fmax_mhz']:.1f} MHz" if report["fmax_mhz"] else "-"
+    return "  ".join(f"{metric.upper()} {report[metric]}" for metric in METRICS) + f"  fmax {fmax}"
+
+
+def synth(targets: Sequence[str] = ("core",), family: str = "ecp5", pnr: bool = True,
+          freq_mhz: float = 12.0, build_dir: str = "build", report: str = "synth.json",
+          history: Optional[str] = None, max_regression: Optional[float] = None) -> bool:
+    """
+    Synthesize each target with Yosys, place and route it with nextpnr,
+    print its resource usage and fmax, and write them all to ``report``.
+    The RTLIL, Verilog and netlist of every target are kept in
+    ``build_dir/<target>``.
+
+    With ``history``, each report is also appended to that file along with
+    the commit it was built from, and compared with the previous report of
+    the same target and family.
+
+    Arguments:
+        targets (list[str]):    keys of ``TARGETS``
+        family (str):           FPGA family, a key of ``FAMILIES``
+        pnr (bool):             run place and route to get the fmax
+        freq_mhz (float):       clock constraint given to nextpnr
+        build_dir (str):        where to keep the build files
+        report (str):           JSON report to write
+        history (str):          JSON lines file tracking reports over commits
+        max_regression (float): largest relative regression of any metric
+                                accepted against the history, e.g. 0.05
+
+    Returns whether no metric regressed by more than ``max_regression``.
+    """
+    commit = git_commit()
+    date = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    reports = {}
+    ok = True
+    for target in targets:
+        if target not in TARGETS:
+            raise FlowError(f"unknown target {target!r}, expected one of {', '.join(TARGETS)}")
+        design, ports = TARGETS[target]()
+        res = synthesize(design, ports, family=family, pnr=pnr, freq_mhz=freq_mhz,
+                         build_dir=str(Path(build_dir) / target), name="top")
+        res = {"target": target, "commit": commit, "date": date, **res}
+        reports[target] = res
+        print(f"{target:14} {_format(res)}")
+
+        if history is None:
+            continue
+        previous = last_entry(history, target, family)
+        if previous is not None:
+            changes = compare(previous, res)
+            worst = max(changes.values(), default=0.0)
+            moved = [f"{metric} {100 * change:+.1f}%" for metric, change in changes.items() if change]
+            print(f"{'':14} vs {(previous.get('commit') or '?')[:12]}: {', '.join(moved) or 'no change'}")
+            if max_regression is not None and worst > max_regression:
+                print(f"{'':14} REGRESSION over {100 * max_regression:.1f}%")
+                ok = False
+        with open(history, "a") as f:
+            f.write(json.dumps(res, sort_keys=True) + "\n")
+
+    Path(report).write_text(json.dumps(reports, indent=2, sort_keys=True) + "\n")
+    return ok
@@ -1,10 +1,7 @@
 from amaranth import *
-from amaranth.sim import Simulator, Settle, Delay
 
 from mips.cpu.isa import Funct
 
-import random
-
 class ALU(Elaboratable):
     """
     Arithmetic Logic Unit
@@ -18,10 +15,137 @@ class ALU(Elaboratable):
     and then reading the result. Same for SLL vs SLLV, where one parses
     a total amount from the instruction and the other from the lower bits
     of a register.
+
+    Shifts follow the MIPS operand order: the value being shifted is ``rt``,
+    and the amount is either ``shamt`` or the low 5 bits of ``rs``.
+
+    Every function shares one of three units, so that the critical path
+    goes through a single adder or shifter followed by the result mux:
+
+    * one 32-bit adder computes ``rs + rt`` and, with ``rt`` inverted and
+      a carry in, ``rs - rt``; ``SLT`` and ``SLTU`` read the sign and the
+      carry out of the subtraction;
+    * one right barrel shifter handles every shift, a left shift being a
+      right shift of the bit reversed value;
+    * the bitwise functions.
+
+    With ``registered`` the outputs are registered, and are those of the
+    inputs of the previous cycle.
+
+    Arguments:
+        registered (bool):  add an output register stage
+
+    Attributes:
+        rs (Signal[32]):    input signal 1
+        rt (Signal[32]):    input signal 2
+        shamt (Signal[5]):  constant shift amount
+        func (Signal[6]):   input signal specifying function
+        rd (Signal[32]):    output signal
+        ovf (Signal): overflow signal (used for signalling traps)
+        latency (int):      cycles from the inputs to the outputs
+    """
+    def __init__(self, *, registered=False):
+        self.registered = registered
+        self.latency = 1 if registered else 0
+        # input
+        self.rs = Signal(32)
+        self.rt = Signal(32)
+        self.shamt = Signal(5)
+        self.func = Signal(Funct)
+        # output
+        self.rd = Signal(32)
+        self.ovf = Signal()
+
+    def elaborate(self, platform):
+        m = Module()
+        func = self.func.as_value()
+
+        # Adder/subtractor
+        sub = Signal()
+        operand = Signal(32)
+        total = Signal(33)
+        overflow = Signal()
+        m.d.comb += [
+            sub.eq(func.matches(Funct.SUB, Funct.SUBU, Funct.SLT, Funct.SLTU)),
+            operand.eq(self.rt ^ sub.replicate(32)),
+            total.eq(self.rs + operand + sub),
+            overflow.eq((self.rs[-1] == operand[-1]) & (total[31] != self.rs[-1])),
+        ]
+
+        # Shifter
+        left = Signal()
+        amount = Signal(5)
+        value = Signal(32)
+        shifted = Signal(32)
+        m.d.comb += [
+            left.eq(func.matches(Funct.SLL, Funct.SLLV)),
+            amount.eq(Mux(func.matches(Funct.SLLV, Funct.SRLV, Funct.SRAV), self.rs[:5], self.shamt)),
+            value.eq(Mux(left, self.rt[::-1], self.rt)),
+            shifted.eq(Cat(value, (func.matches(Funct.SRA, Funct.SRAV) & self.rt[-1]).replicate(32)) >> amount),
+        ]
+
+        rd = Signal(32)
+        ovf = Signal()
+        with m.Switch(self.func):
+            with m.Case(Funct.ADD, Funct.SUB):
+                m.d.comb += [
+                    rd.eq(total),
+                    ovf.eq(overflow),
+                ]
+            with m.Case(Funct.ADDU, Funct.SUBU):
+                m.d.comb += rd.eq(total)
+            # Logical combinators
+            with m.Case(Funct.AND):
+                m.d.comb += rd.eq(self.rs & self.rt)
+            with m.Case(Funct.OR):
+                m.d.comb += rd.eq(self.rs | self.rt)
+            with m.Case(Funct.XOR):
+                m.d.comb += rd.eq(self.rs ^ self.rt)
+            with m.Case(Funct.NOR):
+                m.d.comb += rd.eq(~(self.rs | self.rt))
+            # Shifts
+            with m.Case(Funct.SLL, Funct.SLLV):
+                m.d.comb += rd.eq(shifted[::-1])
+            with m.Case(Funct.SRL, Funct.SRLV, Funct.SRA, Funct.SRAV):
+                m.d.comb += rd.eq(shifted)
+            # less than
+            with m.Case(Funct.SLT):
+                m.d.comb += rd.eq(total[31] ^ overflow)
+            with m.Case(Funct.SLTU):
+                m.d.comb += rd.eq(~total[32])
+
+        domain = m.d.sync if self.registered else m.d.comb
+        domain += [
+            self.rd.eq(rd),
+            self.ovf.eq(ovf),
+        ]
+
+        return m
+
+
+class SwitchALU(Elaboratable):
+    """
+    Arithmetic Logic Unit with a separate datapath per function: the
+    original ``ALU``, kept as the baseline its synthesis results are
+    compared against.
+
+    The design of this unit is currently outputs *both* if the operation
+    would trap and the result. It's expected that the consumer of the ALU
+    module should perform logic on the output of ``ovf`` before routing.
+
+    It's possible that immediate operations (like ``adi``) can be routed in
+    via performing the logic to push them into the register,
+    and then reading the result. Same for SLL vs SLLV, where one parses
+    a total amount from the instruction and the other from the lower bits
+    of a register.
+
+    Shifts follow the MIPS operand order: the value being shifted is ``rt``,
+    and the amount is either ``shamt`` or the low 5 bits of ``rs``.
     
     Attributes:
         rs (Signal[32]):    input signal 1
         rt (Signal[32]):    input signal 2
+        shamt (Signal[5]):  constant shift amount
         func (Signal[6]):   input signal specifying function
         rd (Signal[32]):    output signal
         ovf (Signal): overflow signal (used for signalling traps)
@@ -79,17 +203,17 @@ class ALU(Elaboratable):
                 m.d.comb += self.rd.eq( ~ (self.rs | self.rt) )
             # Shifts
             with m.Case(Funct.SLL):
-                m.d.comb += self.rd.eq(self.rs << self.shamt)
+                m.d.comb += self.rd.eq(self.rt << self.shamt)
             with m.Case(Funct.SLLV):
-                m.d.comb += self.rd.eq(self.rs << self.rt[:6])
+                m.d.comb += self.rd.eq(self.rt << self.rs[:5])
             with m.Case(Funct.SRA):
-                m.d.comb += self.rd.eq(self.rs >> self.shamt)
+                m.d.comb += self.rd.eq(self.rt.as_signed() >> self.shamt)
             with m.Case(Funct.SRAV):
-                m.d.comb += self.rd.eq(self.rs >> self.rt[:6])
+                m.d.comb += self.rd.eq(self.rt.as_signed() >> self.rs[:5])
             with m.Case(Funct.SRL):
-                m.d.comb += self.rd.eq(self.rs.as_signed() >> self.rt[:6])
+                m.d.comb += self.rd.eq(self.rt >> self.shamt)
             with m.Case(Funct.SRLV):
-                m.d.comb += self.rd.eq(self.rs.as_signed() >> self.rt[:6])
+                m.d.comb += self.rd.eq(self.rt >> self.rs[:5])
             # less than
             with m.Case(Funct.SLT):
                 m.d.comb += self.rd.eq( self.rs.as_signed() < self.rt.as_signed() )
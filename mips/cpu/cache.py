@@ -0,0 +1,402 @@
+from amaranth import *
+
+__all__ = [
+    "REPLACEMENT",
+    "MainMemory",
+    "Cache",
+]
+
+REPLACEMENT = ["lru", "plru"]
+"Replacement policies available to ``Cache``"
+
+
+class MainMemory(Elaboratable):
+    """
+    Model of the slow main memory behind a cache: every word access
+    takes ``latency`` cycles.
+
+    A request is held with the same address until ``ack``, which is high
+    for the last cycle of the access. Reads return ``rdata`` with the
+    ``ack`` and writes happen at the end of that cycle.
+
+    Arguments:
+        memory (Memory):    contents of the main memory
+        latency (int):      cycles taken by an access, at least 1
+
+    Attributes:
+        addr (Signal[30]):  input word address
+        req (Signal):       input, access ``addr``
+        we (Signal):        input, the access writes ``wdata``
+        wdata (Signal[32]): input word to write
+        rdata (Signal[32]): output word read
+        ack (Signal):       output, the access completes this cycle
+    """
+    def __init__(self, memory, latency=8):
+        assert latency >= 1
+        self.memory = memory
+        self.latency = latency
+
+        self.addr = Signal(30)
+        self.req = Signal()
+        self.we = Signal()
+        self.wdata = Signal(32)
+        self.rdata = Signal(32)
+        self.ack = Signal()
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.read = read = self.memory.read_port(domain="comb")
+        m.submodules.write = write = self.memory.write_port()
+
+        count = Signal(range(self.latency))
+        with m.If(self.req):
+            with m.If(count == self.latency - 1):
+                m.d.comb += self.ack.eq(1)
+                m.d.sync += count.eq(0)
+            with m.Else():
+                m.d.sync += count.eq(count + 1)
+        with m.Else():
+            m.d.sync += count.eq(0)
+
+        m.d.comb += [
+            read.addr.eq(self.addr),
+            self.rdata.eq(read.data),
+            write.addr.eq(self.addr),
+            write.data.eq(self.wdata),
+            write.en.eq(self.ack & self.we),
+        ]
+
+        return m
+
+
+class Cache(Elaboratable):
+    """
+    Set associative, write back and write allocate cache, used both as
+    the instruction and the data cache of the ``PipelinedCore``. One way
+    makes it direct mapped.
+
+    Tags and data are kept in ``Memory`` blocks with synchronous read
+    ports, one of each per way, so that they map onto block RAM. An access
+    is presented with ``en`` and answered the next cycle: on a hit ``rdata``
+    is valid and a store is written, on a miss ``busy`` is raised while the
+    victim line is written back (if dirty) and the line is refilled from
+    ``MainMemory``, after which the access is retried and hits. The core
+    must hold ``en`` low while ``busy``, and as long as ``en`` stays low the
+    answer to the last access is held.
+
+    The victim is the first invalid way, or the one picked by the
+    replacement policy: true LRU (``lru``) keeps the age of every way of a
+    set, tree pseudo-LRU (``plru``) keeps one bit per node of a binary
+    tree over the ways.
+
+    Arguments:
+        sets (int):         number of sets, a power of 2
+        ways (int):         associativity, a power of 2
+        line_words (int):   words per line, a power of 2
+        replacement (str):  one of ``REPLACEMENT``
+
+    Attributes:
+        addr (Signal[30]):      input word address of the access
+        en (Signal):            input, take a new access (``req``)
+        req (Signal):           input, there is an access; an ``en`` without
+                                ``req`` is a bubble
+        wmask (Signal[4]):      input byte enables of a store, 0 for a load
+        wdata (Signal[32]):     input value of a store
+        rdata (Signal[32]):     output word read by the last access
+        busy (Signal):          output, the last access is being served
+        miss (Signal):          output, the last access missed (for the
+                                first cycle of ``busy`` only)
+        mem_addr, mem_req, mem_we, mem_wdata, mem_rdata, mem_ack:
+                                bus to the ``MainMemory`` attributes of
+                                the same name
+        hits (Signal[32]):      output number of accesses that hit
+        misses (Signal[32]):    output number of accesses that missed
+        writebacks (Signal[32]): output number of dirty lines written back
+    """
+    def __init__(self, *, sets=16, ways=1, line_words=4, replacement="lru"):
+        for n in (sets, ways, line_words):
+            assert n >= 1 and n & (n - 1) == 0, "cache geometry must be powers of 2"
+        assert replacement in REPLACEMENT, f"unknown replacement {replacement!r}"
+        self.sets = sets
+        self.ways = ways
+        self.line_words = line_words
+        self.replacement = replacement
+
+        self.set_bits = sets.bit_length() - 1
+        self.offset_bits = line_words.bit_length() - 1
+        self.tag_bits = 30 - self.set_bits - self.offset_bits
+        self.way_bits = ways.bit_length() - 1
+
+        # cpu side
+        self.addr = Signal(30)
+        self.en = Signal()
+        self.req = Signal()
+        self.wmask = Signal(4)
+        self.wdata = Signal(32)
+        self.rdata = Signal(32)
+        self.busy = Signal()
+        self.miss = Signal()
+        # memory side
+        self.mem_addr = Signal(30)
+        self.mem_req = Signal()
+        self.mem_we = Signal()
+        self.mem_wdata = Signal(32)
+        self.mem_rdata = Signal(32)
+        self.mem_ack = Signal()
+        # statistics
+        self.hits = Signal(32)
+        self.misses = Signal(32)
+        self.writebacks = Signal(32)
+
+        # tag entry: valid, dirty and tag
+        self.tags = [Memory(width=2 + self.tag_bits, depth=sets, name=f"tag{w}") for w in range(ways)]
+        self.data = [Memory(width=32, depth=sets * line_words, name=f"data{w}") for w in range(ways)]
+
+        if replacement == "lru":
+            width = max(ways * self.way_bits, 1)
+            reset = sum(w << (w * self.way_bits) for w in range(ways))
+        else:
+            width = max(ways - 1, 1)
+            reset = 0
+        self.state = Array(Signal(width, reset=reset, name=f"repl{s}") for s in range(sets))
+
+    def ports(self):
+        return [
+            self.addr, self.en, self.req, self.wmask, self.wdata, self.rdata, self.busy, self.miss,
+            self.mem_addr, self.mem_req, self.mem_we, self.mem_wdata, self.mem_rdata, self.mem_ack,
+            self.hits, self.misses, self.writebacks,
+        ]
+
+    def peek(self, addr: int, memory):
+        """
+        Simulation helper returning the word at ``addr``, from the cache if
+        it holds the line and from ``memory`` otherwise, use as
+        ``value = yield from cache.peek(addr, memory)``.
+        """
+        offset = addr & (self.line_words - 1)
+        index = (addr >> self.offset_bits) & (self.sets - 1)
+        tag = addr >> (self.offset_bits + self.set_bits)
+        for w in range(self.ways):
+            entry = yield self.tags[w][index]
+            if entry & 1 and entry >> 2 == tag:
+                return (yield self.data[w][index * self.line_words + offset])
+        return (yield memory[addr % memory.depth])
+
+    def _touch(self, m, state, way):
+        # Replacement state of a set after an access to ``way``
+        new = Signal(len(self.state[0]))
+        m.d.comb += new.eq(state)
+        if self.ways == 1:
+            return new
+        b = self.way_bits
+        with m.Switch(way):
+            for w in range(self.ways):
+                with m.Case(w):
+                    if self.replacement == "lru":
+                        age = state[w * b:(w + 1) * b]
+                        for v in range(self.ways):
+                            other = state[v * b:(v + 1) * b]
+                            m.d.comb += new[v * b:(v + 1) * b].eq(
+                                0 if v == w else Mux(other < age, other + 1, other))
+                    else:
+                        node = 0
+                        for level in range(b):
+                            bit = (w >> (b - 1 - level)) & 1
+                            m.d.comb += new[node].eq(1 - bit)
+                            node = 2 * node + 1 + bit
+        return new
+
+    def _victim(self, state):
+        # Way picked by the replacement policy
+        if self.ways == 1:
+            return C(0, 1)
+        b = self.way_bits
+        if self.replacement == "lru":
+            victim = C(0, b)
+            for v in reversed(range(self.ways)):
+                victim = Mux(state[v * b:(v + 1) * b] == self.ways - 1, v, victim)
+            return victim
+
+        def pick(node, low, size):
+            if size == 1:
+                return C(low, b)
+            half = size // 2
+            return Mux(state[node], pick(2 * node + 2, low + half, half), pick(2 * node + 1, low, half))
+        return pick(0, 0, self.ways)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        tag_reads = []
+        tag_writes = []
+        data_reads = []
+        data_writes = []
+        for w in range(self.ways):
+            tag_read = self.tags[w].read_port(transparent=True)
+            tag_write = self.tags[w].write_port()
+            data_read = self.data[w].read_port(transparent=True)
+            data_write = self.data[w].write_port(granularity=8)
+            m.submodules[f"tag{w}_read"] = tag_read
+            m.submodules[f"tag{w}_write"] = tag_write
+            m.submodules[f"data{w}_read"] = data_read
+            m.submodules[f"data{w}_write"] = data_write
+            tag_reads.append(tag_read)
+            tag_writes.append(tag_write)
+            data_reads.append(data_read)
+            data_writes.append(data_write)
+
+        # Access being answered
+        req_valid = Signal()
+        req_fresh = Signal()
+        req_addr = Signal(30)
+        req_wmask = Signal(4)
+        req_wdata = Signal(32)
+
+        line_bits = self.offset_bits + self.set_bits
+        req_set = req_addr[self.offset_bits:line_bits]
+        req_tag = req_addr[line_bits:]
+
+        # Lookup
+        hit = Signal()
+        hit_way = Signal(max(self.way_bits, 1))
+        valid = Cat(read.data[0] for read in tag_reads)
+        for w in reversed(range(self.ways)):
+            entry = tag_reads[w].data
+            with m.If(entry[0] & (entry[2:] == req_tag)):
+                m.d.comb += [
+                    hit.eq(1),
+                    hit_way.eq(w),
+                ]
+
+        m.d.comb += self.rdata.eq(Array(read.data for read in data_reads)[hit_way])
+
+        state = self.state[req_set]
+
+        victim = Signal.like(hit_way)
+        m.d.comb += victim.eq(self._victim(state))
+        for w in reversed(range(self.ways)):
+            with m.If(~valid[w]):
+                m.d.comb += victim.eq(w)
+
+        # Miss handling
+        way = Signal.like(hit_way)
+        victim_tag = Signal(self.tag_bits)
+        word = Signal(range(self.line_words))
+        last = word == self.line_words - 1
+
+        for w in range(self.ways):
+            m.d.comb += [
+                tag_reads[w].addr.eq(self.addr[self.offset_bits:line_bits]),
+                tag_reads[w].en.eq(self.en),
+                data_reads[w].addr.eq(self.addr[:line_bits]),
+                data_reads[w].en.eq(self.en),
+            ]
+
+        with m.FSM():
+            with m.State("LOOKUP"):
+                with m.If(req_valid & hit):
+                    m.d.sync += state.eq(self._touch(m, state, hit_way))
+                    with m.If(req_fresh):
+                        m.d.sync += self.hits.eq(self.hits + 1)
+                    with m.If(req_wmask.any()):
+                        for w in range(self.ways):
+                            with m.If(hit_way == w):
+                                m.d.comb += [
+                                    data_writes[w].addr.eq(req_addr[:line_bits]),
+                                    data_writes[w].data.eq(req_wdata),
+                                    data_writes[w].en.eq(req_wmask),
+                                    tag_writes[w].addr.eq(req_set),
+                                    tag_writes[w].data.eq(Cat(C(0b11, 2), req_tag)),
+                                    tag_writes[w].en.eq(1),
+                                ]
+                with m.Elif(req_valid):
+                    m.d.comb += [
+                        self.busy.eq(1),
+                        self.miss.eq(1),
+                    ]
+                    entry = Array(read.data for read in tag_reads)[victim]
+                    m.d.sync += [
+                        self.misses.eq(self.misses + 1),
+                        way.eq(victim),
+                        victim_tag.eq(entry[2:]),
+                        word.eq(0),
+                    ]
+                    with m.If(entry[0] & entry[1]):
+                        m.d.sync += self.writebacks.eq(self.writebacks + 1)
+                        m.next = "WB_READ"
+                    with m.Else():
+                        m.next = "REFILL"
+
+            with m.State("WB_READ"):
+                m.d.comb += self.busy.eq(1)
+                for w in range(self.ways):
+                    m.d.comb += [
+                        data_reads[w].addr.eq(Cat(word, req_set)),
+                        data_reads[w].en.eq(way == w),
+                        tag_reads[w].en.eq(0),
+                    ]
+                m.next = "WB_WRITE"
+
+            with m.State("WB_WRITE"):
+                m.d.comb += [
+                    self.busy.eq(1),
+                    self.mem_addr.eq(Cat(word, req_set, victim_tag)),
+                    self.mem_req.eq(1),
+                    self.mem_we.eq(1),
+                    self.mem_wdata.eq(Array(read.data for read in data_reads)[way]),
+                ]
+                with m.If(self.mem_ack):
+                    m.d.sync += word.eq(word + 1)
+                    with m.If(last):
+                        m.next = "REFILL"
+                    with m.Else():
+                        m.next = "WB_READ"
+
+            with m.State("REFILL"):
+                m.d.comb += [
+                    self.busy.eq(1),
+                    self.mem_addr.eq(Cat(word, req_set, req_tag)),
+                    self.mem_req.eq(1),
+                ]
+                with m.If(self.mem_ack):
+                    for w in range(self.ways):
+                        with m.If(way == w):
+                            m.d.comb += [
+                                data_writes[w].addr.eq(Cat(word, req_set)),
+                                data_writes[w].data.eq(self.mem_rdata),
+                                data_writes[w].en.eq(0b1111),
+                            ]
+                            with m.If(last):
+                                m.d.comb += [
+                                    tag_writes[w].addr.eq(req_set),
+                                    tag_writes[w].data.eq(Cat(C(0b01, 2), req_tag)),
+                                    tag_writes[w].en.eq(1),
+                                ]
+                    m.d.sync += word.eq(word + 1)
+                    with m.If(last):
+                        m.next = "REPLAY"
+
+            with m.State("REPLAY"):
+                m.d.comb += self.busy.eq(1)
+                for w in range(self.ways):
+                    m.d.comb += [
+                        tag_reads[w].addr.eq(req_set),
+                        tag_reads[w].en.eq(1),
+                        data_reads[w].addr.eq(req_addr[:line_bits]),
+                        data_reads[w].en.eq(1),
+                    ]
+                m.next = "LOOKUP"
+
+        with m.If(req_valid):
+            m.d.sync += req_fresh.eq(0)
+        with m.If(self.en):
+            m.d.sync += [
+                req_valid.eq(self.req),
+                req_fresh.eq(self.req),
+                req_addr.eq(self.addr),
+                req_wmask.eq(self.wmask),
+                req_wdata.eq(self.wdata),
+            ]
+
+        return m
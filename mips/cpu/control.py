@@ -0,0 +1,288 @@
+from amaranth import *
+from amaranth.lib import enum
+
+from mips.cpu.isa import *
+
+__all__ = [
+    "Branch",
+    "MemSize",
+    "WbSel",
+    "MulDivOp",
+    "Control",
+]
+
+class Branch(enum.Enum, shape=3):
+    """
+    Condition used to resolve a conditional branch
+    """
+    NONE = 0
+    EQ = 1
+    NE = 2
+    LEZ = 3
+    GTZ = 4
+
+
+class MemSize(enum.Enum, shape=2):
+    """
+    Width of a load or a store
+    """
+    BYTE = 0
+    HALF = 1
+    WORD = 2
+
+
+class WbSel(enum.Enum, shape=3):
+    """
+    Source of the value written back to the register file
+    """
+    ALU = 0
+    MEM = 1
+    LINK = 2
+    LLO = 3
+    LHI = 4
+    HI = 5
+    LO = 6
+
+
+class MulDivOp(enum.Enum, shape=3):
+    """
+    Operation started on the multiply/divide unit
+    """
+    NONE = 0
+    MULT = 1
+    MULTU = 2
+    DIV = 3
+    DIVU = 4
+    MTHI = 5
+    MTLO = 6
+
+
+IMM_FUNCT = {
+    Opcode.ADDI: Funct.ADD,
+    Opcode.ADDIU: Funct.ADDU,
+    Opcode.SLTI: Funct.SLT,
+    Opcode.SLTIU: Funct.SLTU,
+    Opcode.ANDI: Funct.AND,
+    Opcode.ORI: Funct.OR,
+    Opcode.XORI: Funct.XOR,
+}
+"ALU function used by each arithmetic immediate opcode"
+
+ZERO_EXTEND = [
+    Opcode.ANDI,
+    Opcode.ORI,
+    Opcode.XORI,
+]
+"Immediate opcodes that zero extend rather than sign extend"
+
+LOAD_OPCODE = {
+    Opcode.LB: (MemSize.BYTE, True),
+    Opcode.LBU: (MemSize.BYTE, False),
+    Opcode.LH: (MemSize.HALF, True),
+    Opcode.LHU: (MemSize.HALF, False),
+    Opcode.LW: (MemSize.WORD, False),
+}
+"Size and signedness of each load"
+
+STORE_OPCODE = {
+    Opcode.SB: MemSize.BYTE,
+    Opcode.SH: MemSize.HALF,
+    Opcode.SW: MemSize.WORD,
+}
+"Size of each store"
+
+BRANCH_OPCODE = {
+    Opcode.BEQ: Branch.EQ,
+    Opcode.BNE: Branch.NE,
+    Opcode.BLEZ: Branch.LEZ,
+    Opcode.BGTZ: Branch.GTZ,
+}
+"Condition of each branch"
+
+MULDIV_FUNCT = {
+    Funct.MULT: MulDivOp.MULT,
+    Funct.MULTU: MulDivOp.MULTU,
+    Funct.DIV: MulDivOp.DIV,
+    Funct.DIVU: MulDivOp.DIVU,
+    Funct.MTHI: MulDivOp.MTHI,
+    Funct.MTLO: MulDivOp.MTLO,
+}
+"Multiply/divide unit operation of each funct that writes HI or LO"
+
+
+class Control(Elaboratable):
+    """
+    Control unit that turns the fields produced by the ``Decoder``
+    into datapath control signals.
+
+    This is purely combinatorial and is shared by every core variant,
+    so all the opcode specific knowledge of the datapath lives here.
+    Opcodes that are not handled produce a bubble (nothing is written
+    and nothing is stored).
+
+    Attributes:
+        opcode: input opcode value
+        funct: input funct value
+        rd: input rd register value
+        rt: input rt register value
+        imm: input 16-bit immediate value
+        alu_func: output function fed to the ALU
+        alu_imm: output, use ``ext_imm`` as the ALU rt operand
+        ext_imm: output sign/zero extended immediate
+        dest: output register written by the instruction
+        reg_write: output, the instruction writes ``dest``
+        wb_sel: output source of the written back value
+        mem_read: output, the instruction is a load
+        mem_write: output, the instruction is a store
+        mem_size: output width of the load or store
+        mem_signed: output, the load sign extends
+        branch: output branch condition
+        jump: output, absolute jump using ``addr``
+        jump_reg: output, jump to the value of rs
+        halt: output, the instruction stops the core
+        reads_rs: output, the instruction uses the value of rs
+        reads_rt: output, the instruction uses the value of rt
+        muldiv: output operation started on the multiply/divide unit
+    """
+    def __init__(self):
+        # input
+        self.opcode = Signal(Opcode)
+        self.funct = Signal(Funct)
+        self.rd = Signal(unsigned(5))
+        self.rt = Signal(unsigned(5))
+        self.imm = Signal(unsigned(16))
+        # output
+        self.alu_func = Signal(Funct)
+        self.alu_imm = Signal()
+        self.ext_imm = Signal(32)
+        self.dest = Signal(unsigned(5))
+        self.reg_write = Signal()
+        self.wb_sel = Signal(WbSel)
+        self.mem_read = Signal()
+        self.mem_write = Signal()
+        self.mem_size = Signal(MemSize)
+        self.mem_signed = Signal()
+        self.branch = Signal(Branch)
+        self.jump = Signal()
+        self.jump_reg = Signal()
+        self.halt = Signal()
+        self.reads_rs = Signal()
+        self.reads_rt = Signal()
+        self.muldiv = Signal(MulDivOp)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        with m.Switch(self.opcode):
+            with m.Case(*ZERO_EXTEND):
+                m.d.comb += self.ext_imm.eq(self.imm)
+            with m.Default():
+                m.d.comb += self.ext_imm.eq(self.imm.as_signed())
+
+        with m.Switch(self.opcode):
+            with m.Case(Opcode.SPECIAL):
+                m.d.comb += [
+                    self.alu_func.eq(self.funct),
+                    self.dest.eq(self.rd),
+                    self.reads_rs.eq(1),
+                    self.reads_rt.eq(1),
+                ]
+                with m.Switch(self.funct):
+                    with m.Case(Funct.JR):
+                        m.d.comb += self.jump_reg.eq(1)
+                    with m.Case(Funct.JALR):
+                        m.d.comb += [
+                            self.jump_reg.eq(1),
+                            self.reg_write.eq(1),
+                            self.wb_sel.eq(WbSel.LINK),
+                        ]
+                    with m.Case(Funct.MFHI):
+                        m.d.comb += [
+                            self.reg_write.eq(1),
+                            self.wb_sel.eq(WbSel.HI),
+                        ]
+                    with m.Case(Funct.MFLO):
+                        m.d.comb += [
+                            self.reg_write.eq(1),
+                            self.wb_sel.eq(WbSel.LO),
+                        ]
+                    for funct, op in MULDIV_FUNCT.items():
+                        with m.Case(funct):
+                            m.d.comb += self.muldiv.eq(op)
+                    with m.Default():
+                        m.d.comb += self.reg_write.eq(1)
+
+            for opcode, funct in IMM_FUNCT.items():
+                with m.Case(opcode):
+                    m.d.comb += [
+                        self.alu_func.eq(funct),
+                        self.alu_imm.eq(1),
+                        self.dest.eq(self.rt),
+                        self.reg_write.eq(1),
+                        self.reads_rs.eq(1),
+                    ]
+
+            with m.Case(Opcode.LLO):
+                m.d.comb += [
+                    self.dest.eq(self.rt),
+                    self.reg_write.eq(1),
+                    self.wb_sel.eq(WbSel.LLO),
+                    self.reads_rt.eq(1),
+                ]
+            with m.Case(Opcode.LHI):
+                m.d.comb += [
+                    self.dest.eq(self.rt),
+                    self.reg_write.eq(1),
+                    self.wb_sel.eq(WbSel.LHI),
+                    self.reads_rt.eq(1),
+                ]
+
+            for opcode, (size, signed) in LOAD_OPCODE.items():
+                with m.Case(opcode):
+                    m.d.comb += [
+                        self.alu_func.eq(Funct.ADDU),
+                        self.alu_imm.eq(1),
+                        self.dest.eq(self.rt),
+                        self.reg_write.eq(1),
+                        self.wb_sel.eq(WbSel.MEM),
+                        self.mem_read.eq(1),
+                        self.mem_size.eq(size),
+                        self.mem_signed.eq(signed),
+                        self.reads_rs.eq(1),
+                    ]
+
+            for opcode, size in STORE_OPCODE.items():
+                with m.Case(opcode):
+                    m.d.comb += [
+                        self.alu_func.eq(Funct.ADDU),
+                        self.alu_imm.eq(1),
+                        self.mem_write.eq(1),
+                        self.mem_size.eq(size),
+                        self.reads_rs.eq(1),
+                        self.reads_rt.eq(1),
+                    ]
+
+            for opcode, cond in BRANCH_OPCODE.items():
+                with m.Case(opcode):
+                    m.d.comb += [
+                        self.branch.eq(cond),
+                        self.reads_rs.eq(1),
+                        self.reads_rt.eq(cond in (Branch.EQ, Branch.NE)),
+                    ]
+
+            with m.Case(Opcode.J):
+                m.d.comb += self.jump.eq(1)
+            with m.Case(Opcode.JAL):
+                m.d.comb += [
+                    self.jump.eq(1),
+                    self.dest.eq(31),
+                    self.reg_write.eq(1),
+                    self.wb_sel.eq(WbSel.LINK),
+                ]
+            with m.Case(Opcode.TRAP):
+                m.d.comb += self.halt.eq(1)
+
+            with m.Default():
+                pass
+
+        return m
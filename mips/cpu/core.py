@@ -0,0 +1,240 @@
+from amaranth import *
+
+from mips.cpu.alu import ALU
+from mips.cpu.control import *
+from mips.cpu.decoder import Decoder
+from mips.cpu.isa import *
+from mips.cpu.lsu import *
+from mips.cpu.muldiv import MulDiv
+from mips.cpu.perf import PerfCounters
+from mips.cpu.regfile import RegisterFile
+
+__all__ = [
+    "Core",
+]
+
+class Core(Elaboratable):
+    """
+    Single cycle core built out of the ``Decoder``, ``Control`` and ``ALU``.
+
+    Every cycle one instruction is fetched from the program memory,
+    decoded, executed and written back. There are no branch delay slots:
+    a taken branch lands on ``pc + 4 + (imm << 2)`` and jumps keep the
+    upper 4 bits of ``pc + 4``. Memory is little endian, and both
+    memories are word addressed by ``addr[2:]``.
+
+    An arithmetic overflow (``ALU.ovf``) suppresses the register write of
+    the instruction, and ``TRAP`` stops the core. Multiplies and divides run
+    in ``muldiv`` while the following instructions execute, and an
+    ``MFHI``/``MFLO`` waits for their result.
+
+    Loads from the window at ``PERF_BASE`` read the counters of ``perf``
+    instead of the data memory.
+
+    Arguments:
+        program (list[int]):    words loaded into the program memory
+        data (list[int]):       words loaded into the data memory
+        imem_depth (int):       size of the program memory in words
+        dmem_depth (int):       size of the data memory in words
+        muldiv (MulDiv):        multiply/divide unit, or ``None`` for the
+                                default one
+
+    Attributes:
+        pc (Signal[32]):    output address of the current instruction
+        inst (Signal[32]):  output current instruction
+        halt (Signal):      output, a ``TRAP`` was executed
+        retire (Signal):    output, the current instruction retires this cycle
+        retire_pc (Signal[32]): output address of the retiring instruction
+        retire_reg (Signal[5]): output register written by the retiring
+                            instruction, 0 if none
+        retire_value (Signal[32]): output value written to ``retire_reg``
+        retire_store (Signal[4]): output byte enables of the store of the
+                            retiring instruction, 0 if none
+        retire_addr (Signal[30]): output word address of the store
+        retire_data (Signal[32]): output word stored, only the enabled
+                            bytes are meaningful
+        regfile (RegisterFile): register file
+        imem (Memory):      program memory
+        dmem (Memory):      data memory
+        muldiv (MulDiv):    multiply/divide unit
+        perf (PerfCounters): performance counters, of which this core
+                            counts ``cycles``, ``retired``, ``muldiv_wait``
+                            and ``overflow``
+    """
+    def __init__(self, program=(), data=(), *, imem_depth=1024, dmem_depth=1024, muldiv=None):
+        self.pc = Signal(32)
+        self.inst = Signal(32)
+        self.halt = Signal()
+        self.retire = Signal()
+        self.retire_pc = Signal(32)
+        self.retire_reg = Signal(unsigned(5))
+        self.retire_value = Signal(32)
+        self.retire_store = Signal(4)
+        self.retire_addr = Signal(30)
+        self.retire_data = Signal(32)
+
+        self.regfile = RegisterFile()
+        self.imem = Memory(width=32, depth=imem_depth, init=program)
+        self.dmem = Memory(width=32, depth=dmem_depth, init=data)
+        self.muldiv = muldiv if muldiv is not None else MulDiv()
+        self.perf = PerfCounters()
+
+    def ports(self):
+        return [
+            self.pc, self.inst, self.halt, self.retire, self.retire_pc, self.retire_reg, self.retire_value,
+            self.retire_store, self.retire_addr, self.retire_data,
+        ]
+
+    def peek_data(self, index: int):
+        """
+        Simulation helper returning word ``index`` of the data memory,
+        use as ``value = yield from core.peek_data(index)``.
+        """
+        return (yield self.dmem[index])
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.decoder = decoder = Decoder()
+        m.submodules.control = control = Control()
+        m.submodules.alu = alu = ALU()
+        m.submodules.regfile = regfile = self.regfile
+        m.submodules.muldiv = muldiv = self.muldiv
+        m.submodules.perf = perf = self.perf
+
+        # Fetch
+        m.submodules.imem_read = imem_read = self.imem.read_port(domain="comb")
+        m.d.comb += [
+            imem_read.addr.eq(self.pc[2:]),
+            self.inst.eq(imem_read.data),
+            decoder.inst.eq(self.inst),
+        ]
+
+        # Decode
+        m.d.comb += [
+            control.opcode.eq(decoder.opcode),
+            control.funct.eq(decoder.funct),
+            control.rd.eq(decoder.rd),
+            control.rt.eq(decoder.rt),
+            control.imm.eq(decoder.imm),
+        ]
+
+        rs_val = regfile.rs_data
+        rt_val = regfile.rt_data
+        m.d.comb += [
+            regfile.rs.eq(decoder.rs),
+            regfile.rt.eq(decoder.rt),
+        ]
+
+        # Execute
+        m.d.comb += [
+            alu.rs.eq(rs_val),
+            alu.rt.eq(Mux(control.alu_imm, control.ext_imm, rt_val)),
+            alu.shamt.eq(decoder.shamt),
+            alu.func.eq(control.alu_func),
+        ]
+
+        pc_plus4 = Signal(32)
+        m.d.comb += pc_plus4.eq(self.pc + 4)
+
+        taken = Signal()
+        with m.Switch(control.branch):
+            with m.Case(Branch.EQ):
+                m.d.comb += taken.eq(rs_val == rt_val)
+            with m.Case(Branch.NE):
+                m.d.comb += taken.eq(rs_val != rt_val)
+            with m.Case(Branch.LEZ):
+                m.d.comb += taken.eq(rs_val.as_signed() <= 0)
+            with m.Case(Branch.GTZ):
+                m.d.comb += taken.eq(rs_val.as_signed() > 0)
+
+        pc_next = Signal(32)
+        with m.If(control.halt):
+            m.d.comb += pc_next.eq(self.pc)
+        with m.Elif(control.jump_reg):
+            m.d.comb += pc_next.eq(rs_val)
+        with m.Elif(control.jump):
+            m.d.comb += pc_next.eq(Cat(C(0, 2), decoder.addr, pc_plus4[28:]))
+        with m.Elif(taken):
+            m.d.comb += pc_next.eq(pc_plus4 + (control.ext_imm << 2))
+        with m.Else():
+            m.d.comb += pc_next.eq(pc_plus4)
+
+        m.d.comb += [
+            muldiv.op.eq(control.muldiv),
+            muldiv.start.eq(self.retire),
+            muldiv.rs.eq(rs_val),
+            muldiv.rt.eq(rt_val),
+        ]
+
+        # Memory
+        m.submodules.dmem_read = dmem_read = self.dmem.read_port(domain="comb")
+        m.submodules.dmem_write = dmem_write = self.dmem.write_port(granularity=8)
+
+        offset = alu.rd[:2]
+        m.d.comb += [
+            dmem_read.addr.eq(alu.rd[2:]),
+            dmem_write.addr.eq(alu.rd[2:]),
+        ]
+
+        m.d.comb += perf.addr.eq(alu.rd[2:])
+        mem_data = Mux(perf.selects(alu.rd), perf.data, dmem_read.data)
+        load = load_extend(m, mem_data, offset, control.mem_size, control.mem_signed)
+
+        store_data, store_en = store_align(m, rt_val, offset, control.mem_size)
+        m.d.comb += [
+            dmem_write.data.eq(store_data),
+            dmem_write.en.eq(Mux(control.mem_write & self.retire, store_en, 0)),
+            self.retire_store.eq(dmem_write.en),
+            self.retire_addr.eq(dmem_write.addr),
+            self.retire_data.eq(dmem_write.data),
+        ]
+
+        # Write back
+        wb_data = Signal(32)
+        with m.Switch(control.wb_sel):
+            with m.Case(WbSel.MEM):
+                m.d.comb += wb_data.eq(load)
+            with m.Case(WbSel.LINK):
+                m.d.comb += wb_data.eq(pc_plus4)
+            with m.Case(WbSel.LLO):
+                m.d.comb += wb_data.eq(Cat(decoder.imm, rt_val[16:]))
+            with m.Case(WbSel.LHI):
+                m.d.comb += wb_data.eq(Cat(rt_val[:16], decoder.imm))
+            with m.Case(WbSel.HI):
+                m.d.comb += wb_data.eq(muldiv.hi)
+            with m.Case(WbSel.LO):
+                m.d.comb += wb_data.eq(muldiv.lo)
+            with m.Default():
+                m.d.comb += wb_data.eq(alu.rd)
+
+        # An ``MFHI``/``MFLO`` does not retire until HI and LO are ready
+        hilo_wait = Signal()
+        m.d.comb += [
+            hilo_wait.eq(((control.wb_sel == WbSel.HI) | (control.wb_sel == WbSel.LO)) & muldiv.busy),
+            self.retire.eq(~self.halt & ~hilo_wait),
+        ]
+
+        m.d.comb += [
+            regfile.rd.eq(control.dest),
+            regfile.value.eq(wb_data),
+            regfile.we.eq(self.retire & control.reg_write & ~alu.ovf),
+            self.retire_pc.eq(self.pc),
+            self.retire_reg.eq(Mux(regfile.we, control.dest, 0)),
+            self.retire_value.eq(wb_data),
+        ]
+
+        m.d.comb += [
+            perf.enable.eq(~self.halt),
+            perf.events["cycles"].eq(1),
+            perf.events["retired"].eq(self.retire),
+            perf.events["muldiv_wait"].eq(hilo_wait),
+            perf.events["overflow"].eq(self.retire & control.reg_write & alu.ovf),
+        ]
+
+        with m.If(self.retire):
+            m.d.sync += self.pc.eq(pc_next)
+            with m.If(control.halt):
+                m.d.sync += self.halt.eq(1)
+
+        return m
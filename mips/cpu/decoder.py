@@ -9,8 +9,16 @@ class Decoder(Elaboratable):
     Any non-set value are going to default to 0's (this is moreso
     a quirk of Amaranth).
 
+    With ``predecoded``, the encoding of the instruction is not worked
+    out from its opcode but given by ``kind``, as stored by the predecode
+    stage (see ``mips.cpu.predecode``).
+
+    Arguments:
+        predecoded (bool): take the encoding from ``kind``
+
     Attributes:
         inst: input instruction value
+        kind: input encoding of ``inst``, only with ``predecoded``
         opcode: output opcode value
         rs: output rs register value
         rt: output rt register value
@@ -19,8 +27,10 @@ class Decoder(Elaboratable):
         imm: immediate value
         addr: address value
     """
-    def __init__(self):
-        self.inst = Signal(Instr) 
+    def __init__(self, *, predecoded=False):
+        self.predecoded = predecoded
+        self.inst = Signal(Instr)
+        self.kind = Signal(EnumEncoding) if predecoded else None
         self.opcode = Signal(Opcode)
         self.rs = Signal(unsigned(5))
         self.rt = Signal(unsigned(5))
@@ -29,13 +39,23 @@ class Decoder(Elaboratable):
         self.shamt = Signal(unsigned(5))
         self.imm = Signal(unsigned(16))
         self.addr = Signal(26)
-        pass
 
     def elaborate(self, platform):
         m = Module()
 
-        with m.Switch(self.inst.opcode):
-            with m.Case(Opcode.SPECIAL):
+        if self.predecoded:
+            self._fields(m, self.kind, [EnumEncoding.Register], [EnumEncoding.Immediate],
+                         [EnumEncoding.Jump])
+        else:
+            self._fields(m, self.inst.opcode, REG_OPCODE, IMM_OPCODE, JMP_OPCODE)
+
+        return m
+
+    def _fields(self, m, select, register, immediate, jump):
+        # split the fields of ``inst`` as the encoding given by the case of
+        # ``select`` that matches
+        with m.Switch(select):
+            with m.Case(*register):
                 m.d.comb += [
                     self.opcode.eq(Opcode.SPECIAL),
                     self.rs.eq(self.inst.data.reg.rs),
@@ -44,19 +64,17 @@ class Decoder(Elaboratable):
                     self.funct.eq(self.inst.data.reg.funct),
                     self.shamt.eq(self.inst.data.reg.shamt)
                 ]
-            with m.Case(*IMM_OPCODE):
+            with m.Case(*immediate):
                 m.d.comb += [
                     self.opcode.eq(self.inst.opcode),
                     self.rs.eq(self.inst.data.imm.rs),
                     self.rt.eq(self.inst.data.imm.rt),
                     self.imm.eq(self.inst.data.imm.imm)
                 ]
-            with m.Case(*JMP_OPCODE):
+            with m.Case(*jump):
                 m.d.comb += [
                     self.opcode.eq(self.inst.opcode),
                     self.addr.eq(self.inst.data.jmp.addr)
                 ]
             with m.Default():
-                pass
-
-        return m
\ No newline at end of file
+                pass
\ No newline at end of file
@@ -0,0 +1,112 @@
+from amaranth import *
+
+from mips.util.image import read_image
+
+from typing import *
+
+__all__ = [
+    "InstructionMemory",
+]
+
+class InstructionMemory(Elaboratable):
+    """
+    Program memory of 32-bit words, built on a ``Memory`` with synchronous
+    read ports so that it maps onto block RAM rather than LUTs.
+
+    The fetch port reads the word at ``addr`` when ``en`` is set, and
+    ``data`` holds it from the next cycle on. The optional data port does
+    the same for loads from the program memory.
+
+    In simulation ``load`` writes a new program into the memory of the
+    design already being simulated, so that many programs can be run on
+    one elaboration (see ``mips.sim.cache.cached_simulator``).
+
+    Arguments:
+        init (list[int]):   initial contents, see ``from_image``
+        depth (int):        size in words
+        data_port (bool):   add the second read port
+
+    Attributes:
+        addr (Signal):      input word address to fetch
+        en (Signal):        input, read ``addr`` this cycle
+        data (Signal[32]):  output word read
+        data_addr (Signal): input word address of the data port, or ``None``
+        data_en (Signal):   input, read ``data_addr`` this cycle, or ``None``
+        data_data (Signal[32]): output word read by the data port, or ``None``
+        memory (Memory):    storage
+    """
+    def __init__(self, init=(), *, depth=1024, data_port=False):
+        assert len(init) <= depth, "program does not fit in memory"
+        self.init = list(init)
+        self.depth = depth
+
+        self.addr = Signal(range(depth))
+        self.en = Signal(reset=1)
+        self.data = Signal(32)
+        if data_port:
+            self.data_addr = Signal(range(depth))
+            self.data_en = Signal(reset=1)
+            self.data_data = Signal(32)
+        else:
+            self.data_addr = self.data_en = self.data_data = None
+
+        self.memory = Memory(width=32, depth=depth, init=self.init)
+        # rows the last program loaded may have left something other than 0 in
+        self._used = 0
+
+    @classmethod
+    def from_image(cls, path: str, **kwargs) -> "InstructionMemory":
+        """
+        Program memory initialized with the image at ``path``, in any
+        format ``read_image`` understands (``$readmemh``, Intel HEX or
+        flat binary).
+        """
+        return cls(read_image(path), **kwargs)
+
+    def ports(self):
+        ports = [self.addr, self.en, self.data]
+        if self.data_addr is not None:
+            ports += [self.data_addr, self.data_en, self.data_data]
+        return ports
+
+    def load(self, words: List[int]):
+        """
+        Simulation helper returning a process that writes ``words`` into
+        the memory and clears the rows after them that the initial contents
+        or an earlier program used, use as ``sim.add_process(imem.load(words))``.
+        """
+        assert len(words) <= self.depth, "program does not fit in memory"
+        used = max(len(self.init), self._used, len(words))
+        self._used = len(words)
+
+        def process():
+            for i in range(used):
+                yield self.memory[i].eq(words[i] if i < len(words) else 0)
+        return process
+
+    def peek(self, index: int):
+        """
+        Simulation helper returning word ``index``, use as
+        ``value = yield from imem.peek(index)``.
+        """
+        return (yield self.memory[index])
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.fetch = fetch = self.memory.read_port(transparent=False)
+        m.d.comb += [
+            fetch.addr.eq(self.addr),
+            fetch.en.eq(self.en),
+            self.data.eq(fetch.data),
+        ]
+
+        if self.data_addr is not None:
+            m.submodules.load = load = self.memory.read_port(transparent=False)
+            m.d.comb += [
+                load.addr.eq(self.data_addr),
+                load.en.eq(self.data_en),
+                self.data_data.eq(load.data),
+            ]
+
+        return m
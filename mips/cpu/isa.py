@@ -20,6 +20,7 @@ class EnumEncoding(enum.Enum, shape=2):
     Register = 0
     Immediate = 1
     Jump = 2
+    Invalid = 3
 
 class Funct(enum.Enum, shape=6):
     """
@@ -65,6 +66,14 @@ class Funct(enum.Enum, shape=6):
     MFLO = 0b010_010
     MTHI = 0b010_001
     MTLO = 0b010_011    
+    MULT = 0b011_000
+    "Signed multiply into HI and LO"
+    MULTU = 0b011_001
+    "Unsigned multiply into HI and LO"
+    DIV = 0b011_010
+    "Signed divide, quotient into LO and remainder into HI"
+    DIVU = 0b011_011
+    "Unsigned divide, quotient into LO and remainder into HI"
 
 class Opcode(enum.Enum, shape=6):
     SPECIAL = 0
@@ -94,7 +103,7 @@ class Opcode(enum.Enum, shape=6):
     LLO = 0b011_000
     LHI = 0b011_001
     TRAP = 0b011_010
-    LB = 0b100_001
+    LB = 0b100_000
     LW = 0b100_011
     LBU = 0b100_100
     LH = 0b100_001
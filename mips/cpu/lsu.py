@@ -0,0 +1,76 @@
+from amaranth import *
+
+from mips.cpu.control import MemSize
+
+__all__ = [
+    "load_extend",
+    "store_align",
+]
+
+def load_extend(m: Module, word, offset, size, signed) -> Signal:
+    """
+    Extract the byte, half or word addressed by ``offset`` out of a
+    little endian memory ``word`` and extend it to 32 bits.
+
+    Arguments:
+        m (Module):             module the logic is added to
+        word (Signal[32]):      word read from the data memory
+        offset (Signal[2]):     low bits of the address
+        size (Signal[MemSize]): width of the load
+        signed (Signal):        sign extend rather than zero extend
+
+    Returns:
+        the loaded value
+    """
+    load = Signal(32)
+    byte = word.word_select(offset, 8)
+    half = word.word_select(offset[1], 16)
+    with m.Switch(size):
+        with m.Case(MemSize.BYTE):
+            with m.If(signed):
+                m.d.comb += load.eq(byte.as_signed())
+            with m.Else():
+                m.d.comb += load.eq(byte)
+        with m.Case(MemSize.HALF):
+            with m.If(signed):
+                m.d.comb += load.eq(half.as_signed())
+            with m.Else():
+                m.d.comb += load.eq(half)
+        with m.Default():
+            m.d.comb += load.eq(word)
+    return load
+
+
+def store_align(m: Module, value, offset, size):
+    """
+    Place the low byte, half or word of ``value`` at ``offset`` of a
+    little endian memory word.
+
+    Arguments:
+        m (Module):             module the logic is added to
+        value (Signal[32]):     value of the register being stored
+        offset (Signal[2]):     low bits of the address
+        size (Signal[MemSize]): width of the store
+
+    Returns:
+        a ``(data, en)`` pair for a write port with a granularity of 8
+    """
+    data = Signal(32)
+    en = Signal(4)
+    with m.Switch(size):
+        with m.Case(MemSize.BYTE):
+            m.d.comb += [
+                data.eq(value[:8].replicate(4)),
+                en.eq(C(0b0001, 4) << offset),
+            ]
+        with m.Case(MemSize.HALF):
+            m.d.comb += [
+                data.eq(value[:16].replicate(2)),
+                en.eq(C(0b0011, 4) << (offset[1] * 2)),
+            ]
+        with m.Default():
+            m.d.comb += [
+                data.eq(value),
+                en.eq(0b1111),
+            ]
+    return data, en
@@ -0,0 +1,186 @@
+from amaranth import *
+
+from mips.cpu.control import MulDivOp
+
+__all__ = [
+    "MULDIV_CONFIGS",
+    "MulDiv",
+]
+
+MULDIV_CONFIGS = {
+    "fast": dict(mul_cycles=1, div_cycles=8),
+    "balanced": dict(mul_cycles=4, div_cycles=16),
+    "small": dict(mul_cycles=32, div_cycles=32),
+}
+"Latency versus area trade-offs of ``MulDiv``, as its constructor arguments"
+
+
+class MulDiv(Elaboratable):
+    """
+    Multiply/divide unit holding the HI and LO registers.
+
+    ``MULT``/``MULTU`` leave the 64-bit product in HI:LO, ``DIV``/``DIVU``
+    leave the quotient in LO and the remainder in HI. Signed operations
+    work on the magnitudes of the operands and fix the sign of the result
+    when they complete. Dividing by zero gives an all ones quotient and
+    the dividend as remainder.
+
+    The multiplier is iterative: every cycle it multiplies the multiplicand
+    by the next ``32 // mul_cycles`` bits of the multiplier, so
+    ``mul_cycles=1`` is a full 32x32 multiplier and ``mul_cycles=32`` a
+    single adder. The divider is a restoring divider producing
+    ``32 // div_cycles`` quotient bits per cycle. ``MULDIV_CONFIGS`` lists
+    a few useful points.
+
+    An operation is accepted whenever ``start`` is high, even while the
+    unit is ``busy``: a new multiply or divide abandons the one in flight,
+    whose result could never be read, and ``MTHI``/``MTLO`` write their
+    register at once and keep it from being overwritten by the operation
+    in flight. The core only has to hold ``MFHI``/``MFLO`` while ``busy``.
+
+    Arguments:
+        mul_cycles (int):   cycles taken by a multiply, a power of 2 up to 32
+        div_cycles (int):   cycles taken by a divide, a power of 2 up to 32
+
+    Attributes:
+        op (Signal[MulDivOp]):  input operation
+        start (Signal):     input, start ``op`` this cycle
+        rs (Signal[32]):    input first operand
+        rt (Signal[32]):    input second operand
+        hi (Signal[32]):    output HI register
+        lo (Signal[32]):    output LO register
+        busy (Signal):      output, HI and LO are not ready
+    """
+    def __init__(self, *, mul_cycles=4, div_cycles=16):
+        assert mul_cycles & (mul_cycles - 1) == 0 and 1 <= mul_cycles <= 32
+        assert div_cycles & (div_cycles - 1) == 0 and 1 <= div_cycles <= 32
+        self.mul_cycles = mul_cycles
+        self.div_cycles = div_cycles
+
+        # input
+        self.op = Signal(MulDivOp)
+        self.start = Signal()
+        self.rs = Signal(32)
+        self.rt = Signal(32)
+        # output
+        self.hi = Signal(32)
+        self.lo = Signal(32)
+        self.busy = Signal()
+
+    def ports(self):
+        return [self.op, self.start, self.rs, self.rt, self.hi, self.lo, self.busy]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        mul_bits = 32 // self.mul_cycles
+        div_bits = 32 // self.div_cycles
+
+        divide = Signal()
+        count = Signal(range(32))
+        # sign of the product or quotient, and of the remainder
+        negate = Signal()
+        negate_rem = Signal()
+        keep_hi = Signal()
+        keep_lo = Signal()
+
+        # Multiplier: the upper half of ``acc`` accumulates the partial
+        # products while its lower half shifts out the multiplier bits and
+        # shifts in the low bits of the product.
+        multiplicand = Signal(32)
+        acc = Signal(64)
+        partial = Signal(32 + mul_bits)
+        acc_next = Signal(64)
+        m.d.comb += [
+            partial.eq(acc[32:] + multiplicand * acc[:mul_bits]),
+            acc_next.eq(Cat(acc[mul_bits:32], partial)),
+        ]
+
+        # Divider: the dividend shifts out of ``quo`` into ``rem`` as the
+        # quotient bits shift in.
+        divisor = Signal(32)
+        rem = Signal(32)
+        quo = Signal(32)
+        rem_next = Signal(32)
+        quo_next = Signal(32)
+        r, q = rem, quo
+        for _ in range(div_bits):
+            shifted = Cat(q[31], r)
+            fits = shifted >= divisor
+            r = Mux(fits, shifted - divisor, shifted)[:32]
+            q = Cat(fits, q[:31])
+        m.d.comb += [
+            rem_next.eq(r),
+            quo_next.eq(q),
+        ]
+
+        product = Signal(64)
+        m.d.comb += product.eq(Mux(negate, -acc_next, acc_next))
+
+        with m.If(self.busy):
+            with m.If(divide):
+                m.d.sync += [
+                    rem.eq(rem_next),
+                    quo.eq(quo_next),
+                ]
+            with m.Else():
+                m.d.sync += acc.eq(acc_next)
+            m.d.sync += count.eq(count - 1)
+
+            with m.If(count == 0):
+                m.d.sync += self.busy.eq(0)
+                with m.If(divide):
+                    with m.If(~keep_hi):
+                        m.d.sync += self.hi.eq(Mux(negate_rem, -rem_next, rem_next))
+                    with m.If(~keep_lo):
+                        m.d.sync += self.lo.eq(Mux(negate, -quo_next, quo_next))
+                with m.Else():
+                    with m.If(~keep_hi):
+                        m.d.sync += self.hi.eq(product[32:])
+                    with m.If(~keep_lo):
+                        m.d.sync += self.lo.eq(product[:32])
+
+        signed = (self.op == MulDivOp.MULT) | (self.op == MulDivOp.DIV)
+        rs_neg = signed & self.rs[31]
+        rt_neg = signed & self.rt[31]
+        rs_mag = Mux(rs_neg, -self.rs, self.rs)[:32]
+        rt_mag = Mux(rt_neg, -self.rt, self.rt)[:32]
+
+        with m.If(self.start):
+            with m.Switch(self.op):
+                with m.Case(MulDivOp.MULT, MulDivOp.MULTU):
+                    m.d.sync += [
+                        self.busy.eq(1),
+                        divide.eq(0),
+                        count.eq(self.mul_cycles - 1),
+                        negate.eq(rs_neg ^ rt_neg),
+                        keep_hi.eq(0),
+                        keep_lo.eq(0),
+                        multiplicand.eq(rs_mag),
+                        acc.eq(rt_mag),
+                    ]
+                with m.Case(MulDivOp.DIV, MulDivOp.DIVU):
+                    m.d.sync += [
+                        self.busy.eq(1),
+                        divide.eq(1),
+                        count.eq(self.div_cycles - 1),
+                        negate.eq((rs_neg ^ rt_neg) & (self.rt != 0)),
+                        negate_rem.eq(rs_neg),
+                        keep_hi.eq(0),
+                        keep_lo.eq(0),
+                        divisor.eq(rt_mag),
+                        rem.eq(0),
+                        quo.eq(rs_mag),
+                    ]
+                with m.Case(MulDivOp.MTHI):
+                    m.d.sync += [
+                        self.hi.eq(self.rs),
+                        keep_hi.eq(1),
+                    ]
+                with m.Case(MulDivOp.MTLO):
+                    m.d.sync += [
+                        self.lo.eq(self.rs),
+                        keep_lo.eq(1),
+                    ]
+
+        return m
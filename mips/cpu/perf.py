@@ -0,0 +1,111 @@
+from amaranth import *
+
+__all__ = [
+    "PERF_BASE",
+    "PERF_EVENTS",
+    "PerfCounters",
+]
+
+PERF_BASE = 0xffff_ffc0
+"Byte address of the counter window, the last 16 words: ``lw $t, -64($0)``"
+
+PERF_EVENTS = [
+    "cycles",
+    "retired",
+    "load_use",
+    "muldiv_wait",
+    "mem_stall",
+    "mispredict",
+    "icache_miss",
+    "dcache_miss",
+    "overflow",
+    "dual_issue",
+]
+"""
+Counted events, in address order from ``PERF_BASE``:
+
+* ``cycles``: cycles run;
+* ``retired``: instructions retired;
+* ``load_use``: cycles stalled on a load result;
+* ``muldiv_wait``: cycles an ``MFHI``/``MFLO`` waited for ``MulDiv``;
+* ``mem_stall``: cycles frozen by a cache miss;
+* ``mispredict``: branches and jumps that redirected fetch;
+* ``icache_miss``, ``dcache_miss``: cache misses;
+* ``overflow``: instructions whose write was suppressed by ``ALU.ovf``;
+* ``dual_issue``: cycles that retired two instructions.
+"""
+
+
+class PerfCounters(Elaboratable):
+    """
+    Block of 32-bit event counters sitting alongside a core.
+
+    Every cycle with ``enable`` set, each counter is incremented by the
+    value of its event, a single bit except for the events of ``widths``
+    that can happen several times a cycle. The counters are read through ``addr``/``data``, which the
+    cores decode as a read-only window of 16 words at ``PERF_BASE``: a load
+    from the window returns a counter, 0 past the last one. Stores are not
+    decoded and go to the data memory like any other address.
+
+    The ``ISS`` has no notion of time and does not model the window, so
+    programs reading counters cannot be co-simulated.
+
+    Arguments:
+        events (list[str]): names of the counted events, defaults to
+                            ``PERF_EVENTS``
+        widths (dict[str, int]): width of the events that can happen more
+                            than once a cycle, by name
+
+    Attributes:
+        enable (Signal):    input, count this cycle
+        events (dict[str, Signal]): inputs, one per event, added every cycle
+        counters (dict[str, Signal[32]]): output counts
+        addr (Signal[4]):   input word index into the window
+        data (Signal[32]):  output counter at ``addr``, combinatorially
+    """
+    WORDS = 16
+
+    def __init__(self, events=PERF_EVENTS, *, widths={}):
+        assert len(events) <= self.WORDS, "too many events for the window"
+        self.enable = Signal()
+        self.events = {name: Signal(widths.get(name, 1), name=name) for name in events}
+        self.counters = {name: Signal(32, name=f"{name}_count") for name in events}
+        self.addr = Signal(range(self.WORDS))
+        self.data = Signal(32)
+
+    def __getitem__(self, name: str) -> Signal:
+        "Counter of the event ``name``"
+        return self.counters[name]
+
+    def ports(self):
+        return [self.enable, *self.events.values(), *self.counters.values(), self.addr, self.data]
+
+    @classmethod
+    def selects(cls, addr) -> Value:
+        "Whether the byte address ``addr`` falls in the counter window"
+        return addr[2 + (cls.WORDS - 1).bit_length():].all()
+
+    def peek(self):
+        """
+        Simulation helper returning every count by name, use as
+        ``counts = yield from perf.peek()``.
+        """
+        counts = {}
+        for name, counter in self.counters.items():
+            counts[name] = yield counter
+        return counts
+
+    def elaborate(self, platform):
+        m = Module()
+
+        with m.If(self.enable):
+            for name, event in self.events.items():
+                with m.If(event):
+                    m.d.sync += self.counters[name].eq(self.counters[name] + event)
+
+        with m.Switch(self.addr):
+            for i, counter in enumerate(self.counters.values()):
+                with m.Case(i):
+                    m.d.comb += self.data.eq(counter)
+
+        return m
@@ -0,0 +1,579 @@
+from amaranth import *
+
+from mips.cpu.alu import ALU
+from mips.cpu.cache import MainMemory
+from mips.cpu.control import *
+from mips.cpu.decoder import Decoder
+from mips.cpu.imem import InstructionMemory
+from mips.cpu.isa import *
+from mips.cpu.lsu import *
+from mips.cpu.muldiv import MulDiv
+from mips.cpu.perf import PerfCounters
+from mips.cpu.predecode import Predecoded, alu_func, predecode_program
+from mips.cpu.regfile import RegisterFile
+
+__all__ = [
+    "PipelinedCore",
+]
+
+class PipelinedCore(Elaboratable):
+    """
+    Classic five stage pipelined core: fetch (IF), decode (ID), execute
+    (EX), memory (MEM) and write back (WB). It runs the same programs as
+    ``Core`` with the same semantics, one instruction per cycle at best.
+
+    Both memories have synchronous read ports, so they map onto block RAM:
+    the program memory (an ``InstructionMemory``) is addressed by the fetch
+    pc and its output is the instruction in ID, and the data memory is
+    addressed by the ALU result in EX and its output is read in MEM.
+
+    Hazards are handled as follows:
+
+    * results of the instructions in MEM and WB are forwarded to the
+      operands of the instruction in EX, and the register file forwards
+      the value written by WB to the reads of ID;
+    * an instruction in ID that uses the result of a load in EX is held
+      for one cycle;
+    * multiplies and divides start in EX and run in ``muldiv`` alongside
+      the following instructions, only an ``MFHI``/``MFLO`` in ID is held
+      until their result is ready;
+    * fetch follows the ``predictor`` if there is one, and otherwise
+      assumes that nothing is taken. A mispredicted ``J``/``JAL`` redirects
+      fetch from ID (one bubble), a mispredicted branch, ``JR``/``JALR``
+      and ``TRAP`` redirect it from EX (two bubbles).
+
+    With an ``icache`` or a ``dcache``, the matching memory becomes the
+    main memory behind the cache, accessed with ``mem_latency`` cycles per
+    word. While a cache is busy serving a miss the whole pipeline is
+    frozen.
+
+    ``TRAP`` stops fetching once it reaches EX and halts the core when it
+    retires. An arithmetic overflow suppresses the register write of the
+    instruction, as in ``Core``.
+
+    Loads from the window at ``PERF_BASE`` read the counters of ``perf``
+    in MEM instead of the data memory, and bypass the data cache.
+
+    With ``predecode``, every word of the program memory has a
+    ``Predecoded`` row in ``imem_predecode``, read alongside it: ID takes
+    the encoding, the ALU function and the extended immediate from it
+    rather than from ``Decoder`` and ``Control``.
+
+    Arguments:
+        program (list[int]):    words loaded into the program memory
+        data (list[int]):       words loaded into the data memory
+        imem_depth (int):       size of the program memory in words
+        dmem_depth (int):       size of the data memory in words
+        predictor (BranchPredictor): branch predictor, or ``None`` to
+                                predict that nothing is taken
+        icache (Cache):         instruction cache, or ``None``
+        dcache (Cache):         data cache, or ``None``
+        mem_latency (int):      cycles per word of the memories behind
+                                the caches
+        muldiv (MulDiv):        multiply/divide unit, or ``None`` for the
+                                default one
+        predecode (bool):       keep predecoded fields next to the program,
+                                only without an ``icache``
+
+    Attributes:
+        pc (Signal[32]):        output address being fetched
+        halt (Signal):          output, a ``TRAP`` has retired
+        retire (Signal):        output, an instruction retires this cycle
+        retire_pc (Signal[32]): output address of the retiring instruction
+        retire_reg (Signal[5]): output register written by the retiring
+                                instruction, 0 if none
+        retire_value (Signal[32]): output value written to ``retire_reg``
+        retire_store (Signal[4]): output byte enables of the store of the
+                                retiring instruction, 0 if none
+        retire_addr (Signal[30]): output word address of the store
+        retire_data (Signal[32]): output word stored, only the enabled
+                                bytes are meaningful
+        cycles (Signal[32]):    output number of cycles run before halting,
+                                the ``cycles`` counter of ``perf``
+        retired (Signal[32]):   output number of instructions retired
+        stalls (Signal[32]):    output number of load-use and HI/LO stall cycles
+        flushes (Signal[32]):   output number of redirects from EX
+        mem_stalls (Signal[32]): output number of cycles frozen by the caches
+        regfile (RegisterFile): register file
+        imem (InstructionMemory): program memory
+        imem_predecode (Memory): ``Predecoded`` rows of the program memory,
+                                or ``None``
+        dmem (Memory):          data memory
+        predictor (BranchPredictor): branch predictor, or ``None``
+        icache, dcache (Cache): caches, or ``None``
+        muldiv (MulDiv):        multiply/divide unit
+        perf (PerfCounters):    performance counters
+    """
+    def __init__(self, program=(), data=(), *, imem_depth=1024, dmem_depth=1024,
+                 predictor=None, icache=None, dcache=None, mem_latency=8, muldiv=None,
+                 predecode=False):
+        assert not (predecode and icache), "predecoded fields are not kept in the instruction cache"
+        self.pc = Signal(32)
+        self.halt = Signal()
+        self.retire = Signal()
+        self.retire_pc = Signal(32)
+        self.retire_reg = Signal(unsigned(5))
+        self.retire_value = Signal(32)
+        self.retire_store = Signal(4)
+        self.retire_addr = Signal(30)
+        self.retire_data = Signal(32)
+
+        self.perf = PerfCounters()
+        self.cycles = self.perf["cycles"]
+        self.retired = self.perf["retired"]
+        self.stalls = Signal(32)
+        self.flushes = Signal(32)
+        self.mem_stalls = self.perf["mem_stall"]
+
+        self.regfile = RegisterFile(bypass=True)
+        self.imem = InstructionMemory(program, depth=imem_depth)
+        self.imem_predecode = None
+        if predecode:
+            self.imem_predecode = Memory(width=Shape.cast(Predecoded).width, depth=imem_depth,
+                                         init=predecode_program(program))
+        self.dmem = Memory(width=32, depth=dmem_depth, init=data)
+        self.predictor = predictor
+        self.icache = icache
+        self.dcache = dcache
+        self.mem_latency = mem_latency
+        self.muldiv = muldiv if muldiv is not None else MulDiv()
+
+    def ports(self):
+        return [
+            self.pc, self.halt, self.retire, self.retire_pc, self.retire_reg, self.retire_value,
+            self.retire_store, self.retire_addr, self.retire_data,
+        ]
+
+    def peek_data(self, index: int):
+        """
+        Simulation helper returning word ``index`` of the data memory, as
+        seen through the data cache, use as
+        ``value = yield from core.peek_data(index)``.
+        """
+        if self.dcache is not None:
+            return (yield from self.dcache.peek(index, self.dmem))
+        return (yield self.dmem[index])
+
+    def _main_memory(self, m, name, cache, memory):
+        main = MainMemory(memory, self.mem_latency)
+        m.submodules[name] = cache
+        m.submodules[f"{name}_main"] = main
+        m.d.comb += [
+            main.addr.eq(cache.mem_addr),
+            main.req.eq(cache.mem_req),
+            main.we.eq(cache.mem_we),
+            main.wdata.eq(cache.mem_wdata),
+            cache.mem_rdata.eq(main.rdata),
+            cache.mem_ack.eq(main.ack),
+        ]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.decoder = decoder = Decoder(predecoded=self.imem_predecode is not None)
+        m.submodules.control = control = Control()
+        m.submodules.alu = alu = ALU()
+        m.submodules.regfile = regfile = self.regfile
+        m.submodules.muldiv = muldiv = self.muldiv
+        m.submodules.perf = perf = self.perf
+
+        stall = Signal()
+        frozen = Signal()
+        redirect = Signal()
+        redirect_pc = Signal(32)
+
+        # IF
+        fetching = Signal(reset=1)
+
+        pred_pc = Signal(32)
+        if self.predictor is not None:
+            m.submodules.predictor = predictor = self.predictor
+            m.d.comb += [
+                predictor.pc.eq(self.pc),
+                pred_pc.eq(Mux(predictor.taken, predictor.target, self.pc + 4)),
+            ]
+        else:
+            predictor = None
+            m.d.comb += pred_pc.eq(self.pc + 4)
+
+        # Nothing is fetched past a ``TRAP`` or on a path being redirected
+        fetch = Signal()
+        inst = Signal(32)
+        if self.icache is not None:
+            self._main_memory(m, "icache", self.icache, self.imem.memory)
+            m.d.comb += [
+                self.icache.addr.eq(self.pc[2:]),
+                self.icache.en.eq(~stall & ~frozen),
+                self.icache.req.eq(fetch),
+                inst.eq(self.icache.rdata),
+            ]
+        else:
+            m.submodules.imem = imem = self.imem
+            m.d.comb += [
+                imem.addr.eq(self.pc[2:]),
+                imem.en.eq(~stall & ~frozen),
+                inst.eq(imem.data),
+            ]
+
+        row = Signal(Predecoded)
+        if self.imem_predecode is not None:
+            m.submodules.imem_predecode_read = predecode_read = \
+                self.imem_predecode.read_port(transparent=False)
+            m.d.comb += [
+                predecode_read.addr.eq(self.pc[2:]),
+                predecode_read.en.eq(~stall & ~frozen),
+                row.eq(predecode_read.data),
+            ]
+
+        # ID
+        pc_d = Signal(32)
+        valid_d = Signal()
+        pred_pc_d = Signal(32)
+        index_d = Signal(predictor.index.shape() if predictor else 1)
+
+        m.d.comb += [
+            decoder.inst.eq(inst),
+            control.opcode.eq(decoder.opcode),
+            control.funct.eq(decoder.funct),
+            control.rd.eq(decoder.rd),
+            control.rt.eq(decoder.rt),
+            control.imm.eq(decoder.imm),
+            regfile.rs.eq(decoder.rs),
+            regfile.rt.eq(decoder.rt),
+        ]
+
+        alu_func_d = Signal(Funct)
+        ext_imm_d = Signal(32)
+        if self.imem_predecode is not None:
+            m.d.comb += [
+                decoder.kind.eq(row.kind),
+                alu_func_d.eq(alu_func(row.alu_op)),
+                ext_imm_d.eq(row.ext_imm),
+            ]
+        else:
+            m.d.comb += [
+                alu_func_d.eq(control.alu_func),
+                ext_imm_d.eq(control.ext_imm),
+            ]
+
+        jump = Signal()
+        jump_pc = Signal(32)
+        m.d.comb += [
+            jump_pc.eq(Cat(C(0, 2), decoder.addr, (pc_d + 4)[28:])),
+            jump.eq(valid_d & control.jump & ~stall & (pred_pc_d != jump_pc)),
+            fetch.eq(fetching & ~redirect & ~jump),
+        ]
+
+        # EX
+        pc_e = Signal(32)
+        valid_e = Signal()
+        pred_pc_e = Signal(32)
+        index_e = Signal.like(index_d)
+        jump_e = Signal()
+        jump_miss_e = Signal()
+        rs_e = Signal(unsigned(5))
+        rt_e = Signal(unsigned(5))
+        rs_val_e = Signal(32)
+        rt_val_e = Signal(32)
+        shamt_e = Signal(unsigned(5))
+        imm_e = Signal(unsigned(16))
+        ext_imm_e = Signal(32)
+        alu_func_e = Signal(Funct)
+        alu_imm_e = Signal()
+        dest_e = Signal(unsigned(5))
+        reg_write_e = Signal()
+        wb_sel_e = Signal(WbSel)
+        mem_read_e = Signal()
+        mem_write_e = Signal()
+        mem_size_e = Signal(MemSize)
+        mem_signed_e = Signal()
+        branch_e = Signal(Branch)
+        jump_reg_e = Signal()
+        halt_e = Signal()
+        muldiv_e = Signal(MulDivOp)
+
+        # MEM
+        pc_m = Signal(32)
+        valid_m = Signal()
+        result_m = Signal(32)
+        dest_m = Signal(unsigned(5))
+        reg_write_m = Signal()
+        mem_read_m = Signal()
+        mem_size_m = Signal(MemSize)
+        mem_signed_m = Signal()
+        offset_m = Signal(2)
+        perf_m = Signal()
+        store_addr_m = Signal(30)
+        store_data_m = Signal(32)
+        store_en_m = Signal(4)
+        halt_m = Signal()
+
+        # WB
+        pc_w = Signal(32)
+        valid_w = Signal()
+        result_w = Signal(32)
+        dest_w = Signal(unsigned(5))
+        reg_write_w = Signal()
+        store_addr_w = Signal(30)
+        store_data_w = Signal(32)
+        store_en_w = Signal(4)
+        halt_w = Signal()
+
+        # Hazards: a load in EX feeding the instruction in ID holds ID and IF
+        # for a cycle, and so does an ``MFHI``/``MFLO`` while a multiply or
+        # divide is in EX or still running. Every other dependency is covered
+        # by forwarding.
+        load_use = valid_e & mem_read_e & (dest_e != 0) & (
+            (control.reads_rs & (decoder.rs == dest_e)) |
+            (control.reads_rt & (decoder.rt == dest_e))
+        )
+        reads_hilo = (control.wb_sel == WbSel.HI) | (control.wb_sel == WbSel.LO)
+        starting = valid_e & (muldiv_e != MulDivOp.NONE) & \
+            (muldiv_e != MulDivOp.MTHI) & (muldiv_e != MulDivOp.MTLO)
+        m.d.comb += stall.eq(valid_d & (load_use | (reads_hilo & (starting | muldiv.busy))))
+
+        def forward(index, value):
+            from_mem = valid_m & reg_write_m & (dest_m == index) & (index != 0)
+            from_wb = valid_w & reg_write_w & (dest_w == index) & (index != 0)
+            return Mux(from_mem, result_m, Mux(from_wb, result_w, value))
+
+        rs_val = Signal(32)
+        rt_val = Signal(32)
+        m.d.comb += [
+            rs_val.eq(forward(rs_e, rs_val_e)),
+            rt_val.eq(forward(rt_e, rt_val_e)),
+            alu.rs.eq(rs_val),
+            alu.rt.eq(Mux(alu_imm_e, ext_imm_e, rt_val)),
+            alu.shamt.eq(shamt_e),
+            alu.func.eq(alu_func_e),
+        ]
+
+        pc_plus4 = Signal(32)
+        m.d.comb += pc_plus4.eq(pc_e + 4)
+
+        taken = Signal()
+        with m.Switch(branch_e):
+            with m.Case(Branch.EQ):
+                m.d.comb += taken.eq(rs_val == rt_val)
+            with m.Case(Branch.NE):
+                m.d.comb += taken.eq(rs_val != rt_val)
+            with m.Case(Branch.LEZ):
+                m.d.comb += taken.eq(rs_val.as_signed() <= 0)
+            with m.Case(Branch.GTZ):
+                m.d.comb += taken.eq(rs_val.as_signed() > 0)
+
+        # The pc that should follow the instruction in EX is checked against
+        # the one fetched after it. A ``J``/``JAL`` was already checked in ID
+        # and carries its target in ``pred_pc_e``.
+        target = Signal(32)
+        next_pc = Signal(32)
+        with m.If(jump_reg_e):
+            m.d.comb += target.eq(rs_val)
+        with m.Elif(jump_e):
+            m.d.comb += target.eq(pred_pc_e)
+        with m.Else():
+            m.d.comb += target.eq(pc_plus4 + (ext_imm_e << 2))
+        m.d.comb += [
+            next_pc.eq(Mux(taken | jump_e | jump_reg_e, target, pc_plus4)),
+            redirect.eq(valid_e & ((next_pc != pred_pc_e) | halt_e)),
+            redirect_pc.eq(next_pc),
+        ]
+
+        if predictor is not None:
+            m.d.comb += [
+                predictor.update.eq(valid_e & ~frozen & ((branch_e != Branch.NONE) | jump_e | jump_reg_e)),
+                predictor.update_pc.eq(pc_e),
+                predictor.update_index.eq(index_e),
+                predictor.update_cond.eq(branch_e != Branch.NONE),
+                predictor.update_taken.eq(taken | jump_e | jump_reg_e),
+                predictor.update_target.eq(target),
+                predictor.update_miss.eq((next_pc != pred_pc_e) | jump_miss_e),
+            ]
+
+        m.d.comb += [
+            muldiv.op.eq(muldiv_e),
+            muldiv.start.eq(valid_e & ~frozen),
+            muldiv.rs.eq(rs_val),
+            muldiv.rt.eq(rt_val),
+        ]
+
+        result_e = Signal(32)
+        with m.Switch(wb_sel_e):
+            with m.Case(WbSel.LINK):
+                m.d.comb += result_e.eq(pc_plus4)
+            with m.Case(WbSel.LLO):
+                m.d.comb += result_e.eq(Cat(imm_e, rt_val[16:]))
+            with m.Case(WbSel.LHI):
+                m.d.comb += result_e.eq(Cat(rt_val[:16], imm_e))
+            with m.Case(WbSel.HI):
+                m.d.comb += result_e.eq(muldiv.hi)
+            with m.Case(WbSel.LO):
+                m.d.comb += result_e.eq(muldiv.lo)
+            with m.Default():
+                m.d.comb += result_e.eq(alu.rd)
+
+        # The data memory is read at the end of EX so that the word is there
+        # in MEM. Its read port is transparent, so a load right after a store
+        # to the same word sees the stored value.
+        store_data, store_en = store_align(m, rt_val, alu.rd[:2], mem_size_e)
+
+        perf_e = mem_read_e & perf.selects(alu.rd)
+
+        mem_data = Signal(32)
+        if self.dcache is not None:
+            self._main_memory(m, "dcache", self.dcache, self.dmem)
+            m.d.comb += [
+                self.dcache.addr.eq(alu.rd[2:]),
+                self.dcache.en.eq(~frozen),
+                self.dcache.req.eq(valid_e & ((mem_read_e & ~perf_e) | mem_write_e)),
+                self.dcache.wmask.eq(Mux(valid_e & mem_write_e, store_en, 0)),
+                self.dcache.wdata.eq(store_data),
+                mem_data.eq(self.dcache.rdata),
+            ]
+        else:
+            m.submodules.dmem_read = dmem_read = self.dmem.read_port(transparent=True)
+            m.submodules.dmem_write = dmem_write = self.dmem.write_port(granularity=8)
+            m.d.comb += [
+                dmem_read.addr.eq(alu.rd[2:]),
+                dmem_read.en.eq(~frozen),
+                mem_data.eq(dmem_read.data),
+            ]
+
+        # MEM
+        m.d.comb += perf.addr.eq(store_addr_m)
+        load = load_extend(m, Mux(perf_m, perf.data, mem_data), offset_m, mem_size_m, mem_signed_m)
+        if self.dcache is None:
+            m.d.comb += [
+                dmem_write.addr.eq(store_addr_m),
+                dmem_write.data.eq(store_data_m),
+                dmem_write.en.eq(Mux(valid_m, store_en_m, 0)),
+            ]
+
+        caches = [cache for cache in (self.icache, self.dcache) if cache is not None]
+        m.d.comb += frozen.eq(Cat(cache.busy for cache in caches).any())
+
+        # WB
+        m.d.comb += [
+            regfile.rd.eq(dest_w),
+            regfile.value.eq(result_w),
+            regfile.we.eq(valid_w & reg_write_w),
+            self.retire.eq(valid_w),
+            self.retire_pc.eq(pc_w),
+            self.retire_reg.eq(Mux(regfile.we, dest_w, 0)),
+            self.retire_value.eq(result_w),
+            self.retire_store.eq(Mux(valid_w, store_en_w, 0)),
+            self.retire_addr.eq(store_addr_w),
+            self.retire_data.eq(store_data_w),
+        ]
+
+        # Pipeline registers: a frozen pipeline holds every stage, except
+        # that WB only retires once. EX keeps the operands it was forwarded
+        # as their producers move on.
+        with m.If(frozen):
+            m.d.sync += [
+                valid_w.eq(0),
+                rs_val_e.eq(rs_val),
+                rt_val_e.eq(rt_val),
+            ]
+        with m.Else():
+            m.d.sync += [
+                pc_w.eq(pc_m),
+                valid_w.eq(valid_m),
+                result_w.eq(Mux(mem_read_m, load, result_m)),
+                dest_w.eq(dest_m),
+                reg_write_w.eq(reg_write_m),
+                store_addr_w.eq(store_addr_m),
+                store_data_w.eq(store_data_m),
+                store_en_w.eq(store_en_m),
+                halt_w.eq(halt_m),
+
+                pc_m.eq(pc_e),
+                valid_m.eq(valid_e),
+                result_m.eq(result_e),
+                dest_m.eq(dest_e),
+                reg_write_m.eq(reg_write_e & ~alu.ovf),
+                mem_read_m.eq(mem_read_e),
+                mem_size_m.eq(mem_size_e),
+                mem_signed_m.eq(mem_signed_e),
+                offset_m.eq(alu.rd[:2]),
+                perf_m.eq(perf_e),
+                store_addr_m.eq(alu.rd[2:]),
+                store_data_m.eq(store_data),
+                store_en_m.eq(Mux(mem_write_e, store_en, 0)),
+                halt_m.eq(halt_e),
+            ]
+
+            with m.If(redirect | stall):
+                m.d.sync += valid_e.eq(0)
+            with m.Else():
+                m.d.sync += [
+                    pc_e.eq(pc_d),
+                    valid_e.eq(valid_d),
+                    pred_pc_e.eq(Mux(control.jump, jump_pc, pred_pc_d)),
+                    index_e.eq(index_d),
+                    jump_e.eq(control.jump),
+                    jump_miss_e.eq(jump),
+                    rs_e.eq(decoder.rs),
+                    rt_e.eq(decoder.rt),
+                    rs_val_e.eq(regfile.rs_data),
+                    rt_val_e.eq(regfile.rt_data),
+                    shamt_e.eq(decoder.shamt),
+                    imm_e.eq(decoder.imm),
+                    ext_imm_e.eq(ext_imm_d),
+                    alu_func_e.eq(alu_func_d),
+                    alu_imm_e.eq(control.alu_imm),
+                    dest_e.eq(control.dest),
+                    reg_write_e.eq(control.reg_write),
+                    wb_sel_e.eq(control.wb_sel),
+                    mem_read_e.eq(control.mem_read),
+                    mem_write_e.eq(control.mem_write),
+                    mem_size_e.eq(control.mem_size),
+                    mem_signed_e.eq(control.mem_signed),
+                    branch_e.eq(control.branch),
+                    jump_reg_e.eq(control.jump_reg),
+                    halt_e.eq(control.halt),
+                    muldiv_e.eq(control.muldiv),
+                ]
+
+            with m.If(redirect):
+                m.d.sync += [
+                    self.pc.eq(redirect_pc),
+                    valid_d.eq(0),
+                ]
+                with m.If(halt_e):
+                    m.d.sync += fetching.eq(0)
+            with m.Elif(~stall):
+                m.d.sync += [
+                    self.pc.eq(Mux(jump, jump_pc, pred_pc)),
+                    pc_d.eq(self.pc),
+                    pred_pc_d.eq(pred_pc),
+                    index_d.eq(predictor.index if predictor is not None else 0),
+                    valid_d.eq(fetch),
+                ]
+
+        # Counters
+        m.d.comb += [
+            perf.enable.eq(~self.halt),
+            perf.events["cycles"].eq(1),
+            perf.events["retired"].eq(self.retire),
+            perf.events["load_use"].eq(stall & ~frozen & load_use),
+            perf.events["muldiv_wait"].eq(stall & ~frozen & ~load_use),
+            perf.events["mem_stall"].eq(frozen),
+            perf.events["mispredict"].eq(~frozen & Mux(redirect, ~halt_e, jump)),
+            perf.events["overflow"].eq(valid_e & ~frozen & reg_write_e & alu.ovf),
+        ]
+        if self.icache is not None:
+            m.d.comb += perf.events["icache_miss"].eq(self.icache.miss)
+        if self.dcache is not None:
+            m.d.comb += perf.events["dcache_miss"].eq(self.dcache.miss)
+
+        with m.If(~self.halt):
+            with m.If(stall & ~frozen):
+                m.d.sync += self.stalls.eq(self.stalls + 1)
+            with m.If(redirect & ~frozen):
+                m.d.sync += self.flushes.eq(self.flushes + 1)
+
+        with m.If(valid_w & halt_w):
+            m.d.sync += self.halt.eq(1)
+
+        return m
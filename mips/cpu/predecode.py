@@ -0,0 +1,162 @@
+"""
+Predecoding of instructions as they are written to the program memory.
+
+Decoding an instruction in ID goes from its opcode and funct to its
+encoding, then to its fields and to the ALU function through ``Decoder``
+and ``Control``. The predecode stage works out part of it once, when the
+program is loaded, and stores it in a ``Predecoded`` row next to each
+word:
+
+* ``kind``, the encoding of the instruction, from which ``Decoder`` splits
+  the fields without matching the opcode against every family;
+* ``alu_op``, the ALU function as one bit per function of ``ALU_OPS``,
+  turned back into a ``Funct`` by ORing constants (``alu_func``);
+* ``ext_imm``, the sign or zero extended immediate.
+
+``predecode_program`` computes the rows of a program when it is loaded, and
+``Predecoder`` is the same stage in hardware, for memories written at
+run time.
+"""
+
+from amaranth import *
+from amaranth.lib import data
+
+from mips.cpu.control import *
+from mips.cpu.control import IMM_FUNCT, LOAD_OPCODE, STORE_OPCODE, ZERO_EXTEND
+from mips.cpu.decoder import Decoder
+from mips.cpu.isa import *
+
+from functools import reduce
+from operator import or_
+
+from typing import *
+
+__all__ = [
+    "ALU_OPS",
+    "Predecoded",
+    "alu_func",
+    "predecode_word",
+    "predecode_program",
+    "Predecoder",
+]
+
+ALU_OPS = [
+    Funct.ADD, Funct.ADDU, Funct.SUB, Funct.SUBU,
+    Funct.AND, Funct.OR, Funct.XOR, Funct.NOR,
+    Funct.SLL, Funct.SLLV, Funct.SRL, Funct.SRLV, Funct.SRA, Funct.SRAV,
+    Funct.SLT, Funct.SLTU,
+]
+"Functions implemented by the ALU, in the order of the bits of ``alu_op``"
+
+
+class Predecoded(data.Struct):
+    """
+    Predecoded fields stored next to an instruction
+
+    Attributes:
+        kind (EnumEncoding): encoding of the instruction
+        alu_op (unsigned(16)): one-hot ALU function, a bit per ``ALU_OPS``,
+                            0 if the ALU computes nothing useful
+        ext_imm (unsigned(32)): sign or zero extended immediate
+    """
+    kind: EnumEncoding
+    alu_op: len(ALU_OPS)
+    ext_imm: 32
+
+
+def alu_func(alu_op) -> Value:
+    """
+    ``Funct`` fed to the ALU for the one-hot ``alu_op``. Without any bit
+    set it is ``JR``, which the ALU does not implement and outputs 0 for,
+    as for any other function that is not in ``ALU_OPS``.
+    """
+    return reduce(or_, [Mux(alu_op[i], op.value, 0) for i, op in enumerate(ALU_OPS)],
+                  Mux(alu_op.any(), 0, Funct.JR.value))
+
+
+_REG = {opcode.value for opcode in REG_OPCODE}
+_IMM = {opcode.value for opcode in IMM_OPCODE}
+_JMP = {opcode.value for opcode in JMP_OPCODE}
+_ALU_BIT = {op.value: 1 << i for i, op in enumerate(ALU_OPS)}
+_IMM_BIT = {opcode.value: _ALU_BIT[funct.value] for opcode, funct in IMM_FUNCT.items()}
+_IMM_BIT.update({opcode.value: _ALU_BIT[Funct.ADDU.value] for opcode in [*LOAD_OPCODE, *STORE_OPCODE]})
+_ZERO_EXTEND = {opcode.value for opcode in ZERO_EXTEND}
+_ALU_OP_SHIFT = 2
+_EXT_IMM_SHIFT = 2 + len(ALU_OPS)
+
+
+def predecode_word(word: int) -> int:
+    "``Predecoded`` row of the instruction ``word``, as an integer"
+    opcode = word >> 26
+    if opcode in _REG:
+        kind = EnumEncoding.Register
+        alu_op = _ALU_BIT.get(word & 0x3f, 0)
+        ext_imm = 0
+    elif opcode in _IMM:
+        kind = EnumEncoding.Immediate
+        alu_op = _IMM_BIT.get(opcode, 0)
+        ext_imm = word & 0xffff
+        if opcode not in _ZERO_EXTEND and ext_imm & 0x8000:
+            ext_imm |= 0xffff_0000
+    elif opcode in _JMP:
+        kind = EnumEncoding.Jump
+        alu_op = ext_imm = 0
+    else:
+        kind = EnumEncoding.Invalid
+        alu_op = ext_imm = 0
+    return kind.value | alu_op << _ALU_OP_SHIFT | ext_imm << _EXT_IMM_SHIFT
+
+
+def predecode_program(words: Iterable[int]) -> List[int]:
+    "``Predecoded`` rows of every word of a program"
+    return [predecode_word(word) for word in words]
+
+
+class Predecoder(Elaboratable):
+    """
+    Predecode stage in hardware: the ``Predecoded`` row of ``inst``, out
+    of a ``Decoder`` and a ``Control``, combinatorially.
+
+    Attributes:
+        inst (Signal[32]):  input instruction
+        row (Predecoded):   output predecoded fields
+    """
+    def __init__(self):
+        self.inst = Signal(Instr)
+        self.row = Signal(Predecoded)
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.decoder = decoder = Decoder()
+        m.submodules.control = control = Control()
+        m.d.comb += [
+            decoder.inst.eq(self.inst),
+            control.opcode.eq(decoder.opcode),
+            control.funct.eq(decoder.funct),
+            control.rd.eq(decoder.rd),
+            control.rt.eq(decoder.rt),
+            control.imm.eq(decoder.imm),
+        ]
+
+        with m.Switch(self.inst.opcode):
+            with m.Case(*REG_OPCODE):
+                m.d.comb += self.row.kind.eq(EnumEncoding.Register)
+            with m.Case(*IMM_OPCODE):
+                m.d.comb += self.row.kind.eq(EnumEncoding.Immediate)
+            with m.Case(*JMP_OPCODE):
+                m.d.comb += self.row.kind.eq(EnumEncoding.Jump)
+            with m.Default():
+                m.d.comb += self.row.kind.eq(EnumEncoding.Invalid)
+
+        # an opcode that does not use the ALU leaves ``alu_func`` at 0,
+        # which is ``SLL``, but nothing reads the result
+        uses_alu = Signal()
+        m.d.comb += [
+            uses_alu.eq(self.inst.opcode.as_value().matches(*REG_OPCODE, *IMM_FUNCT, *LOAD_OPCODE,
+                                                          *STORE_OPCODE)),
+            self.row.alu_op.eq(Cat((control.alu_func == op) & uses_alu for op in ALU_OPS)),
+            self.row.ext_imm.eq(control.ext_imm),
+        ]
+
+        return m
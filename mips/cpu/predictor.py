@@ -0,0 +1,174 @@
+from amaranth import *
+
+__all__ = [
+    "PREDICTORS",
+    "BranchPredictor",
+]
+
+PREDICTORS = ["static", "bimodal", "gshare"]
+"Direction predictors available to ``BranchPredictor``"
+
+
+class BranchPredictor(Elaboratable):
+    """
+    Branch predictor made of a branch target buffer (BTB) and a direction
+    predictor, looked up with the fetch address every cycle.
+
+    The BTB is direct mapped and fully tagged. It remembers the target of
+    every branch and jump that was taken, and whether the instruction is
+    unconditional (``J``, ``JAL``, ``JR``, ``JALR``), in which case it is
+    always predicted taken. The direction of conditional branches comes
+    from:
+
+    * ``static``: never taken;
+    * ``bimodal``: a table of 2-bit saturating counters indexed by the pc;
+    * ``gshare``: the same table indexed by the pc xor a global history
+      of the last branch outcomes.
+
+    The predictor is trained when an instruction resolves. The table index
+    used for the prediction travels with the instruction (``index`` out,
+    ``update_index`` back in) so that gshare trains the counter it read.
+    ``hits`` and ``misses`` count the resolved predictions.
+
+    Arguments:
+        kind (str):         one of ``PREDICTORS``
+        entries (int):      number of 2-bit counters, a power of 2
+        btb_entries (int):  number of BTB entries, a power of 2
+        history (int):      bits of global history used by gshare
+
+    Attributes:
+        pc (Signal[32]):            input fetch address
+        taken (Signal):             output, predicted taken
+        target (Signal[32]):        output predicted target
+        index (Signal):             output counter index of the prediction
+        update (Signal):            input, a branch or jump resolves
+        update_pc (Signal[32]):     input address of the resolved instruction
+        update_index (Signal):      input ``index`` of its prediction
+        update_cond (Signal):       input, it is a conditional branch
+        update_taken (Signal):      input, it was taken
+        update_target (Signal[32]): input target it jumped to
+        update_miss (Signal):       input, it was mispredicted
+        hits (Signal[32]):          output number of correct predictions
+        misses (Signal[32]):        output number of mispredictions
+    """
+    def __init__(self, kind="bimodal", *, entries=64, btb_entries=16, history=6):
+        assert kind in PREDICTORS, f"unknown predictor {kind!r}"
+        assert entries & (entries - 1) == 0 and btb_entries & (btb_entries - 1) == 0
+        self.kind = kind
+        self.entries = entries
+        self.btb_entries = btb_entries
+        self.history = min(history, entries.bit_length() - 1)
+
+        index_bits = entries.bit_length() - 1
+        btb_bits = btb_entries.bit_length() - 1
+
+        # input
+        self.pc = Signal(32)
+        # output
+        self.taken = Signal()
+        self.target = Signal(32)
+        self.index = Signal(index_bits)
+        # update
+        self.update = Signal()
+        self.update_pc = Signal(32)
+        self.update_index = Signal(index_bits)
+        self.update_cond = Signal()
+        self.update_taken = Signal()
+        self.update_target = Signal(32)
+        self.update_miss = Signal()
+        # counters
+        self.hits = Signal(32)
+        self.misses = Signal(32)
+
+        # BTB entry: valid, unconditional, tag and target
+        self._tag_bits = 30 - btb_bits
+        self.btb = Memory(width=2 + self._tag_bits + 32, depth=btb_entries, name="btb")
+        # 2-bit counters start weakly not taken
+        if kind == "static":
+            self.bht = None
+        else:
+            self.bht = Memory(width=2, depth=entries, init=[1] * entries, name="bht")
+        self.ghr = Signal(max(self.history, 1))
+
+    def ports(self):
+        return [
+            self.pc, self.taken, self.target, self.index,
+            self.update, self.update_pc, self.update_index, self.update_cond,
+            self.update_taken, self.update_target, self.update_miss,
+            self.hits, self.misses,
+        ]
+
+    def _btb_slot(self, pc):
+        btb_bits = self.btb_entries.bit_length() - 1
+        return pc[2:2 + btb_bits], pc[2 + btb_bits:]
+
+    def _bht_index(self, pc):
+        index_bits = self.entries.bit_length() - 1
+        if self.kind == "gshare":
+            return pc[2:2 + index_bits] ^ self.ghr[:self.history]
+        return pc[2:2 + index_bits]
+
+    def elaborate(self, platform):
+        m = Module()
+
+        # Lookup
+        m.submodules.btb_read = btb_read = self.btb.read_port(domain="comb")
+        slot, tag = self._btb_slot(self.pc)
+        m.d.comb += btb_read.addr.eq(slot)
+
+        entry_valid = btb_read.data[0]
+        entry_uncond = btb_read.data[1]
+        entry_tag = btb_read.data[2:2 + self._tag_bits]
+        entry_target = btb_read.data[2 + self._tag_bits:]
+        hit = entry_valid & (entry_tag == tag)
+
+        predict_taken = Signal()
+        if self.kind == "static":
+            m.d.comb += predict_taken.eq(0)
+        else:
+            m.submodules.bht_read = bht_read = self.bht.read_port(domain="comb")
+            m.d.comb += [
+                self.index.eq(self._bht_index(self.pc)),
+                bht_read.addr.eq(self.index),
+                predict_taken.eq(bht_read.data[1]),
+            ]
+
+        m.d.comb += [
+            self.taken.eq(hit & (entry_uncond | predict_taken)),
+            self.target.eq(entry_target),
+        ]
+
+        # Training
+        m.submodules.btb_write = btb_write = self.btb.write_port()
+        slot, tag = self._btb_slot(self.update_pc)
+        m.d.comb += [
+            btb_write.addr.eq(slot),
+            btb_write.data.eq(Cat(C(1, 1), ~self.update_cond, tag, self.update_target)),
+            btb_write.en.eq(self.update & self.update_taken),
+        ]
+
+        if self.kind != "static":
+            m.submodules.bht_update = bht_update = self.bht.read_port(domain="comb")
+            m.submodules.bht_write = bht_write = self.bht.write_port()
+            counter = bht_update.data
+            m.d.comb += [
+                bht_update.addr.eq(self.update_index),
+                bht_write.addr.eq(self.update_index),
+                bht_write.en.eq(self.update & self.update_cond),
+            ]
+            with m.If(self.update_taken):
+                m.d.comb += bht_write.data.eq(Mux(counter == 3, 3, counter + 1))
+            with m.Else():
+                m.d.comb += bht_write.data.eq(Mux(counter == 0, 0, counter - 1))
+
+            if self.kind == "gshare":
+                with m.If(self.update & self.update_cond):
+                    m.d.sync += self.ghr.eq(Cat(self.update_taken, self.ghr[:-1]))
+
+        with m.If(self.update):
+            with m.If(self.update_miss):
+                m.d.sync += self.misses.eq(self.misses + 1)
+            with m.Else():
+                m.d.sync += self.hits.eq(self.hits + 1)
+
+        return m
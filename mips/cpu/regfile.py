@@ -0,0 +1,136 @@
+from amaranth import *
+
+__all__ = [
+    "RegisterFile",
+]
+
+class RegisterFile(Elaboratable):
+    """
+    Register file with combinatorial read ports and synchronous write ports.
+
+    Register 0 (``$zero``) always reads as 0, writes to it are dropped.
+
+    Two storage styles are available. The flip-flop version keeps every
+    register in its own ``Signal``. The memory version keeps them in
+    ``Memory`` blocks so that the toolchain can infer distributed RAM:
+    every read port gets its own copy of the memory, and with more than
+    one write port each write port writes its own set of copies while a
+    small live value table (LVT) records which port last wrote each
+    register.
+
+    When several write ports write the same register in a cycle, the
+    highest numbered port wins. With ``bypass`` set, a read of a register
+    that is being written in the same cycle returns the new value.
+
+    Arguments:
+        read_ports (int):   number of read ports
+        write_ports (int):  number of write ports
+        memory (bool):      use ``Memory`` instead of flip-flops
+        bypass (bool):      forward values being written to the read ports
+
+    Attributes:
+        raddr (list[Signal[5]]):    input register to read, one per read port
+        rdata (list[Signal[32]]):   output read value, one per read port
+        waddr (list[Signal[5]]):    input register to write, one per write port
+        wen (list[Signal]):         input write enable, one per write port
+        wdata (list[Signal[32]]):   input value to write, one per write port
+        rs, rt (Signal[5]):         aliases of the first two read addresses
+        rs_data, rt_data (Signal[32]): aliases of the first two read values
+        rd, we, value:              aliases of the first write port
+    """
+    def __init__(self, *, read_ports=2, write_ports=1, memory=False, bypass=False):
+        assert read_ports >= 1 and write_ports >= 1
+        self.read_ports = read_ports
+        self.write_ports = write_ports
+        self.memory = memory
+        self.bypass = bypass
+
+        self.raddr = [Signal(unsigned(5), name=f"raddr{i}") for i in range(read_ports)]
+        self.rdata = [Signal(32, name=f"rdata{i}") for i in range(read_ports)]
+        self.waddr = [Signal(unsigned(5), name=f"waddr{i}") for i in range(write_ports)]
+        self.wen = [Signal(name=f"wen{i}") for i in range(write_ports)]
+        self.wdata = [Signal(32, name=f"wdata{i}") for i in range(write_ports)]
+
+        self.rs = self.raddr[0]
+        self.rs_data = self.rdata[0]
+        if read_ports > 1:
+            self.rt = self.raddr[1]
+            self.rt_data = self.rdata[1]
+        self.rd = self.waddr[0]
+        self.we = self.wen[0]
+        self.value = self.wdata[0]
+
+        if memory:
+            self.regs = None
+            self.banks = [
+                [Memory(width=32, depth=32, name=f"bank_w{w}_r{r}") for r in range(read_ports)]
+                for w in range(write_ports)
+            ]
+            self.lvt = Array(Signal(range(write_ports), name=f"lvt{i}") for i in range(32))
+        else:
+            self.regs = Array(Signal(32, name=f"r{i}") for i in range(32))
+            self.banks = None
+            self.lvt = None
+
+    def ports(self):
+        return [*self.raddr, *self.rdata, *self.waddr, *self.wen, *self.wdata]
+
+    def peek(self, index: int):
+        """
+        Simulation helper returning the value of register ``index``,
+        use as ``value = yield from regfile.peek(index)``.
+        """
+        if self.regs is not None:
+            return (yield self.regs[index])
+        port = (yield self.lvt[index]) if self.write_ports > 1 else 0
+        return (yield self.banks[port][0][index])
+
+    def elaborate(self, platform):
+        m = Module()
+
+        writes = [
+            (self.waddr[w], self.wen[w] & (self.waddr[w] != 0), self.wdata[w])
+            for w in range(self.write_ports)
+        ]
+
+        if self.memory:
+            for w, (addr, en, data) in enumerate(writes):
+                for r in range(self.read_ports):
+                    bank = self.banks[w][r]
+                    write = bank.write_port()
+                    m.submodules[f"bank_w{w}_r{r}_write"] = write
+                    m.d.comb += [
+                        write.addr.eq(addr),
+                        write.data.eq(data),
+                        write.en.eq(en),
+                    ]
+                if self.write_ports > 1:
+                    with m.If(en):
+                        m.d.sync += self.lvt[addr].eq(w)
+
+            for r in range(self.read_ports):
+                values = []
+                for w in range(self.write_ports):
+                    read = self.banks[w][r].read_port(domain="comb")
+                    m.submodules[f"bank_w{w}_r{r}_read"] = read
+                    m.d.comb += read.addr.eq(self.raddr[r])
+                    values.append(read.data)
+                if self.write_ports > 1:
+                    m.d.comb += self.rdata[r].eq(Array(values)[self.lvt[self.raddr[r]]])
+                else:
+                    m.d.comb += self.rdata[r].eq(values[0])
+        else:
+            for addr, en, data in writes:
+                with m.If(en):
+                    m.d.sync += self.regs[addr].eq(data)
+
+            for r in range(self.read_ports):
+                m.d.comb += self.rdata[r].eq(self.regs[self.raddr[r]])
+
+        if self.bypass:
+            for r in range(self.read_ports):
+                for addr, en, data in writes:
+                    with m.If(en & (addr == self.raddr[r])):
+                        m.d.comb += self.rdata[r].eq(data)
+
+        return m
@@ -0,0 +1,501 @@
+from amaranth import *
+
+from mips.cpu.alu import ALU
+from mips.cpu.control import *
+from mips.cpu.decoder import Decoder
+from mips.cpu.imem import InstructionMemory
+from mips.cpu.isa import *
+from mips.cpu.lsu import *
+from mips.cpu.muldiv import MulDiv
+from mips.cpu.perf import PerfCounters
+from mips.cpu.regfile import RegisterFile
+
+__all__ = [
+    "DualIssueCore",
+]
+
+def _lanes(shape, name: str, **kwargs):
+    # One signal per lane, ``name0`` for the older instruction of the pair
+    return [Signal(shape, name=f"{name}{lane}", **kwargs) for lane in range(2)]
+
+
+class DualIssueCore(Elaboratable):
+    """
+    In-order dual-issue version of ``PipelinedCore``, without branch
+    predictor, caches or predecode, and with the same semantics.
+
+    Every stage has two lanes, lane 0 holding the older instruction. IF
+    fetches the two words at ``pc`` and ``pc + 4`` through the fetch and
+    data ports of the program memory, and ID decodes both. The first one
+    issues unless it is held by a hazard, as in ``PipelinedCore``. The
+    second one issues alongside it into lane 1 when:
+
+    * the first one is not a branch, a jump or a ``TRAP``;
+    * at most one of them accesses the data memory;
+    * the second one does not read a register written by the first one;
+    * the second one does not use ``muldiv`` or read HI/LO;
+    * the second one does not use the result of a load in EX.
+
+    ID chooses the next fetch address itself: the word after the last
+    instruction it issued, so that an instruction left behind is fetched
+    again as the first of the next pair, or the target of a ``J``/``JAL``.
+    Branches, ``JR``/``JALR`` and ``TRAP`` are assumed not taken and
+    redirect fetch from EX (two bubbles).
+
+    Results of both lanes of MEM and WB are forwarded to both lanes of EX,
+    the newest first. The register file has four read ports and two write
+    ports, lane 1 writing through the highest numbered one so that it wins
+    when both write the same register. The data memory has one read and
+    one write port, used by whichever lane holds the memory access, and
+    ``muldiv`` is only fed by lane 0.
+
+    The commit port of ``PipelinedCore`` describes lane 0 of WB, and the
+    ``retire2`` port lane 1, which only retires along with lane 0.
+
+    Arguments:
+        program (list[int]):    words loaded into the program memory
+        data (list[int]):       words loaded into the data memory
+        imem_depth (int):       size of the program memory in words
+        dmem_depth (int):       size of the data memory in words
+        muldiv (MulDiv):        multiply/divide unit, or ``None`` for the
+                                default one
+
+    Attributes:
+        pc (Signal[32]):    output address of the pair being fetched
+        halt (Signal):      output, a ``TRAP`` has retired
+        retire, retire_pc, retire_reg, retire_value, retire_store,
+        retire_addr, retire_data: outputs, commit of the older instruction
+                            as in ``PipelinedCore``
+        retire2, retire2_pc, retire2_reg, retire2_value, retire2_store,
+        retire2_addr, retire2_data: outputs, commit of the younger
+                            instruction of the pair
+        regfile (RegisterFile): register file
+        imem (InstructionMemory): program memory, with its data port
+                            fetching the second word
+        dmem (Memory):      data memory
+        muldiv (MulDiv):    multiply/divide unit
+        perf (PerfCounters): performance counters, of which this core
+                            counts ``cycles``, ``retired``, ``load_use``,
+                            ``muldiv_wait``, ``mispredict``, ``overflow``
+                            and ``dual_issue``
+    """
+    def __init__(self, program=(), data=(), *, imem_depth=1024, dmem_depth=1024, muldiv=None):
+        self.pc = Signal(32)
+        self.halt = Signal()
+        self.retire = Signal()
+        self.retire_pc = Signal(32)
+        self.retire_reg = Signal(unsigned(5))
+        self.retire_value = Signal(32)
+        self.retire_store = Signal(4)
+        self.retire_addr = Signal(30)
+        self.retire_data = Signal(32)
+        self.retire2 = Signal()
+        self.retire2_pc = Signal(32)
+        self.retire2_reg = Signal(unsigned(5))
+        self.retire2_value = Signal(32)
+        self.retire2_store = Signal(4)
+        self.retire2_addr = Signal(30)
+        self.retire2_data = Signal(32)
+
+        self.regfile = RegisterFile(read_ports=4, write_ports=2, bypass=True)
+        self.imem = InstructionMemory(program, depth=imem_depth, data_port=True)
+        self.dmem = Memory(width=32, depth=dmem_depth, init=data)
+        self.muldiv = muldiv if muldiv is not None else MulDiv()
+        self.perf = PerfCounters(widths={"retired": 2, "overflow": 2})
+
+    def ports(self):
+        return [
+            self.pc, self.halt,
+            self.retire, self.retire_pc, self.retire_reg, self.retire_value,
+            self.retire_store, self.retire_addr, self.retire_data,
+            self.retire2, self.retire2_pc, self.retire2_reg, self.retire2_value,
+            self.retire2_store, self.retire2_addr, self.retire2_data,
+        ]
+
+    def peek_data(self, index: int):
+        """
+        Simulation helper returning word ``index`` of the data memory,
+        use as ``value = yield from core.peek_data(index)``.
+        """
+        return (yield self.dmem[index])
+
+    def elaborate(self, platform):
+        m = Module()
+
+        m.submodules.regfile = regfile = self.regfile
+        m.submodules.imem = imem = self.imem
+        m.submodules.muldiv = muldiv = self.muldiv
+        m.submodules.perf = perf = self.perf
+
+        decoders = [Decoder() for lane in range(2)]
+        controls = [Control() for lane in range(2)]
+        alus = [ALU() for lane in range(2)]
+        for lane in range(2):
+            m.submodules[f"decoder{lane}"] = decoders[lane]
+            m.submodules[f"control{lane}"] = controls[lane]
+            m.submodules[f"alu{lane}"] = alus[lane]
+
+        stall = Signal()
+        pair = Signal()
+        redirect = Signal()
+        redirect_pc = Signal(32)
+
+        # IF: the word at ``pc`` comes out of the fetch port and the one
+        # after it out of the data port
+        fetching = Signal(reset=1)
+        pc2 = Signal(32)
+        m.d.comb += [
+            pc2.eq(self.pc + 4),
+            imem.addr.eq(self.pc[2:]),
+            imem.data_addr.eq(pc2[2:]),
+        ]
+
+        # ID
+        pc_d = Signal(32)
+        valid_d = Signal()
+
+        jump_pc_d = _lanes(32, "jump_pc_d")
+        for lane, (decoder, control) in enumerate(zip(decoders, controls)):
+            m.d.comb += [
+                decoder.inst.eq(imem.data if lane == 0 else imem.data_data),
+                control.opcode.eq(decoder.opcode),
+                control.funct.eq(decoder.funct),
+                control.rd.eq(decoder.rd),
+                control.rt.eq(decoder.rt),
+                control.imm.eq(decoder.imm),
+                regfile.raddr[2 * lane].eq(decoder.rs),
+                regfile.raddr[2 * lane + 1].eq(decoder.rt),
+                jump_pc_d[lane].eq(Cat(C(0, 2), decoder.addr, (pc_d + 4 * lane + 4)[28:])),
+            ]
+        decoder0, decoder1 = decoders
+        control0, control1 = controls
+
+        # EX
+        pc_e = _lanes(32, "pc_e")
+        valid_e = _lanes(1, "valid_e")
+        pred_pc_e = _lanes(32, "pred_pc_e")
+        jump_e = _lanes(1, "jump_e")
+        rs_e = _lanes(unsigned(5), "rs_e")
+        rt_e = _lanes(unsigned(5), "rt_e")
+        rs_val_e = _lanes(32, "rs_val_e")
+        rt_val_e = _lanes(32, "rt_val_e")
+        shamt_e = _lanes(unsigned(5), "shamt_e")
+        imm_e = _lanes(unsigned(16), "imm_e")
+        ext_imm_e = _lanes(32, "ext_imm_e")
+        alu_func_e = _lanes(Funct, "alu_func_e")
+        alu_imm_e = _lanes(1, "alu_imm_e")
+        dest_e = _lanes(unsigned(5), "dest_e")
+        reg_write_e = _lanes(1, "reg_write_e")
+        wb_sel_e = _lanes(WbSel, "wb_sel_e")
+        mem_read_e = _lanes(1, "mem_read_e")
+        mem_write_e = _lanes(1, "mem_write_e")
+        mem_size_e = _lanes(MemSize, "mem_size_e")
+        mem_signed_e = _lanes(1, "mem_signed_e")
+        branch_e = _lanes(Branch, "branch_e")
+        jump_reg_e = _lanes(1, "jump_reg_e")
+        halt_e = _lanes(1, "halt_e")
+        muldiv_e = Signal(MulDivOp)
+
+        # MEM, the memory access fields are those of the lane that has one
+        pc_m = _lanes(32, "pc_m")
+        valid_m = _lanes(1, "valid_m")
+        result_m = _lanes(32, "result_m")
+        dest_m = _lanes(unsigned(5), "dest_m")
+        reg_write_m = _lanes(1, "reg_write_m")
+        mem_read_m = _lanes(1, "mem_read_m")
+        store_en_m = _lanes(4, "store_en_m")
+        halt_m = _lanes(1, "halt_m")
+        mem_size_m = Signal(MemSize)
+        mem_signed_m = Signal()
+        offset_m = Signal(2)
+        perf_m = Signal()
+        store_addr_m = Signal(30)
+        store_data_m = Signal(32)
+
+        # WB
+        pc_w = _lanes(32, "pc_w")
+        valid_w = _lanes(1, "valid_w")
+        result_w = _lanes(32, "result_w")
+        dest_w = _lanes(unsigned(5), "dest_w")
+        reg_write_w = _lanes(1, "reg_write_w")
+        store_en_w = _lanes(4, "store_en_w")
+        halt_w = _lanes(1, "halt_w")
+        store_addr_w = Signal(30)
+        store_data_w = Signal(32)
+
+        # Hazards: as in ``PipelinedCore``, against the loads of both lanes
+        # of EX. Lane 0 of EX is the only one that can start ``muldiv``.
+        def load_use(decoder, control):
+            return Cat(
+                valid_e[lane] & mem_read_e[lane] & (dest_e[lane] != 0) & (
+                    (control.reads_rs & (decoder.rs == dest_e[lane])) |
+                    (control.reads_rt & (decoder.rt == dest_e[lane]))
+                )
+                for lane in range(2)
+            ).any()
+
+        load_use0 = Signal()
+        load_use1 = Signal()
+        m.d.comb += [
+            load_use0.eq(load_use(decoder0, control0)),
+            load_use1.eq(load_use(decoder1, control1)),
+        ]
+        reads_hilo = (control0.wb_sel == WbSel.HI) | (control0.wb_sel == WbSel.LO)
+        starting = valid_e[0] & (muldiv_e != MulDivOp.NONE) & \
+            (muldiv_e != MulDivOp.MTHI) & (muldiv_e != MulDivOp.MTLO)
+        m.d.comb += stall.eq(valid_d & (load_use0 | (reads_hilo & (starting | muldiv.busy))))
+
+        # Pairing rules
+        mem0 = control0.mem_read | control0.mem_write
+        mem1 = control1.mem_read | control1.mem_write
+        ends_pair = (control0.branch != Branch.NONE) | control0.jump | control0.jump_reg | control0.halt
+        raw = control0.reg_write & (control0.dest != 0) & (
+            (control1.reads_rs & (decoder1.rs == control0.dest)) |
+            (control1.reads_rt & (decoder1.rt == control0.dest))
+        )
+        uses_muldiv = (control1.muldiv != MulDivOp.NONE) | \
+            (control1.wb_sel == WbSel.HI) | (control1.wb_sel == WbSel.LO)
+        m.d.comb += pair.eq(valid_d & ~stall & ~ends_pair & ~(mem0 & mem1) & ~raw &
+                            ~uses_muldiv & ~load_use1)
+
+        # The next pair starts after the last instruction issued, or at the
+        # target of a ``J``/``JAL`` issued last. The fetch pc of the next
+        # instruction is kept with each one to be checked in EX.
+        pred_pc_d = _lanes(32, "pred_pc_d")
+        with m.If(~valid_d | stall):
+            m.d.comb += self.pc.eq(pc_d)
+        with m.Elif(pair):
+            m.d.comb += self.pc.eq(Mux(control1.jump, jump_pc_d[1], pc_d + 8))
+        with m.Else():
+            m.d.comb += self.pc.eq(Mux(control0.jump, jump_pc_d[0], pc_d + 4))
+        m.d.comb += [
+            pred_pc_d[0].eq(Mux(pair, pc_d + 4, self.pc)),
+            pred_pc_d[1].eq(self.pc),
+        ]
+
+        # EX
+        def forward(index, value):
+            # lane 1 is younger than lane 0, and MEM younger than WB
+            for valid, reg_write, dest, result in [
+                (valid_w[0], reg_write_w[0], dest_w[0], result_w[0]),
+                (valid_w[1], reg_write_w[1], dest_w[1], result_w[1]),
+                (valid_m[0], reg_write_m[0], dest_m[0], result_m[0]),
+                (valid_m[1], reg_write_m[1], dest_m[1], result_m[1]),
+            ]:
+                value = Mux(valid & reg_write & (dest == index) & (index != 0), result, value)
+            return value
+
+        rs_val = _lanes(32, "rs_val")
+        rt_val = _lanes(32, "rt_val")
+        pc_plus4 = _lanes(32, "pc_plus4")
+        next_pc = _lanes(32, "next_pc")
+        result_e = _lanes(32, "result_e")
+        for lane, alu in enumerate(alus):
+            m.d.comb += [
+                rs_val[lane].eq(forward(rs_e[lane], rs_val_e[lane])),
+                rt_val[lane].eq(forward(rt_e[lane], rt_val_e[lane])),
+                alu.rs.eq(rs_val[lane]),
+                alu.rt.eq(Mux(alu_imm_e[lane], ext_imm_e[lane], rt_val[lane])),
+                alu.shamt.eq(shamt_e[lane]),
+                alu.func.eq(alu_func_e[lane]),
+                pc_plus4[lane].eq(pc_e[lane] + 4),
+            ]
+
+            taken = Signal(name=f"taken{lane}")
+            with m.Switch(branch_e[lane]):
+                with m.Case(Branch.EQ):
+                    m.d.comb += taken.eq(rs_val[lane] == rt_val[lane])
+                with m.Case(Branch.NE):
+                    m.d.comb += taken.eq(rs_val[lane] != rt_val[lane])
+                with m.Case(Branch.LEZ):
+                    m.d.comb += taken.eq(rs_val[lane].as_signed() <= 0)
+                with m.Case(Branch.GTZ):
+                    m.d.comb += taken.eq(rs_val[lane].as_signed() > 0)
+
+            target = Signal(32, name=f"target{lane}")
+            with m.If(jump_reg_e[lane]):
+                m.d.comb += target.eq(rs_val[lane])
+            with m.Elif(jump_e[lane]):
+                m.d.comb += target.eq(pred_pc_e[lane])
+            with m.Else():
+                m.d.comb += target.eq(pc_plus4[lane] + (ext_imm_e[lane] << 2))
+            m.d.comb += next_pc[lane].eq(
+                Mux(taken | jump_e[lane] | jump_reg_e[lane], target, pc_plus4[lane]))
+
+            with m.Switch(wb_sel_e[lane]):
+                with m.Case(WbSel.LINK):
+                    m.d.comb += result_e[lane].eq(pc_plus4[lane])
+                with m.Case(WbSel.LLO):
+                    m.d.comb += result_e[lane].eq(Cat(imm_e[lane], rt_val[lane][16:]))
+                with m.Case(WbSel.LHI):
+                    m.d.comb += result_e[lane].eq(Cat(rt_val[lane][:16], imm_e[lane]))
+                with m.Case(WbSel.HI):
+                    m.d.comb += result_e[lane].eq(muldiv.hi)
+                with m.Case(WbSel.LO):
+                    m.d.comb += result_e[lane].eq(muldiv.lo)
+                with m.Default():
+                    m.d.comb += result_e[lane].eq(alu.rd)
+
+        # Only the younger instruction of a pair can be taken, the older
+        # one then always falls through to it
+        miss = [valid_e[lane] & ((next_pc[lane] != pred_pc_e[lane]) | halt_e[lane])
+                for lane in range(2)]
+        halting = Signal()
+        m.d.comb += [
+            halting.eq((valid_e[0] & halt_e[0]) | (valid_e[1] & halt_e[1])),
+            redirect.eq(miss[0] | miss[1]),
+            redirect_pc.eq(Mux(miss[0], next_pc[0], next_pc[1])),
+        ]
+
+        m.d.comb += [
+            muldiv.op.eq(muldiv_e),
+            muldiv.start.eq(valid_e[0]),
+            muldiv.rs.eq(rs_val[0]),
+            muldiv.rt.eq(rt_val[0]),
+        ]
+
+        # Memory, accessed by whichever lane needs it, read at the end of EX
+        # through a transparent port as in ``PipelinedCore``
+        second = Signal()
+        addr = Signal(32)
+        m.d.comb += [
+            second.eq(valid_e[1] & (mem_read_e[1] | mem_write_e[1])),
+            addr.eq(Mux(second, alus[1].rd, alus[0].rd)),
+        ]
+        mem_size = Mux(second, mem_size_e[1], mem_size_e[0])
+        store_data, store_en = store_align(m, Mux(second, rt_val[1], rt_val[0]), addr[:2], mem_size)
+
+        perf_e = Mux(second, mem_read_e[1], mem_read_e[0]) & perf.selects(addr)
+
+        m.submodules.dmem_read = dmem_read = self.dmem.read_port(transparent=True)
+        m.submodules.dmem_write = dmem_write = self.dmem.write_port(granularity=8)
+        m.d.comb += dmem_read.addr.eq(addr[2:])
+
+        # MEM
+        m.d.comb += perf.addr.eq(store_addr_m)
+        load = load_extend(m, Mux(perf_m, perf.data, dmem_read.data), offset_m, mem_size_m,
+                           mem_signed_m)
+        m.d.comb += [
+            dmem_write.addr.eq(store_addr_m),
+            dmem_write.data.eq(store_data_m),
+            dmem_write.en.eq(Mux(valid_m[0], store_en_m[0], 0) | Mux(valid_m[1], store_en_m[1], 0)),
+        ]
+
+        # WB
+        retires = [
+            (self.retire, self.retire_pc, self.retire_reg, self.retire_value,
+             self.retire_store, self.retire_addr, self.retire_data),
+            (self.retire2, self.retire2_pc, self.retire2_reg, self.retire2_value,
+             self.retire2_store, self.retire2_addr, self.retire2_data),
+        ]
+        for lane, (retire, retire_pc, retire_reg, retire_value, retire_store, retire_addr,
+                   retire_data) in enumerate(retires):
+            m.d.comb += [
+                regfile.waddr[lane].eq(dest_w[lane]),
+                regfile.wdata[lane].eq(result_w[lane]),
+                regfile.wen[lane].eq(valid_w[lane] & reg_write_w[lane]),
+                retire.eq(valid_w[lane]),
+                retire_pc.eq(pc_w[lane]),
+                retire_reg.eq(Mux(regfile.wen[lane], dest_w[lane], 0)),
+                retire_value.eq(result_w[lane]),
+                retire_store.eq(Mux(valid_w[lane], store_en_w[lane], 0)),
+                retire_addr.eq(store_addr_w),
+                retire_data.eq(store_data_w),
+            ]
+
+        # Pipeline registers
+        m.d.sync += [
+            store_addr_w.eq(store_addr_m),
+            store_data_w.eq(store_data_m),
+
+            mem_size_m.eq(mem_size),
+            mem_signed_m.eq(Mux(second, mem_signed_e[1], mem_signed_e[0])),
+            offset_m.eq(addr[:2]),
+            perf_m.eq(perf_e),
+            store_addr_m.eq(addr[2:]),
+            store_data_m.eq(store_data),
+        ]
+        for lane, alu in enumerate(alus):
+            m.d.sync += [
+                pc_w[lane].eq(pc_m[lane]),
+                valid_w[lane].eq(valid_m[lane]),
+                result_w[lane].eq(Mux(mem_read_m[lane], load, result_m[lane])),
+                dest_w[lane].eq(dest_m[lane]),
+                reg_write_w[lane].eq(reg_write_m[lane]),
+                store_en_w[lane].eq(store_en_m[lane]),
+                halt_w[lane].eq(halt_m[lane]),
+
+                pc_m[lane].eq(pc_e[lane]),
+                valid_m[lane].eq(valid_e[lane]),
+                result_m[lane].eq(result_e[lane]),
+                dest_m[lane].eq(dest_e[lane]),
+                reg_write_m[lane].eq(reg_write_e[lane] & ~alu.ovf),
+                mem_read_m[lane].eq(mem_read_e[lane]),
+                store_en_m[lane].eq(Mux(mem_write_e[lane], store_en, 0)),
+                halt_m[lane].eq(halt_e[lane]),
+            ]
+
+        with m.If(redirect | stall):
+            m.d.sync += [valid_e[lane].eq(0) for lane in range(2)]
+        with m.Else():
+            m.d.sync += [
+                valid_e[0].eq(valid_d),
+                valid_e[1].eq(pair),
+                muldiv_e.eq(control0.muldiv),
+            ]
+            for lane, (decoder, control) in enumerate(zip(decoders, controls)):
+                m.d.sync += [
+                    pc_e[lane].eq(pc_d + 4 * lane),
+                    pred_pc_e[lane].eq(pred_pc_d[lane]),
+                    jump_e[lane].eq(control.jump),
+                    rs_e[lane].eq(decoder.rs),
+                    rt_e[lane].eq(decoder.rt),
+                    rs_val_e[lane].eq(regfile.rdata[2 * lane]),
+                    rt_val_e[lane].eq(regfile.rdata[2 * lane + 1]),
+                    shamt_e[lane].eq(decoder.shamt),
+                    imm_e[lane].eq(decoder.imm),
+                    ext_imm_e[lane].eq(control.ext_imm),
+                    alu_func_e[lane].eq(control.alu_func),
+                    alu_imm_e[lane].eq(control.alu_imm),
+                    dest_e[lane].eq(control.dest),
+                    reg_write_e[lane].eq(control.reg_write),
+                    wb_sel_e[lane].eq(control.wb_sel),
+                    mem_read_e[lane].eq(control.mem_read),
+                    mem_write_e[lane].eq(control.mem_write),
+                    mem_size_e[lane].eq(control.mem_size),
+                    mem_signed_e[lane].eq(control.mem_signed),
+                    branch_e[lane].eq(control.branch),
+                    jump_reg_e[lane].eq(control.jump_reg),
+                    halt_e[lane].eq(control.halt),
+                ]
+
+        with m.If(redirect):
+            m.d.sync += [
+                pc_d.eq(redirect_pc),
+                valid_d.eq(0),
+            ]
+            with m.If(halting):
+                m.d.sync += fetching.eq(0)
+        with m.Else():
+            m.d.sync += [
+                pc_d.eq(self.pc),
+                valid_d.eq(fetching),
+            ]
+
+        # Counters
+        overflow = [valid_e[lane] & reg_write_e[lane] & alus[lane].ovf for lane in range(2)]
+        m.d.comb += [
+            perf.enable.eq(~self.halt),
+            perf.events["cycles"].eq(1),
+            perf.events["retired"].eq(self.retire + self.retire2),
+            perf.events["load_use"].eq(stall & load_use0),
+            perf.events["muldiv_wait"].eq(stall & ~load_use0),
+            perf.events["mispredict"].eq(redirect & ~halting),
+            perf.events["overflow"].eq(overflow[0] + overflow[1]),
+            perf.events["dual_issue"].eq(self.retire2),
+        ]
+
+        with m.If((valid_w[0] & halt_w[0]) | (valid_w[1] & halt_w[1])):
+            m.d.sync += self.halt.eq(1)
+
+        return m
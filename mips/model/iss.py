@@ -0,0 +1,403 @@
+"""
+Functional instruction set simulator (ISS) used as the reference model
+for the core.
+
+Instead of decoding every instruction as it executes, each basic block of
+the program is translated once into Python source with all of its fields
+already folded into constants, and compiled. Running a program is then a
+loop of one call per basic block. The semantics match ``Core``: no branch
+delay slots, little endian memory, overflowing ``ADD``/``SUB``/``ADDI``
+leave the destination untouched (and count a trap), and ``TRAP`` halts.
+"""
+
+from mips.cpu.isa import *
+from typing import *
+
+MASK = 0xffff_ffff
+
+SIGN = 0x8000_0000
+
+BLOCK_MAX = 64
+"Longest straight line sequence translated into a single block"
+
+
+class Halt(Exception):
+    "Raised by ``TRAP`` with the address of the ``TRAP``"
+
+
+class Commit(NamedTuple):
+    """
+    Architectural effects of a retired instruction
+
+    Attributes:
+        pc: address of the instruction
+        inst: instruction word
+        reg: register written, or ``None``
+        value: value written to ``reg``
+        store: ``(addr, size, value)`` of a store, or ``None``
+    """
+    pc: int
+    inst: int
+    reg: Optional[int]
+    value: int
+    store: Optional[Tuple[int, int, int]]
+
+
+def fields(word: int):
+    """
+    Split ``word`` into opcode, rs, rt, rd, shamt, funct, imm and addr.
+    """
+    return (
+        word >> 26,
+        (word >> 21) & 0x1f,
+        (word >> 16) & 0x1f,
+        (word >> 11) & 0x1f,
+        (word >> 6) & 0x1f,
+        word & 0x3f,
+        word & 0xffff,
+        word & 0x3ff_ffff,
+    )
+
+
+def sext16(v: int) -> int:
+    "Sign extend a 16-bit value"
+    return (v ^ 0x8000) - 0x8000
+
+
+def divide(a: int, b: int, signed: bool):
+    """
+    Divide ``a`` by ``b`` as ``DIV``/``DIVU`` do, returning ``(hi, lo)``:
+    the remainder, which has the sign of ``a``, and the quotient rounded
+    towards zero. Dividing by zero gives an all ones quotient and ``a`` as
+    remainder, and ``DIV`` of ``-2**31`` by ``-1`` gives ``-2**31``.
+    """
+    if b == 0:
+        return a, MASK
+    if signed:
+        a = (a ^ SIGN) - SIGN
+        b = (b ^ SIGN) - SIGN
+    q = abs(a) // abs(b)
+    if (a < 0) != (b < 0):
+        q = -q
+    return (a - q * b) & MASK, q & MASK
+
+
+# Source templates of the instructions that never change control flow.
+# ``{s}``/``{t}``/``{d}``/``{h}`` are register and shift fields, ``{i}`` the
+# sign extended immediate, ``{u}`` the zero extended one, and ``{x}`` the
+# sign extended immediate as an unsigned 32-bit value. Templates are only
+# used when the destination is not ``$zero``.
+
+REG_TEMPLATE = {
+    Funct.ADDU: "r[{d}] = (r[{s}] + r[{t}]) & MASK",
+    Funct.SUBU: "r[{d}] = (r[{s}] - r[{t}]) & MASK",
+    Funct.AND: "r[{d}] = r[{s}] & r[{t}]",
+    Funct.OR: "r[{d}] = r[{s}] | r[{t}]",
+    Funct.XOR: "r[{d}] = r[{s}] ^ r[{t}]",
+    Funct.NOR: "r[{d}] = ~(r[{s}] | r[{t}]) & MASK",
+    Funct.SLL: "r[{d}] = (r[{t}] << {h}) & MASK",
+    Funct.SLLV: "r[{d}] = (r[{t}] << (r[{s}] & 31)) & MASK",
+    Funct.SRL: "r[{d}] = r[{t}] >> {h}",
+    Funct.SRLV: "r[{d}] = r[{t}] >> (r[{s}] & 31)",
+    Funct.SRA: "r[{d}] = (((r[{t}] ^ SIGN) - SIGN) >> {h}) & MASK",
+    Funct.SRAV: "r[{d}] = (((r[{t}] ^ SIGN) - SIGN) >> (r[{s}] & 31)) & MASK",
+    Funct.SLT: "r[{d}] = int((r[{s}] ^ SIGN) < (r[{t}] ^ SIGN))",
+    Funct.SLTU: "r[{d}] = int(r[{s}] < r[{t}])",
+    Funct.MFHI: "r[{d}] = iss.hi",
+    Funct.MFLO: "r[{d}] = iss.lo",
+}
+
+IMM_TEMPLATE = {
+    Opcode.ADDIU: "r[{t}] = (r[{s}] + {i}) & MASK",
+    Opcode.SLTI: "r[{t}] = int((r[{s}] ^ SIGN) < ({x} ^ SIGN))",
+    Opcode.SLTIU: "r[{t}] = int(r[{s}] < {x})",
+    Opcode.ANDI: "r[{t}] = r[{s}] & {u}",
+    Opcode.ORI: "r[{t}] = r[{s}] | {u}",
+    Opcode.XORI: "r[{t}] = r[{s}] ^ {u}",
+    Opcode.LLO: "r[{t}] = (r[{t}] & 0xffff0000) | {u}",
+    Opcode.LHI: "r[{t}] = (r[{t}] & 0xffff) | {u} << 16",
+    Opcode.LB: "r[{t}] = ((mem[(r[{s}] + {i}) & AMASK] ^ 0x80) - 0x80) & MASK",
+    Opcode.LBU: "r[{t}] = mem[(r[{s}] + {i}) & AMASK]",
+    Opcode.LH: (
+        "a = (r[{s}] + {i}) & AMASK & ~1\n"
+        "r[{t}] = (((mem[a] | mem[a + 1] << 8) ^ 0x8000) - 0x8000) & MASK"
+    ),
+    Opcode.LHU: (
+        "a = (r[{s}] + {i}) & AMASK & ~1\n"
+        "r[{t}] = mem[a] | mem[a + 1] << 8"
+    ),
+    Opcode.LW: (
+        "a = (r[{s}] + {i}) & AMASK & ~3\n"
+        "r[{t}] = int.from_bytes(mem[a:a + 4], 'little')"
+    ),
+}
+
+STORE_TEMPLATE = {
+    Opcode.SB: "mem[(r[{s}] + {i}) & AMASK] = r[{t}] & 0xff",
+    Opcode.SH: (
+        "a = (r[{s}] + {i}) & AMASK & ~1\n"
+        "mem[a:a + 2] = (r[{t}] & 0xffff).to_bytes(2, 'little')"
+    ),
+    Opcode.SW: (
+        "a = (r[{s}] + {i}) & AMASK & ~3\n"
+        "mem[a:a + 4] = r[{t}].to_bytes(4, 'little')"
+    ),
+    Funct.MTHI: "iss.hi = r[{s}]",
+    Funct.MTLO: "iss.lo = r[{s}]",
+    Funct.MULT: (
+        "p = ((r[{s}] ^ SIGN) - SIGN) * ((r[{t}] ^ SIGN) - SIGN)\n"
+        "iss.hi = (p >> 32) & MASK\n"
+        "iss.lo = p & MASK"
+    ),
+    Funct.MULTU: "p = r[{s}] * r[{t}]\niss.hi = p >> 32\niss.lo = p & MASK",
+    Funct.DIV: "iss.hi, iss.lo = divide(r[{s}], r[{t}], True)",
+    Funct.DIVU: "iss.hi, iss.lo = divide(r[{s}], r[{t}], False)",
+}
+"Templates of instructions that write no register"
+
+TRAPPING_TEMPLATE = {
+    Funct.ADD: "a = r[{s}]\nb = r[{t}]\nv = (a + b) & MASK\nif ~(a ^ b) & (a ^ v) & SIGN:",
+    Funct.SUB: "a = r[{s}]\nb = r[{t}]\nv = (a - b) & MASK\nif (a ^ b) & (a ^ v) & SIGN:",
+    Opcode.ADDI: "a = r[{s}]\nb = {x}\nv = (a + b) & MASK\nif ~(a ^ b) & (a ^ v) & SIGN:",
+}
+"Templates computing ``v`` and testing for overflow"
+
+BRANCH_TEMPLATE = {
+    Opcode.BEQ: "r[{s}] == r[{t}]",
+    Opcode.BNE: "r[{s}] != r[{t}]",
+    Opcode.BLEZ: "(r[{s}] ^ SIGN) <= SIGN",
+    Opcode.BGTZ: "(r[{s}] ^ SIGN) > SIGN",
+}
+"Branch conditions"
+
+STORE_SIZE = {
+    Opcode.SB.value: 1,
+    Opcode.SH.value: 2,
+    Opcode.SW.value: 4,
+}
+
+_FUNCT = {f.value: f for f in Funct}
+
+_OPCODE = {o.value: o for o in Opcode}
+
+
+def translate(word: int, offset: int):
+    """
+    Translate ``word`` into Python source.
+
+    Arguments:
+        word (int):     instruction word
+        offset (int):   byte offset of the instruction from ``pc``, the
+                        address of the first instruction of its block
+
+    Returns ``(source, dest, ends)``: the statements executing the
+    instruction, the register it writes (``None`` if none), and whether it
+    ends its block.
+    """
+    op, rs, rt, rd, shamt, funct, imm, addr = fields(word)
+    simm = sext16(imm)
+    args = dict(s=rs, t=rt, d=rd, h=shamt, i=simm, u=imm, x=simm & MASK)
+    link = f"(pc + {offset + 4}) & MASK"
+    illegal = f"raise ValueError('illegal instruction {word:#010x} at %#x' % (pc + {offset}))"
+
+    opcode = _OPCODE.get(op)
+    funct = _FUNCT.get(funct) if opcode == Opcode.SPECIAL else None
+
+    if opcode == Opcode.SPECIAL:
+        if funct is None:
+            return illegal, None, True
+        if funct in TRAPPING_TEMPLATE:
+            source = TRAPPING_TEMPLATE[funct].format(**args)
+            write = f"r[{rd}] = v" if rd else "pass"
+            return f"{source}\n    iss.traps += 1\nelse:\n    {write}", rd or None, False
+        if funct == Funct.JR:
+            return f"return r[{rs}]", None, True
+        if funct == Funct.JALR:
+            write = f"r[{rd}] = {link}\n" if rd else ""
+            return f"a = r[{rs}]\n{write}return a", rd or None, True
+        if funct in STORE_TEMPLATE:
+            return STORE_TEMPLATE[funct].format(**args), None, False
+        if not rd:
+            return "pass", None, False
+        return REG_TEMPLATE[funct].format(**args), rd, False
+
+    if opcode in (Opcode.J, Opcode.JAL):
+        target = f"((pc + {offset + 4}) & 0xf0000000) | {addr << 2}"
+        if opcode == Opcode.JAL:
+            return f"r[31] = {link}\nreturn {target}", 31, True
+        return f"return {target}", None, True
+    if opcode == Opcode.TRAP:
+        return f"raise Halt(pc + {offset})", None, True
+    if opcode in BRANCH_TEMPLATE:
+        cond = BRANCH_TEMPLATE[opcode].format(**args)
+        target = f"(pc + {offset + 4 + (simm << 2)}) & MASK"
+        return f"if {cond}:\n    return {target}\nreturn pc + {offset + 4}", None, True
+    if opcode in STORE_TEMPLATE:
+        return STORE_TEMPLATE[opcode].format(**args), None, False
+    if opcode in TRAPPING_TEMPLATE:
+        source = TRAPPING_TEMPLATE[opcode].format(**args)
+        write = f"r[{rt}] = v" if rt else "pass"
+        return f"{source}\n    iss.traps += 1\nelse:\n    {write}", rt or None, False
+    if opcode in IMM_TEMPLATE:
+        if not rt:
+            return "pass", None, False
+        return IMM_TEMPLATE[opcode].format(**args), rt, False
+    return illegal, None, True
+
+
+class ISS:
+    """
+    Instruction set simulator
+
+    Arguments:
+        program (list[int]):    words loaded into the program memory
+        data (list[int]):       words loaded into the data memory
+        imem_depth (int):       size of the program memory in words
+        dmem_depth (int):       size of the data memory in words
+
+    Attributes:
+        pc (int):               address of the next instruction
+        regs (list[int]):       register values
+        hi (int):               HI register
+        lo (int):               LO register
+        memory (bytearray):     data memory
+        halted (bool):          a ``TRAP`` was executed
+        retired (int):          number of retired instructions
+        traps (int):            number of suppressed overflowing instructions
+    """
+    def __init__(self, program=(), data=(), *, imem_depth=1024, dmem_depth=1024):
+        assert imem_depth & (imem_depth - 1) == 0, "imem_depth must be a power of 2"
+        assert dmem_depth & (dmem_depth - 1) == 0, "dmem_depth must be a power of 2"
+        program = list(program)
+        assert len(program) <= imem_depth, "program does not fit in memory"
+
+        self.pc = 0
+        self.regs = [0] * 32
+        self.hi = 0
+        self.lo = 0
+        self.memory = bytearray(4 * dmem_depth)
+        self.halted = False
+        self.retired = 0
+        self.traps = 0
+
+        for i, word in enumerate(data):
+            self.memory[4 * i:4 * i + 4] = (word & MASK).to_bytes(4, "little")
+
+        self._imask = imem_depth - 1
+        self._amask = 4 * dmem_depth - 1
+        self._words = program + [0] * (imem_depth - len(program))
+        self._globals = {
+            "r": self.regs,
+            "mem": self.memory,
+            "iss": self,
+            "Halt": Halt,
+            "divide": divide,
+            "MASK": MASK,
+            "SIGN": SIGN,
+            "AMASK": self._amask,
+        }
+        # compiled lazily, indexed by the word index of their first instruction
+        self._blocks = [None] * imem_depth
+        self._lengths = [0] * imem_depth
+        self._singles = [None] * imem_depth
+        self._dests = [None] * imem_depth
+
+    def fetch(self, pc: int) -> int:
+        "Instruction word at address ``pc``"
+        return self._words[(pc >> 2) & self._imask]
+
+    def word(self, index: int) -> int:
+        "Read the ``index``-th word of the data memory"
+        return int.from_bytes(self.memory[4 * index:4 * index + 4], "little")
+
+    def run(self, max_steps: int = 1_000_000) -> int:
+        """
+        Run until ``TRAP`` or until ``max_steps`` instructions retired.
+
+        Returns the number of instructions retired by this call.
+        """
+        if self.halted:
+            return 0
+        blocks = self._blocks
+        lengths = self._lengths
+        imask = self._imask
+        pc = self.pc
+        remaining = max_steps
+        n = 0
+        try:
+            while remaining:
+                index = (pc >> 2) & imask
+                block = blocks[index] or self._compile_block(index)
+                n = lengths[index]
+                if n > remaining:
+                    block = self._singles[index] or self._compile_single(index)
+                    n = 1
+                pc = block(pc)
+                remaining -= n
+        except Halt as halt:
+            self.halted = True
+            pc = halt.args[0]
+            remaining -= n
+        self.pc = pc
+        ran = max_steps - remaining
+        self.retired += ran
+        return ran
+
+    def step(self) -> Optional[Commit]:
+        """
+        Retire a single instruction and describe what it changed.
+
+        Returns ``None`` once the simulator is halted.
+        """
+        if self.halted:
+            return None
+        pc = self.pc
+        index = (pc >> 2) & self._imask
+        word = self._words[index]
+        regs = self.regs
+
+        store = None
+        op, rs, rt, _, _, _, imm, _ = fields(word)
+        size = STORE_SIZE.get(op)
+        if size is not None:
+            addr = (regs[rs] + sext16(imm)) & self._amask & -size
+            store = (addr, size, regs[rt] & ((1 << (8 * size)) - 1))
+
+        single = self._singles[index] or self._compile_single(index)
+        traps = self.traps
+        try:
+            self.pc = single(pc)
+        except Halt:
+            self.halted = True
+        self.retired += 1
+
+        dest = self._dests[index]
+        if dest is None or self.traps != traps:
+            return Commit(pc, word, None, 0, store)
+        return Commit(pc, word, dest, regs[dest], store)
+
+    def _compile(self, index: int, limit: int):
+        lines = ["def block(pc):"]
+        offset = 0
+        ends = False
+        while not ends and offset < 4 * limit:
+            word = self._words[(index + offset // 4) & self._imask]
+            source, dest, ends = translate(word, offset)
+            if offset == 0:
+                self._dests[index] = dest
+            lines.extend("    " + line for line in source.splitlines())
+            offset += 4
+        if not ends:
+            lines.append(f"    return pc + {offset}")
+        exec("\n".join(lines), self._globals)
+        return self._globals.pop("block"), offset // 4
+
+    def _compile_block(self, index: int):
+        block, self._lengths[index] = self._compile(index, BLOCK_MAX)
+        self._blocks[index] = block
+        return block
+
+    def _compile_single(self, index: int):
+        single, _ = self._compile(index, 1)
+        self._singles[index] = single
+        return single
@@ -0,0 +1,148 @@
+"""
+In-process cache of elaborated and compiled simulation models.
+
+Building a ``Simulator`` elaborates the design and compiles it into Python
+code, which dominates the runtime of short simulations. The designs under
+``mips/cpu`` rarely change between simulations, so ``cached_simulator``
+hands out a simulator that is reset and reused rather than rebuilt.
+
+Entries are keyed by a hash of the sources in ``mips/cpu``, so a model
+compiled from an older version of the design is never handed out. The
+compiled model is made of live Python closures, so the cache lives in
+memory and is per process.
+"""
+
+from amaranth.sim import Simulator
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import *
+
+import hashlib
+
+CPU_DIR = Path(__file__).resolve().parent.parent / "cpu"
+
+MAX_ENTRIES = 32
+
+
+def design_hash() -> str:
+    """
+    Hash of every source file in ``mips/cpu``.
+    """
+    h = hashlib.sha256()
+    for path in sorted(CPU_DIR.glob("*.py")):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+class CachedSimulator:
+    """
+    Wrapper around a ``Simulator`` that can be run any number of times.
+
+    It offers the parts of the ``Simulator`` interface used by the tests.
+    Processes added before ``run`` only take part in that run; between runs
+    the simulator is reset, which restores every signal and memory to its
+    initial value without elaborating the design again.
+
+    Attributes:
+        dut (Elaboratable): the simulated design, use its signals in processes
+    """
+    def __init__(self, dut):
+        self.dut = dut
+        self._sim = Simulator(dut)
+        self._clocks = set()
+        self._slots = {"comb": 0, "sync": 0}
+        self._pending = {"comb": [], "sync": []}
+        self._active = {"comb": [], "sync": []}
+        self._dirty = False
+
+    def add_clock(self, period, *, domain="sync"):
+        if domain in self._clocks:
+            return
+        assert not self._dirty, "clocks must be added before the first run"
+        self._sim.add_clock(period, domain=domain)
+        self._clocks.add(domain)
+
+    def add_process(self, process):
+        self._pending["comb"].append(process)
+
+    def add_sync_process(self, process):
+        self._pending["sync"].append(process)
+
+    def write_vcd(self, *args, **kwargs):
+        return self._sim.write_vcd(*args, **kwargs)
+
+    def run(self):
+        if self._dirty:
+            self._sim.reset()
+        self._dirty = True
+
+        self._active = self._pending
+        self._pending = {"comb": [], "sync": []}
+
+        for kind, processes in self._active.items():
+            while self._slots[kind] < len(processes):
+                dispatcher = self._dispatcher(kind, self._slots[kind])
+                if kind == "comb":
+                    self._sim.add_process(dispatcher)
+                else:
+                    self._sim.add_sync_process(dispatcher)
+                self._slots[kind] += 1
+
+        try:
+            self._sim.run()
+        finally:
+            self._active = {"comb": [], "sync": []}
+
+    def _dispatcher(self, kind: str, index: int):
+        # Processes stay registered forever, so each slot runs whatever
+        # process was added to that position for the current run, if any.
+        def dispatch():
+            active = self._active[kind]
+            if index < len(active):
+                yield from active[index]()
+        return dispatch
+
+
+_cache: "OrderedDict[Any, CachedSimulator]" = OrderedDict()
+_cache_hash: Optional[str] = None
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def cached_simulator(factory: Callable, *args, **kwargs) -> CachedSimulator:
+    """
+    Return a reusable simulator of ``factory(*args, **kwargs)``.
+
+    Arguments:
+        factory:    callable building the design, usually its class
+        args:       arguments of ``factory``, they must be hashable once
+                    lists are turned into tuples
+    """
+    global _cache_hash
+    current = design_hash()
+    if current != _cache_hash:
+        _cache.clear()
+        _cache_hash = current
+
+    key = (factory, _freeze(args), _freeze(kwargs))
+    entry = _cache.get(key)
+    if entry is None:
+        entry = _cache[key] = CachedSimulator(factory(*args, **kwargs))
+        if len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+    return entry
+
+
+def clear():
+    "Drop every cached simulator"
+    _cache.clear()
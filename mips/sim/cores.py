@@ -0,0 +1,95 @@
+"""
+The cores by name, and building one for a program: shared by the
+simulator, the co-simulation, synthesis and flashing.
+"""
+
+from mips.cpu.cache import Cache
+from mips.cpu.core import Core
+from mips.cpu.muldiv import MULDIV_CONFIGS, MulDiv
+from mips.cpu.pipeline import PipelinedCore
+from mips.cpu.predictor import BranchPredictor
+from mips.cpu.superscalar import DualIssueCore
+from mips.util.asm import assemble_file
+from mips.util.image import read_image
+import mips.util.encode as encode
+
+from typing import *
+
+__all__ = [
+    "CORES",
+    "DEMO_PROGRAM",
+    "parse_cache",
+    "load_program",
+    "build_core",
+]
+
+CORES = {
+    "single": Core,
+    "pipeline": PipelinedCore,
+    "dual": DualIssueCore,
+}
+"Cores that can be simulated, by name"
+
+DEMO_PROGRAM = [
+    encode.ADDIU(rs=0, rt=1, imm=10)[0],        # n = 10
+    encode.ADDIU(rs=0, rt=2, imm=0)[0],         # sum = 0
+    encode.ADDU(rs=2, rt=1, rd=2)[0],           # loop: sum += n
+    encode.ADDIU(rs=1, rt=1, imm=0xffff)[0],    # n -= 1
+    encode.BNE(rs=1, rt=0, imm=0xfffd)[0],      # if n != 0 goto loop
+    encode.SW(rs=0, rt=2, imm=0)[0],            # MEM[0] = sum
+    encode.TRAP(0)[0],                          # halt
+]
+"Program that is run when no image is given: sums 1 to 10 and halts"
+
+
+def parse_cache(spec: str, replacement: str = "lru") -> Cache:
+    """
+    Build a ``Cache`` from a ``SETSxWAYSxWORDS`` description, e.g.
+    ``16x2x4`` for 16 sets of 2 ways of 4 words lines (512 bytes).
+    """
+    try:
+        sets, ways, line_words = (int(v) for v in spec.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"cache {spec!r} is not SETSxWAYSxWORDS")
+    return Cache(sets=sets, ways=ways, line_words=line_words, replacement=replacement)
+
+
+def load_program(program: Optional[str]) -> Tuple[List[int], List[int]]:
+    """
+    Program and data words of ``program``, an image (see ``read_image``)
+    or a ``.s`` source, or of ``DEMO_PROGRAM`` if ``None``.
+    """
+    if program is None:
+        return DEMO_PROGRAM, []
+    if program.endswith(".s"):
+        words, data, _ = assemble_file(program)
+        return words, data
+    return read_image(program), []
+
+
+def build_core(words: List[int], data: List[int] = (), core: str = "single",
+               predictor: Optional[str] = None, bht_entries: int = 64, btb_entries: int = 16,
+               icache: Optional[str] = None, dcache: Optional[str] = None,
+               replacement: str = "lru", mem_latency: int = 8, muldiv: str = "balanced",
+               predecode: bool = False):
+    """
+    Build the core named ``core`` running ``words`` over ``data``, with the
+    multiply/divide unit configured as ``MULDIV_CONFIGS[muldiv]``. If it
+    is pipelined it gets a branch predictor of kind ``predictor``, the
+    caches described by ``icache`` and ``dcache`` (see ``parse_cache``),
+    and predecoded fields next to its program with ``predecode``.
+    """
+    if core in ("single", "dual") and \
+            (predictor is not None or icache is not None or dcache is not None or predecode):
+        raise ValueError(f"the {core} core has no branch predictor, no caches and no predecode")
+    muldiv = MulDiv(**MULDIV_CONFIGS[muldiv])
+    if core in ("single", "dual"):
+        return CORES[core](words, data, muldiv=muldiv)
+    if predictor is not None:
+        predictor = BranchPredictor(predictor, entries=bht_entries, btb_entries=btb_entries)
+    if icache is not None:
+        icache = parse_cache(icache, replacement)
+    if dcache is not None:
+        dcache = parse_cache(dcache, replacement)
+    return CORES[core](words, data, predictor=predictor, icache=icache, dcache=dcache,
+                       mem_latency=mem_latency, muldiv=muldiv, predecode=predecode)
@@ -0,0 +1,320 @@
+"""
+Lockstep co-simulation of a core against the ``ISS``.
+
+Every instruction the core retires is stepped on the ISS, and the two
+commits are compared: address, register written and its value, and the
+bytes stored. The first difference stops the run and is reported with the
+last few commits leading up to it. The register files are compared once
+both have halted.
+
+The core must expose the commit port of ``Core`` and ``PipelinedCore``:
+``retire``, ``retire_pc``, ``retire_reg``, ``retire_value`` and the
+``retire_store``/``retire_addr``/``retire_data`` store. The second
+instruction retired by ``DualIssueCore`` in a cycle comes from its
+``retire2`` port, which is checked after the first one.
+
+``cosim`` elaborates each core configuration once per process and loads
+every program into its memories, and ``cosim_many`` spreads a batch over
+a pool of processes.
+"""
+
+from amaranth.sim import Simulator
+
+from mips.cpu.imem import InstructionMemory
+from mips.cpu.predecode import predecode_program
+from mips.model.iss import ISS, Commit
+from mips.sim.cache import cached_simulator
+from mips.sim.cores import build_core
+from mips.util.disasm import disassemble
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from typing import *
+
+__all__ = [
+    "Divergence",
+    "CosimResult",
+    "lockstep",
+    "cosim",
+    "cosim_many",
+    "load_memories",
+    "format_divergence",
+]
+
+WINDOW = 8
+"Commits kept before a divergence by default"
+
+
+class Divergence(NamedTuple):
+    """
+    First difference between the core and the ISS
+
+    Attributes:
+        index: number of instructions retired before the diverging one
+        what: ``pc``, ``reg``, ``store``, ``halt``, ``illegal`` or ``regs``
+        expected: commit of the ISS, ``None`` if it had halted
+        got: commit of the core, ``None`` if it had halted
+        window: ``(expected, got)`` commits that led up to it
+    """
+    index: int
+    what: str
+    expected: Optional[Commit]
+    got: Optional[Commit]
+    window: Tuple[Tuple[Commit, Commit], ...]
+
+
+class CosimResult(NamedTuple):
+    cycles: int
+    retired: int
+    halted: bool
+    divergence: Optional[Divergence] = None
+
+    @property
+    def ok(self) -> bool:
+        "no divergence was found"
+        return self.divergence is None
+
+
+def _store(commit: Commit, amask: int) -> Optional[Tuple[int, int, int]]:
+    # ``(word address, byte enables, data)`` of the store of an ISS commit,
+    # with the bytes that are not enabled cleared
+    if commit.store is None:
+        return None
+    addr, size, value = commit.store
+    shift = addr & 3
+    return ((addr & amask) >> 2, ((1 << size) - 1) << shift, value << 8 * shift)
+
+
+def _byte_mask(enables: int) -> int:
+    return sum(0xff << 8 * i for i in range(4) if enables >> i & 1)
+
+
+def lockstep(core, iss: ISS, *, cycles: int = 100_000, window: int = WINDOW,
+             sim: Optional[Simulator] = None) -> CosimResult:
+    """
+    Run ``core`` and ``iss`` in lockstep until both halt, they diverge, or
+    ``cycles`` cycles have been simulated. Both must have been built with
+    the same program and data.
+
+    Arguments:
+        core (Core | PipelinedCore | DualIssueCore): core under test
+        iss (ISS):          reference model
+        cycles (int):       maximum number of cycles to simulate
+        window (int):       number of commits kept before a divergence
+        sim (Simulator):    simulator of ``core`` to use, a new one is made
+                            if ``None``
+    """
+    if sim is None:
+        sim = Simulator(core)
+        sim.add_clock(1e-6)
+
+    amask = core.dmem.depth - 1
+    history = deque(maxlen=window)
+    ran = 0
+    retired = 0
+    divergence = None
+
+    def diverge(what, expected, got):
+        nonlocal divergence
+        divergence = Divergence(retired, what, expected, got, tuple(history))
+
+    # commit slots in program order, a slot only retires after the ones
+    # before it
+    slots = [(core.retire, core.retire_pc, core.retire_reg, core.retire_value,
+              core.retire_store, core.retire_addr, core.retire_data)]
+    if hasattr(core, "retire2"):
+        slots.append((core.retire2, core.retire2_pc, core.retire2_reg, core.retire2_value,
+                      core.retire2_store, core.retire2_addr, core.retire2_data))
+
+    def bench():
+        nonlocal ran, retired
+        for _ in range(cycles):
+            for retire, retire_pc, retire_reg, retire_value, retire_store, retire_addr, retire_data in slots:
+                if not (yield retire):
+                    break
+                pc = yield retire_pc
+                reg = yield retire_reg
+                value = yield retire_value
+                enables = yield retire_store
+                store = None
+                if enables:
+                    store = ((yield retire_addr) & amask, enables,
+                             (yield retire_data) & _byte_mask(enables))
+
+                got = Commit(pc, iss.fetch(pc), reg or None, value if reg else 0, store)
+                try:
+                    expected = iss.step()
+                except ValueError:
+                    diverge("illegal", None, got)
+                    return
+                if expected is None:
+                    diverge("halt", None, got)
+                    return
+
+                expected = expected._replace(store=_store(expected, amask << 2 | 3))
+                if pc != expected.pc:
+                    diverge("pc", expected, got)
+                elif (got.reg, got.value) != (expected.reg, expected.value):
+                    diverge("reg", expected, got)
+                elif got.store != expected.store:
+                    diverge("store", expected, got)
+                if divergence is not None:
+                    return
+                history.append((expected, got))
+                retired += 1
+
+            yield
+            ran += 1
+            if (yield core.halt):
+                break
+
+        halted = yield core.halt
+        if halted != iss.halted:
+            diverge("halt", None, None)
+        elif halted:
+            regs = []
+            for i in range(32):
+                regs.append((yield from core.regfile.peek(i)))
+            if regs != iss.regs:
+                diverge("regs", None, None)
+
+    sim.add_sync_process(bench)
+    sim.run()
+    return CosimResult(ran, retired, iss.halted, divergence)
+
+
+def load_memories(core, program: List[int], data: List[int] = ()):
+    """
+    Process writing ``program`` and ``data`` into the memories of ``core``,
+    and the predecoded rows of ``program`` if it has them, to be added
+    with ``add_process`` to a simulator in its initial state so that it
+    runs before the first clock edge. An ``InstructionMemory`` is written
+    by its own ``load``.
+    """
+    assert len(program) <= core.imem.depth, "program does not fit in memory"
+    assert len(data) <= core.dmem.depth, "data does not fit in memory"
+    if isinstance(core.imem, InstructionMemory):
+        load_program, memories = core.imem.load(program), [(core.dmem, data)]
+    else:
+        load_program, memories = None, [(core.imem, program), (core.dmem, data)]
+
+    def process():
+        if load_program is not None:
+            yield from load_program()
+        for memory, words in memories:
+            for i, word in enumerate(words):
+                if word:
+                    yield memory[i].eq(word)
+        predecoded = getattr(core, "imem_predecode", None)
+        if predecoded is not None:
+            for i, row in enumerate(predecode_program(program)):
+                yield predecoded[i].eq(row)
+    return process
+
+
+def cosim(program: List[int], data: List[int] = (), core: str = "single", *,
+          cycles: int = 100_000, window: int = WINDOW, **options) -> CosimResult:
+    """
+    Co-simulate ``program`` over ``data`` on the core named ``core`` and
+    on the ISS, see ``lockstep``. ``options`` configure the core as in
+    ``mips.sim.cores.build_core``.
+
+    The core is built with empty memories and simulated by a
+    ``cached_simulator``, so that every program run on the same
+    configuration in this process shares one elaboration.
+    """
+    sim = cached_simulator(build_core, (), (), core, **options)
+    dut = sim.dut
+    sim.add_clock(1e-6)
+    sim.add_process(load_memories(dut, program, data))
+    iss = ISS(program, data, imem_depth=dut.imem.depth, dmem_depth=dut.dmem.depth)
+    return lockstep(dut, iss, cycles=cycles, window=window, sim=sim)
+
+
+def _cosim_job(job):
+    # runs in a worker of ``cosim_many``, with its own simulator cache
+    name, program, data, core, options = job
+    return name, cosim(program, data, core, **options)
+
+
+def cosim_many(programs: Iterable[Tuple[str, List[int], List[int]]], core: str = "single", *,
+               cycles: int = 100_000, window: int = WINDOW, stop: bool = False,
+               jobs: int = 1, **options) -> Iterator[Tuple[str, CosimResult]]:
+    """
+    Batch mode of ``cosim``: co-simulate every ``(name, program, data)``
+    and yield ``(name, result)`` in order as each completes, so that long
+    runs can report progress and failures as they go.
+
+    With more than one job the programs are run by a pool of processes,
+    each elaborating the core once.
+
+    Arguments:
+        stop (bool):    stop after the first program that diverges
+        jobs (int):     number of worker processes, 1 to run in this
+                        process and 0 for one per CPU
+    """
+    options = dict(options, cycles=cycles, window=window)
+    if jobs == 1:
+        for name, program, data in programs:
+            res = cosim(program, data, core, **options)
+            yield name, res
+            if stop and not res.ok:
+                return
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs or None) as pool:
+        results = pool.map(_cosim_job, ((name, program, data, core, options)
+                                        for name, program, data in programs))
+        for name, res in results:
+            yield name, res
+            if stop and not res.ok:
+                pool.shutdown(cancel_futures=True)
+                return
+
+
+def _describe(commit: Optional[Commit]) -> str:
+    if commit is None:
+        return "-"
+    parts = []
+    if commit.reg is not None:
+        parts.append(f"${commit.reg} = {commit.value:#010x}")
+    if commit.store is not None:
+        addr, enables, value = commit.store
+        parts.append(f"[{addr << 2:#x}/{enables:04b}] = {value:#010x}")
+    return ", ".join(parts) or "-"
+
+
+def format_divergence(divergence: Divergence) -> str:
+    """
+    Render ``divergence`` as a short listing: the commits that led up to
+    it, then what the ISS expected and what the core did.
+    """
+    lines = []
+    for expected, _ in divergence.window:
+        asm = disassemble([expected.inst], base=expected.pc)[0]
+        lines.append(f"   {expected.pc:#010x}  {asm:28} {_describe(expected)}")
+
+    first = divergence.index - len(divergence.window)
+    headers = {
+        "regs": "register files differ after halting",
+        "halt": "the core and the ISS did not halt together",
+        "illegal": "the ISS rejected an illegal instruction",
+    }
+    header = f"{headers.get(divergence.what, divergence.what + ' mismatch')} " \
+             f"after {divergence.index} instructions"
+    out = [header]
+    if lines:
+        out.append(f"last {len(lines)} commits (from #{first}):")
+        out += lines
+    if divergence.expected is not None or divergence.got is not None:
+        commit = divergence.expected or divergence.got
+        asm = disassemble([commit.inst], base=commit.pc)[0]
+        out.append(f">  {commit.pc:#010x}  {asm}")
+        out.append(f"   expected: pc {_pc(divergence.expected)}  {_describe(divergence.expected)}")
+        out.append(f"   got:      pc {_pc(divergence.got)}  {_describe(divergence.got)}")
+    return "\n".join(out)
+
+
+def _pc(commit: Optional[Commit]) -> str:
+    return "-" if commit is None else f"{commit.pc:#010x}"
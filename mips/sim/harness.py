@@ -0,0 +1,69 @@
+"""
+Streaming testbench harness for combinatorial modules.
+
+Creating a ``Simulator`` elaborates and compiles the whole design, which
+costs far more than simulating a single input vector. ``run_vectors``
+pays that cost once and pushes every vector through the same simulation.
+"""
+
+from amaranth.sim import Simulator, Settle
+
+import numpy as np
+
+from typing import *
+
+def run_vectors(dut, inputs: Sequence[Tuple[Any, Sequence[int]]], outputs: Sequence[Any],
+                *, sim: Optional[Simulator] = None) -> List[np.ndarray]:
+    """
+    Drive every input vector into ``dut`` and sample its outputs.
+
+    Inputs are only written when they change from one vector to the next,
+    so constant inputs (like an ``ALU`` function) cost nothing per vector.
+
+    Arguments:
+        dut (Elaboratable):     combinatorial design under test
+        inputs:                 ``(signal, values)`` pairs, all of the same length
+        outputs:                signals sampled after each vector settles
+        sim (Simulator):        simulator of ``dut`` to reuse, a new one is made if ``None``
+
+    Returns:
+        one ``uint64`` array per output holding its value for each vector.
+    """
+    columns = [(signal, np.asarray(values).tolist()) for signal, values in inputs]
+    count = len(columns[0][1]) if columns else 0
+    assert all(len(values) == count for _, values in columns),\
+        "every input must have the same number of vectors"
+
+    results = [[0] * count for _ in outputs]
+
+    if sim is None:
+        sim = Simulator(dut)
+
+    def bench():
+        previous = [None] * len(columns)
+        for i in range(count):
+            for j, (signal, values) in enumerate(columns):
+                value = values[i]
+                if value != previous[j]:
+                    yield signal.eq(value)
+                    previous[j] = value
+            yield Settle()
+            for j, signal in enumerate(outputs):
+                results[j][i] = yield signal
+
+    sim.add_process(bench)
+    sim.run()
+
+    return [np.array(column, dtype=np.uint64) for column in results]
+
+
+def first_mismatch(expected: Sequence[np.ndarray], got: Sequence[np.ndarray]) -> Optional[int]:
+    """
+    Index of the first vector where any of the ``got`` arrays differs from
+    the ``expected`` ones, or ``None`` if they all match.
+    """
+    bad = np.zeros(len(got[0]), dtype=bool)
+    for exp, res in zip(expected, got):
+        bad |= np.asarray(exp, dtype=np.uint64) != res
+    found = np.flatnonzero(bad)
+    return int(found[0]) if found.size else None
@@ -0,0 +1,94 @@
+"""
+Every access to Amaranth internals made by the simulation backends.
+
+The trace writer and the Verilator backend need to name the signals and
+memories of the design being simulated and to interpret the commands of
+generator testbenches, which Amaranth has no public interface for. They
+go through the functions of this module only, so that bumping the
+Amaranth commit pinned in ``requirements.txt`` only means porting them.
+"""
+
+from amaranth.back import rtlil
+from amaranth.hdl import Fragment
+from amaranth.hdl._ast import Assign, Concat, SignalDict
+from amaranth.hdl._ir import Design
+from amaranth.hdl._mem import MemoryData, MemoryInstance
+
+from typing import *
+
+__all__ = [
+    "SignalDict",
+    "prepare",
+    "simulated_design",
+    "signal_paths",
+    "memory_paths",
+    "convert",
+    "memory_row",
+    "assignment",
+    "concat_parts",
+]
+
+
+def prepare(design) -> Design:
+    """
+    The elaborated ``Design`` of ``design``, or ``design`` itself if it
+    already is one.
+    """
+    if isinstance(design, Design):
+        return design
+    return Fragment.get(design, None).prepare(ports=())
+
+
+def simulated_design(sim) -> Design:
+    "The ``Design`` prepared by ``amaranth.sim.Simulator`` ``sim``"
+    return sim._design
+
+
+def signal_paths(prepared: Design) -> SignalDict:
+    """
+    Path of every signal of ``prepared``, as a tuple of the names of the
+    modules below the top level followed by the name of the signal.
+    """
+    paths = SignalDict()
+    for signal, fragment in prepared.signal_lca.items():
+        info = prepared.fragments[fragment]
+        paths[signal] = info.name[1:] + (info.signal_names.get(signal, signal.name),)
+    return paths
+
+
+def memory_paths(prepared: Design) -> Dict[MemoryData, Tuple[str, ...]]:
+    "Path of every memory of ``prepared``, below the top level"
+    return {
+        fragment._data: info.name[1:]
+        for fragment, info in prepared.fragments.items()
+        if isinstance(fragment, MemoryInstance)
+    }
+
+
+def convert(prepared: Design, name: str = "top") -> Tuple[str, SignalDict]:
+    """
+    RTLIL of ``prepared`` and the path of each of its signals in it,
+    including the top level.
+    """
+    return rtlil.convert_fragment(prepared, name=name)
+
+
+def memory_row(value) -> Optional[Tuple[MemoryData, int]]:
+    "Memory and index of ``value`` if it is a memory row, e.g. ``mem[3]``"
+    if isinstance(value, MemoryData._Row):
+        return value._memory, value._index
+    return None
+
+
+def assignment(command) -> Optional[Tuple[Any, Any]]:
+    "Target and value of ``command`` if it is an assignment, ``lhs.eq(rhs)``"
+    if isinstance(command, Assign):
+        return command.lhs, command.rhs
+    return None
+
+
+def concat_parts(value) -> Optional[List[Any]]:
+    "Parts of ``value``, least significant first, if it is a ``Cat``"
+    if isinstance(value, Concat):
+        return list(value.parts)
+    return None
@@ -0,0 +1,265 @@
+"""
+Streaming trace writer, for long simulations.
+
+Amaranth's ``write_vcd`` records every signal of the design for the whole
+run, which for millions of cycles is gigabytes of text and makes the
+simulation I/O bound. ``TraceWriter`` instead records:
+
+* only the signals whose hierarchical name (``regfile.r3``, ``pc``)
+  matches one of a list of patterns;
+* only between a ``start`` and a ``stop`` trigger, on a cycle count or
+  on the address of a retiring instruction;
+* optionally only the last ``ring`` cycles, kept in memory and written
+  when the writer is closed, including when the simulation crashed.
+
+The traced signals are read as a single value once per cycle and only
+the ones that changed are written. The VCD is streamed through gzip for
+``.vcd.gz`` files and through zstd for ``.vcd.zst`` files (with the
+optional ``zstandard`` package).
+"""
+
+from amaranth import *
+
+from mips.sim.internals import SignalDict, prepare, signal_paths
+
+from collections import deque
+from fnmatch import fnmatchcase
+from typing import *
+
+import gzip
+import io
+
+__all__ = [
+    "Trigger",
+    "signal_names",
+    "open_trace",
+    "TraceWriter",
+]
+
+
+class Trigger(NamedTuple):
+    """
+    Condition starting or stopping a trace: reaching a cycle, or retiring
+    the instruction at an address.
+
+    Attributes:
+        cycle: cycle number, or ``None``
+        pc: instruction address, or ``None``
+    """
+    cycle: Optional[int] = None
+    pc: Optional[int] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "Trigger":
+        """
+        Parse ``cycle=N``, ``pc=ADDR`` or a bare cycle number, numbers in
+        any base Python accepts (``pc=0x40``).
+        """
+        kind, _, value = spec.rpartition("=")
+        kind = kind or "cycle"
+        if kind not in cls._fields:
+            raise ValueError(f"trigger {spec!r} is not cycle=N or pc=ADDR")
+        return cls(**{kind: int(value, 0)})
+
+    def fires(self, cycle: int, pc: Optional[int]) -> bool:
+        "Whether the trigger fires at ``cycle`` with ``pc`` retiring"
+        return (self.cycle is not None and cycle >= self.cycle) or \
+            (self.pc is not None and pc == self.pc)
+
+
+def signal_names(design) -> SignalDict:
+    """
+    Hierarchical name of every signal used in ``design``, with the levels
+    separated by dots and without the name of the top level, e.g.
+    ``regfile.r3``.
+
+    Every elaboration of a design makes new internal signals, so to name
+    the signals being simulated ``design`` must be the ``Design`` prepared
+    by the simulator rather than the ``Elaboratable``.
+    """
+    return SignalDict((signal, ".".join(path)) for signal, path in signal_paths(prepare(design)).items())
+
+
+def open_trace(path: str) -> TextIO:
+    """
+    Open ``path`` for writing text, compressed with gzip if it ends with
+    ``.gz`` and with zstd if it ends with ``.zst``.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", compresslevel=6)
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("writing .zst traces needs the zstandard package") from None
+        raw = zstandard.ZstdCompressor(level=3).stream_writer(open(path, "wb"))
+        return io.TextIOWrapper(raw, encoding="ascii")
+    if path.endswith(".fst"):
+        raise ValueError("FST traces are only written by the verilator backend")
+    return open(path, "w", buffering=1 << 20)
+
+
+def _identifier(index: int) -> str:
+    # short VCD identifier, in base 94 over the printable characters
+    chars = []
+    while True:
+        index, digit = divmod(index, 94)
+        chars.append(chr(33 + digit))
+        if not index:
+            return "".join(chars)
+        index -= 1
+
+
+class TraceWriter:
+    """
+    Streaming VCD writer of the signals of ``design`` matching
+    ``signals``, sampled once per cycle.
+
+    A testbench reads ``value`` after every clock edge and passes it to
+    ``sample``, e.g. ``writer.sample(cycle, (yield writer.value))``, and
+    closes the writer when done, which ``with`` does even on errors.
+
+    Arguments:
+        design (Design):        design being simulated, see ``signal_names``
+        path (str):             VCD file to write, see ``open_trace``
+        signals (list[str]):    patterns of the names to trace, matched by
+                                ``fnmatch`` against ``signal_names``
+        start (Trigger):        start tracing when it fires, or ``None``
+                                to trace from the first cycle
+        stop (Trigger):         stop tracing when it fires, or ``None``
+        ring (int):             keep only the last ``ring`` traced cycles,
+                                written on ``close``
+        pc (Signal):            address of the retiring instruction, for
+                                ``pc`` triggers
+        retire (Signal):        an instruction retires, for ``pc`` triggers
+
+    Attributes:
+        value (Value):          every traced signal, and ``pc``/``retire``
+        names (dict[str, Signal]): traced signals by name
+        cycles (int):           number of cycles traced
+    """
+    def __init__(self, design, path: str, *, signals: Sequence[str] = ("*",),
+                 start: Optional[Trigger] = None, stop: Optional[Trigger] = None,
+                 ring: Optional[int] = None, pc=None, retire=None):
+        names = signal_names(design)
+        self.names = {name: signal for signal, name in names.items()
+                      if any(fnmatchcase(name, pattern) for pattern in signals)}
+        self.names = dict(sorted(self.names.items()))
+        if not self.names:
+            raise ValueError(f"no signal matches {', '.join(signals)}")
+        if (start and start.pc is not None or stop and stop.pc is not None) and pc is None:
+            raise ValueError("pc triggers need the pc signal")
+
+        self.path = path
+        self.start = start
+        self.stop = stop
+        self.cycles = 0
+
+        traced = list(self.names.values())
+        self._fields = []
+        offset = 0
+        for i, signal in enumerate(traced):
+            width = len(signal)
+            self._fields.append((offset, (1 << width) - 1, width, _identifier(i)))
+            offset += width
+        self._mask = (1 << offset) - 1
+        self._pc_offset = offset
+        self._pc_width = None
+        extra = []
+        if pc is not None:
+            self._pc_width = len(pc)
+            extra = [pc, retire if retire is not None else C(1, 1)]
+        self.value = Cat(*traced, *extra)
+
+        self._on = start is None
+        self._done = False
+        self._last = None
+        self._written = None
+        self._cycle = None
+        self._ring = deque(maxlen=ring) if ring is not None else None
+        self._file = None
+        if self._ring is None:
+            self._file = open_trace(path)
+            self._header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _header(self):
+        lines = ["$timescale 1 us $end", "$scope module top $end"]
+        scope = []
+        for name, (_, _, width, ident) in zip(self.names, self._fields):
+            *path, leaf = name.split(".")
+            while scope and scope != path[:len(scope)]:
+                lines.append("$upscope $end")
+                scope.pop()
+            for level in path[len(scope):]:
+                lines.append(f"$scope module {level} $end")
+                scope.append(level)
+            lines.append(f"$var wire {width} {ident} {leaf} $end")
+        lines += ["$upscope $end"] * (len(scope) + 1)
+        lines.append("$enddefinitions $end")
+        self._file.write("\n".join(lines) + "\n")
+
+    def _write(self, cycle: int, packed: int):
+        last = self._last
+        lines = [f"#{cycle}"] if last is not None else [f"#{cycle}", "$dumpvars"]
+        for offset, mask, width, ident in self._fields:
+            value = packed >> offset & mask
+            if last is None or last >> offset & mask != value:
+                if width == 1:
+                    lines.append(f"{value}{ident}")
+                else:
+                    lines.append(f"b{value:b} {ident}")
+        if last is None:
+            lines.append("$end")
+        self._last = packed
+        self._written = cycle
+        self._file.write("\n".join(lines) + "\n")
+
+    def sample(self, cycle: int, value: int):
+        """
+        Record ``value``, the value of ``value`` at ``cycle``. Cycles must
+        be sampled in order.
+        """
+        if self._done:
+            return
+        pc = None
+        if self._pc_width is not None:
+            extra = value >> self._pc_offset
+            if extra >> self._pc_width & 1:
+                pc = extra & ((1 << self._pc_width) - 1)
+        if not self._on:
+            if not self.start.fires(cycle, pc):
+                return
+            self._on = True
+        elif self.stop is not None and self.stop.fires(cycle, pc):
+            self._done = True
+            return
+
+        packed = value & self._mask
+        self.cycles += 1
+        self._cycle = cycle
+        if self._ring is not None:
+            self._ring.append((cycle, packed))
+        elif packed != self._last:
+            self._write(cycle, packed)
+
+    def close(self):
+        "Write the ring buffer if there is one, and close the file"
+        if self._ring is not None:
+            self._file = open_trace(self.path)
+            self._header()
+            for cycle, packed in self._ring:
+                if packed != self._last:
+                    self._write(cycle, packed)
+            self._ring = None
+        if self._file is not None:
+            # hold the last values until the last traced cycle
+            if self._cycle is not None and self._cycle != self._written:
+                self._file.write(f"#{self._cycle}\n")
+            self._file.close()
+            self._file = None
@@ -0,0 +1,513 @@
+"""
+Verilator backend for simulating the cores at native speed.
+
+The design is converted to RTLIL by Amaranth, flattened and written as
+Verilog by Yosys, and compiled by Verilator together with a small C++
+shim into a shared library that is loaded with ``ctypes``. Signals and
+memories are reached by name through VPI, so every ``Signal`` of the
+design can be read and written, not only its ports.
+
+``VerilatorSimulator`` runs the same generator testbenches as
+``amaranth.sim.Simulator`` (``yield signal``, ``yield signal.eq(value)``,
+``yield`` for a clock edge, ``yield memory[index]``) and writes VCD or FST
+traces. Python is still called on every cycle of such a testbench, so
+``run_cycles`` runs the clock inside the library, checking a stop signal
+and counting the cycles a signal is high, which is what reaches MHz rates.
+
+Builds are cached by a hash of the Verilog and the trace format, as
+compiling takes far longer than most runs.
+"""
+
+from amaranth import *
+from amaranth.sim import Settle, Tick
+
+from mips.sim.internals import (SignalDict, assignment, concat_parts, convert, memory_paths,
+                                memory_row, prepare)
+from mips.util.flow import FlowError, run_tool
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import *
+
+import ctypes
+import hashlib
+import os
+import re
+import shutil
+
+__all__ = [
+    "have_verilator",
+    "legal_name",
+    "VerilatedDesign",
+    "VerilatorSimulator",
+]
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "amaranth-mips" / "verilator"
+"Where compiled designs are kept"
+
+TRACE_FORMATS = {".vcd": "vcd", ".fst": "fst"}
+"Trace format written for each file extension"
+
+
+def have_verilator() -> bool:
+    """
+    Whether Yosys and Verilator are on the ``PATH``.
+    """
+    return all(shutil.which(tool) for tool in ("yosys", "verilator"))
+
+
+def legal_name(name: str) -> str:
+    """
+    Verilog identifier standing for the hierarchical name ``name`` of a
+    flattened design: ``.`` becomes ``__`` and any other character that
+    is not allowed in an identifier becomes ``_XX_``, its hex code.
+    """
+    name = name.replace(".", "__")
+    name = re.sub(r"[^A-Za-z0-9_]", lambda m: f"_{ord(m.group()):02x}_", name)
+    return name if re.match(r"[A-Za-z_]", name) else f"_{name}"
+
+
+_ESCAPED = re.compile(r"\\(\S+) ")
+
+
+SHIM = r"""
+#include <verilated.h>
+#include <verilated_vpi.h>
+#include "Vtop.h"
+#if VM_TRACE_FST
+#include <verilated_fst_c.h>
+typedef VerilatedFstC Trace;
+#elif VM_TRACE
+#include <verilated_vcd_c.h>
+typedef VerilatedVcdC Trace;
+#endif
+
+#include <cstdint>
+#include <vector>
+
+struct Sim {
+    VerilatedContext *context;
+    Vtop *top;
+#if VM_TRACE
+    Trace *trace;
+#endif
+    uint64_t time;
+};
+
+static void dump(Sim *sim) {
+#if VM_TRACE
+    if (sim->trace)
+        sim->trace->dump(sim->time);
+#endif
+}
+
+static void tick(Sim *sim) {
+    sim->top->clk = 1;
+    sim->top->eval();
+    sim->time += 1;
+    dump(sim);
+    sim->top->clk = 0;
+    sim->top->eval();
+    sim->time += 1;
+    dump(sim);
+}
+
+static uint32_t bit(vpiHandle handle) {
+    s_vpi_value value;
+    value.format = vpiIntVal;
+    vpi_get_value(handle, &value);
+    return value.value.integer & 1;
+}
+
+extern "C" {
+
+void sim_trace_close(Sim *sim);
+
+Sim *sim_new() {
+    Sim *sim = new Sim();
+    sim->context = new VerilatedContext;
+    sim->context->traceEverOn(true);
+    sim->top = new Vtop{sim->context};
+#if VM_TRACE
+    sim->trace = nullptr;
+#endif
+    sim->time = 0;
+    sim->top->clk = 0;
+    sim->top->rst = 0;
+    sim->top->eval();
+    return sim;
+}
+
+void sim_free(Sim *sim) {
+    sim_trace_close(sim);
+    sim->top->final();
+    delete sim->top;
+    delete sim->context;
+    delete sim;
+}
+
+int sim_trace(Sim *sim, const char *path) {
+#if VM_TRACE
+    sim->trace = new Trace;
+    sim->top->trace(sim->trace, 99);
+    sim->trace->open(path);
+    dump(sim);
+    return 1;
+#else
+    return 0;
+#endif
+}
+
+void sim_trace_close(Sim *sim) {
+#if VM_TRACE
+    if (sim->trace) {
+        sim->trace->close();
+        delete sim->trace;
+        sim->trace = nullptr;
+    }
+#endif
+}
+
+void *sim_handle(const char *name) {
+    return vpi_handle_by_name((PLI_BYTE8 *)name, nullptr);
+}
+
+void *sim_index(void *memory, int index) {
+    return vpi_handle_by_index((vpiHandle)memory, index);
+}
+
+void sim_get(void *handle, uint32_t *words, int count) {
+    s_vpi_value value;
+    value.format = vpiVectorVal;
+    vpi_get_value((vpiHandle)handle, &value);
+    for (int i = 0; i < count; i++)
+        words[i] = value.value.vector[i].aval;
+}
+
+void sim_put(Sim *sim, void *handle, const uint32_t *words, int count) {
+    std::vector<s_vpi_vecval> vector(count);
+    for (int i = 0; i < count; i++) {
+        vector[i].aval = words[i];
+        vector[i].bval = 0;
+    }
+    s_vpi_value value;
+    value.format = vpiVectorVal;
+    value.value.vector = vector.data();
+    vpi_put_value((vpiHandle)handle, &value, nullptr, vpiNoDelay);
+    sim->top->eval();
+}
+
+void sim_tick(Sim *sim) {
+    tick(sim);
+}
+
+uint64_t sim_run(Sim *sim, uint64_t cycles, void *stop, void *count, uint64_t *counted) {
+    uint64_t ran = 0;
+    uint64_t n = 0;
+    while (ran < cycles) {
+        if (count)
+            n += bit((vpiHandle)count);
+        tick(sim);
+        ran += 1;
+        if (stop && bit((vpiHandle)stop))
+            break;
+    }
+    *counted = n;
+    return ran;
+}
+
+}
+"""
+"C++ shim exposing a Verilated design ``top`` to ``ctypes``"
+
+
+class VerilatedDesign:
+    """
+    A design converted to Verilog, with the Verilog name of each of its
+    signals and memories.
+
+    Arguments:
+        design (Elaboratable):  design to convert, clocked by ``sync``
+
+    Attributes:
+        verilog (str):          flattened Verilog, produced by ``build``
+        rtlil (str):            RTLIL of the design
+        prepared (Design):      the elaborated design, whose signals are
+                                the ones simulated
+        names (SignalDict):     Verilog name of every signal
+        memories (dict):        Verilog name of every ``MemoryData``
+    """
+    def __init__(self, design):
+        prepared = prepare(design)
+        self.prepared = prepared
+        self.rtlil, name_map = convert(prepared, name="top")
+        self.names = SignalDict((signal, legal_name(".".join(path[1:])))
+                                for signal, path in name_map.items())
+        self.memories = {memory: legal_name(".".join(path))
+                         for memory, path in memory_paths(prepared).items()}
+        self.verilog = None
+
+    def convert(self, build: Path) -> str:
+        """
+        Flatten the design with Yosys and write it as Verilog, with every
+        escaped identifier replaced by its ``legal_name``. The design has no
+        ports, so every wire is kept from being cleaned up as unused.
+        """
+        (build / "top.il").write_text(self.rtlil)
+        run_tool([
+            "yosys", "-q", "-p",
+            "read_rtlil top.il; hierarchy -top top; proc; flatten; setattr -set keep 1 w:*; "
+            "memory -nomap; write_verilog -noattr top.v",
+        ], cwd=build)
+        verilog = (build / "top.v").read_text()
+        self.verilog = _ESCAPED.sub(lambda m: legal_name(m.group(1)) + " ", verilog)
+        return self.verilog
+
+    def build(self, trace: Optional[str] = None, build_dir: Optional[str] = None) -> Path:
+        """
+        Compile the design and the shim, and return the path of the shared
+        library. A library built from the same Verilog is reused.
+
+        Arguments:
+            trace (str):        ``vcd``, ``fst`` or ``None`` for no tracing
+            build_dir (str):    build directory, ``CACHE_DIR`` if ``None``
+        """
+        if not have_verilator():
+            raise FlowError("yosys and verilator are needed for the verilator backend")
+
+        scratch = Path(build_dir or CACHE_DIR) / "scratch"
+        scratch.mkdir(parents=True, exist_ok=True)
+        verilog = self.convert(scratch)
+
+        key = hashlib.sha256(f"{trace}\n{SHIM}\n{verilog}".encode()).hexdigest()[:16]
+        build = Path(build_dir or CACHE_DIR) / key
+        library = build / "libsim.so"
+        if library.exists():
+            return library
+
+        build.mkdir(parents=True, exist_ok=True)
+        (build / "top.v").write_text(verilog)
+        (build / "shim.cpp").write_text(SHIM)
+        flags = {"vcd": ["--trace"], "fst": ["--trace-fst"], None: []}[trace]
+        run_tool([
+            "verilator", "--cc", "--build", "-j", "0", "-O3", "--vpi", "--public-flat-rw",
+            "-Wno-fatal", "--top-module", "top", *flags,
+            "-CFLAGS", "-fPIC -O2", "top.v",
+        ], cwd=build)
+
+        root = run_tool(["verilator", "--getenv", "VERILATOR_ROOT"], cwd=build).stdout.strip()
+        include = Path(root) / "include"
+        # the libraries Verilator links its own models with, e.g. zlib and
+        # lz4 for FST depending on its version
+        ldlibs = run_tool(["make", "-s", "-C", "obj_dir", "-f", "Vtop.mk",
+                           "--eval=ldlibs: ; @echo $(LDLIBS)", "ldlibs"], cwd=build).stdout.split()
+        run_tool([
+            "g++", "-shared", "-fPIC", "-O2", "-std=c++17",
+            f"-I{include}", f"-I{include / 'vltstd'}", "-Iobj_dir",
+            *(["-DVM_TRACE=1"] if trace else []), *(["-DVM_TRACE_FST=1"] if trace == "fst" else []),
+            "shim.cpp", "obj_dir/Vtop__ALL.a", "obj_dir/libverilated.a",
+            "-o", "libsim.so", *ldlibs, "-lpthread", "-latomic",
+        ], cwd=build)
+        return library
+
+
+class VerilatorSimulator:
+    """
+    Drop-in replacement of ``amaranth.sim.Simulator`` for generator
+    testbenches, running ``design`` compiled by Verilator.
+
+    Only the ``sync`` domain is simulated, and processes may yield a
+    ``Signal`` or memory row to read it, an assignment of a constant to a
+    ``Signal`` or memory row to write it, ``None`` or ``Tick()`` to wait
+    for the next clock edge, and ``Settle()``. Values read after a clock
+    edge are the settled values after it.
+
+    Arguments:
+        design (Elaboratable):  design to simulate
+        build_dir (str):        build directory, ``CACHE_DIR`` if ``None``
+    """
+    def __init__(self, design, *, build_dir: Optional[str] = None):
+        self.design = VerilatedDesign(design)
+        self.build_dir = build_dir
+        self._processes = []
+        self._trace = None
+        self._lib = None
+        self._sim = None
+        self._handles = SignalDict()
+        self._rows = {}
+
+    def add_clock(self, period: float, *, domain: str = "sync"):
+        assert domain == "sync", "only the sync domain is simulated"
+
+    def add_sync_process(self, process, *, domain: str = "sync"):
+        assert domain == "sync", "only the sync domain is simulated"
+        self._processes.append(process)
+
+    add_process = add_sync_process
+
+    @contextmanager
+    def write_vcd(self, path: str, *args, **kwargs):
+        """
+        Trace the simulation to ``path``, as FST if it ends with ``.fst``
+        and VCD otherwise. Must be entered before the first run.
+        """
+        assert self._sim is None, "tracing must start before the simulation"
+        self._trace = path
+        try:
+            yield
+        finally:
+            if self._sim is not None:
+                self._lib.sim_trace_close(self._sim)
+
+    def build(self):
+        "Compile the design if needed and load it, done by the first run"
+        if self._sim is not None:
+            return
+        fmt = None
+        if self._trace is not None:
+            fmt = TRACE_FORMATS.get(Path(self._trace).suffix, "vcd")
+        lib = ctypes.CDLL(str(self.design.build(fmt, self.build_dir)))
+        lib.sim_new.restype = ctypes.c_void_p
+        lib.sim_free.argtypes = [ctypes.c_void_p]
+        lib.sim_trace.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+        lib.sim_trace_close.argtypes = [ctypes.c_void_p]
+        lib.sim_handle.argtypes = [ctypes.c_char_p]
+        lib.sim_handle.restype = ctypes.c_void_p
+        lib.sim_index.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        lib.sim_index.restype = ctypes.c_void_p
+        lib.sim_get.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_uint32), ctypes.c_int]
+        lib.sim_put.argtypes = [ctypes.c_void_p, ctypes.c_void_p,
+                                ctypes.POINTER(ctypes.c_uint32), ctypes.c_int]
+        lib.sim_tick.argtypes = [ctypes.c_void_p]
+        lib.sim_run.argtypes = [ctypes.c_void_p, ctypes.c_uint64, ctypes.c_void_p, ctypes.c_void_p,
+                                ctypes.POINTER(ctypes.c_uint64)]
+        lib.sim_run.restype = ctypes.c_uint64
+        self._lib = lib
+        self._sim = lib.sim_new()
+        if self._trace is not None:
+            lib.sim_trace(self._sim, self._trace.encode())
+
+    def close(self):
+        "Free the simulation, closing its trace"
+        if self._sim is not None:
+            self._lib.sim_free(self._sim)
+            self._sim = None
+
+    def __del__(self):
+        if getattr(self, "_sim", None) is not None:
+            self.close()
+
+    def _handle(self, value) -> Tuple[int, int, bool]:
+        # VPI handle, width and signedness of a signal or memory row
+        row = memory_row(value)
+        if row is not None:
+            handles, key = self._rows, (id(row[0]), row[1])
+        else:
+            handles, key = self._handles, value
+        if key in handles:
+            return handles[key]
+        if row is not None:
+            name = self.design.memories.get(row[0])
+            shape = row[0].shape
+        elif isinstance(value, Signal):
+            name = self.design.names.get(value)
+            shape = value.shape()
+        else:
+            raise TypeError(f"the verilator backend can only access signals and memory rows, "
+                            f"not {value!r}")
+        if name is None:
+            raise KeyError(f"{value!r} is not part of the simulated design")
+        handle = self._lib.sim_handle(f"TOP.top.{name}".encode())
+        if handle and row is not None:
+            handle = self._lib.sim_index(handle, row[1])
+        if not handle:
+            raise KeyError(f"{name} was not found in the Verilated design")
+        shape = Shape.cast(shape)
+        handles[key] = handle, shape.width, shape.signed
+        return handles[key]
+
+    def peek(self, value) -> int:
+        "Current value of a signal or memory row, or of a ``Cat`` of them"
+        self.build()
+        parts = concat_parts(value)
+        if parts is not None:
+            result = 0
+            offset = 0
+            for part in parts:
+                result |= (self.peek(part) & ((1 << len(part)) - 1)) << offset
+                offset += len(part)
+            return result
+        if isinstance(value, Const):
+            return value.value
+        handle, width, signed = self._handle(value)
+        count = (width + 31) // 32
+        words = (ctypes.c_uint32 * count)()
+        self._lib.sim_get(handle, words, count)
+        result = sum(w << (32 * i) for i, w in enumerate(words)) & ((1 << width) - 1)
+        if signed and result >> (width - 1):
+            result -= 1 << width
+        return result
+
+    def poke(self, value, data: int):
+        "Set a signal or memory row to ``data``"
+        self.build()
+        handle, width, _ = self._handle(value)
+        count = (width + 31) // 32
+        data &= (1 << width) - 1
+        words = (ctypes.c_uint32 * count)(*((data >> (32 * i)) & 0xffff_ffff for i in range(count)))
+        self._lib.sim_put(self._sim, handle, words, count)
+
+    def tick(self):
+        "Run one clock cycle"
+        self.build()
+        self._lib.sim_tick(self._sim)
+
+    def run_cycles(self, cycles: int, *, stop=None, count=None) -> Tuple[int, int]:
+        """
+        Run up to ``cycles`` cycles without calling back into Python.
+
+        Arguments:
+            cycles (int):       maximum number of cycles
+            stop (Signal):      stop after the first edge that sets it
+            count (Signal):     count the cycles it is set before the edge
+
+        Returns ``(cycles run, cycles count was set)``.
+        """
+        self.build()
+        stop = self._handle(stop)[0] if stop is not None else None
+        count = self._handle(count)[0] if count is not None else None
+        counted = ctypes.c_uint64()
+        ran = self._lib.sim_run(self._sim, cycles, stop, count, ctypes.byref(counted))
+        return ran, counted.value
+
+    def _step(self, process) -> bool:
+        # Run ``process`` until it waits for the clock, returns whether it
+        # has not finished yet
+        command = None
+        value = None
+        while True:
+            try:
+                command = process.send(value)
+            except StopIteration:
+                return False
+            value = None
+            if command is None or isinstance(command, Tick):
+                return True
+            assign = assignment(command)
+            if assign is not None:
+                self.poke(assign[0], Const.cast(assign[1]).value)
+            elif not isinstance(command, Settle):
+                value = self.peek(command)
+
+    def run(self):
+        """
+        Run every process until they have all returned, advancing the clock
+        whenever all of them wait for it.
+        """
+        self.build()
+        running = [process() for process in self._processes]
+        self._processes = []
+        while running:
+            running = [process for process in running if self._step(process)]
+            if running:
+                self.tick()
@@ -1,7 +1,11 @@
-from amaranth.sim import Simulator, Delay, Settle
-from mips.cpu.alu import ALU
+from amaranth.sim import Settle
+from mips.cpu.alu import ALU, SwitchALU
 from mips.cpu.isa import Funct
+from mips.model.alu import alu_batch
+from mips.sim.cache import cached_simulator
+from mips.sim.harness import run_vectors, first_mismatch
 
+import numpy as np
 import pytest
 
 from typing import *
@@ -10,161 +14,175 @@ MAX_32U = 0xff_ff_ff_ff
 MAX_UNSIGN = 0x80_00_00_00
 MAX_SIGNED = 0x7f_ff_ff_ff
 
-def make_bench(alu: ALU, func: Funct, rs: int, rt: int, rd: int, shamt: int = 0):
-    """
-    Utility function to generate a callback that can be passed
-    to simulator.add_process()
-    """
-    def bench():
-        yield alu.func.eq(func)
-        yield alu.rs.eq(rs)
-        yield alu.rt.eq(rt)
-        yield alu.shamt.eq(shamt)
-        yield Settle()
-
-        res_rd = yield alu.rd
+RANDOM_VECTORS = 2000
 
-        assert rd == res_rd,\
-            f"Expected {func} rs:{rs: 09x} rt:{rt: 09x} => rd:{rd: 09x} but got {res_rd: 09x} instead"
+def check(func: Funct, rs, rt, rd, ovf=None, shamt=None, design=ALU):
+    """
+    Utility function that streams every vector through a single
+    simulation of the ALU built by ``design`` and reports the first one
+    that doesn't match.
 
-        yield Delay(1e-6)        
+    ``rd`` entries that are ``None`` are not checked, and neither is
+    ``ovf`` if it is ``None``.
+    """
+    rs = [v & MAX_32U for v in rs]
+    rt = [v & MAX_32U for v in rt]
+    shamt = [0] * len(rs) if shamt is None else list(shamt)
+    check_rd = [v is not None for v in rd]
+    rd = [v or 0 for v in rd]
+
+    sim = cached_simulator(design)
+    alu = sim.dut
+    res_rd, res_ovf = run_vectors(
+        alu,
+        [(alu.func, [func.value] * len(rs)), (alu.rs, rs), (alu.rt, rt), (alu.shamt, shamt)],
+        [alu.rd, alu.ovf],
+        sim=sim,
+    )
+
+    if ovf is not None:
+        i = first_mismatch([ovf], [res_ovf])
+        assert i is None,\
+            f"Expected {func} rs:{rs[i]: 09x} rt:{rt[i]: 09x} => rd:{int(res_rd[i]): 09x} for ovf == {ovf[i]} but got {res_ovf[i]} instead"
+
+    res_rd = np.where(check_rd, res_rd, 0)
+    i = first_mismatch([rd], [res_rd])
+    assert i is None,\
+        f"Expected {func} rs:{rs[i]: 09x} rt:{rt[i]: 09x} => rd:{rd[i]: 09x} but got {int(res_rd[i]): 09x} instead"
+
+
+def check_table(func: Funct, table):
+    columns = list(zip(*table))
+    check(func, *columns)
+
+
+ADD_VECTORS = [
+    (1, 2, 3, 0),
+    (2, 2, 4, 0),
+    (4, 5, 9, 0),
+    (8, 8, 16, 0),
+    (MAX_32U, 1, 0, 0),
+    (MAX_SIGNED, 1, None, 1),
+    (0, -1, 0xffffffff, 0),
+    (1, -1, 0, 0),
+    (2, -1, 1, 0),
+]
+
+SUB_VECTORS = [
+    (1, 1, 0, False),
+    (5, 4, 1, False),
+    (2, 3, 0xffffffff, False),
+    (0, 1, 0xffffffff, False),
+    (MAX_UNSIGN, 1, None, True),
+]
+
+AND_VECTORS = [
+    (0b11, 0b00, 0b00),
+    (0b10, 0b11, 0b10),
+    (0b11, 0b11, 0b11),
+    (0b00, 0b00, 0b00),
+]
+
+OR_VECTORS = [
+    (0b11, 0b00, 0b11),
+    (0b10, 0b01, 0b11),
+    (0b01, 0b01, 0b01),
+    (0b00, 0b00, 0b00),
+]
+
+XOR_VECTORS = [
+    (0b00, 0b00, 0b00),
+    (0b10, 0b00, 0b10),
+    (0b11, 0b00, 0b11),
+    (0b11, 0b01, 0b10),
+    (0b11, 0b10, 0b01),
+]
+
+SHIFT_VECTORS = [
+    (Funct.SLL, 0, 0b1, 0b100, 2),
+    (Funct.SLL, 0, MAX_32U, 0xff_ff_ff_00, 8),
+    (Funct.SLLV, 4, 0b1, 0b10000, 0),
+    (Funct.SLLV, 33, 0b1, 0b10, 0),
+    (Funct.SRL, 0, MAX_UNSIGN, 0x08_00_00_00, 4),
+    (Funct.SRLV, 31, MAX_UNSIGN, 1, 0),
+    (Funct.SRA, 0, MAX_UNSIGN, 0xf8_00_00_00, 4),
+    (Funct.SRA, 0, MAX_SIGNED, 0x07_ff_ff_ff, 4),
+    (Funct.SRAV, 31, MAX_UNSIGN, MAX_32U, 0),
+]
+
+
+def test_add():
+    check_table(Funct.ADD, ADD_VECTORS)
+
+
+def test_sub():
+    check_table(Funct.SUB, SUB_VECTORS)
+
+
+def test_and():
+    check_table(Funct.AND, AND_VECTORS)
+
+
+def test_or():
+    check_table(Funct.OR, OR_VECTORS)
+
+
+def test_xor():
+    check_table(Funct.XOR, XOR_VECTORS)
 
-    return bench
 
 @pytest.mark.parametrize(
-        "rs,rt,rd,ovf",
-        [
-            (1, 2, 3, 0),
-            (2, 2, 4, 0),
-            (4, 5, 9, 0),
-            (8, 8, 16, 0),
-            (MAX_32U, 1, 0, 0),
-            (MAX_SIGNED, 1, None, 1),
-            (0, -1, 0xffffffff, 0),
-            (1, -1, 0, 0),
-            (2, -1, 1, 0),
-        ]
+    "func",
+    [Funct.SLL, Funct.SLLV, Funct.SRL, Funct.SRLV, Funct.SRA, Funct.SRAV]
 )
-def test_add(rs: int, rt: int, rd: Optional[int], ovf: bool):
-    alu = ALU()
-    sim = Simulator(alu)
+def test_shift(func: Funct):
+    table = [(rs, rt, rd, h) for f, rs, rt, rd, h in SHIFT_VECTORS if f == func]
+    rs, rt, rd, shamt = zip(*table)
+    check(func, rs, rt, rd, shamt=shamt)
 
-    def bench():
-        yield alu.func.eq(Funct.ADD)
-        yield alu.rs.eq(rs)
-        yield alu.rt.eq(rt)
-        yield Settle()
-
-        res_rd = yield alu.rd
-        res_ovf = yield alu.ovf
-
-        assert ovf == res_ovf,\
-            f"Expected {Funct.ADD} rs:{rs: 09x} rt:{rt: 09x} => rd:{res_rd: 09x} for ovf == {ovf} but got {res_ovf} instead"
-        if not ovf:
-            assert rd is not None, "rd must not be None if testing for not overflow"
-            assert rd == res_rd,\
-                f"Expected {Funct.ADD} rs:{rs: 09x} rt:{rt: 09x} => rd:{rd: 09x} but got {res_rd: 09x} instead"
-    
-        yield Delay(1e-6)
-    
-    sim.add_process(bench)
-    sim.run()
 
 @pytest.mark.parametrize(
-        "rs,rt,rd,ovf",
-        [
-            (1, 1, 0, False),
-            (5, 4, 1, False),
-            (2, 3, 0xffffffff, False),
-            (0, 1, 0xffffffff, False),
-            (MAX_UNSIGN, 1, None, True),
-        ]
+    "func",
+    [
+        Funct.ADD, Funct.ADDU, Funct.SUB, Funct.SUBU,
+        Funct.AND, Funct.OR, Funct.XOR, Funct.NOR,
+        Funct.SLL, Funct.SLLV, Funct.SRL, Funct.SRLV, Funct.SRA, Funct.SRAV,
+        Funct.SLT, Funct.SLTU, Funct.JR,
+    ]
 )
-def test_sub(rs: int, rt: int, rd: Optional[int], ovf: int):
-    alu = ALU()
-    sim = Simulator(alu)
+@pytest.mark.parametrize("design", [ALU, SwitchALU])
+def test_random(func: Funct, design):
+    rng = np.random.default_rng(func.value)
+    rs = rng.integers(0, 1 << 32, RANDOM_VECTORS, dtype=np.uint32)
+    rt = rng.integers(0, 1 << 32, RANDOM_VECTORS, dtype=np.uint32)
+    shamt = rng.integers(0, 32, RANDOM_VECTORS, dtype=np.uint32)
+    rd, ovf = alu_batch(func, rs, rt, shamt)
+    check(func, rs.tolist(), rt.tolist(), rd.tolist(), ovf.tolist(), shamt.tolist(), design=design)
+
+
+def test_registered():
+    funcs = [Funct.ADD, Funct.SUB, Funct.SLT, Funct.SLTU, Funct.SLLV, Funct.SRA, Funct.NOR]
+    rng = np.random.default_rng(0)
+    rs = rng.integers(0, 1 << 32, 200, dtype=np.uint32)
+    rt = rng.integers(0, 1 << 32, 200, dtype=np.uint32)
+    shamt = rng.integers(0, 32, 200, dtype=np.uint32)
+    sim = cached_simulator(ALU, registered=True)
+    alu = sim.dut
+    assert alu.latency == 1
+    sim.add_clock(1e-6)
 
     def bench():
-        yield alu.func.eq(Funct.SUB)
-        yield alu.rs.eq(rs)
-        yield alu.rt.eq(rt)
-        yield Settle()
-
-        res_rd = yield alu.rd
-        res_ovf = yield alu.ovf
-
-        assert ovf == res_ovf,\
-            f"Expected {Funct.SUB} rs:{rs: 09x} rt:{rt: 09x} => rd:{res_rd: 09x} for ovf == {ovf} but got {res_ovf} instead"
-        if not ovf:
-            assert rd is not None, "rd must not be None if testing for not overflow"
-            assert rd == res_rd,\
-                f"Expected {Funct.SUB} rs:{rs: 09x} rt:{rt: 09x} => rd:{rd: 09x} but got {res_rd: 09x} instead"
-    
-        yield Delay(1e-6)
-    
-    sim.add_process(bench)
+        for func in funcs:
+            rd, ovf = alu_batch(func, rs, rt, shamt)
+            yield alu.func.eq(func)
+            for i in range(len(rs)):
+                yield alu.rs.eq(int(rs[i]))
+                yield alu.rt.eq(int(rt[i]))
+                yield alu.shamt.eq(int(shamt[i]))
+                yield
+                yield Settle()
+                assert (yield alu.rd) == rd[i], f"{func} vector {i}"
+                assert (yield alu.ovf) == ovf[i], f"{func} vector {i}"
+
+    sim.add_sync_process(bench)
     sim.run()
-
-@pytest.mark.parametrize(
-        "rs,rt,rd",
-        [   
-            (0b11, 0b00, 0b00),
-            (0b10, 0b11, 0b10),
-            (0b11, 0b11, 0b11),
-            (0b00, 0b00, 0b00),
-        ]
-)
-def test_and(rs: int, rt: int, rd: int):
-    alu = ALU()
-    sim = Simulator(alu)
-    sim.add_process(make_bench(alu, Funct.AND, rs, rt, rd))
-    sim.run()
-
-
-@pytest.mark.parametrize(
-        "rs,rt,rd",
-        [   
-            (0b11, 0b00, 0b11),
-            (0b10, 0b01, 0b11),
-            (0b01, 0b01, 0b01),
-            (0b00, 0b00, 0b00),
-        ]
-)
-def test_or(rs: int, rt: int, rd: int):
-    alu = ALU()
-    sim = Simulator(alu)
-    sim.add_process(make_bench(alu, Funct.OR, rs, rt, rd))
-    sim.run()
-
-"""
-@pytest.mark.parametrize(
-        "rs,rt,rd",
-        [
-        ]
-)
-"""
-
-
-@pytest.mark.parametrize(
-        "rs,rt,rd",
-        [
-            (0b00, 0b00, 0b00),
-            (0b10, 0b00, 0b10),
-            (0b11, 0b00, 0b11),
-            (0b11, 0b01, 0b10),
-            (0b11, 0b10, 0b01),
-        ]
-)
-def test_xor(rs: int, rt: int, rd: int):
-    alu = ALU()
-    sim = Simulator(alu)
-    sim.add_process(make_bench(alu, Funct.XOR, rs, rt, rd))
-    sim.run()
-
-
-@pytest.mark.parametrize(
-    "rs, rt, rd, h",
-    []
-)
-def test_sll(rs: int, rt: int, rd: int, h: int):
-    pass
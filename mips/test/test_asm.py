@@ -0,0 +1,138 @@
+from mips.bench.bench_asm import large_source
+from mips.bench.bench_predictor import SORT, SORT_DATA
+from mips.model.iss import ISS
+from mips.util.asm import AsmError, assemble
+from mips.util.image import *
+import mips.util.encode as encode
+
+import random
+import re
+import pytest
+
+SORT_SOURCE = """
+# bubble sort of the data section
+        .text
+        addiu $1, $0, 7             # passes
+outer:  addiu $2, $zero, 0          # p = 0
+        addu  $3, $1, $0            # i = passes
+inner:  lw    $4, 0($2)
+        lw    $5, 4($2)
+        slt   $6, $5, $4
+        beq   $6, $zero, skip
+        sw    $5, 0($2)
+        sw    $4, 4($2)
+skip:   addiu $2, $2, 4
+        addiu $3, $3, -1
+        bgtz  $3, inner
+        addiu $1, $1, 0xffff
+        bgtz  $1, outer
+        trap
+        .data
+data:   .word 23, 5, 42, 8
+        .word 16, 4, 15, 99
+"""
+
+
+def test_matches_encode():
+    program = assemble(SORT_SOURCE)
+    assert program.text == SORT
+    assert program.data == SORT_DATA
+    assert program.symbols == {"outer": 4, "inner": 12, "skip": 36, "data": 0}
+
+    iss = ISS(program.text, program.data)
+    iss.run()
+    assert iss.halted
+    assert [iss.word(i) for i in range(8)] == sorted(SORT_DATA)
+
+
+@pytest.mark.parametrize("source, word", [
+    ("sllv $3, $4, $5", encode.SLLV(rs=5, rt=4, rd=3)[0]),
+    ("sra $t0, $t1, 7", encode.SRA(rs=0, rt=9, shamt=7, rd=8)[0]),
+    ("jr $ra", encode.JR(rs=31, rt=0, rd=0)[0]),
+    ("jalr $t9", encode.JALR(rs=25, rt=0, rd=31)[0]),
+    ("jalr $4, $t9", encode.JALR(rs=25, rt=0, rd=4)[0]),
+    ("mfhi $2", encode.MFHI(rs=0, rt=0, rd=2)[0]),
+    ("mtlo $2", encode.MTLO(rs=2, rt=0, rd=0)[0]),
+    ("divu $2, $3", encode.DIVU(rs=2, rt=3, rd=0)[0]),
+    ("ori $1, $2, 0xbeef", encode.ORI(rs=2, rt=1, imm=0xbeef)[0]),
+    ("slti $1, $2, -2", encode.SLTI(rs=2, rt=1, imm=0xfffe)[0]),
+    ("lhi $1, %hi(0x12345678)", encode.LHI(rs=0, rt=1, imm=0x1234)[0]),
+    ("llo $1, %lo(0x12345678)", encode.LLO(rs=0, rt=1, imm=0x5678)[0]),
+    ("sb $1, ($sp)", encode.SB(rs=29, rt=1, imm=0)[0]),
+    ("lhu $1, -2( $sp )", encode.LHU(rs=29, rt=1, imm=0xfffe)[0]),
+    ("blez $1, 0", encode.BLEZ(rs=1, rt=0, imm=0xffff)[0]),
+    ("j 0x40", encode.J(0x10)[0]),
+    ("jal 0x40", encode.JAL(0x10)[0]),
+    ("trap", encode.TRAP(0)[0]),
+    ("TRAP 5", encode.TRAP(5)[0]),
+    ("nop", 0),
+])
+def test_instruction(source: str, word: int):
+    assert assemble(source).text == [word]
+
+
+def test_labels():
+    program = assemble("""
+        j end               # forward reference
+        .word end, 0x1234
+    end: trap
+        .data
+        .word ptr
+    ptr: .word -1
+    """)
+    assert program.text == [encode.J(3)[0], 12, 0x1234, encode.TRAP(0)[0]]
+    assert program.data == [4, 0xffff_ffff]
+
+
+def test_lo_offset():
+    program = assemble("""
+        lhi $t0, %hi(value)
+        lw $t1, %lo(value)($t0)
+        trap
+        .data
+        .word 0
+    value: .word 7
+    """)
+    assert program.text[1] == encode.LW(rs=8, rt=9, imm=4)[0]
+
+
+@pytest.mark.parametrize("source, message", [
+    ("addu $1, $2", "expected 3 operands"),
+    ("addu $1, $2, $x", "bad register '$x'"),
+    ("lw $1, 4", "expected offset($reg)"),
+    ("beq $1, $2, nowhere", "unknown symbol 'nowhere'"),
+    ("frob $1", "unknown instruction 'frob'"),
+    (".align 4", "unknown directive"),
+    ("addi $1, $2, 70000", "does not fit 16 bits"),
+    ("sll $1, $2, 32", "out of range"),
+    ("x: nop\nx: nop", "label 'x' already defined"),
+    (".data\nnop", "instruction in the .data section"),
+    ("beq $1, $2, 0x40000", "out of reach"),
+    ("j 0x10000000", "out of reach"),
+])
+def test_errors(source: str, message: str):
+    with pytest.raises(AsmError, match=r"line \d+: .*" + re.escape(message)):
+        assemble("nop\n" + source)
+
+
+def test_large_source():
+    program = assemble(large_source(20_000))
+    assert len(program.text) == 100_001
+    assert program.text[2] == encode.BEQ(rs=8, rt=9, imm=2)[0]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_image_round_trip(tmp_path, fmt: str):
+    rng = random.Random(fmt)
+    words = [rng.getrandbits(32) for _ in range(20_000)]
+    path = str(tmp_path / f"image.{fmt}")
+    write_image(path, words, fmt)
+    assert read_image(path) == words
+
+
+def test_ihex_records():
+    assert to_ihex([0x1234_5678, 1]) == ":080000007856341201000000E3\n:00000001FF\n"
+    # a 64 KiB boundary starts an extended linear address record
+    text = to_ihex([0] * 0x4004)
+    assert ":020000040001F9\n" in text
+    assert parse_ihex(text) == [0] * 0x4004
@@ -0,0 +1,73 @@
+from amaranth.sim import Settle
+from mips.cpu.alu import ALU
+from mips.cpu.core import Core
+from mips.cpu.isa import Funct
+import mips.sim.cache as cache
+import mips.util.encode as encode
+
+import pytest
+
+from typing import *
+
+def test_reuse():
+    first = cache.cached_simulator(ALU)
+    assert cache.cached_simulator(ALU) is first
+    assert cache.cached_simulator(Core, [1, 2]) is cache.cached_simulator(Core, (1, 2))
+    assert cache.cached_simulator(Core, [1, 2]) is not cache.cached_simulator(Core, [1, 3])
+
+
+def test_runs_are_independent():
+    sim = cache.cached_simulator(ALU)
+    alu = sim.dut
+    seen = []
+
+    def drive():
+        yield alu.func.eq(Funct.ADD)
+        yield alu.rs.eq(2)
+        yield alu.rt.eq(3)
+        yield Settle()
+        seen.append((yield alu.rd))
+
+    def sample():
+        yield Settle()
+        seen.append((yield alu.rs))
+
+    sim.add_process(drive)
+    sim.run()
+    sim.add_process(sample)
+    sim.run()
+    assert seen == [5, 0]
+
+
+def test_memory_is_reset():
+    program = [
+        encode.ADDIU(rs=0, rt=1, imm=7)[0],
+        encode.SW(rs=0, rt=1, imm=0)[0],
+        encode.TRAP(0)[0],
+    ]
+    sim = cache.cached_simulator(Core, program)
+    sim.add_clock(1e-6)
+    core = sim.dut
+    seen = []
+
+    def bench():
+        seen.append((yield core.dmem[0]))
+        for _ in range(4):
+            yield
+        seen.append((yield core.dmem[0]))
+
+    for _ in range(2):
+        sim.add_sync_process(bench)
+        sim.run()
+    assert seen == [0, 7, 0, 7]
+
+
+def test_invalidated_by_source_change(tmp_path, monkeypatch):
+    source = tmp_path / "design.py"
+    source.write_text("# first version\n")
+    monkeypatch.setattr(cache, "CPU_DIR", tmp_path)
+
+    first = cache.cached_simulator(ALU)
+    assert cache.cached_simulator(ALU) is first
+    source.write_text("# second version\n")
+    assert cache.cached_simulator(ALU) is not first
@@ -0,0 +1,92 @@
+from mips.cpu.core import Core
+from mips.sim.cache import cached_simulator
+from mips.sim.cores import DEMO_PROGRAM
+from mips.sim.cosim import load_memories
+import mips.util.encode as encode
+
+import pytest
+
+from typing import *
+
+def run(program: List[int], cycles: int = 200, data: List[int] = (), *, core=Core):
+    """
+    Utility function that runs ``program`` until it halts and returns the
+    final register file and the first words of the data memory.
+
+    ``core`` builds the core from a program and data, ``Core`` by
+    default. It is built with empty memories and elaborated once per test
+    process, and every program is loaded into it.
+    """
+    sim = cached_simulator(core, (), ())
+    core = sim.dut
+    sim.add_clock(1e-6)
+    sim.add_process(load_memories(core, program, data))
+    regs = []
+    mem = []
+
+    def bench():
+        for _ in range(cycles):
+            yield
+            if (yield core.halt):
+                break
+        assert (yield core.halt), f"core did not halt within {cycles} cycles"
+        for i in range(32):
+            regs.append((yield from core.regfile.peek(i)))
+        for i in range(8):
+            mem.append((yield from core.peek_data(i)))
+
+    sim.add_sync_process(bench)
+    sim.run()
+    return regs, mem
+
+
+def test_demo():
+    regs, mem = run(DEMO_PROGRAM)
+    assert regs[2] == 55
+    assert mem[0] == 55
+
+
+def test_memory():
+    regs, mem = run([
+        encode.LW(rs=0, rt=1, imm=0)[0],
+        encode.LB(rs=0, rt=2, imm=1)[0],
+        encode.LBU(rs=0, rt=3, imm=1)[0],
+        encode.LH(rs=0, rt=4, imm=2)[0],
+        encode.LHU(rs=0, rt=5, imm=2)[0],
+        encode.SB(rs=0, rt=1, imm=5)[0],
+        encode.SH(rs=0, rt=1, imm=10)[0],
+        encode.SW(rs=0, rt=1, imm=12)[0],
+        encode.TRAP(0)[0],
+    ], data=[0x8765_8321])
+    assert regs[1:6] == [0x8765_8321, 0xffff_ff83, 0x83, 0xffff_8765, 0x8765]
+    assert mem[1:4] == [0x0000_2100, 0x8321_0000, 0x8765_8321]
+
+
+def test_control_flow():
+    regs, mem = run([
+        encode.JAL(3)[0],                           # 0: call 12
+        encode.ADDIU(rs=0, rt=2, imm=1)[0],         # 4: r2 = 1
+        encode.TRAP(0)[0],                          # 8
+        encode.LHI(rs=0, rt=3, imm=0x1234)[0],      # 12
+        encode.LLO(rs=0, rt=3, imm=0x5678)[0],      # 16
+        encode.SLL(rs=0, rt=3, shamt=4, rd=4)[0],   # 20
+        encode.BLEZ(rs=0, rt=0, imm=1)[0],          # 24: skip 28
+        encode.ADDIU(rs=0, rt=5, imm=1)[0],         # 28
+        encode.JR(rs=31, rt=0, rd=0)[0],            # 32: return to 4
+    ])
+    assert regs[31] == 4
+    assert regs[2] == 1
+    assert regs[3] == 0x1234_5678
+    assert regs[4] == 0x2345_6780
+    assert regs[5] == 0
+
+
+def test_overflow_suppresses_write():
+    regs, mem = run([
+        encode.LHI(rs=0, rt=1, imm=0x7fff)[0],
+        encode.LLO(rs=0, rt=1, imm=0xffff)[0],
+        encode.ADDIU(rs=0, rt=2, imm=7)[0],
+        encode.ADDI(rs=1, rt=2, imm=1)[0],
+        encode.TRAP(0)[0],
+    ])
+    assert regs[2] == 7
@@ -0,0 +1,118 @@
+from mips.bench.bench_predictor import CALLS, SORT, SORT_DATA
+from mips.cpu.core import Core
+from mips.cpu.pipeline import PipelinedCore
+from mips.model.iss import ISS
+from mips.sim.cores import DEMO_PROGRAM
+from mips.sim.cosim import *
+import mips.sim.cache as cache
+import mips.util.encode as encode
+
+import pytest
+
+from test_iss import PROGRAMS
+from test_muldiv import HILO_PROGRAM
+
+BATCH = [
+    ("sort", SORT, SORT_DATA),
+    ("calls", CALLS, []),
+    ("hilo", HILO_PROGRAM, []),
+    *((name, program, data) for name, (program, data) in PROGRAMS.items()),
+]
+
+
+@pytest.mark.parametrize("core, options", [
+    ("single", {}),
+    ("dual", {}),
+    ("pipeline", {}),
+    ("pipeline", dict(predictor="gshare", icache="4x1x4", dcache="2x2x2", muldiv="small")),
+])
+def test_batch_matches(core: str, options):
+    results = dict(cosim_many(BATCH, core, **options))
+    assert list(results) == [name for name, _, _ in BATCH]
+    for name, res in results.items():
+        assert res.ok, f"{name}:\n{format_divergence(res.divergence)}"
+        assert res.halted
+        assert res.retired == ISS(*next((p, d) for n, p, d in BATCH if n == name)).run()
+
+
+def with_word(program, index, word):
+    program = list(program)
+    program[index] = word
+    return program
+
+
+@pytest.mark.parametrize("core", [Core, PipelinedCore])
+def test_register_divergence(core):
+    iss = ISS(with_word(DEMO_PROGRAM, 3, encode.ADDIU(rs=1, rt=1, imm=0xfffe)[0]))
+    res = lockstep(core(DEMO_PROGRAM), iss, window=2)
+    assert not res.ok
+    d = res.divergence
+    assert (d.index, d.what) == (3, "reg")
+    assert (d.expected.pc, d.expected.reg, d.expected.value) == (12, 1, 8)
+    assert (d.got.pc, d.got.reg, d.got.value) == (12, 1, 9)
+    assert [expected.pc for expected, _ in d.window] == [4, 8]
+
+    text = format_divergence(d)
+    assert "reg mismatch after 3 instructions" in text
+    assert "addu $2, $2, $1" in text
+    assert "$1 = 0x00000008" in text and "$1 = 0x00000009" in text
+
+
+@pytest.mark.parametrize("core", [Core, PipelinedCore])
+def test_store_divergence(core):
+    iss = ISS(with_word(DEMO_PROGRAM, 5, encode.SB(rs=0, rt=2, imm=1)[0]))
+    d = lockstep(core(DEMO_PROGRAM), iss).divergence
+    assert (d.index, d.what) == (32, "store")
+    assert d.expected.store == (0, 0b0010, 55 << 8)
+    assert d.got.store == (0, 0b1111, 55)
+
+
+@pytest.mark.parametrize("core", [Core, PipelinedCore])
+def test_pc_divergence(core):
+    iss = ISS(with_word(DEMO_PROGRAM, 4, encode.BEQ(rs=1, rt=0, imm=0xfffd)[0]))
+    d = lockstep(core(DEMO_PROGRAM), iss).divergence
+    assert (d.index, d.what) == (5, "pc")
+    assert (d.expected.pc, d.got.pc) == (20, 8)
+
+
+def test_data_divergence():
+    # the core and the ISS load different data, the first load shows it
+    res = lockstep(Core(SORT, SORT_DATA), ISS(SORT, SORT_DATA[::-1]))
+    assert res.divergence.what == "reg"
+    assert res.divergence.expected.inst == SORT[res.divergence.index]
+
+
+def test_timeout_is_not_a_divergence():
+    program = [encode.J(0)[0]]
+    res = lockstep(Core(program), ISS(program), cycles=50)
+    assert res.ok and not res.halted
+    assert res.retired == res.cycles == 50
+
+
+def test_stop_at_first_divergence():
+    # the ISS refuses illegal instructions, which the core runs anyway
+    bad = ("bad", with_word(DEMO_PROGRAM, 1, 0x0000_003f), [])
+    batch = [BATCH[0], bad, BATCH[1]]
+    results = dict(cosim_many(batch))
+    assert list(results) == ["sort", "bad", "calls"]
+    assert results["bad"].divergence.what == "illegal"
+    assert results["bad"].divergence.got.pc == 4
+    names = [name for name, _ in cosim_many(batch, stop=True)]
+    assert names == ["sort", "bad"]
+
+
+def test_parallel_matches_serial():
+    batch = BATCH + [("bad", with_word(DEMO_PROGRAM, 1, 0x0000_003f), [])]
+    options = dict(predictor="bimodal", dcache="2x2x2")
+    serial = list(cosim_many(batch, "pipeline", **options))
+    assert list(cosim_many(batch, "pipeline", jobs=2, **options)) == serial
+    names = [name for name, _ in cosim_many(batch + BATCH, "pipeline", jobs=2, stop=True)]
+    assert names == [name for name, _, _ in batch]
+
+
+def test_programs_share_an_elaboration():
+    cache.clear()
+    for program, data in ((SORT, SORT_DATA), (DEMO_PROGRAM, [])):
+        res = cosim(program, data, "pipeline", predictor="gshare")
+        assert res.ok and res.halted
+    assert len(cache._cache) == 1
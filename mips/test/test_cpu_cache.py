@@ -0,0 +1,163 @@
+from amaranth import *
+from amaranth.sim import Simulator
+from mips.cpu.cache import Cache, MainMemory, REPLACEMENT
+from mips.cpu.pipeline import PipelinedCore
+from mips.model.iss import ISS
+
+import random
+import pytest
+
+from typing import *
+
+from test_core import run as run_core
+from test_iss import PROGRAMS
+from test_pipeline import counters
+
+class Top(Elaboratable):
+    "A cache and its main memory"
+    def __init__(self, cache: Cache, memory: Memory, latency: int):
+        self.cache = cache
+        self.memory = memory
+        self.main = MainMemory(memory, latency)
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.cache = cache = self.cache
+        m.submodules.main = main = self.main
+        m.d.comb += [
+            main.addr.eq(cache.mem_addr),
+            main.req.eq(cache.mem_req),
+            main.we.eq(cache.mem_we),
+            main.wdata.eq(cache.mem_wdata),
+            cache.mem_rdata.eq(main.rdata),
+            cache.mem_ack.eq(main.ack),
+        ]
+        return m
+
+
+def run(cache: Cache, accesses, depth: int = 256, latency: int = 3):
+    """
+    Utility function that performs ``accesses``, a list of ``(addr, wmask,
+    wdata)``, through ``cache`` and returns the word read by each access,
+    the hit, miss and write back counts, and the final memory contents
+    as seen through the cache.
+    """
+    memory = Memory(width=32, depth=depth, init=[i * 0x0101_0101 for i in range(depth)])
+    top = Top(cache, memory, latency)
+    sim = Simulator(top)
+    sim.add_clock(1e-6)
+    reads = []
+    res = {}
+
+    def bench():
+        for addr, wmask, wdata in accesses:
+            yield cache.addr.eq(addr)
+            yield cache.wmask.eq(wmask)
+            yield cache.wdata.eq(wdata)
+            yield cache.en.eq(1)
+            yield cache.req.eq(1)
+            yield
+            yield cache.en.eq(0)
+            yield
+            while (yield cache.busy):
+                yield
+            reads.append((yield cache.rdata))
+        yield
+        for name in ("hits", "misses", "writebacks"):
+            res[name] = yield getattr(cache, name)
+        res["memory"] = []
+        for i in range(depth):
+            res["memory"].append((yield from cache.peek(i, memory)))
+
+    sim.add_sync_process(bench)
+    sim.run()
+    return reads, res
+
+
+def model(accesses, depth: int = 256):
+    memory = [i * 0x0101_0101 for i in range(depth)]
+    reads = []
+    for addr, wmask, wdata in accesses:
+        reads.append(memory[addr])
+        for b in range(4):
+            if wmask >> b & 1:
+                mask = 0xff << (8 * b)
+                memory[addr] = (memory[addr] & ~mask) | (wdata & mask)
+    return reads, memory
+
+
+def test_direct_mapped():
+    cache = Cache(sets=4, ways=1, line_words=2)
+    accesses = [
+        (0, 0, 0),          # miss
+        (1, 0, 0),          # same line
+        (8, 0, 0),          # same set: evicts line 0
+        (0, 0b0011, 0x1234),# miss, dirty
+        (8, 0, 0),          # writes line 0 back
+        (0, 0, 0),
+    ]
+    reads, res = run(cache, accesses)
+    assert reads == model(accesses)[0]
+    assert (res["hits"], res["misses"], res["writebacks"]) == (1, 5, 1)
+
+
+@pytest.mark.parametrize("replacement", REPLACEMENT)
+def test_replacement(replacement: str):
+    cache = Cache(sets=1, ways=4, line_words=1, replacement=replacement)
+    # fill the 4 ways and touch 0, then a 5th line evicts 1 with LRU, and
+    # 2 with pseudo-LRU which only remembers that 0 is more recent than 1
+    # and 3 more recent than 2; after that pseudo-LRU keeps evicting the
+    # line that is accessed next
+    accesses = [(a, 0, 0) for a in (0, 1, 2, 3, 0, 4, 0, 2, 3, 1)]
+    reads, res = run(cache, accesses)
+    assert reads == model(accesses)[0]
+    assert res["misses"] == {"lru": 4 + 1 + 1, "plru": 4 + 1 + 3}[replacement]
+
+
+@pytest.mark.parametrize("ways", [1, 2, 4])
+@pytest.mark.parametrize("replacement", REPLACEMENT)
+def test_random(ways: int, replacement: str):
+    rng = random.Random(ways)
+    accesses = [
+        (rng.randrange(64), rng.choice([0, 0, 0b0001, 0b1100, 0b1111]), rng.getrandbits(32))
+        for _ in range(300)
+    ]
+    cache = Cache(sets=4, ways=ways, line_words=2, replacement=replacement)
+    reads, res = run(cache, accesses, depth=64)
+    expected_reads, expected_memory = model(accesses, depth=64)
+    assert reads == expected_reads
+    assert res["memory"] == expected_memory
+    assert res["hits"] + res["misses"] == len(accesses)
+
+
+CORE_CACHES = [
+    {"icache": dict(sets=4, ways=1, line_words=2), "dcache": dict(sets=2, ways=1, line_words=2)},
+    {"icache": dict(sets=2, ways=2, line_words=4, replacement="plru"),
+     "dcache": dict(sets=1, ways=2, line_words=1)},
+    {"dcache": dict(sets=4, ways=4, line_words=2)},
+]
+"Cache configurations the core is tested with"
+
+
+@pytest.mark.parametrize("caches", range(len(CORE_CACHES)))
+@pytest.mark.parametrize("name", PROGRAMS.keys())
+def test_core_matches_iss(name: str, caches: int):
+    program, data = PROGRAMS[name]
+    config = CORE_CACHES[caches]
+    regs, mem = run_core(program, data=data, cycles=5000, core=lambda p, d: PipelinedCore(
+        p, d, mem_latency=3, **{k: Cache(**v) for k, v in config.items()}))
+    iss = ISS(program, data)
+    iss.run()
+    assert iss.regs == regs
+    assert [iss.word(i) for i in range(len(mem))] == mem
+
+
+def test_core_counts_misses():
+    program, data = PROGRAMS["demo"]
+    icache = Cache(sets=4, ways=1, line_words=4)
+    dcache = Cache(sets=2, ways=1, line_words=2)
+    res = counters(program, data, cycles=1000, icache=icache, dcache=dcache, mem_latency=5)
+    assert res["retired"] == ISS(program, data).run()
+    # the 7 instructions span 2 lines, and the store misses once; a miss
+    # is a cycle of lookup, 5 cycles per word of refill and a replay
+    assert res["mem_stalls"] == 2 * (1 + 4 * 5 + 1) + (1 + 2 * 5 + 1)
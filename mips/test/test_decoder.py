@@ -1,5 +1,6 @@
-from amaranth.sim import Simulator, Delay, Settle
+from amaranth.sim import Delay, Settle
 from mips.cpu.decoder import Decoder
+from mips.sim.cache import cached_simulator
 from mips.cpu.isa import *
 import mips.util.encode as encode
 import pytest
@@ -117,8 +118,8 @@ def test_adhoc_coverage(
     if isinstance(funct, Funct):
         funct = funct.value
 
-    decoder = Decoder()
-    sim = Simulator(decoder)
+    sim = cached_simulator(Decoder)
+    decoder = sim.dut
     
     def test():
         yield decoder.inst.eq(inst)
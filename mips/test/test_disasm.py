@@ -0,0 +1,70 @@
+from mips.bench.bench_cache import STRIDE
+from mips.bench.bench_muldiv import DIGITS, DOT
+from mips.bench.bench_predictor import CALLS, SORT
+from mips.model.iss import fields
+from mips.util.asm import assemble
+from mips.util.disasm import *
+import mips.util.encode as encode
+
+import numpy as np
+import pytest
+
+from test_asm import SORT_SOURCE
+
+
+@pytest.mark.parametrize("program", [SORT, CALLS, STRIDE, DIGITS, DOT])
+def test_round_trip(program):
+    assert assemble("\n".join(disassemble(program))).text == program
+
+
+def test_listing():
+    assert disassemble([
+        encode.ADDIU(rs=0, rt=1, imm=0xfff9)[0],
+        encode.ORI(rs=2, rt=3, imm=0xbeef)[0],
+        encode.SW(rs=29, rt=31, imm=8)[0],
+        encode.BNE(rs=1, rt=0, imm=0xfffd)[0],
+        encode.JAL(0x10)[0],
+        encode.SRAV(rs=4, rt=5, rd=6)[0],
+        encode.LHI(rs=0, rt=7, imm=0x1234)[0],
+        0,
+    ], base=0x100) == [
+        "addiu $1, $0, -7",
+        "ori $3, $2, 0xbeef",
+        "sw $31, 8($29)",
+        "bne $1, $0, 0x104",
+        "jal 0x40",
+        "srav $6, $5, $4",
+        "lhi $7, 0x1234",
+        "nop",
+    ]
+
+
+def test_illegal_words():
+    words = [
+        0xffff_ffff,                                # unknown opcode
+        0x0000_003f,                                # unknown funct
+        encode.ADDU(rs=1, rt=2, rd=3)[0] | 1 << 6,  # stray shamt
+        encode.JR(rs=31, rt=0, rd=0)[0] | 1 << 16,  # stray rt
+    ]
+    assert disassemble(words) == [f".word {w:#010x}" for w in words]
+    assert (decode(words).mnemonic == 0).all()
+
+
+def test_decode_matches_fields():
+    rng = np.random.default_rng(12)
+    words = rng.integers(0, 1 << 32, 100_000, dtype=np.uint32)
+    decoded = decode(words)
+    for i in range(0, len(words), 997):
+        op, rs, rt, rd, shamt, funct, imm, addr = fields(int(words[i]))
+        assert (decoded.opcode[i], decoded.rs[i], decoded.rt[i], decoded.rd[i],
+                decoded.shamt[i], decoded.funct[i], decoded.imm[i], decoded.addr[i]) == \
+            (op, rs, rt, rd, shamt, funct, imm, addr)
+
+    legal = words[decoded.mnemonic != 0][:20_000]
+    assert assemble("\n".join(disassemble(legal))).text == legal.tolist()
+
+
+def test_histogram():
+    counts = histogram(assemble(SORT_SOURCE).text)
+    assert counts == {"addu": 1, "slt": 1, "addiu": 5, "lw": 2, "sw": 2, "beq": 1, "bgtz": 2, "trap": 1}
+    assert sum(counts.values()) == len(SORT)
@@ -0,0 +1,99 @@
+from mips.cpu.isa import *
+from mips.util.encode import encode_many, word_view
+import mips.util.encode as encode
+
+from array import array
+
+import numpy as np
+import pytest
+import random
+
+REGISTER = ["ADD", "ADDU", "SUB", "SUBU", "SLLV", "SRAV", "SRLV", "AND", "NOR", "OR", "XOR",
+            "SLT", "SLTU", "JALR", "JR", "MFHI", "MFLO", "MTHI", "MTLO", "MULT", "MULTU", "DIV", "DIVU"]
+SHIFT = ["SLL", "SRA", "SRL"]
+IMMEDIATE = [op.name for op in IMM_OPCODE]
+JUMP = [op.name for op in JMP_OPCODE]
+
+
+def random_fields(name: str):
+    if name in REGISTER:
+        return dict(rs=random.randrange(32), rd=random.randrange(32), rt=random.randrange(32))
+    if name in SHIFT:
+        return dict(rs=random.randrange(32), rt=random.randrange(32),
+                    shamt=random.randrange(32), rd=random.randrange(32))
+    if name in IMMEDIATE:
+        return dict(rs=random.randrange(32), rt=random.randrange(32), imm=random.randrange(1 << 16))
+    return dict(addr=random.randrange(1 << 26))
+
+
+@pytest.mark.parametrize("name", REGISTER + SHIFT + IMMEDIATE + JUMP)
+def test_word_matches_tuple(name: str):
+    encoder = getattr(encode, name)
+    for _ in range(100):
+        fields = random_fields(name)
+        word = encoder(**fields)[0]
+        assert encoder.word(**fields) == word
+
+        buf = array("I", [0, 0])
+        encoder.into(buf, 1, **fields)
+        assert buf.tolist() == [0, word]
+
+
+def test_negative_immediate():
+    assert encode.ADDIU.word(1, 2, -1) == encode.ADDIU(rs=1, rt=2, imm=0xffff)[0]
+    assert encode.BEQ.word(1, 2, -3) == encode.BEQ(rs=1, rt=2, imm=0xfffd)[0]
+
+
+@pytest.mark.parametrize("kind", ["array", "numpy", "bytearray"])
+def test_into_buffers(kind: str):
+    raw = {"array": array("I", bytes(16)), "numpy": np.zeros(4, dtype=np.uint32),
+           "bytearray": bytearray(16)}[kind]
+    buf = word_view(raw)
+    encode.SW.into(buf, 2, 29, 31, 8)
+    encode.J.into(buf, 3, 0x10)
+    assert np.frombuffer(raw, dtype=np.uint32).tolist() == \
+        [0, 0, encode.SW(rs=29, rt=31, imm=8)[0], encode.J(0x10)[0]]
+
+
+def test_encode_many_matches_scalar():
+    rng = np.random.default_rng(13)
+    n = 1000
+    rs, rt, rd, shamt = (rng.integers(0, 32, n) for _ in range(4))
+    imm = rng.integers(-0x8000, 0x10000, n)
+    addr = rng.integers(0, 1 << 26, n)
+
+    assert encode_many(Funct.ADDU, rs, rt, rd).tolist() == \
+        [encode.ADDU.word(*f) for f in zip(rs.tolist(), rd.tolist(), rt.tolist())]
+    assert encode_many(Funct.SRA, rs, rt, rd, shamt).tolist() == \
+        [encode.SRA.word(*f) for f in zip(rs.tolist(), rt.tolist(), shamt.tolist(), rd.tolist())]
+    assert encode_many(Opcode.LW, rs, rt, imm=imm).tolist() == \
+        [encode.LW.word(*f) for f in zip(rs.tolist(), rt.tolist(), imm.tolist())]
+    assert encode_many(Opcode.JAL, addr=addr).tolist() == [encode.JAL.word(a) for a in addr.tolist()]
+
+
+def test_encode_many_broadcast():
+    words = encode_many(Opcode.ADDIU, rs=0, rt=np.arange(1, 4), imm=-1)
+    assert words.dtype == np.uint32
+    assert words.tolist() == [encode.ADDIU(rs=0, rt=rt, imm=0xffff)[0] for rt in (1, 2, 3)]
+
+
+@pytest.mark.parametrize("kind", ["array", "numpy", "bytearray"])
+def test_encode_many_out(kind: str):
+    out = {"array": array("I", bytes(24)), "numpy": np.zeros(6, dtype=np.uint32),
+           "bytearray": bytearray(24)}[kind]
+    view = encode_many(Opcode.ORI, rs=1, rt=2, imm=[1, 2, 3], out=out, offset=2)
+    expected = [encode.ORI(rs=1, rt=2, imm=i)[0] for i in (1, 2, 3)]
+    assert view.tolist() == expected
+    assert np.frombuffer(out, dtype=np.uint32).tolist() == [0, 0] + expected + [0]
+
+
+@pytest.mark.parametrize("fields", [
+    dict(rs=[0, 32]),
+    dict(rt=-1),
+    dict(imm=0x10000),
+    dict(imm=-0x8001),
+    dict(addr=1 << 26),
+])
+def test_encode_many_range(fields):
+    with pytest.raises(ValueError, match="out of range"):
+        encode_many(Opcode.ADDIU, **fields)
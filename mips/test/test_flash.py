@@ -0,0 +1,173 @@
+from mips.cli.flash import *
+from mips.sim.cores import DEMO_PROGRAM, build_core, load_program
+from mips.util.flow import FlowError, have_tools
+import mips.cli.flash as flash_module
+
+from amaranth.back import rtlil
+
+from pathlib import Path
+
+import shutil
+import subprocess
+import sys
+import pytest
+
+from typing import *
+
+SOURCE = """
+.text
+    lw $1, 0($0)
+    addiu $1, $1, {step}
+    sw $1, 0($0)
+.data
+    .word 42
+"""
+
+PROGRAMMER = """
+import shutil, sys
+shutil.copy(sys.argv[2], sys.argv[1])
+"""
+
+
+class Tools:
+    """
+    Stand-ins for the FPGA tools: the placed design is the placeholder image
+    of every memory that is in block RAM, which the BRAM tool patches and
+    the packer copies as is. The programmer is a real script copying the
+    bitstream to ``flashed``.
+    """
+    def __init__(self, tmp_path: Path, bram=("imem", "dmem")):
+        self.bram = bram
+        self.broken = False
+        self.calls = []
+        self.flashed = tmp_path / "flashed"
+        script = tmp_path / "programmer.py"
+        script.write_text(PROGRAMMER)
+        self.programmer = f"{sys.executable} {script} {self.flashed}"
+
+    def placed(self, options) -> str:
+        core = build_core([], core=options.get("core", "pipeline"))
+        return "".join(to_hex(placeholder(name, memory.width, memory.depth), memory.width)
+                       for name, memory in memories(core).items() if name in self.bram)
+
+    def run_tool(self, args, cwd, input=None):
+        tool = "programmer" if args[0] == sys.executable else Path(args[0]).name
+        self.calls.append(tool)
+        cwd = Path(cwd)
+        if tool == "yosys":
+            (cwd / "top.json").write_text((cwd / "top.il").read_text())
+        elif tool == "nextpnr-ice40":
+            (cwd / args[-1]).write_text(self.placed(self.options))
+        elif tool == "icebram":
+            before, after = (cwd / args[1]).read_text(), (cwd / args[2]).read_text()
+            if self.broken:
+                raise FlowError("icebram failed:\nSegmentation fault")
+            if before not in input:
+                raise FlowError("icebram failed:\nNo memory instances were replaced.\n")
+            return subprocess.CompletedProcess(args, 0, input.replace(before, after), "")
+        elif tool == "icepack":
+            shutil.copy(cwd / args[1], cwd / args[2])
+        else:
+            return run_tool(args, cwd, input)
+
+    def flash(self, program: str, cache_dir: Path, **options):
+        self.options = options
+        self.calls = []
+        return flash(program, family="ice40", programmer=self.programmer,
+                     cache_dir=str(cache_dir), **options)
+
+
+@pytest.fixture
+def tools(tmp_path, monkeypatch):
+    tools = Tools(tmp_path)
+    monkeypatch.setattr(flash_module, "run_tool", tools.run_tool)
+    return tools
+
+
+def source(tmp_path: Path, step: int) -> str:
+    path = tmp_path / f"prog{step}.s"
+    path.write_text(SOURCE.format(step=step))
+    return str(path)
+
+
+def image(words: List[int], depth: int = 1024) -> str:
+    return to_hex(words + [0] * (depth - len(words)), 32)
+
+
+def test_patch_program(tmp_path, tools):
+    cache = tmp_path / "cache"
+    bitstream = tools.flash(source(tmp_path, 1), cache)
+    assert tools.calls == ["yosys", "nextpnr-ice40", "icebram", "icebram", "icepack", "programmer"]
+    assert tools.flashed.read_text() == bitstream.read_text()
+    words, data = load_program(source(tmp_path, 1))
+    assert tools.flashed.read_text() == image(words) + image(data)
+
+    # firmware changes only patch the memories of the placed design
+    tools.flash(source(tmp_path, 2), cache)
+    assert tools.calls == ["icebram", "icebram", "icepack", "programmer"]
+    words, data = load_program(source(tmp_path, 2))
+    assert tools.flashed.read_text() == image(words) + image(data)
+
+    # unless the design changes
+    tools.flash(source(tmp_path, 2), cache, predictor="gshare")
+    assert tools.calls[:2] == ["yosys", "nextpnr-ice40"]
+    tools.flash(source(tmp_path, 2), cache, rebuild=True)
+    assert tools.calls[:2] == ["yosys", "nextpnr-ice40"]
+    assert len(list(cache.iterdir())) == 2
+
+
+def test_unpatchable(tmp_path, tools):
+    # the program memory of the single cycle core is read combinatorially,
+    # so it is not in block RAM and the design is built with each program
+    tools.bram = ("dmem",)
+    cache = tmp_path / "cache"
+    tools.flash(source(tmp_path, 1), cache, core="single")
+    assert tools.calls == ["yosys", "nextpnr-ice40", "icebram", "yosys", "nextpnr-ice40", "icepack",
+                           "programmer"]
+    tools.flash(source(tmp_path, 2), cache, core="single")
+    assert tools.calls == ["yosys", "nextpnr-ice40", "icepack", "programmer"]
+    tools.flash(source(tmp_path, 2), cache, core="single")
+    assert tools.calls == ["icepack", "programmer"]
+    assert len(list(cache.iterdir())) == 3
+
+
+def test_tool_failure(tmp_path, tools):
+    # a failing tool is reported, and does not mark the design unpatchable
+    cache = tmp_path / "cache"
+    tools.broken = True
+    with pytest.raises(FlowError, match="Segmentation fault"):
+        tools.flash(source(tmp_path, 1), cache)
+    assert not list(cache.glob("*/unpatchable"))
+    tools.broken = False
+    tools.flash(source(tmp_path, 1), cache)
+    assert tools.calls == ["icebram", "icebram", "icepack", "programmer"]
+
+
+def test_placeholder():
+    words = placeholder("imem", 32, 1024)
+    assert words == placeholder("imem", 32, 1024)
+    assert words != placeholder("dmem", 32, 1024)
+    assert max(placeholder("imem_predecode", 50, 1024)) >= 1 << 32
+    assert to_hex([0x2a, 1 << 49], 50) == "000000000002a\n2000000000000\n"
+
+
+def test_board_ports():
+    top = Board(build_core(DEMO_PROGRAM, core="dual"))
+    assert len(top.ports()) == 2
+    assert "module \\top" in rtlil.convert(top, name="top", ports=top.ports())
+
+
+def test_unknown_family(tmp_path):
+    with pytest.raises(FlowError, match="family"):
+        flash(family="xc7", cache_dir=str(tmp_path))
+
+
+@pytest.mark.skipif(not (have_tools("ice40") and shutil.which("icebram") and shutil.which("icepack")),
+                    reason="needs yosys, nextpnr-ice40, icebram and icepack")
+def test_flash(tmp_path):
+    tools = Tools(tmp_path)
+    flash(source(tmp_path, 1), programmer=tools.programmer, cache_dir=str(tmp_path))
+    first = tools.flashed.read_bytes()
+    flash(source(tmp_path, 2), programmer=tools.programmer, cache_dir=str(tmp_path))
+    assert tools.flashed.read_bytes() != first
+    assert len([path for path in tmp_path.iterdir() if path.is_dir()]) == 1
@@ -0,0 +1,54 @@
+from mips.cpu.regfile import RegisterFile
+from mips.util.flow import *
+
+import pytest
+
+from typing import *
+
+def test_count_cells_ice40():
+    counts = count_cells({
+        "SB_LUT4": 120,
+        "SB_DFF": 10,
+        "SB_DFFE": 22,
+        "SB_CARRY": 31,
+        "SB_RAM40_4K": 2,
+        "SB_MAC16": 1,
+    })
+    assert counts == {"lut": 120, "ff": 32, "lutram": 0, "bram": 2, "dsp": 1}
+
+
+def test_count_cells_ecp5():
+    counts = count_cells({
+        "LUT4": 300,
+        "TRELLIS_FF": 64,
+        "TRELLIS_DPR16X4": 16,
+        "DP16KD": 1,
+        "MULT18X18D": 4,
+        "CCU2C": 17,
+    })
+    assert counts == {"lut": 300, "ff": 64, "lutram": 16, "bram": 1, "dsp": 4}
+
+
+def test_parse_fmax():
+    assert parse_fmax({"fmax": {}}) is None
+    assert parse_fmax({"fmax": {
+        "clk": {"achieved": 81.5, "constraint": 12.0},
+        "clk2": {"achieved": 64.0, "constraint": 12.0},
+    }}) == 64.0
+
+
+def test_missing_tool(monkeypatch):
+    monkeypatch.setenv("PATH", "")
+    regfile = RegisterFile()
+    with pytest.raises(FlowError):
+        synthesize(regfile, regfile.ports(), pnr=False)
+
+
+@pytest.mark.skipif(not have_tools("ice40"), reason="needs yosys and nextpnr-ice40")
+def test_synthesize():
+    regfile = RegisterFile()
+    top = Registered(regfile, regfile.raddr + regfile.waddr + regfile.wen + regfile.wdata, regfile.rdata)
+    report = synthesize(top, top.ports())
+    assert report["lut"] > 0
+    assert report["ff"] > 32 * 31
+    assert report["fmax_mhz"] > 0
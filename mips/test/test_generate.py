@@ -0,0 +1,110 @@
+from mips.cpu.isa import *
+from mips.model.iss import ISS, fields
+from mips.sim.cosim import cosim, format_divergence
+from mips.util.disasm import MNEMONICS, decode, histogram
+from mips.util.generate import *
+from mips.util.generate import MAX_SKIP
+
+from array import array
+
+import numpy as np
+import pytest
+
+
+def test_reproducible():
+    assert (generate(10_000, seed=3) == generate(10_000, seed=3)).all()
+    assert (generate(10_000, seed=3) != generate(10_000, seed=4)).any()
+    program, data = workload(100, "memory", seed=9)
+    assert workload(100, "memory", seed=9) == (program, data)
+
+
+@pytest.mark.parametrize("mix", MIXES)
+def test_mix(mix: str):
+    words = generate(50_000, mix, seed=1)
+    counts = histogram(words)
+    assert ".word" not in counts
+    allowed = {op.name.lower() for name, weight in MIXES[mix].weights.items()
+               if weight for op in CLASSES[name]}
+    assert set(counts) <= allowed | {"nop"}
+    # every class shows up in proportion to its weight
+    weights = MIXES[mix].weights
+    total = sum(weights.values())
+    for name, weight in weights.items():
+        share = sum(counts.get(op.name.lower(), 0) for op in CLASSES[name]) / len(words)
+        assert abs(share - weight / total) < 0.02, name
+
+
+def test_constraints():
+    words = generate(50_000, seed=2, footprint=256, base=10)
+    d = decode(words)
+    index = np.arange(len(words))
+    names = np.array(MNEMONICS)[d.mnemonic]
+
+    memory = np.isin(names, ["lw", "lh", "lhu", "lb", "lbu", "sw", "sh", "sb"])
+    assert (d.rs[memory] == 0).all()
+    assert (d.imm[memory] < 256).all()
+    assert (d.imm[np.isin(names, ["lw", "sw"])] % 4 == 0).all()
+    assert (d.imm[np.isin(names, ["lh", "lhu", "sh"])] % 2 == 0).all()
+
+    branch = np.isin(names, ["beq", "bne", "blez", "bgtz"])
+    assert (d.imm[branch] <= MAX_SKIP).all()
+    assert (index[branch] + d.imm[branch] < len(words)).all()
+    jump = np.isin(names, ["j", "jal"])
+    skip = d.addr[jump] - 10 - index[jump] - 1
+    assert ((skip >= 0) & (skip <= MAX_SKIP) & (index[jump] + skip < len(words))).all()
+
+    # $28 to $30 are left alone, $31 is only written by JAL
+    assert not np.isin(names, ["jr", "jalr", "trap"]).any()
+    assert (d.rd[d.opcode == 0] < 28).all()
+    for field in (d.rs, d.rt):
+        assert not np.isin(field[~jump], [28, 29, 30]).any()
+
+
+def test_dependency_distance():
+    words = generate(20_000, "alu", seed=5, distance=1).tolist()
+    for prev, word in zip(words, words[1:]):
+        op, rs, rt, rd, *_ = fields(prev)
+        dest = rd if op == 0 else rt
+        op, rs, rt, *_ = fields(word)
+        if op == 0 and (word & 0x3f) in (Funct.SLL.value, Funct.SRL.value, Funct.SRA.value):
+            assert rt == dest
+        elif op not in (Opcode.LLO.value, Opcode.LHI.value):
+            assert rs == dest
+
+
+def test_out_buffers():
+    words = generate(1000, seed=6)
+    for out in (array("I", bytes(4008)), np.zeros(1002, dtype=np.uint32), bytearray(4008)):
+        view = generate(1000, seed=6, out=out, offset=1)
+        assert (view == words).all()
+        assert np.frombuffer(out, dtype=np.uint32)[1:1001].tolist() == words.tolist()
+
+
+def test_large_stream():
+    # the rate is measured by mips.bench.bench_workload
+    out = np.zeros(1_000_000, dtype=np.uint32)
+    view = generate(len(out), seed=8, out=out)
+    assert (view == out).all() and (out == generate(len(out), seed=8)).all()
+    assert ".word" not in histogram(out)
+
+
+@pytest.mark.parametrize("mix", MIXES)
+def test_workload_halts(mix: str):
+    program, data = workload(300, mix, iterations=3, seed=7)
+    assert len(program) == 300 + 4 and len(data) == 256
+    iss = ISS(program, data)
+    iss.run(10_000)
+    assert iss.halted
+
+
+@pytest.mark.parametrize("mix", ["balanced", "hazard"])
+@pytest.mark.parametrize("core, options", [
+    ("single", {}),
+    ("dual", {}),
+    ("pipeline", dict(predictor="bimodal", icache="4x1x4", dcache="4x2x2", muldiv="fast")),
+])
+def test_workload_cosim(mix: str, core: str, options):
+    program, data = workload(150, mix, iterations=2, seed=11)
+    res = cosim(program, data, core, **options)
+    assert res.ok, format_divergence(res.divergence)
+    assert res.halted
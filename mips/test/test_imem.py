@@ -0,0 +1,131 @@
+from amaranth.back import rtlil
+from amaranth.sim import Simulator, Settle
+from mips.cpu.imem import InstructionMemory
+from mips.cpu.pipeline import PipelinedCore
+from mips.model.iss import ISS
+from mips.sim.cache import cached_simulator
+from mips.sim.cosim import format_divergence, load_memories, lockstep
+from mips.util.image import to_binary, to_ihex, to_readmemh
+
+import pytest
+
+from typing import *
+
+from test_iss import PROGRAMS
+
+WORDS = [0x2001_0005, 0x0021_1020, 0xac02_0000, 0x1000_ffff, 0xdead_beef]
+
+
+def run(imem: InstructionMemory, bench, sim=None):
+    if sim is None:
+        sim = Simulator(imem)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.run()
+
+
+def fetch(addr: int, imem: InstructionMemory):
+    yield imem.addr.eq(addr)
+    yield
+    yield Settle()
+    return (yield imem.data)
+
+
+def read_all(imem: InstructionMemory, count: int, sim=None) -> List[int]:
+    words = []
+    def bench():
+        for i in range(count):
+            words.append((yield from fetch(i, imem)))
+    run(imem, bench, sim)
+    return words
+
+
+@pytest.mark.parametrize("suffix,write", [
+    (".hex", lambda words: to_readmemh(words).encode()),
+    (".ihex", lambda words: to_ihex(words).encode()),
+    (".bin", to_binary),
+])
+def test_from_image(tmp_path, suffix: str, write):
+    path = tmp_path / f"prog{suffix}"
+    path.write_bytes(write(WORDS))
+    imem = InstructionMemory.from_image(str(path), depth=16)
+    assert read_all(imem, 8) == WORDS + [0] * 3
+
+
+def test_sync_read():
+    imem = InstructionMemory(WORDS, depth=16)
+
+    def bench():
+        yield imem.addr.eq(1)
+        yield Settle()
+        # the word comes out on the cycle after the address
+        assert (yield imem.data) == WORDS[0]
+        yield
+        yield Settle()
+        assert (yield imem.data) == WORDS[1]
+        # and is held while the port is disabled
+        yield imem.en.eq(0)
+        yield imem.addr.eq(2)
+        yield
+        yield Settle()
+        assert (yield imem.data) == WORDS[1]
+
+    run(imem, bench)
+
+
+def test_data_port():
+    imem = InstructionMemory(WORDS, depth=16, data_port=True)
+
+    def bench():
+        yield imem.addr.eq(0)
+        yield imem.data_addr.eq(4)
+        yield
+        yield Settle()
+        assert (yield imem.data) == WORDS[0]
+        assert (yield imem.data_data) == WORDS[4]
+
+    run(imem, bench)
+
+
+def test_no_data_port():
+    imem = InstructionMemory(WORDS)
+    assert imem.data_addr is None
+    assert len(imem.ports()) == 3
+
+
+def test_too_large():
+    with pytest.raises(AssertionError, match="does not fit"):
+        InstructionMemory(WORDS, depth=4)
+
+
+def test_reload():
+    # every program runs on the same elaborated design, with the rows left
+    # by the initial contents and by longer programs cleared
+    sim = cached_simulator(InstructionMemory, WORDS, depth=64)
+    imem = sim.dut
+    programs = [program for program, _ in PROGRAMS.values()] + [WORDS[:2], []]
+    for program in programs:
+        sim.add_process(imem.load(program))
+        depth = max(len(WORDS), *(len(p) for p in programs))
+        assert read_all(imem, depth, sim) == program + [0] * (depth - len(program))
+        assert cached_simulator(InstructionMemory, WORDS, depth=64) is sim
+
+
+def test_pipeline_programs():
+    # the pipelined core fetches from an ``InstructionMemory``, so every
+    # program runs on one elaboration of it
+    sim = cached_simulator(PipelinedCore, (), ())
+    for program, data in PROGRAMS.values():
+        sim.add_clock(1e-6)
+        sim.add_process(load_memories(sim.dut, program, data))
+        res = lockstep(sim.dut, ISS(program, data), sim=sim)
+        assert res.ok, format_divergence(res.divergence)
+        assert res.halted
+        assert cached_simulator(PipelinedCore, (), ()) is sim
+
+
+def test_block_ram():
+    imem = InstructionMemory(WORDS, data_port=True)
+    text = rtlil.convert(imem, ports=imem.ports())
+    assert "$mem" in text
+    assert text.count("$memrd") == 2
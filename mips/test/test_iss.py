@@ -0,0 +1,97 @@
+from mips.model.iss import ISS, Commit
+from mips.sim.cores import DEMO_PROGRAM
+import mips.util.encode as encode
+
+import pytest
+
+from typing import *
+
+from test_core import run
+
+PROGRAMS = {
+    "demo": (DEMO_PROGRAM, []),
+    "memory": ([
+        encode.LW(rs=0, rt=1, imm=0)[0],
+        encode.LB(rs=0, rt=2, imm=1)[0],
+        encode.LBU(rs=0, rt=3, imm=1)[0],
+        encode.LH(rs=0, rt=4, imm=2)[0],
+        encode.LHU(rs=0, rt=5, imm=2)[0],
+        encode.SB(rs=0, rt=1, imm=5)[0],
+        encode.SH(rs=0, rt=1, imm=10)[0],
+        encode.SW(rs=0, rt=1, imm=12)[0],
+        encode.TRAP(0)[0],
+    ], [0x8765_8321]),
+    "arith": ([
+        encode.LHI(rs=0, rt=1, imm=0x8000)[0],
+        encode.ADDIU(rs=0, rt=2, imm=0xfff3)[0],
+        encode.SRA(rs=0, rt=1, shamt=4, rd=3)[0],
+        encode.SRL(rs=0, rt=1, shamt=4, rd=4)[0],
+        encode.SRAV(rs=2, rt=1, rd=5)[0],
+        encode.SLT(rs=1, rt=2, rd=6)[0],
+        encode.SLTU(rs=1, rt=2, rd=7)[0],
+        encode.SLTI(rs=2, rt=8, imm=0)[0],
+        encode.SLTIU(rs=2, rt=9, imm=0xffff)[0],
+        encode.NOR(rs=1, rt=2, rd=10)[0],
+        encode.XORI(rs=2, rt=11, imm=0xffff)[0],
+        encode.SUBU(rs=0, rt=2, rd=12)[0],
+        encode.SUB(rs=1, rt=12, rd=13)[0],
+        encode.TRAP(0)[0],
+    ], []),
+}
+
+
+def test_demo():
+    iss = ISS(DEMO_PROGRAM)
+    assert iss.run() == 7 + 3 * 9
+    assert iss.halted
+    assert iss.regs[2] == 55
+    assert iss.word(0) == 55
+
+
+def test_overflow_counts_trap():
+    iss = ISS([
+        encode.LHI(rs=0, rt=1, imm=0x7fff)[0],
+        encode.ADDIU(rs=0, rt=2, imm=7)[0],
+        encode.LLO(rs=0, rt=1, imm=0xffff)[0],
+        encode.ADDI(rs=1, rt=2, imm=1)[0],
+        encode.ADD(rs=1, rt=1, rd=2)[0],
+        encode.TRAP(0)[0],
+    ])
+    iss.run()
+    assert iss.regs[2] == 7
+    assert iss.traps == 2
+
+
+def test_step_commits():
+    iss = ISS(PROGRAMS["memory"][0], PROGRAMS["memory"][1])
+    commits = []
+    while (commit := iss.step()) is not None:
+        commits.append(commit)
+    assert commits[0] == Commit(0, PROGRAMS["memory"][0][0], 1, 0x8765_8321, None)
+    assert commits[5].store == (5, 1, 0x21)
+    assert commits[6].store == (10, 2, 0x8321)
+    assert commits[7].store == (12, 4, 0x8765_8321)
+    assert iss.retired == len(commits) == 9
+
+
+def test_run_limit():
+    iss = ISS([encode.J(0)[0]])
+    assert iss.run(100) == 100
+    assert not iss.halted
+    assert iss.pc == 0
+
+
+def test_illegal():
+    iss = ISS([0xffff_ffff])
+    with pytest.raises(ValueError):
+        iss.run()
+
+
+@pytest.mark.parametrize("name", PROGRAMS.keys())
+def test_matches_core(name: str):
+    program, data = PROGRAMS[name]
+    regs, mem = run(program, data=data)
+    iss = ISS(program, data)
+    iss.run()
+    assert iss.regs == regs
+    assert [iss.word(i) for i in range(len(mem))] == mem
@@ -0,0 +1,78 @@
+from mips.cpu.isa import Funct
+from mips.model.alu import alu_batch
+
+import numpy as np
+import pytest
+
+from typing import *
+
+MAX_32U = 0xff_ff_ff_ff
+MAX_UNSIGN = 0x80_00_00_00
+MAX_SIGNED = 0x7f_ff_ff_ff
+
+def signed(v: int) -> int:
+    return v - (1 << 32) if v & MAX_UNSIGN else v
+
+SCALAR = {
+    Funct.ADD: lambda s, t, h: (s + t, signed(s) + signed(t) != signed((s + t) & MAX_32U)),
+    Funct.ADDU: lambda s, t, h: (s + t, False),
+    Funct.SUB: lambda s, t, h: (s - t, signed(s) - signed(t) != signed((s - t) & MAX_32U)),
+    Funct.SUBU: lambda s, t, h: (s - t, False),
+    Funct.AND: lambda s, t, h: (s & t, False),
+    Funct.OR: lambda s, t, h: (s | t, False),
+    Funct.XOR: lambda s, t, h: (s ^ t, False),
+    Funct.NOR: lambda s, t, h: (~(s | t), False),
+    Funct.SLL: lambda s, t, h: (t << h, False),
+    Funct.SLLV: lambda s, t, h: (t << (s & 31), False),
+    Funct.SRL: lambda s, t, h: (t >> h, False),
+    Funct.SRLV: lambda s, t, h: (t >> (s & 31), False),
+    Funct.SRA: lambda s, t, h: (signed(t) >> h, False),
+    Funct.SRAV: lambda s, t, h: (signed(t) >> (s & 31), False),
+    Funct.SLT: lambda s, t, h: (int(signed(s) < signed(t)), False),
+    Funct.SLTU: lambda s, t, h: (int(s < t), False),
+    Funct.JR: lambda s, t, h: (0, False),
+}
+"Straightforward per-vector definition of every ALU function"
+
+
+@pytest.mark.parametrize(
+        "func, rs, rt, rd, ovf",
+        [
+            (Funct.ADD, 1, 2, 3, False),
+            (Funct.ADD, MAX_32U, 1, 0, False),
+            (Funct.ADD, MAX_SIGNED, 1, MAX_UNSIGN, True),
+            (Funct.ADD, MAX_UNSIGN, MAX_UNSIGN, 0, True),
+            (Funct.ADDU, MAX_SIGNED, 1, MAX_UNSIGN, False),
+            (Funct.SUB, 2, 3, MAX_32U, False),
+            (Funct.SUB, MAX_UNSIGN, 1, MAX_SIGNED, True),
+            (Funct.SUB, 0, MAX_UNSIGN, MAX_UNSIGN, True),
+            (Funct.SUBU, MAX_UNSIGN, 1, MAX_SIGNED, False),
+            (Funct.SLT, MAX_UNSIGN, 0, 1, False),
+            (Funct.SLTU, MAX_UNSIGN, 0, 0, False),
+            (Funct.SRAV, 33, MAX_UNSIGN, 0xc0_00_00_00, False),
+            (Funct.MFHI, 1, 1, 0, False),
+        ]
+)
+def test_known(func: Funct, rs: int, rt: int, rd: int, ovf: bool):
+    res_rd, res_ovf = alu_batch(func, [rs], [rt])
+    assert res_rd.dtype == np.uint32
+    assert res_rd[0] == rd
+    assert res_ovf[0] == ovf
+
+
+@pytest.mark.parametrize("func", SCALAR.keys())
+def test_random(func: Funct):
+    rng = np.random.default_rng(func.value)
+    rs = rng.integers(0, 1 << 32, 2000, dtype=np.uint32)
+    rt = rng.integers(0, 1 << 32, 2000, dtype=np.uint32)
+    shamt = rng.integers(0, 32, 2000, dtype=np.uint32)
+    rs[:4] = [0, MAX_32U, MAX_UNSIGN, MAX_SIGNED]
+    rt[:4] = [MAX_SIGNED, MAX_UNSIGN, MAX_32U, 0]
+
+    rd, ovf = alu_batch(func, rs, rt, shamt)
+
+    for s, t, h, d, o in zip(rs.tolist(), rt.tolist(), shamt.tolist(), rd.tolist(), ovf.tolist()):
+        exp_rd, exp_ovf = SCALAR[func](s, t, h)
+        assert (exp_rd & MAX_32U, exp_ovf) == (d, o),\
+            f"Expected {func} rs:{s:08x} rt:{t:08x} h:{h} => rd:{exp_rd & MAX_32U:08x} ovf:{exp_ovf}"\
+            f" but got rd:{d:08x} ovf:{o} instead"
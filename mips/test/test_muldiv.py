@@ -0,0 +1,130 @@
+from amaranth.sim import Simulator
+from mips.cpu.control import MulDivOp
+from mips.cpu.core import Core
+from mips.cpu.muldiv import MULDIV_CONFIGS, MulDiv
+from mips.cpu.pipeline import PipelinedCore
+from mips.model.iss import ISS, divide
+import mips.util.encode as encode
+
+import random
+import pytest
+
+from typing import *
+
+from test_core import run
+from test_pipeline import counters
+
+MASK = 0xffff_ffff
+
+EDGE_OPERANDS = [0, 1, 2, 3, 7, 0x7fff_ffff, 0x8000_0000, 0x8000_0001, 0xffff_fffe, MASK]
+
+
+def expected(op: MulDivOp, a: int, b: int):
+    "``(hi, lo)`` left by ``op`` on ``a`` and ``b``"
+    if op == MulDivOp.MULT:
+        p = ((a ^ 0x8000_0000) - 0x8000_0000) * ((b ^ 0x8000_0000) - 0x8000_0000)
+    elif op == MulDivOp.MULTU:
+        p = a * b
+    else:
+        return divide(a, b, op == MulDivOp.DIV)
+    return (p >> 32) & MASK, p & MASK
+
+
+def check(muldiv: MulDiv, vectors: List[Tuple[MulDivOp, int, int]]):
+    """
+    Utility function that runs every ``(op, a, b)`` vector through the unit
+    and checks HI, LO and the number of cycles the unit is busy.
+    """
+    sim = Simulator(muldiv)
+    sim.add_clock(1e-6)
+
+    def bench():
+        for op, a, b in vectors:
+            yield muldiv.op.eq(op)
+            yield muldiv.rs.eq(a)
+            yield muldiv.rt.eq(b)
+            yield muldiv.start.eq(1)
+            yield
+            yield muldiv.start.eq(0)
+            busy = 0
+            yield
+            while (yield muldiv.busy):
+                busy += 1
+                yield
+            latency = muldiv.div_cycles if op in (MulDivOp.DIV, MulDivOp.DIVU) else muldiv.mul_cycles
+            assert busy == latency
+            hi, lo = expected(op, a, b)
+            assert ((yield muldiv.hi), (yield muldiv.lo)) == (hi, lo),\
+                f"{op} {a:#x} {b:#x}"
+
+    sim.add_sync_process(bench)
+    sim.run()
+
+
+@pytest.mark.parametrize("config", MULDIV_CONFIGS.keys())
+def test_operations(config: str):
+    rng = random.Random(10)
+    vectors = []
+    for op in (MulDivOp.MULT, MulDivOp.MULTU, MulDivOp.DIV, MulDivOp.DIVU):
+        vectors += [(op, a, b) for a in EDGE_OPERANDS for b in EDGE_OPERANDS]
+        vectors += [(op, rng.getrandbits(32), rng.getrandbits(32)) for _ in range(20)]
+        vectors += [(op, rng.getrandbits(32), rng.getrandbits(8)) for _ in range(20)]
+    check(MulDiv(**MULDIV_CONFIGS[config]), vectors)
+
+
+HILO_PROGRAM = [
+    encode.ADDIU(rs=0, rt=1, imm=0xfff9)[0],    # r1 = -7
+    encode.ADDIU(rs=0, rt=2, imm=3)[0],         # r2 = 3
+    encode.MULT(rs=1, rt=2, rd=0)[0],
+    encode.ADDIU(rs=0, rt=9, imm=1)[0],         # runs alongside
+    encode.MFHI(rs=0, rt=0, rd=3)[0],
+    encode.MFLO(rs=0, rt=0, rd=4)[0],
+    encode.MULTU(rs=1, rt=2, rd=0)[0],
+    encode.MFHI(rs=0, rt=0, rd=5)[0],
+    encode.DIV(rs=1, rt=2, rd=0)[0],
+    encode.MFLO(rs=0, rt=0, rd=6)[0],
+    encode.MFHI(rs=0, rt=0, rd=7)[0],
+    encode.DIVU(rs=1, rt=2, rd=0)[0],
+    encode.MTHI(rs=9, rt=0, rd=0)[0],           # HI is not overwritten
+    encode.MFHI(rs=0, rt=0, rd=8)[0],
+    encode.MFLO(rs=0, rt=0, rd=10)[0],
+    encode.DIV(rs=1, rt=0, rd=0)[0],            # by zero
+    encode.MULT(rs=2, rt=2, rd=0)[0],           # abandons the divide
+    encode.MFLO(rs=0, rt=0, rd=11)[0],
+    encode.MTLO(rs=1, rt=0, rd=0)[0],
+    encode.MFLO(rs=0, rt=0, rd=12)[0],
+    encode.TRAP(0)[0],
+]
+"Every HI/LO instruction, back to back"
+
+
+@pytest.mark.parametrize("config", MULDIV_CONFIGS.keys())
+@pytest.mark.parametrize("core", [Core, PipelinedCore])
+def test_core_matches_iss(core, config: str):
+    regs, _ = run(HILO_PROGRAM, core=lambda *args: core(*args, muldiv=MulDiv(**MULDIV_CONFIGS[config])))
+    iss = ISS(HILO_PROGRAM)
+    iss.run()
+    assert iss.regs == regs
+    assert regs[3:5] == [MASK, (-21) & MASK]
+    assert regs[6:9] == [(-2) & MASK, (-1) & MASK, 1]
+
+
+def test_interlock_only_on_reads():
+    config = MULDIV_CONFIGS["small"]
+    independent = [
+        encode.MULT(rs=1, rt=2, rd=0)[0],
+        *[encode.ADDIU(rs=3, rt=3, imm=1)[0] for _ in range(8)],
+        encode.TRAP(0)[0],
+    ]
+    res = counters(independent, muldiv=MulDiv(**config))
+    assert res["stalls"] == 0
+
+    dependent = [
+        encode.MULT(rs=1, rt=2, rd=0)[0],
+        *[encode.ADDIU(rs=3, rt=3, imm=1)[0] for _ in range(8)],
+        encode.MFLO(rs=0, rt=0, rd=4)[0],
+        encode.TRAP(0)[0],
+    ]
+    res = counters(dependent, muldiv=MulDiv(**config))
+    # the MFLO reaches ID 8 cycles after the MULT leaves it
+    assert res["stalls"] == config["mul_cycles"] + 1 - 8
@@ -0,0 +1,122 @@
+from amaranth.sim import Simulator
+from mips.bench.bench_predictor import SORT, SORT_DATA
+from mips.cpu.core import Core
+from mips.cpu.perf import *
+from mips.cpu.pipeline import PipelinedCore
+from mips.model.iss import ISS
+from mips.sim.cores import build_core
+from mips.util.asm import assemble
+
+import pytest
+
+from typing import *
+
+from test_core import run
+
+# Reads every counter the single cycle core drives, after an overflow
+# and a multiply. Counters are at ``-64($0)`` onwards.
+FIRMWARE = assemble("""
+    lhi $1, 0x7fff
+    add $2, $1, $1          # overflows, $2 is left alone
+    addiu $7, $0, 3
+    mult $7, $7
+    mflo $8                 # waits for the multiply
+    lw $3, -64($0)          # cycles
+    lw $4, -60($0)          # retired
+    lw $5, -52($0)          # muldiv_wait
+    lw $6, -32($0)          # overflow
+    lbu $9, -60($0)         # low byte of retired
+    lw $10, -24($0)         # past the last counter
+    trap
+""").text
+
+
+def snapshot(core, cycles: int = 200) -> Dict[str, int]:
+    """
+    Utility function that runs ``core`` until it halts and returns its
+    performance counters, read directly from the simulator.
+    """
+    sim = Simulator(core)
+    sim.add_clock(1e-6)
+    counts = {}
+
+    def bench():
+        for _ in range(cycles):
+            yield
+            if (yield core.halt):
+                break
+        assert (yield core.halt), f"core did not halt within {cycles} cycles"
+        counts.update((yield from core.perf.peek()))
+
+    sim.add_sync_process(bench)
+    sim.run()
+    return counts
+
+
+def test_window():
+    assert PERF_BASE & 0xffff_ffff == (-64) & 0xffff_ffff
+    assert len(PERF_EVENTS) <= PerfCounters.WORDS
+
+
+def test_firmware_reads():
+    regs, _ = run(FIRMWARE)
+    wait = regs[5]
+    assert regs[2] == 0
+    assert regs[8] == 9
+    # one instruction per cycle, plus the cycles ``mflo`` waited
+    assert regs[3] == 5 + wait
+    assert regs[4] == 6
+    assert wait > 0
+    assert regs[6] == 1
+    assert regs[9] == 9
+    assert regs[10] == 0
+
+
+def test_core_counters():
+    core = Core(FIRMWARE)
+    counts = snapshot(core)
+    assert counts["retired"] == len(FIRMWARE)
+    assert counts["cycles"] == counts["retired"] + counts["muldiv_wait"]
+    assert counts["overflow"] == 1
+    assert counts["mispredict"] == counts["load_use"] == counts["dcache_miss"] == 0
+
+
+def test_pipeline_firmware_reads():
+    regs, _ = run(FIRMWARE, core=PipelinedCore)
+    assert regs[2] == 0
+    assert regs[8] == 9
+    assert 0 < regs[4] < 9
+    assert regs[3] > regs[4]
+    assert regs[6] == 1
+    assert regs[10] == 0
+
+
+@pytest.mark.parametrize("options", [
+    dict(),
+    dict(predictor="gshare"),
+    dict(predictor="bimodal", icache="4x1x4", dcache="4x2x2"),
+])
+def test_pipeline_counters(options):
+    core = build_core(SORT, SORT_DATA, "pipeline", **options)
+    iss = ISS(SORT, SORT_DATA)
+    iss.run()
+    sim = Simulator(core)
+    sim.add_clock(1e-6)
+
+    def bench():
+        for _ in range(5000):
+            yield
+            if (yield core.halt):
+                break
+        counts = yield from core.perf.peek()
+        assert counts["retired"] == iss.retired
+        assert counts["overflow"] == 0
+        assert counts["load_use"] + counts["muldiv_wait"] == (yield core.stalls)
+        if core.predictor is not None:
+            assert counts["mispredict"] == (yield core.predictor.misses)
+        for name in ("icache", "dcache"):
+            cache = getattr(core, name)
+            assert counts[f"{name}_miss"] == (0 if cache is None else (yield cache.misses))
+
+    sim.add_sync_process(bench)
+    sim.run()
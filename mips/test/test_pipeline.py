@@ -0,0 +1,127 @@
+from amaranth.sim import Simulator
+from mips.cpu.pipeline import PipelinedCore
+from mips.model.iss import ISS
+import mips.util.encode as encode
+
+import pytest
+
+from typing import *
+
+from test_core import run
+from test_iss import PROGRAMS
+
+def counters(program: List[int], data: List[int] = (), cycles: int = 200, **kwargs):
+    """
+    Utility function that runs ``program`` on the pipelined core until
+    it halts and returns its ``cycles``, ``retired``, ``stalls``,
+    ``flushes`` and ``mem_stalls`` counters, and the ``hits`` and
+    ``misses`` of its predictor.
+
+    ``kwargs`` are passed on to ``PipelinedCore``.
+    """
+    core = PipelinedCore(program, data, **kwargs)
+    sim = Simulator(core)
+    sim.add_clock(1e-6)
+    res = {}
+
+    def bench():
+        for _ in range(cycles):
+            yield
+            if (yield core.halt):
+                break
+        assert (yield core.halt), f"core did not halt within {cycles} cycles"
+        for name in ("cycles", "retired", "stalls", "flushes", "mem_stalls"):
+            res[name] = yield getattr(core, name)
+        if core.predictor is not None:
+            res["hits"] = yield core.predictor.hits
+            res["misses"] = yield core.predictor.misses
+
+    sim.add_sync_process(bench)
+    sim.run()
+    return res
+
+
+@pytest.mark.parametrize("name", PROGRAMS.keys())
+def test_matches_iss(name: str):
+    program, data = PROGRAMS[name]
+    regs, mem = run(program, data=data, core=PipelinedCore)
+    iss = ISS(program, data)
+    iss.run()
+    assert iss.regs == regs
+    assert [iss.word(i) for i in range(len(mem))] == mem
+
+
+def test_control_flow():
+    regs, mem = run([
+        encode.JAL(3)[0],                           # 0: call 12
+        encode.ADDIU(rs=0, rt=2, imm=1)[0],         # 4: r2 = 1
+        encode.TRAP(0)[0],                          # 8
+        encode.LHI(rs=0, rt=3, imm=0x1234)[0],      # 12
+        encode.LLO(rs=0, rt=3, imm=0x5678)[0],      # 16
+        encode.SLL(rs=0, rt=3, shamt=4, rd=4)[0],   # 20
+        encode.BLEZ(rs=0, rt=0, imm=1)[0],          # 24: skip 28
+        encode.ADDIU(rs=0, rt=5, imm=1)[0],         # 28
+        encode.JR(rs=31, rt=0, rd=0)[0],            # 32: return to 4
+        encode.ADDIU(rs=0, rt=6, imm=1)[0],         # 36: never runs
+    ], core=PipelinedCore)
+    assert regs[31] == 4
+    assert regs[2] == 1
+    assert regs[3] == 0x1234_5678
+    assert regs[4] == 0x2345_6780
+    assert regs[5] == regs[6] == 0
+
+
+def test_forwarding():
+    regs, mem = run([
+        encode.ADDIU(rs=0, rt=1, imm=3)[0],
+        encode.ADDU(rs=1, rt=1, rd=2)[0],           # EX/MEM -> EX
+        encode.ADDU(rs=1, rt=2, rd=3)[0],           # both paths
+        encode.SW(rs=0, rt=3, imm=4)[0],            # store data forwarded
+        encode.LW(rs=0, rt=4, imm=4)[0],            # load after store
+        encode.TRAP(0)[0],
+    ], core=PipelinedCore)
+    assert regs[1:5] == [3, 6, 9, 9]
+    assert mem[1] == 9
+
+
+def test_overflow_is_not_forwarded():
+    regs, mem = run([
+        encode.LHI(rs=0, rt=1, imm=0x7fff)[0],
+        encode.LLO(rs=0, rt=1, imm=0xffff)[0],
+        encode.ADDIU(rs=0, rt=2, imm=7)[0],
+        encode.ADDI(rs=1, rt=2, imm=1)[0],
+        encode.ADDU(rs=2, rt=0, rd=3)[0],
+        encode.TRAP(0)[0],
+    ], core=PipelinedCore)
+    assert regs[2] == regs[3] == 7
+
+
+def test_load_use_stall():
+    program = [
+        encode.LW(rs=0, rt=1, imm=0)[0],
+        encode.ADDU(rs=1, rt=1, rd=2)[0],           # stalls a cycle
+        encode.LW(rs=0, rt=3, imm=0)[0],
+        encode.ADDIU(rs=0, rt=4, imm=1)[0],         # independent
+        encode.ADDU(rs=3, rt=4, rd=5)[0],           # forwarded from WB
+        encode.TRAP(0)[0],
+    ]
+    regs, mem = run(program, data=[21], core=PipelinedCore)
+    assert regs[2] == 42
+    assert regs[5] == 22
+    res = counters(program, data=[21])
+    assert res["retired"] == len(program)
+    assert res["stalls"] == 1
+    assert res["flushes"] == 1
+    # 4 cycles to fill the pipeline, then one per instruction plus the stall
+    assert res["cycles"] == len(program) + 4 + 1
+
+
+def test_ipc():
+    program, data = PROGRAMS["demo"]
+    res = counters(program, data)
+    iss = ISS(program, data)
+    assert res["retired"] == iss.run()
+    # every taken branch of the loop costs two bubbles
+    assert res["flushes"] == 9 + 1
+    assert res["stalls"] == 0
+    assert res["cycles"] == res["retired"] + 4 + 2 * 9
@@ -0,0 +1,79 @@
+from mips.cpu.isa import EnumEncoding, Funct, Opcode
+from mips.cpu.pipeline import PipelinedCore
+from mips.cpu.predecode import *
+from mips.model.iss import ISS
+from mips.sim.cache import cached_simulator
+from mips.sim.cosim import cosim, format_divergence
+from mips.sim.harness import run_vectors, first_mismatch
+from mips.util.generate import workload
+
+import functools
+import numpy as np
+import pytest
+
+from typing import *
+
+from test_core import run
+from test_iss import PROGRAMS
+
+PredecodedCore = functools.partial(PipelinedCore, predecode=True)
+
+
+def instructions() -> List[int]:
+    """
+    Utility function returning instructions of every opcode, and of every
+    funct of ``SPECIAL``, with random fields and both signs of immediates.
+    """
+    rng = np.random.default_rng(0)
+    words = []
+    for opcode in range(64):
+        fields = rng.integers(0, 1 << 26, 8, dtype=np.uint32)
+        fields[:4] &= 0x7fff
+        fields[4:] |= 0x8000
+        words += [opcode << 26 | int(field) for field in fields]
+    for funct in range(64):
+        fields = rng.integers(0, 1 << 20, 4, dtype=np.uint32)
+        words += [int(field) << 6 | funct for field in fields]
+    return words
+
+
+def test_layout():
+    row = predecode_word(0x2001_ffff)           # addi $1, $0, -1
+    assert row & 3 == EnumEncoding.Immediate.value
+    assert row >> 2 & 0xffff == 1 << ALU_OPS.index(Funct.ADD)
+    assert row >> 18 == 0xffff_ffff
+    assert predecode_word(Opcode.ORI.value << 26 | 0xffff) >> 18 == 0xffff
+    assert predecode_word(Opcode.J.value << 26 | 0xffff) == EnumEncoding.Jump.value
+    assert predecode_word(0x3f << 26) == EnumEncoding.Invalid.value
+
+
+def test_matches_predecoder():
+    words = instructions()
+    sim = cached_simulator(Predecoder)
+    stage = sim.dut
+    rows, = run_vectors(stage, [(stage.inst, words)], [stage.row.as_value()], sim=sim)
+    i = first_mismatch([predecode_program(words)], [rows])
+    assert i is None, f"{words[i]:08x}: expected {predecode_word(words[i]):x}, got {int(rows[i]):x}"
+
+
+@pytest.mark.parametrize("name", PROGRAMS.keys())
+def test_matches_iss(name: str):
+    program, data = PROGRAMS[name]
+    regs, mem = run(program, data=data, core=PredecodedCore)
+    iss = ISS(program, data)
+    iss.run()
+    assert iss.regs == regs
+    assert [iss.word(i) for i in range(len(mem))] == mem
+
+
+@pytest.mark.parametrize("mix", ["balanced", "hazard"])
+def test_workload_cosim(mix: str):
+    program, data = workload(150, mix, iterations=2, seed=5)
+    res = cosim(program, data, "pipeline", predictor="gshare", dcache="4x2x2", predecode=True)
+    assert res.ok, format_divergence(res.divergence)
+    assert res.halted
+
+
+def test_no_icache():
+    with pytest.raises(AssertionError, match="instruction cache"):
+        PipelinedCore(icache=object(), predecode=True)
@@ -0,0 +1,72 @@
+from mips.cpu.pipeline import PipelinedCore
+from mips.cpu.predictor import BranchPredictor, PREDICTORS
+from mips.model.iss import ISS
+import mips.util.encode as encode
+
+import pytest
+
+from typing import *
+
+from test_core import run
+from test_iss import PROGRAMS
+from test_pipeline import counters
+
+NESTED_LOOPS = [
+    encode.ADDIU(rs=0, rt=1, imm=4)[0],         # 0: i = 4
+    encode.ADDIU(rs=0, rt=2, imm=3)[0],         # 4: outer: j = 3
+    encode.ADDIU(rs=3, rt=3, imm=1)[0],         # 8: inner: count += 1
+    encode.ADDIU(rs=2, rt=2, imm=0xffff)[0],    # 12: j -= 1
+    encode.BGTZ(rs=2, rt=0, imm=0xfffd)[0],     # 16: if j > 0 goto inner
+    encode.JAL(8)[0],                           # 20: call 32
+    encode.ADDIU(rs=1, rt=1, imm=0xffff)[0],    # 24: i -= 1
+    encode.BNE(rs=1, rt=0, imm=0xfff9)[0],      # 28: if i != 0 goto outer
+    encode.BEQ(rs=1, rt=0, imm=2)[0],           # 32: if i == 0 goto 44
+    encode.ADDIU(rs=4, rt=4, imm=1)[0],         # 36: calls += 1
+    encode.JR(rs=31, rt=0, rd=0)[0],            # 40: return
+    encode.TRAP(0)[0],                          # 44
+]
+"Nested loops with a call, which retire 1 + 4 * (3 * 3 + 7) + 2 instructions"
+
+
+@pytest.mark.parametrize("kind", PREDICTORS)
+@pytest.mark.parametrize("name", ["demo", "nested"])
+def test_matches_iss(kind: str, name: str):
+    program, data = (NESTED_LOOPS, []) if name == "nested" else PROGRAMS[name]
+    regs, mem = run(program, data=data, core=lambda p, d: PipelinedCore(
+        p, d, predictor=BranchPredictor(kind)))
+    iss = ISS(program, data)
+    iss.run()
+    assert iss.regs == regs
+    assert [iss.word(i) for i in range(len(mem))] == mem
+
+
+@pytest.mark.parametrize("kind", PREDICTORS)
+def test_counts_every_control_instruction(kind: str):
+    res = counters(NESTED_LOOPS, predictor=BranchPredictor(kind))
+    assert res["retired"] == 1 + 4 * (3 * 3 + 7) + 2
+    # 3 inner and 1 outer branch, a call, a branch and a return per outer
+    # iteration, then the branch leading to the TRAP
+    assert res["hits"] + res["misses"] == 4 * (3 + 4) + 1
+
+
+def test_static_learns_jumps():
+    res = counters(NESTED_LOOPS, predictor=BranchPredictor("static"))
+    none = counters(NESTED_LOOPS)
+    assert res["cycles"] < none["cycles"]
+
+
+def test_bimodal_learns_loops():
+    program, data = PROGRAMS["demo"]
+    res = counters(program, data, predictor=BranchPredictor("bimodal"))
+    static = counters(program, data, predictor=BranchPredictor("static"))
+    # the first taken branch misses and trains the counter and the BTB,
+    # then only the exit of the loop misses
+    assert res["misses"] == 2
+    assert static["misses"] == 9
+    assert res["cycles"] == static["cycles"] - 2 * 7
+
+
+def test_gshare_learns_patterns():
+    res = counters(NESTED_LOOPS, predictor=BranchPredictor("gshare", entries=64, history=4))
+    bimodal = counters(NESTED_LOOPS, predictor=BranchPredictor("bimodal", entries=64))
+    assert res["misses"] <= bimodal["misses"] + 4
@@ -0,0 +1,96 @@
+from amaranth.sim import Simulator, Settle
+from mips.cpu.regfile import RegisterFile
+
+import pytest
+
+from typing import *
+
+CONFIGS = [
+    dict(memory=False),
+    dict(memory=True),
+    dict(read_ports=4, write_ports=2, memory=False),
+    dict(read_ports=4, write_ports=2, memory=True),
+]
+
+def run(regfile: RegisterFile, bench):
+    sim = Simulator(regfile)
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.run()
+
+
+def write(regfile: RegisterFile, port: int, addr: int, value: int):
+    yield regfile.waddr[port].eq(addr)
+    yield regfile.wdata[port].eq(value)
+    yield regfile.wen[port].eq(1)
+
+
+def read(regfile: RegisterFile, port: int, addr: int):
+    yield regfile.raddr[port].eq(addr)
+    yield Settle()
+    return (yield regfile.rdata[port])
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_write_then_read(config: dict):
+    regfile = RegisterFile(**config)
+
+    def bench():
+        for i in range(32):
+            yield from write(regfile, 0, i, 0x1000 + i)
+            yield
+        yield regfile.we.eq(0)
+        for i in range(32):
+            for port in range(regfile.read_ports):
+                value = yield from read(regfile, port, i)
+                assert value == (0x1000 + i if i else 0),\
+                    f"Expected r{i} to read {0x1000 + i if i else 0:08x} on port {port} but got {value:08x}"
+            assert (yield from regfile.peek(i)) == (0x1000 + i if i else 0)
+
+    run(regfile, bench)
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_write_is_synchronous(config: dict):
+    regfile = RegisterFile(**config)
+
+    def bench():
+        yield from write(regfile, 0, 3, 42)
+        assert (yield from read(regfile, 0, 3)) == 0
+        yield
+        yield regfile.we.eq(0)
+        assert (yield from read(regfile, 1, 3)) == 42
+
+    run(regfile, bench)
+
+
+@pytest.mark.parametrize("memory", [False, True])
+def test_bypass(memory: bool):
+    regfile = RegisterFile(memory=memory, bypass=True)
+
+    def bench():
+        yield from write(regfile, 0, 5, 99)
+        assert (yield from read(regfile, 0, 5)) == 99
+        yield from write(regfile, 0, 0, 99)
+        assert (yield from read(regfile, 0, 0)) == 0
+
+    run(regfile, bench)
+
+
+@pytest.mark.parametrize("memory", [False, True])
+def test_write_priority(memory: bool):
+    regfile = RegisterFile(read_ports=4, write_ports=2, memory=memory)
+
+    def bench():
+        yield from write(regfile, 0, 7, 1)
+        yield from write(regfile, 1, 7, 2)
+        yield
+        yield regfile.wen[1].eq(0)
+        yield from write(regfile, 0, 8, 3)
+        yield
+        yield regfile.wen[0].eq(0)
+        for port in range(4):
+            assert (yield from read(regfile, port, 7)) == 2
+            assert (yield from read(regfile, port, 8)) == 3
+
+    run(regfile, bench)
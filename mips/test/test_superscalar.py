@@ -0,0 +1,126 @@
+from amaranth.sim import Settle, Simulator
+from mips.bench.bench_predictor import SORT, SORT_DATA
+from mips.cli.sim import build_core, run as run_core
+from mips.cpu.pipeline import PipelinedCore
+from mips.cpu.superscalar import DualIssueCore
+from mips.model.iss import ISS
+import mips.util.encode as encode
+
+import pytest
+
+from typing import *
+
+from test_core import run
+from test_iss import PROGRAMS
+
+def paired(first: int, second: int) -> bool:
+    """
+    Utility function that returns whether the core issues ``first`` and
+    ``second`` together, i.e. retires them in the same cycle.
+    """
+    core = DualIssueCore([first, second, encode.TRAP(0)[0]])
+    sim = Simulator(core)
+    sim.add_clock(1e-6)
+    res = []
+
+    def bench():
+        for _ in range(10):
+            yield Settle()
+            if (yield core.retire):
+                break
+            yield
+        assert (yield core.retire) and (yield core.retire_pc) == 0
+        res.append((yield core.retire2))
+
+    sim.add_sync_process(bench)
+    sim.run()
+    return bool(res[0])
+
+
+@pytest.mark.parametrize("name", PROGRAMS.keys())
+def test_matches_iss(name: str):
+    program, data = PROGRAMS[name]
+    regs, mem = run(program, data=data, core=DualIssueCore)
+    iss = ISS(program, data)
+    iss.run()
+    assert iss.regs == regs
+    assert [iss.word(i) for i in range(len(mem))] == mem
+
+
+@pytest.mark.parametrize("first, second, expected", [
+    (encode.ADDIU(rs=0, rt=1, imm=1), encode.ADDIU(rs=0, rt=2, imm=2), True),
+    (encode.ADDIU(rs=0, rt=1, imm=1), encode.ADDU(rs=1, rt=0, rd=2), False),
+    (encode.ADDIU(rs=0, rt=1, imm=1), encode.SW(rs=0, rt=1, imm=0), False),
+    (encode.ADDIU(rs=0, rt=0, imm=1), encode.ADDU(rs=0, rt=0, rd=2), True),
+    (encode.ADDIU(rs=0, rt=1, imm=1), encode.ADDIU(rs=0, rt=1, imm=2), True),
+    (encode.LW(rs=0, rt=1, imm=0), encode.ADDIU(rs=0, rt=2, imm=2), True),
+    (encode.LW(rs=0, rt=1, imm=0), encode.SW(rs=0, rt=2, imm=4), False),
+    (encode.BEQ(rs=0, rt=0, imm=0), encode.ADDIU(rs=0, rt=2, imm=2), False),
+    (encode.J(4), encode.ADDIU(rs=0, rt=2, imm=2), False),
+    (encode.ADDIU(rs=0, rt=2, imm=2), encode.BEQ(rs=0, rt=0, imm=0), True),
+    (encode.MULT(rs=0, rt=0, rd=0), encode.ADDIU(rs=0, rt=2, imm=2), True),
+    (encode.ADDIU(rs=0, rt=2, imm=2), encode.MULT(rs=0, rt=0, rd=0), False),
+    (encode.ADDIU(rs=0, rt=2, imm=2), encode.MFLO(rs=0, rt=0, rd=3), False),
+])
+def test_pairing(first, second, expected):
+    assert paired(first[0], second[0]) == expected
+
+
+def test_pair_write_order():
+    regs, mem = run([
+        encode.ADDIU(rs=0, rt=1, imm=1)[0],
+        encode.ADDIU(rs=0, rt=1, imm=2)[0],         # same pair, wins
+        encode.LW(rs=0, rt=3, imm=0)[0],
+        encode.SW(rs=0, rt=1, imm=0)[0],            # second memory access
+        encode.ADDIU(rs=0, rt=4, imm=4)[0],
+        encode.SW(rs=0, rt=4, imm=4)[0],            # store from the second slot
+        encode.TRAP(0)[0],
+    ], data=[7], core=DualIssueCore)
+    assert regs[1] == 2
+    assert regs[3] == 7
+    assert mem[:2] == [2, 4]
+
+
+def test_ipc():
+    # the eight ADDIUs issue in pairs, and the pipeline fills and drains as
+    # that of ``PipelinedCore``
+    program = [encode.ADDIU(rs=0, rt=i, imm=i)[0] for i in range(1, 9)] + [encode.TRAP(0)[0]]
+    res = run_core(DualIssueCore(program))
+    pipeline = run_core(PipelinedCore(program))
+    assert res.halted
+    assert res.retired == len(program)
+    assert res.cycles == pipeline.cycles - 4
+    assert res.counters["dual_issue"] == 4
+    assert res.counters["retired"] == len(program)
+
+
+def test_load_use():
+    # the ADDU waits for the load in EX whether it is first or second
+    regs, mem = run([
+        encode.LW(rs=0, rt=1, imm=0)[0],
+        encode.ADDU(rs=1, rt=1, rd=2)[0],
+        encode.LW(rs=0, rt=3, imm=0)[0],
+        encode.ADDIU(rs=0, rt=4, imm=1)[0],
+        encode.ADDU(rs=3, rt=4, rd=5)[0],
+        encode.TRAP(0)[0],
+    ], data=[7], core=DualIssueCore)
+    assert regs[2] == 14
+    assert regs[5] == 8
+
+
+def test_faster_than_pipeline():
+    iss = ISS(SORT, SORT_DATA)
+    iss.run()
+    pipeline = run_core(build_core(SORT, SORT_DATA, "pipeline"), cycles=5000)
+    dual = run_core(build_core(SORT, SORT_DATA, "dual"), cycles=5000)
+    assert pipeline.halted and dual.halted
+    assert pipeline.retired == dual.retired == iss.retired
+    assert dual.counters["retired"] == iss.retired
+    assert dual.counters["dual_issue"] > 0
+    assert dual.ipc > pipeline.ipc
+
+
+@pytest.mark.parametrize("option", [dict(predictor="gshare"), dict(dcache="4x2x4"), dict(predecode=True)])
+def test_pipeline_options(option):
+    with pytest.raises(ValueError, match="the dual core has no branch predictor"):
+        build_core(SORT, SORT_DATA, "dual", **option)
@@ -0,0 +1,70 @@
+from mips.cli.synth import *
+from mips.util.flow import FlowError, have_tools
+import mips.cli.synth as synth_module
+
+from amaranth.back import rtlil
+
+import json
+import pytest
+
+from typing import *
+
+
+def report(lut: int, ff: int, fmax: Optional[float], family: str = "ecp5") -> Dict[str, Any]:
+    return {"family": family, "lut": lut, "ff": ff, "lutram": 0, "bram": 0, "dsp": 0,
+            "cells": {}, "fmax_mhz": fmax}
+
+
+@pytest.mark.parametrize("target", TARGETS)
+def test_targets_convert(target: str):
+    design, ports = TARGETS[target]()
+    assert "module \\top" in rtlil.convert(design, name="top", ports=ports)
+
+
+def test_compare():
+    changes = compare(report(100, 50, 80.0), report(110, 50, 60.0))
+    assert changes["lut"] == pytest.approx(0.10)
+    assert changes["ff"] == 0
+    assert changes["fmax_mhz"] == pytest.approx(0.25)
+    assert "fmax_mhz" not in compare(report(100, 50, None), report(100, 50, 60.0))
+    assert compare(report(100, 50, 80.0), report(90, 40, 100.0))["fmax_mhz"] < 0
+
+
+def test_history(tmp_path, monkeypatch):
+    results = iter([report(100, 50, 80.0), report(102, 50, 79.0), report(130, 50, 80.0)])
+    monkeypatch.setattr(synth_module, "synthesize", lambda *args, **kwargs: next(results))
+    history = tmp_path / "synth.jsonl"
+    out = tmp_path / "synth.json"
+
+    options = dict(build_dir=str(tmp_path / "build"), report=str(out), history=str(history),
+                   max_regression=0.05)
+    assert synth(["alu"], **options)
+    assert synth(["alu"], **options)
+    assert not synth(["alu"], **options)
+
+    entries = [json.loads(line) for line in history.read_text().splitlines()]
+    assert [entry["lut"] for entry in entries] == [100, 102, 130]
+    assert all(entry["target"] == "alu" for entry in entries)
+    assert last_entry(str(history), "alu", "ecp5")["lut"] == 130
+    assert last_entry(str(history), "alu", "ice40") is None
+    assert json.loads(out.read_text())["alu"]["lut"] == 130
+
+
+def test_unknown_target(tmp_path):
+    with pytest.raises(FlowError, match="target"):
+        synth(["gpu"], report=str(tmp_path / "synth.json"))
+
+
+def test_missing_tools(tmp_path, monkeypatch):
+    monkeypatch.setenv("PATH", "")
+    with pytest.raises(FlowError, match="yosys"):
+        synth(["alu"], build_dir=str(tmp_path), report=str(tmp_path / "synth.json"))
+
+
+@pytest.mark.skipif(not have_tools("ecp5"), reason="needs yosys and nextpnr-ecp5")
+def test_synth(tmp_path):
+    out = tmp_path / "synth.json"
+    assert synth(["alu", "decoder"], build_dir=str(tmp_path), report=str(out))
+    res = json.loads(out.read_text())
+    assert res["alu"]["lut"] > 0 and res["alu"]["fmax_mhz"] > 0
+    assert (tmp_path / "decoder" / "top.v").exists()
@@ -0,0 +1,153 @@
+from amaranth.sim import Simulator
+from mips.cli.sim import DEMO_PROGRAM, run
+from mips.cpu.core import Core
+from mips.sim.trace import *
+from mips.sim.verilator import have_verilator
+
+import gzip
+import importlib.util
+import pytest
+
+from typing import *
+
+
+def read_vcd(path: str) -> Tuple[Dict[str, str], Dict[int, Dict[str, int]]]:
+    """
+    Utility function that reads back a VCD written by ``TraceWriter`` and
+    returns the dotted name of every identifier, and the changes at every
+    timestamp by name.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        lines = f.read().splitlines()
+    names = {}
+    scope = []
+    changes = {}
+    time = None
+    for line in lines:
+        words = line.split()
+        if words[0] == "$scope":
+            scope.append(words[2])
+        elif words[0] == "$upscope":
+            scope.pop()
+        elif words[0] == "$var":
+            names[words[3]] = ".".join(scope[1:] + [words[4]])
+        elif line.startswith("#"):
+            time = int(line[1:])
+            changes[time] = {}
+        elif line.startswith("b"):
+            changes[time][names[words[1]]] = int(words[0][1:], 2)
+        elif line[0] in "01":
+            changes[time][names[line[1:]]] = int(line[0])
+    return names, changes
+
+
+def final(changes: Dict[int, Dict[str, int]]) -> Dict[str, int]:
+    values = {}
+    for time in sorted(changes):
+        values.update(changes[time])
+    return values
+
+
+def test_trigger_parse():
+    assert Trigger.parse("100") == Trigger(cycle=100)
+    assert Trigger.parse("cycle=0x10") == Trigger(cycle=16)
+    assert Trigger.parse("pc=0x40") == Trigger(pc=0x40)
+    with pytest.raises(ValueError):
+        Trigger.parse("inst=3")
+    assert Trigger(cycle=5).fires(5, None) and not Trigger(cycle=5).fires(4, 0)
+    assert Trigger(pc=8).fires(0, 8) and not Trigger(pc=8).fires(100, None)
+
+
+def test_signal_names():
+    names = signal_names(Core(DEMO_PROGRAM))
+    assert "pc" in names.values()
+    assert "regfile.r3" in names.values()
+    assert "perf.cycles_count" in names.values()
+
+
+def test_allowlist(tmp_path):
+    path = str(tmp_path / "trace.vcd.gz")
+    res = run(Core(DEMO_PROGRAM), vcd=path, signals=["regfile.r[12]", "halt"])
+    assert res.halted
+    names, changes = read_vcd(path)
+    assert sorted(names.values()) == ["halt", "regfile.r1", "regfile.r2"]
+    values = final(changes)
+    assert values == {"halt": 1, "regfile.r1": 0, "regfile.r2": 55}
+    # only changes are written
+    assert all(len(change) < 3 for time, change in changes.items() if time)
+
+
+def test_window(tmp_path):
+    path = str(tmp_path / "trace.vcd")
+    run(Core(DEMO_PROGRAM), vcd=path, signals=["pc"], start=Trigger(pc=0x10), stop=Trigger(cycle=20))
+    _, changes = read_vcd(path)
+    times = sorted(changes)
+    # the first instruction at 0x10 retires in cycle 4
+    assert times[0] == 4 and changes[4] == {"pc": 0x10}
+    assert times[-1] == 19
+
+
+def test_ring(tmp_path):
+    path = str(tmp_path / "trace.vcd")
+    res = run(Core(DEMO_PROGRAM), vcd=path, signals=["pc"], ring=4)
+    _, changes = read_vcd(path)
+    assert sorted(changes) == list(range(res.cycles - 4, res.cycles))
+
+
+def test_ring_written_on_crash(tmp_path):
+    core = Core(DEMO_PROGRAM)
+    sim = Simulator(core)
+    sim.add_clock(1e-6)
+    path = str(tmp_path / "crash.vcd")
+    writer = TraceWriter(sim._design, path, signals=["pc"], ring=3)
+
+    def bench():
+        for cycle in range(10):
+            writer.sample(cycle, (yield writer.value))
+            yield
+        raise RuntimeError("crashed")
+
+    sim.add_sync_process(bench)
+    with pytest.raises(RuntimeError):
+        with writer:
+            sim.run()
+    _, changes = read_vcd(path)
+    assert sorted(changes) == [7, 8, 9]
+    assert set(changes[7]) == {"pc"}
+
+
+def test_errors(tmp_path):
+    design = Core(DEMO_PROGRAM)
+    with pytest.raises(ValueError, match="no signal"):
+        TraceWriter(design, str(tmp_path / "t.vcd"), signals=["nothing*"])
+    with pytest.raises(ValueError, match="pc"):
+        TraceWriter(design, str(tmp_path / "t.vcd"), start=Trigger(pc=4))
+    with pytest.raises(ValueError, match="verilator"):
+        run(Core(DEMO_PROGRAM), vcd=str(tmp_path / "t.fst"), signals=["pc"])
+    with pytest.raises(ValueError, match="verilator"):
+        run(Core(DEMO_PROGRAM), vcd=str(tmp_path / "t.fst"))
+    assert not (tmp_path / "t.fst").exists()
+
+
+@pytest.mark.skipif(importlib.util.find_spec("zstandard") is not None, reason="zstandard is installed")
+def test_zstd_missing(tmp_path):
+    with pytest.raises(ImportError, match="zstandard"):
+        run(Core(DEMO_PROGRAM), vcd=str(tmp_path / "t.vcd.zst"))
+
+
+@pytest.mark.skipif(importlib.util.find_spec("zstandard") is None, reason="needs zstandard")
+def test_zstd(tmp_path):
+    import zstandard
+    path = tmp_path / "t.vcd.zst"
+    run(Core(DEMO_PROGRAM), vcd=str(path), signals=["regfile.r2"])
+    text = zstandard.ZstdDecompressor().stream_reader(open(path, "rb")).read().decode()
+    assert "b110111 " in text
+
+
+@pytest.mark.skipif(not have_verilator(), reason="needs yosys and verilator")
+def test_verilator_matches_python(tmp_path):
+    paths = [str(tmp_path / f"{backend}.vcd") for backend in ("python", "verilator")]
+    for path, backend in zip(paths, ("python", "verilator")):
+        run(Core(DEMO_PROGRAM), vcd=path, backend=backend, signals=["pc", "regfile.*"])
+    assert read_vcd(paths[0])[1] == read_vcd(paths[1])[1]
@@ -0,0 +1,85 @@
+from amaranth import Cat
+from mips.cli.sim import DEMO_PROGRAM, build_core, run
+from mips.bench.bench_predictor import SORT, SORT_DATA
+from mips.cpu.core import Core
+from mips.cpu.pipeline import PipelinedCore
+from mips.model.iss import ISS
+from mips.sim.cosim import format_divergence, lockstep
+from mips.sim.internals import assignment, concat_parts, memory_row
+from mips.sim.verilator import *
+from mips.util.flow import FlowError
+
+import pytest
+
+needs_verilator = pytest.mark.skipif(not have_verilator(), reason="needs yosys and verilator")
+
+
+def test_legal_name():
+    assert legal_name("pc") == "pc"
+    assert legal_name("regfile.r3") == "regfile__r3"
+    assert legal_name("muldiv$79.busy") == "muldiv_24_79__busy"
+    assert legal_name("$1") == "_24_1"
+    assert legal_name("0x") == "_0x"
+
+
+def test_names():
+    core = PipelinedCore(DEMO_PROGRAM)
+    design = VerilatedDesign(core)
+    assert design.names[core.retire_pc] == "retire_pc"
+    assert design.names[core.regfile.regs[3]] == "regfile__r3"
+    assert design.names[core.muldiv.busy].endswith("__busy")
+    assert design.memories[core.dmem._data] == "dmem_read"
+    assert design.memories[memory_row(core.imem.memory[0])[0]] == "imem__fetch"
+    assert "module \\top" in design.rtlil
+
+
+def test_testbench_commands():
+    core = Core(DEMO_PROGRAM)
+    memory, index = memory_row(core.dmem[3])
+    assert index == 3 and memory in VerilatedDesign(core).memories
+    assert memory_row(core.pc) is None
+    lhs, rhs = assignment(core.pc.eq(4))
+    assert lhs is core.pc and rhs.value == 4
+    assert assignment(core.pc) is None
+    parts = concat_parts(Cat(core.pc, core.halt))
+    assert parts[0] is core.pc and parts[1] is core.halt
+    assert concat_parts(core.pc) is None
+
+
+def test_missing_tools(monkeypatch):
+    monkeypatch.setenv("PATH", "")
+    assert not have_verilator()
+    with pytest.raises(FlowError, match="verilator"):
+        run(Core(DEMO_PROGRAM), backend="verilator")
+
+
+@needs_verilator
+@pytest.mark.parametrize("core", ["single", "pipeline", "dual"])
+def test_matches_python(tmp_path, core: str):
+    options = dict(predictor="gshare", dcache="4x2x4") if core == "pipeline" else {}
+    expected = run(build_core(SORT, SORT_DATA, core, **options), cycles=2000)
+    res = run(build_core(SORT, SORT_DATA, core, **options), cycles=2000, backend="verilator")
+    assert res.halted
+    assert (res.cycles, res.retired, res.hits, res.misses, res.caches) == \
+        (expected.cycles, expected.retired, expected.hits, expected.misses, expected.caches)
+
+
+@needs_verilator
+@pytest.mark.parametrize("core", [Core, PipelinedCore])
+def test_testbench_api(core):
+    dut = core(SORT, SORT_DATA)
+    res = lockstep(dut, ISS(SORT, SORT_DATA), sim=VerilatorSimulator(dut))
+    assert res.ok, format_divergence(res.divergence)
+    assert res.halted
+
+
+@needs_verilator
+@pytest.mark.parametrize("suffix, magic", [(".vcd", b"$"), (".fst", None)])
+def test_trace(tmp_path, suffix: str, magic):
+    path = tmp_path / f"trace{suffix}"
+    res = run(Core(DEMO_PROGRAM), vcd=str(path), backend="verilator")
+    assert res.halted
+    data = path.read_bytes()
+    assert len(data) > 0
+    if magic is not None:
+        assert data.startswith(magic)
@@ -0,0 +1,347 @@
+"""
+Two-pass assembler turning ``.s`` sources into program and data images
+
+The first pass splits every line into its label, mnemonic and operands,
+and gives each instruction and ``.word`` its address. The second pass
+encodes the instructions with every label known, so labels can be used
+before they are defined.
+
+Syntax::
+
+    # comment
+            .text                   # program memory, the default
+    loop:   lw      $t0, 0($a0)     # label, then instruction
+            addiu   $a0, $a0, 4
+            bne     $t0, $zero, loop
+            lhi     $t1, %hi(table)
+            llo     $t1, %lo(table)
+            trap
+            .data                   # data memory
+    table:  .word   1, 2, 0x3, -4, loop
+
+Registers are written ``$0`` to ``$31`` or with their ABI names. Values are
+integers in any Python base, labels, or ``%hi(x)``/``%lo(x)`` of either.
+Text labels are byte addresses in the program memory, data labels byte
+addresses in the data memory. Branch and jump targets are byte addresses.
+Operands follow the usual MIPS order, e.g. ``sllv $d, $t, $s``,
+``addi $t, $s, imm``, ``lw $t, off($s)``, ``jalr [$d,] $s``, ``mult $s, $t``
+and ``llo $t, imm``. ``nop`` is ``sll $0, $0, 0``.
+"""
+
+from mips.cpu.isa import *
+from mips.util.encode import FUNCT_OFF, OPCODE_OFF, RD_OFF, RS_OFF, RT_OFF, SHAMT_OFF
+
+from typing import *
+
+import re
+
+__all__ = [
+    "AsmError",
+    "Program",
+    "REGISTERS",
+    "assemble",
+    "assemble_file",
+]
+
+ABI_NAMES = [
+    "zero", "at", "v0", "v1", "a0", "a1", "a2", "a3",
+    "t0", "t1", "t2", "t3", "t4", "t5", "t6", "t7",
+    "s0", "s1", "s2", "s3", "s4", "s5", "s6", "s7",
+    "t8", "t9", "k0", "k1", "gp", "sp", "fp", "ra",
+]
+
+REGISTERS = {**{f"${i}": i for i in range(32)}, **{f"${n}": i for i, n in enumerate(ABI_NAMES)}}
+"Register number of every register name"
+
+_SPECIAL = Opcode.SPECIAL.value << OPCODE_OFF
+
+# Operand syntax of each mnemonic: ``d``/``s``/``t`` are the rd/rs/rt
+# registers, ``h`` the shift amount, ``i`` a 16-bit immediate, ``m`` an
+# ``offset($s)`` memory operand, ``b`` a branch target, ``a`` a jump target
+# and ``c`` an optional 26-bit code.
+SYNTAX = {
+    **{f.name.lower(): ("dst", _SPECIAL | f.value << FUNCT_OFF) for f in [
+        Funct.ADD, Funct.ADDU, Funct.SUB, Funct.SUBU, Funct.AND, Funct.OR,
+        Funct.XOR, Funct.NOR, Funct.SLT, Funct.SLTU,
+    ]},
+    **{f.name.lower(): ("dts", _SPECIAL | f.value << FUNCT_OFF) for f in [
+        Funct.SLLV, Funct.SRLV, Funct.SRAV,
+    ]},
+    **{f.name.lower(): ("dth", _SPECIAL | f.value << FUNCT_OFF) for f in [
+        Funct.SLL, Funct.SRL, Funct.SRA,
+    ]},
+    **{f.name.lower(): ("s", _SPECIAL | f.value << FUNCT_OFF) for f in [
+        Funct.JR, Funct.MTHI, Funct.MTLO,
+    ]},
+    **{f.name.lower(): ("d", _SPECIAL | f.value << FUNCT_OFF) for f in [
+        Funct.MFHI, Funct.MFLO,
+    ]},
+    **{f.name.lower(): ("st", _SPECIAL | f.value << FUNCT_OFF) for f in [
+        Funct.MULT, Funct.MULTU, Funct.DIV, Funct.DIVU,
+    ]},
+    "jalr": ("jalr", _SPECIAL | Funct.JALR.value << FUNCT_OFF),
+    **{o.name.lower(): ("tsi", o.value << OPCODE_OFF) for o in [
+        Opcode.ADDI, Opcode.ADDIU, Opcode.SLTI, Opcode.SLTIU, Opcode.ANDI,
+        Opcode.ORI, Opcode.XORI,
+    ]},
+    **{o.name.lower(): ("ti", o.value << OPCODE_OFF) for o in [
+        Opcode.LLO, Opcode.LHI,
+    ]},
+    **{o.name.lower(): ("tm", o.value << OPCODE_OFF) for o in [
+        Opcode.LB, Opcode.LBU, Opcode.LH, Opcode.LHU, Opcode.LW,
+        Opcode.SB, Opcode.SH, Opcode.SW,
+    ]},
+    **{o.name.lower(): ("stb", o.value << OPCODE_OFF) for o in [
+        Opcode.BEQ, Opcode.BNE,
+    ]},
+    **{o.name.lower(): ("sb", o.value << OPCODE_OFF) for o in [
+        Opcode.BLEZ, Opcode.BGTZ,
+    ]},
+    "j": ("a", Opcode.J.value << OPCODE_OFF),
+    "jal": ("a", Opcode.JAL.value << OPCODE_OFF),
+    "trap": ("c", Opcode.TRAP.value << OPCODE_OFF),
+    "nop": ("", 0),
+}
+"Operand syntax and fixed bits of every mnemonic"
+
+_LABEL = re.compile(r"[A-Za-z_.][\w.$]*$")
+
+
+class AsmError(Exception):
+    "Raised with the line number of the first error of a source"
+
+
+class Program(NamedTuple):
+    """
+    Assembled program
+
+    Attributes:
+        text: words of the program memory
+        data: words of the data memory
+        symbols: byte address of every label
+    """
+    text: List[int]
+    data: List[int]
+    symbols: Dict[str, int]
+
+
+def assemble(source: str) -> Program:
+    """
+    Assemble ``source``, raising ``AsmError`` on the first error.
+
+    Arguments:
+        source (str):   assembly text
+    """
+    symbols = {}
+    sections = {"text": [], "data": []}
+    # (lineno, address, ``_MNEMONICS`` entry, operand text) of each
+    # instruction, the operands are only split in the second pass
+    pending = []
+    # (lineno, section, index, expression) of each .word given a label
+    refs = []
+    section = "text"
+    words = sections["text"]
+
+    for lineno, line in enumerate(source.splitlines(), 1):
+        if "#" in line:
+            line = line.split("#", 1)[0]
+        while ":" in line:
+            label, rest = line.split(":", 1)
+            label = label.strip()
+            if not _LABEL.match(label):
+                break
+            if label in symbols:
+                raise AsmError(f"line {lineno}: label {label!r} already defined")
+            symbols[label] = 4 * len(words)
+            line = rest
+        parts = line.split(None, 1)
+        if not parts:
+            continue
+        mnemonic = parts[0].lower()
+        operands = parts[1] if len(parts) > 1 else ""
+
+        if mnemonic[0] == ".":
+            operands = _split(operands)
+            if mnemonic in (".text", ".data"):
+                section = mnemonic[1:]
+                words = sections[section]
+            elif mnemonic == ".word":
+                if not operands or not all(operands):
+                    raise AsmError(f"line {lineno}: .word needs values")
+                for operand in operands:
+                    try:
+                        words.append(int(operand, 0) & 0xffff_ffff)
+                    except ValueError:
+                        refs.append((lineno, section, len(words), operand))
+                        words.append(0)
+            else:
+                raise AsmError(f"line {lineno}: unknown directive {mnemonic}")
+            continue
+
+        entry = _MNEMONICS.get(mnemonic)
+        if entry is None:
+            raise AsmError(f"line {lineno}: unknown instruction {mnemonic!r}")
+        if section != "text":
+            raise AsmError(f"line {lineno}: instruction in the .data section")
+        pending.append((lineno, 4 * len(words), entry, operands))
+        words.append(0)
+
+    text = sections["text"]
+    lineno = 0
+    try:
+        for lineno, section, index, operand in refs:
+            sections[section][index] = _value(operand, symbols) & 0xffff_ffff
+        for lineno, addr, (encode, counts, bits), operands in pending:
+            operands = _split(operands)
+            if len(operands) not in counts:
+                raise AsmError(f"expected {' or '.join(map(str, counts))} operands, "
+                               f"got {len(operands)}")
+            text[addr >> 2] = encode(bits, operands, addr, symbols)
+    except KeyError as e:
+        raise AsmError(f"line {lineno}: bad register {e.args[0]!r}") from None
+    except AsmError as e:
+        raise AsmError(f"line {lineno}: {e}") from None
+
+    return Program(text, sections["data"], symbols)
+
+
+def assemble_file(path: str) -> Program:
+    """
+    Assemble the source file at ``path``.
+
+    Arguments:
+        path (str): file holding the source
+    """
+    with open(path) as f:
+        return assemble(f.read())
+
+
+def _split(operands: str) -> List[str]:
+    return "".join(operands.split()).split(",") if operands else []
+
+
+def _value(operand: str, symbols: Dict[str, int]) -> int:
+    value = symbols.get(operand)
+    if value is not None:
+        return value
+    try:
+        return int(operand, 0)
+    except ValueError:
+        pass
+    if operand[:4] in ("%hi(", "%lo(") and operand[-1] == ")":
+        value = _value(operand[4:-1], symbols)
+        return (value >> 16) & 0xffff if operand[1] == "h" else value & 0xffff
+    raise AsmError(f"unknown symbol {operand!r}")
+
+
+def _immediate(operand: str, symbols: Dict[str, int]) -> int:
+    value = _value(operand, symbols)
+    if not -0x8000 <= value <= 0xffff:
+        raise AsmError(f"immediate {operand!r} does not fit 16 bits")
+    return value & 0xffff
+
+
+# Encoders of each operand syntax, called as ``(bits, operands, address,
+# symbols)``. Registers are looked up in ``REGISTERS`` directly, a
+# ``KeyError`` is a bad register name.
+
+R = REGISTERS
+
+def _dst(bits, ops, addr, symbols):
+    return bits | R[ops[0]] << RD_OFF | R[ops[1]] << RS_OFF | R[ops[2]] << RT_OFF
+
+
+def _dts(bits, ops, addr, symbols):
+    return bits | R[ops[0]] << RD_OFF | R[ops[1]] << RT_OFF | R[ops[2]] << RS_OFF
+
+
+def _dth(bits, ops, addr, symbols):
+    shamt = _value(ops[2], symbols)
+    if not 0 <= shamt < 32:
+        raise AsmError(f"shift amount {ops[2]!r} out of range")
+    return bits | R[ops[0]] << RD_OFF | R[ops[1]] << RT_OFF | shamt << SHAMT_OFF
+
+
+def _s(bits, ops, addr, symbols):
+    return bits | R[ops[0]] << RS_OFF
+
+
+def _d(bits, ops, addr, symbols):
+    return bits | R[ops[0]] << RD_OFF
+
+
+def _st(bits, ops, addr, symbols):
+    return bits | R[ops[0]] << RS_OFF | R[ops[1]] << RT_OFF
+
+
+def _jalr(bits, ops, addr, symbols):
+    rd = R[ops[0]] if len(ops) == 2 else 31
+    return bits | rd << RD_OFF | R[ops[-1]] << RS_OFF
+
+
+def _tsi(bits, ops, addr, symbols):
+    return bits | R[ops[0]] << RT_OFF | R[ops[1]] << RS_OFF | _immediate(ops[2], symbols)
+
+
+def _ti(bits, ops, addr, symbols):
+    return bits | R[ops[0]] << RT_OFF | _immediate(ops[1], symbols)
+
+
+def _tm(bits, ops, addr, symbols):
+    operand = ops[1]
+    if operand[-1:] != ")" or "(" not in operand:
+        raise AsmError(f"expected offset($reg), got {operand!r}")
+    offset, base = operand[:-1].rsplit("(", 1)
+    imm = _immediate(offset, symbols) if offset else 0
+    return bits | R[ops[0]] << RT_OFF | R[base] << RS_OFF | imm
+
+
+def _branch(bits, ops, addr, symbols):
+    target = _value(ops[-1], symbols)
+    # addresses wrap around at 4 GiB
+    offset = ((((target - addr - 4) & 0xffff_ffff) ^ 0x8000_0000) - 0x8000_0000) >> 2
+    if target & 3 or not -0x8000 <= offset < 0x8000:
+        raise AsmError(f"branch target {ops[-1]!r} out of reach")
+    rt = R[ops[1]] if len(ops) == 3 else 0
+    return bits | R[ops[0]] << RS_OFF | rt << RT_OFF | (offset & 0xffff)
+
+
+def _a(bits, ops, addr, symbols):
+    target = _value(ops[0], symbols)
+    if target & 3 or (target ^ (addr + 4)) & 0xf000_0000:
+        raise AsmError(f"jump target {ops[0]!r} out of reach")
+    return bits | (target >> 2) & 0x3ff_ffff
+
+
+def _c(bits, ops, addr, symbols):
+    code = _value(ops[0], symbols) if ops else 0
+    if not 0 <= code < 1 << 26:
+        raise AsmError(f"trap code {ops[0]!r} does not fit 26 bits")
+    return bits | code
+
+
+def _none(bits, ops, addr, symbols):
+    return bits
+
+
+_ENCODERS = {
+    "dst": (_dst, (3,)),
+    "dts": (_dts, (3,)),
+    "dth": (_dth, (3,)),
+    "s": (_s, (1,)),
+    "d": (_d, (1,)),
+    "st": (_st, (2,)),
+    "jalr": (_jalr, (1, 2)),
+    "tsi": (_tsi, (3,)),
+    "ti": (_ti, (2,)),
+    "tm": (_tm, (2,)),
+    "stb": (_branch, (3,)),
+    "sb": (_branch, (2,)),
+    "a": (_a, (1,)),
+    "c": (_c, (0, 1)),
+    "": (_none, (0,)),
+}
+"Encoder and accepted operand counts of each syntax"
+
+_MNEMONICS = {mnemonic: (*_ENCODERS[syntax], bits) for mnemonic, (syntax, bits) in SYNTAX.items()}
+"Encoder, accepted operand counts and fixed bits of every mnemonic"
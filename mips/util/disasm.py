@@ -0,0 +1,188 @@
+"""
+Table-driven disassembler, the inverse of ``mips.util.encode``
+
+Whole images or traces are decoded at once: the fields of every word are
+extracted with NumPy, and the mnemonic comes from lookup tables indexed by
+opcode and funct that are built from ``Funct``, ``IMM_OPCODE`` and
+``JMP_OPCODE``. Text is then rendered one mnemonic at a time, with the
+operand syntax of ``mips.util.asm``, so a listing assembles back to the
+same words. Words that are not a valid encoding, including valid opcodes
+with stray bits in fields they do not use, are listed as ``.word``.
+"""
+
+import numpy as np
+
+from mips.cpu.isa import *
+from mips.util.asm import SYNTAX
+
+from typing import *
+
+__all__ = [
+    "MNEMONICS",
+    "Decoded",
+    "decode",
+    "disassemble",
+    "histogram",
+]
+
+RS = 0x1f << 21
+RT = 0x1f << 16
+RD = 0x1f << 11
+SHAMT = 0x1f << 6
+IMM = 0xffff
+ADDR = 0x3ff_ffff
+
+_OPERAND_BITS = {
+    "dst": RS | RT | RD, "dts": RS | RT | RD, "dth": RT | RD | SHAMT,
+    "s": RS, "d": RD, "st": RS | RT, "jalr": RS | RD,
+    "tsi": RS | RT | IMM, "ti": RT | IMM, "tm": RS | RT | IMM,
+    "stb": RS | RT | IMM, "sb": RS | IMM, "a": ADDR, "c": ADDR, "": 0,
+}
+"Bits of the operand fields used by each syntax of ``SYNTAX``"
+
+_TEMPLATES = {
+    "dst": "{m} ${d}, ${s}, ${t}",
+    "dts": "{m} ${d}, ${t}, ${s}",
+    "dth": "{m} ${d}, ${t}, {h}",
+    "s": "{m} ${s}",
+    "d": "{m} ${d}",
+    "st": "{m} ${s}, ${t}",
+    "jalr": "{m} ${d}, ${s}",
+    "tsi": "{m} ${t}, ${s}, {i}",
+    "ti": "{m} ${t}, {u:#x}",
+    "tm": "{m} ${t}, {i}(${s})",
+    "stb": "{m} ${s}, ${t}, {target:#x}",
+    "sb": "{m} ${s}, {target:#x}",
+    "a": "{m} {target:#x}",
+    "c": "{m} {a}",
+    "": "{m}",
+}
+"Listing of each syntax"
+
+ZERO_EXTEND = ["andi", "ori", "xori"]
+"Immediate mnemonics listed in hexadecimal rather than signed decimal"
+
+MNEMONICS = [".word", "nop"]
+"Mnemonic of each index returned by ``decode``, ``.word`` is not an instruction"
+
+_FUNCT_TABLE = np.zeros(64, dtype=np.int16)
+_OPCODE_TABLE = np.zeros(64, dtype=np.int16)
+for _funct in Funct:
+    _FUNCT_TABLE[_funct.value] = len(MNEMONICS)
+    MNEMONICS.append(_funct.name.lower())
+for _opcode in IMM_OPCODE + JMP_OPCODE:
+    _OPCODE_TABLE[_opcode.value] = len(MNEMONICS)
+    MNEMONICS.append(_opcode.name.lower())
+
+_SYNTAXES = [None, ""] + [SYNTAX[m][0] for m in MNEMONICS[2:]]
+
+_MASKS = np.array(
+    [0xffff_ffff, 0xffff_ffff] + [
+        (0xfc00_003f if syntax in ("dst", "dts", "dth", "s", "d", "st", "jalr") else 0xfc00_0000)
+        | _OPERAND_BITS[syntax] for syntax in _SYNTAXES[2:]
+    ],
+    dtype=np.uint32,
+)
+"Bits each mnemonic may have set"
+
+# Each listing is compiled into an f-string, which formats much faster
+# than ``str.format`` with keyword arguments.
+_FORMATTERS = [
+    eval(f"lambda w, s, t, d, h, i, u, a, target: f{template!r}")
+    for template in [".word {w:#010x}", "nop"] + [
+        _TEMPLATES[syntax].replace("{m}", m).replace("{i}", "{u:#x}" if m in ZERO_EXTEND else "{i}")
+        for m, syntax in zip(MNEMONICS[2:], _SYNTAXES[2:])
+    ]
+]
+
+
+class Decoded(NamedTuple):
+    """
+    Fields of every decoded word, as arrays
+
+    Attributes:
+        mnemonic: index of the mnemonic in ``MNEMONICS``
+        opcode, rs, rt, rd, shamt, funct, imm, addr: instruction fields
+    """
+    mnemonic: np.ndarray
+    opcode: np.ndarray
+    rs: np.ndarray
+    rt: np.ndarray
+    rd: np.ndarray
+    shamt: np.ndarray
+    funct: np.ndarray
+    imm: np.ndarray
+    addr: np.ndarray
+
+
+def decode(words) -> Decoded:
+    """
+    Split every word into its fields and find its mnemonic.
+
+    Arguments:
+        words (array[uint32]): instruction words
+    """
+    words = np.asarray(words, dtype=np.uint32)
+    opcode = words >> 26
+    funct = words & np.uint32(0x3f)
+    mnemonic = np.where(opcode == 0, _FUNCT_TABLE[funct], _OPCODE_TABLE[opcode])
+    mnemonic[(words & ~_MASKS[mnemonic]) != 0] = 0
+    mnemonic[words == 0] = 1
+    return Decoded(
+        mnemonic,
+        opcode,
+        (words >> 21) & np.uint32(0x1f),
+        (words >> 16) & np.uint32(0x1f),
+        (words >> 11) & np.uint32(0x1f),
+        (words >> 6) & np.uint32(0x1f),
+        funct,
+        words & np.uint32(IMM),
+        words & np.uint32(ADDR),
+    )
+
+
+def disassemble(words, base: int = 0) -> List[str]:
+    """
+    List every word as assembly, the first one being at address ``base``.
+    Branch and jump targets are absolute addresses.
+
+    Arguments:
+        words (array[uint32]): instruction words
+        base (int):            address of the first word
+    """
+    words = np.asarray(words, dtype=np.uint32)
+    fields = decode(words)
+    pc = np.uint32(base) + np.arange(len(words), dtype=np.uint32) * np.uint32(4)
+    simm = fields.imm.astype(np.int32) - ((fields.imm.astype(np.int32) & 0x8000) << 1)
+
+    lines = np.empty(len(words), dtype=object)
+    for index in np.unique(fields.mnemonic):
+        where = np.nonzero(fields.mnemonic == index)[0]
+        formatter = _FORMATTERS[index]
+        syntax = _SYNTAXES[index]
+        if syntax in ("stb", "sb"):
+            target = (pc[where] + np.uint32(4) + (simm[where] << 2).astype(np.uint32)).tolist()
+        elif syntax == "a":
+            target = (((pc[where] + np.uint32(4)) & np.uint32(0xf000_0000))
+                      | (fields.addr[where] << np.uint32(2))).tolist()
+        else:
+            target = [0] * len(where)
+        lines[where] = list(map(
+            formatter,
+            words[where].tolist(), fields.rs[where].tolist(), fields.rt[where].tolist(),
+            fields.rd[where].tolist(), fields.shamt[where].tolist(), simm[where].tolist(),
+            fields.imm[where].tolist(), fields.addr[where].tolist(), target,
+        ))
+    return lines.tolist()
+
+
+def histogram(words) -> Dict[str, int]:
+    """
+    Number of occurrences of each mnemonic among ``words``, e.g. the
+    instruction mix of a trace.
+
+    Arguments:
+        words (array[uint32]): instruction words
+    """
+    counts = np.bincount(decode(words).mnemonic, minlength=len(MNEMONICS))
+    return {MNEMONICS[i]: int(n) for i, n in enumerate(counts) if n}
@@ -1,5 +1,16 @@
 """
 Utility functions to encode commands into values
+
+The per instruction encoders (``ADD``, ``LW``, ...) check their arguments
+and return a tuple of the word and its fields, which is convenient but
+slow. Each of them also has a fast path taking the same arguments, that
+neither checks them nor builds a tuple:
+
+* ``ADDIU.word(rs, rt, imm)`` returns the word;
+* ``ADDIU.into(buf, index, rs, rt, imm)`` stores it as ``buf[index]``,
+  see ``word_view`` for the buffers that can be used.
+
+``encode_many`` encodes whole arrays of fields at once with NumPy.
 """
 
 from amaranth import *
@@ -8,6 +19,8 @@ from typing import *
 
 from collections import namedtuple
 
+import numpy as np
+
 OPCODE_OFF = 26
 
 FUNCT_OFF = 0
@@ -69,6 +82,16 @@ def _register(funct: Funct):
             )
             return parts
 
+    base = Opcode.SPECIAL.value << OPCODE_OFF | funct.value
+
+    def word(rs: int, rd: int, rt: int) -> int:
+        return base | rs << RS_OFF | rt << RT_OFF | rd << RD_OFF
+
+    def into(buf, index: int, rs: int, rd: int, rt: int):
+        buf[index] = base | rs << RS_OFF | rt << RT_OFF | rd << RD_OFF
+
+    func.word = word
+    func.into = into
     return func
 
 def _shift(funct: Funct):
@@ -78,16 +101,17 @@ def _shift(funct: Funct):
     Arguments:
         funct (Funct):  Funct value
     """
-    def func(rs: int, rt: int, shamt: int):
+    def func(rs: int, rt: int, shamt: int, rd: int = 0):
             assert 0 <= rs < 32
             assert 0 <= rt <= 32
+            assert 0 <= rd <= 32
             # TODO: assert bounds coherently on shamt?
 
             code: int = (
                 Opcode.SPECIAL.value << OPCODE_OFF
                 | rs << RS_OFF
                 | rt << RT_OFF
-                | 0 << RD_OFF
+                | rd << RD_OFF
                 | shamt << SHAMT_OFF
                 | funct.value
             )
@@ -96,7 +120,7 @@ def _shift(funct: Funct):
                 Opcode.SPECIAL, # opcode
                 rs,             # rs
                 rt,             # rt
-                0,             # rd
+                rd,             # rd
                 shamt,          # shamt
                 funct,          # funct
                 0,      # imm,
@@ -104,6 +128,16 @@ def _shift(funct: Funct):
             )
             return parts
 
+    base = Opcode.SPECIAL.value << OPCODE_OFF | funct.value
+
+    def word(rs: int, rt: int, shamt: int, rd: int = 0) -> int:
+        return base | rs << RS_OFF | rt << RT_OFF | rd << RD_OFF | shamt << SHAMT_OFF
+
+    def into(buf, index: int, rs: int, rt: int, shamt: int, rd: int = 0):
+        buf[index] = base | rs << RS_OFF | rt << RT_OFF | rd << RD_OFF | shamt << SHAMT_OFF
+
+    func.word = word
+    func.into = into
     return func
 
 def _immediate(opcode: Opcode):
@@ -130,6 +164,17 @@ def _immediate(opcode: Opcode):
             0,      # addr
         )
         return parts
+
+    base = opcode.value << OPCODE_OFF
+
+    def word(rs: int, rt: int, imm: int) -> int:
+        return base | rs << RS_OFF | rt << RT_OFF | (imm & 0xffff)
+
+    def into(buf, index: int, rs: int, rt: int, imm: int):
+        buf[index] = base | rs << RS_OFF | rt << RT_OFF | (imm & 0xffff)
+
+    func.word = word
+    func.into = into
     return func
 
 
@@ -149,6 +194,17 @@ def _jump(op: Opcode):
             addr,      # addr
         )
         return parts
+
+    base = op.value << OPCODE_OFF
+
+    def word(addr: int) -> int:
+        return base | addr
+
+    def into(buf, index: int, addr: int):
+        buf[index] = base | addr
+
+    func.word = word
+    func.into = into
     return func
 
 ADD = _register(Funct.ADD)
@@ -217,7 +273,7 @@ LLO = _immediate(Opcode.LLO)
 
 LHI = _immediate(Opcode.LHI)
 
-# TODO: TRAP
+TRAP = _jump(Opcode.TRAP)
 
 LB = _immediate(Opcode.LB)
 
@@ -225,7 +281,7 @@ LW = _immediate(Opcode.LW)
 
 LBU = _immediate(Opcode.LBU)
 
-LH = _immediate(Opcode.LHU)
+LH = _immediate(Opcode.LH)
 
 LHU = _immediate(Opcode.LHU)
 
@@ -241,4 +297,85 @@ MFLO = _register(Funct.MFLO)
 
 MTHI = _register(Funct.MTHI)
 
-MTLO = _register(Funct.MTLO)
\ No newline at end of file
+MTLO = _register(Funct.MTLO)
+
+MULT = _register(Funct.MULT)
+
+MULTU = _register(Funct.MULTU)
+
+DIV = _register(Funct.DIV)
+
+DIVU = _register(Funct.DIVU)
+
+
+# Fast path
+
+_BASE = {
+    **{funct: Opcode.SPECIAL.value << OPCODE_OFF | funct.value for funct in Funct},
+    **{opcode: opcode.value << OPCODE_OFF for opcode in Opcode if opcode != Opcode.SPECIAL},
+}
+"Fixed bits of every funct and opcode"
+
+
+def word_view(buf):
+    """
+    View of ``buf`` that ``into`` and ``encode_many`` can store words to:
+    a ``bytearray`` is cast to native endian words, an ``array('I')`` or a
+    ``uint32`` NumPy array is returned as is.
+    """
+    if isinstance(buf, (bytearray, memoryview)):
+        return memoryview(buf).cast("I")
+    return buf
+
+
+_LIMITS = [("rs", 32), ("rt", 32), ("rd", 32), ("shamt", 32), ("addr", 1 << 26)]
+
+
+def encode_many(op: Union[Funct, Opcode], rs=0, rt=0, rd=0, shamt=0, imm=0, addr=0, *,
+                out=None, offset: int = 0) -> np.ndarray:
+    """
+    Encode one instruction for every set of fields at once. A ``Funct``
+    gives register encoded instructions and an ``Opcode`` immediate or jump
+    ones, and fields that the encoding does not use must be left at 0.
+    The fields are arrays (or scalars) broadcast against each other, and
+    are checked as a whole: ``ValueError`` is raised if any of them is out
+    of range.
+
+    With ``out``, an ``array('I')``, ``uint32`` NumPy array or
+    ``bytearray``, the words are written to it from word ``offset`` on and
+    a view of them is returned, otherwise a new ``uint32`` array is.
+
+    Arguments:
+        op (Funct | Opcode):    instruction
+        rs, rt, rd, shamt (array[int]): register and shift fields
+        imm (array[int]):       16-bit immediates, signed or not
+        addr (array[int]):      26-bit jump addresses
+        out:                    buffer to write the words to, or ``None``
+        offset (int):           index of the first word written to ``out``
+    """
+    fields = dict(rs=rs, rt=rt, rd=rd, shamt=shamt, imm=imm, addr=addr)
+    arrays = np.broadcast_arrays(*(np.asarray(v, dtype=np.int64) for v in fields.values()))
+    fields = dict(zip(fields, arrays))
+    for name, limit in _LIMITS:
+        a = fields[name]
+        if a.size and (a.min() < 0 or a.max() >= limit):
+            raise ValueError(f"{name} out of range for {op.name}")
+    imm = fields["imm"]
+    if imm.size and (imm.min() < -0x8000 or imm.max() > 0xffff):
+        raise ValueError(f"imm out of range for {op.name}")
+
+    words = (
+        np.int64(_BASE[op])
+        | fields["rs"] << RS_OFF
+        | fields["rt"] << RT_OFF
+        | fields["rd"] << RD_OFF
+        | fields["shamt"] << SHAMT_OFF
+        | (imm & 0xffff)
+        | fields["addr"]
+    ).astype(np.uint32).ravel()
+
+    if out is None:
+        return words
+    view = out if isinstance(out, np.ndarray) else np.frombuffer(out, dtype=np.uint32)
+    view[offset:offset + len(words)] = words
+    return view[offset:offset + len(words)]
@@ -0,0 +1,195 @@
+"""
+Utility functions to run designs through the open source FPGA flow:
+Yosys for synthesis and nextpnr for place and route.
+"""
+
+from amaranth import *
+from amaranth.back import rtlil
+
+from pathlib import Path
+from typing import *
+
+import json
+import re
+import shutil
+import subprocess
+import tempfile
+
+FAMILIES = {
+    "ice40": {
+        "synth": "synth_ice40",
+        "nextpnr": "nextpnr-ice40",
+        "device": ["--hx8k", "--package", "ct256"],
+        "unconstrained": "--pcf-allow-unconstrained",
+        "out_of_context": [],
+        "constraints": "--pcf",
+        "placed": ("--asc", "asc"),
+        "bram": "icebram",
+        "pack": "icepack",
+        "bitstream": "bin",
+        "programmer": "iceprog",
+    },
+    "ecp5": {
+        "synth": "synth_ecp5",
+        "nextpnr": "nextpnr-ecp5",
+        "device": ["--25k", "--package", "CABGA381"],
+        "unconstrained": "--lpf-allow-unconstrained",
+        "out_of_context": ["--out-of-context"],
+        "constraints": "--lpf",
+        "placed": ("--textcfg", "config"),
+        "bram": "ecpbram",
+        "pack": "ecppack",
+        "bitstream": "bit",
+        "programmer": "openFPGALoader",
+    },
+}
+"""
+Supported FPGA families, the device each one is placed on, and the tools
+turning the placed design into a bitstream and programming the board.
+``out_of_context`` are the nextpnr options placing a design whose ports
+are not pins, where the family has them: on iCE40 every port of a design
+that is measured takes one of the 206 pins of the device.
+"""
+
+CELL_KINDS = {
+    "lut": re.compile(r"^(SB_LUT4|LUT\d|TRELLIS_COMB)$"),
+    "ff": re.compile(r"^(SB_DFF\w*|TRELLIS_FF|FD\w*)$"),
+    "lutram": re.compile(r"^(TRELLIS_DPR16X4|RAM\d+X\d+\w*)$"),
+    "bram": re.compile(r"^(SB_RAM40_4K\w*|SB_SPRAM256KA|DP16KD|PDPW16KD|RAMB\w+)$"),
+    "dsp": re.compile(r"^(SB_MAC16|MULT18X18D|ALU54B|DSP48\w*)$"),
+}
+"Technology cells counted by each resource kind"
+
+
+class FlowError(Exception):
+    "Raised when a tool of the flow is missing or fails"
+
+
+def have_tools(family: str = "ice40", *, pnr: bool = True) -> bool:
+    """
+    Whether the tools needed to run ``family`` are on the ``PATH``.
+    """
+    tools = ["yosys"] + ([FAMILIES[family]["nextpnr"]] if pnr else [])
+    return all(shutil.which(tool) for tool in tools)
+
+
+class Registered(Elaboratable):
+    """
+    Wrapper putting a flip-flop on every input and output of a design,
+    so that timing analysis sees register to register paths through
+    combinatorial designs.
+
+    Arguments:
+        design (Elaboratable):  wrapped design
+        inputs (list[Signal]):  inputs of ``design``
+        outputs (list[Signal]): outputs of ``design``
+    """
+    def __init__(self, design, inputs, outputs):
+        self.design = design
+        # enum and layout views are registered as their underlying signal
+        inputs = [Value.cast(s) for s in inputs]
+        outputs = [Value.cast(s) for s in outputs]
+        self.inputs = [(Signal.like(s, name=f"in_{s.name}"), s) for s in inputs]
+        self.outputs = [(Signal.like(s, name=f"out_{s.name}"), s) for s in outputs]
+
+    def ports(self):
+        return [outer for outer, _ in self.inputs + self.outputs]
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.design = self.design
+        for outer, inner in self.inputs:
+            m.d.sync += inner.eq(outer)
+        for outer, inner in self.outputs:
+            m.d.sync += outer.eq(inner)
+        return m
+
+
+def count_cells(cells: Dict[str, int]) -> Dict[str, int]:
+    """
+    Sum the technology cells of a Yosys ``stat -json`` report into
+    LUT, FF, LUTRAM, BRAM and DSP counts.
+    """
+    counts = {kind: 0 for kind in CELL_KINDS}
+    for cell, count in cells.items():
+        for kind, pattern in CELL_KINDS.items():
+            if pattern.match(cell):
+                counts[kind] += count
+                break
+    return counts
+
+
+def parse_fmax(report: dict) -> Optional[float]:
+    """
+    Lowest achieved frequency (MHz) over the clocks of a nextpnr
+    ``--report`` JSON, or ``None`` if there is no clocked path.
+    """
+    achieved = [clock["achieved"] for clock in report.get("fmax", {}).values()]
+    return min(achieved) if achieved else None
+
+
+def run_tool(args, cwd, input: Optional[str] = None):
+    """
+    Run a tool of the flow in ``cwd``, with ``input`` on its standard
+    input, raising ``FlowError`` if it is missing or fails.
+    """
+    try:
+        result = subprocess.run(args, cwd=cwd, input=input, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise FlowError(f"{args[0]} is not installed")
+    if result.returncode != 0:
+        raise FlowError(f"{args[0]} failed:\n{result.stderr or result.stdout}")
+    return result
+
+
+def synthesize(design, ports, *, family: str = "ice40", pnr: bool = True,
+               freq_mhz: float = 12.0, build_dir: Optional[str] = None,
+               name: str = "top") -> Dict[str, Any]:
+    """
+    Synthesize ``design`` and optionally place and route it.
+
+    Arguments:
+        design (Elaboratable):  design to build
+        ports (list[Signal]):   top level ports of ``design``
+        family (str):           FPGA family, a key of ``FAMILIES``
+        pnr (bool):             run nextpnr to get the achieved fmax
+        freq_mhz (float):       clock constraint given to nextpnr
+        build_dir (str):        where to keep the build files (``name.il``,
+                                ``name.v``, the netlist and reports), a
+                                temporary directory is used if ``None``
+        name (str):             name of the top level module
+
+    Returns:
+        a dictionary with ``family``, the resource counts of
+        ``count_cells``, ``cells`` (the raw cell counts) and ``fmax_mhz``
+        (``None`` if place and route was skipped or nothing is clocked).
+    """
+    if family not in FAMILIES:
+        raise FlowError(f"unknown family {family!r}, expected one of {', '.join(FAMILIES)}")
+    config = FAMILIES[family]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        build = Path(build_dir or tmp)
+        build.mkdir(parents=True, exist_ok=True)
+
+        (build / f"{name}.il").write_text(rtlil.convert(design, name=name, ports=ports))
+        run_tool([
+            "yosys", "-q", "-p",
+            f"read_rtlil {name}.il; proc; write_verilog -noattr {name}.v; "
+            f"{config['synth']} -top {name} -json {name}.json; "
+            f"tee -q -o {name}.stat.json stat -json",
+        ], cwd=build)
+
+        stat = json.loads((build / f"{name}.stat.json").read_text())
+        cells = stat.get("design", stat["modules"].get(name, {})).get("num_cells_by_type", {})
+        report = {"family": family, **count_cells(cells), "cells": cells, "fmax_mhz": None}
+
+        if pnr:
+            run_tool([
+                config["nextpnr"], *config["device"], config["unconstrained"],
+                *config["out_of_context"], "--json", f"{name}.json", "--freq", str(freq_mhz),
+                "--report", f"{name}.report.json",
+            ], cwd=build)
+            report["fmax_mhz"] = parse_fmax(json.loads((build / f"{name}.report.json").read_text()))
+
+    return report
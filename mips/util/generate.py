@@ -0,0 +1,236 @@
+"""
+Seeded constrained-random instruction streams
+
+Every instruction is drawn from a weighted ``Mix`` of instruction classes,
+and its fields are drawn so that the stream always runs to its end on both
+cores and the ``ISS``:
+
+* registers ``$1`` to ``$27`` are written, ``$30`` is kept for the loop
+  counter of ``workload`` and ``$31`` is only written by ``JAL``;
+* loads and stores are aligned, off ``$0``, within ``footprint`` bytes;
+* branches and jumps only go forward, by at most ``MAX_SKIP``
+  instructions and never past the end of the stream;
+* there is no ``JR``/``JALR`` nor ``TRAP``.
+
+Sources are read from the destination of an earlier instruction, up to
+``distance`` instructions back, so small distances give hazard dense
+streams. The whole stream is drawn and encoded at once with NumPy, at
+millions of instructions per second.
+"""
+
+from mips.cpu.isa import *
+from mips.util.encode import encode_many, word_view
+import mips.util.encode as encode
+
+import numpy as np
+
+from typing import *
+
+__all__ = [
+    "CLASSES",
+    "Mix",
+    "MIXES",
+    "generate",
+    "workload",
+]
+
+DESTS = np.arange(1, 28)
+"Registers written by the generated instructions, except ``JAL``"
+
+COUNTER = 30
+"Loop counter of ``workload``"
+
+MAX_SKIP = 4
+"Longest forward branch or jump, in instructions"
+
+CLASSES = {
+    "alu": [Funct.ADD, Funct.ADDU, Funct.SUB, Funct.SUBU, Funct.AND, Funct.OR, Funct.XOR,
+            Funct.NOR, Funct.SLT, Funct.SLTU, Funct.SLLV, Funct.SRLV, Funct.SRAV],
+    "shift": [Funct.SLL, Funct.SRL, Funct.SRA],
+    "imm": [Opcode.ADDI, Opcode.ADDIU, Opcode.ANDI, Opcode.ORI, Opcode.XORI,
+            Opcode.SLTI, Opcode.SLTIU, Opcode.LLO, Opcode.LHI],
+    "load": [Opcode.LW, Opcode.LH, Opcode.LHU, Opcode.LB, Opcode.LBU],
+    "store": [Opcode.SW, Opcode.SH, Opcode.SB],
+    "branch": [Opcode.BEQ, Opcode.BNE, Opcode.BLEZ, Opcode.BGTZ],
+    "jump": [Opcode.J, Opcode.JAL],
+    "muldiv": [Funct.MULT, Funct.MULTU, Funct.DIV, Funct.DIVU,
+               Funct.MFHI, Funct.MFLO, Funct.MTHI, Funct.MTLO],
+}
+"Instructions of each class, drawn uniformly within the class"
+
+
+class Mix(NamedTuple):
+    """
+    Weighted mix of instruction classes
+
+    Attributes:
+        weights: relative weight of each class of ``CLASSES``
+        distance: default dependency distance, see ``generate``
+    """
+    weights: Dict[str, float]
+    distance: int
+
+
+MIXES = {
+    "balanced": Mix(dict(alu=30, shift=5, imm=20, load=20, store=10, branch=12, jump=2, muldiv=1), 8),
+    "alu": Mix(dict(alu=55, shift=15, imm=30), 8),
+    "memory": Mix(dict(alu=10, imm=15, load=45, store=30), 8),
+    "branch": Mix(dict(alu=25, imm=25, branch=40, jump=10), 8),
+    "hazard": Mix(dict(alu=30, imm=10, load=35, store=10, muldiv=15), 1),
+}
+"Named mixes: even, ALU heavy, load/store heavy, branch heavy and hazard dense"
+
+# Per instruction tables, indexed by the position of the instruction in
+# the concatenation of ``CLASSES``.
+_OPS = [op for ops in CLASSES.values() for op in ops]
+_INDEX = {op: i for i, op in enumerate(_OPS)}
+_BASE = np.array([encode_many(op)[0] for op in _OPS], dtype=np.int64)
+
+_WRITES_RD = np.isin(_OPS, CLASSES["alu"] + CLASSES["shift"] + [Funct.MFHI, Funct.MFLO])
+_WRITES_RT = np.isin(_OPS, CLASSES["imm"] + CLASSES["load"])
+_READS_RS = np.isin(_OPS, CLASSES["alu"] + CLASSES["imm"] + CLASSES["branch"]
+                    + [Funct.MULT, Funct.MULTU, Funct.DIV, Funct.DIVU, Funct.MTHI, Funct.MTLO]) \
+    & ~np.isin(_OPS, [Opcode.LLO, Opcode.LHI])
+_READS_RT = np.isin(_OPS, CLASSES["alu"] + CLASSES["shift"] + CLASSES["store"]
+                    + [Opcode.BEQ, Opcode.BNE, Funct.MULT, Funct.MULTU, Funct.DIV, Funct.DIVU])
+_SIZE = np.array([
+    {Opcode.LW: 4, Opcode.SW: 4, Opcode.LH: 2, Opcode.LHU: 2, Opcode.SH: 2}.get(op, 1)
+    for op in _OPS
+])
+
+
+def _kind(name: str) -> np.ndarray:
+    return np.isin(_OPS, CLASSES[name])
+
+
+_MEMORY = _kind("load") | _kind("store")
+_BRANCH = _kind("branch")
+_JUMP = _kind("jump")
+_SHIFT = _kind("shift")
+_IMM = _kind("imm")
+
+
+def generate(count: int, mix: Union[str, Mix] = "balanced", *, seed: int = 0,
+             distance: Optional[int] = None, footprint: int = 1024, base: int = 0,
+             out=None, offset: int = 0) -> np.ndarray:
+    """
+    Draw ``count`` instructions from ``mix``.
+
+    Every source register is the destination of one of the ``distance``
+    instructions before it (picked uniformly), or a random register when
+    there is none, and ``distance=0`` makes every source random. The same
+    arguments always give the same stream.
+
+    Arguments:
+        count (int):        number of instructions
+        mix (str | Mix):    a key of ``MIXES``, or a ``Mix``
+        seed (int):         seed of the random generator
+        distance (int):     largest dependency distance, defaults to the
+                            one of the mix
+        footprint (int):    bytes of data memory loads and stores touch
+        base (int):         word address of the first instruction, which
+                            ``J``/``JAL`` targets are relative to
+        out:                buffer to write the words to, see ``encode_many``
+        offset (int):       index of the first word written to ``out``
+
+    Returns the words as a ``uint32`` array, a view of ``out`` if given.
+    """
+    if isinstance(mix, str):
+        mix = MIXES[mix]
+    if distance is None:
+        distance = mix.distance
+    assert footprint >= 4 and footprint & 3 == 0, "footprint must be a positive number of words"
+    assert footprint <= 0x8000, "footprint must fit a 16-bit signed offset"
+
+    rng = np.random.default_rng(seed)
+    index = np.arange(count)
+
+    # instruction of every slot
+    names = [name for name, weight in mix.weights.items() if weight > 0]
+    weights = np.array([mix.weights[name] for name in names], dtype=float)
+    starts = np.array([_INDEX[CLASSES[name][0]] for name in names])
+    lengths = np.array([len(CLASSES[name]) for name in names])
+    cls = rng.choice(len(names), size=count, p=weights / weights.sum())
+    op = starts[cls] + (rng.random(count) * lengths[cls]).astype(np.int64)
+
+    # destinations, and the last instruction writing one at every slot
+    writes_rd = _WRITES_RD[op]
+    writes_rt = _WRITES_RT[op]
+    jal = op == _INDEX[Opcode.JAL]
+    dest = rng.choice(DESTS, size=count)
+    dest[jal] = 31
+    writer = np.where(writes_rd | writes_rt | jal, index, -1)
+    writer = np.maximum.accumulate(writer) if count else writer
+
+    def source():
+        regs = rng.choice(DESTS, size=count)
+        if distance > 0:
+            back = index - rng.integers(1, distance + 1, size=count)
+            producer = np.where(back >= 0, writer[np.maximum(back, 0)], -1)
+            regs = np.where(producer >= 0, dest[np.maximum(producer, 0)], regs)
+        return regs
+
+    rs = np.where(_READS_RS[op], source(), 0)
+    rt = np.where(_READS_RT[op], source(), 0)
+    rd = np.where(writes_rd, dest, 0)
+    rt = np.where(writes_rt, dest, rt)
+
+    imm = rng.integers(0, 1 << 16, size=count)
+    imm = np.where(_MEMORY[op], rng.integers(0, footprint, size=count) & -_SIZE[op], imm)
+
+    # forward control flow, ending at the end of the stream at the latest
+    skip = np.minimum(rng.integers(0, MAX_SKIP + 1, size=count), count - 1 - index)
+    imm = np.where(_BRANCH[op], skip, imm)
+    addr = np.where(_JUMP[op], base + index + 1 + skip, 0)
+    assert not _JUMP[op].any() or addr.max() < 1 << 26, "jump target out of reach"
+
+    shamt = np.where(_SHIFT[op], rng.integers(0, 32, size=count), 0)
+    imm = np.where(_IMM[op] | _MEMORY[op] | _BRANCH[op], imm, 0)
+
+    words = (
+        _BASE[op]
+        | rs << encode.RS_OFF
+        | rt << encode.RT_OFF
+        | rd << encode.RD_OFF
+        | shamt << encode.SHAMT_OFF
+        | imm
+        | addr
+    ).astype(np.uint32)
+
+    if out is None:
+        return words
+    view = out if isinstance(out, np.ndarray) else np.frombuffer(word_view(out), dtype=np.uint32)
+    view[offset:offset + count] = words
+    return view[offset:offset + count]
+
+
+def workload(count: int, mix: Union[str, Mix] = "balanced", *, iterations: int = 1,
+             seed: int = 0, footprint: int = 1024, **kwargs) -> Tuple[List[int], List[int]]:
+    """
+    Program running ``count`` instructions from ``generate`` ``iterations``
+    times in a loop and halting, and random data for its loads.
+
+    The loop lets branch predictors and caches warm up, and takes
+    ``count + 2`` instructions per iteration (plus 2 to set up and halt).
+
+    Arguments:
+        count (int):        instructions in the loop body
+        mix (str | Mix):    mix of the body, see ``generate``
+        iterations (int):   number of times the body runs
+        seed (int):         seed of the random generator
+        footprint (int):    bytes of data memory used, and of data returned
+        kwargs:             other arguments of ``generate``
+
+    Returns ``(program, data)``.
+    """
+    assert 1 <= iterations < 0x8000, "iterations must fit a 16-bit signed immediate"
+    body = generate(count, mix, seed=seed, footprint=footprint, base=1, **kwargs)
+    program = [encode.ADDIU.word(0, COUNTER, iterations)]
+    program += body.tolist()
+    program += [
+        encode.ADDIU.word(COUNTER, COUNTER, -1),
+        encode.BGTZ.word(COUNTER, 0, -(count + 2)),
+        encode.TRAP.word(0),
+    ]
+    data = np.random.default_rng(seed).integers(0, 1 << 32, size=footprint // 4, dtype=np.uint32)
+    return program, data.tolist()
@@ -0,0 +1,159 @@
+"""
+Utility functions to load and write program images
+"""
+
+from typing import *
+
+import os
+
+FORMATS = ["readmemh", "ihex", "bin"]
+"Image formats understood by ``write_image``"
+
+def parse_hex(text: str) -> List[int]:
+    """
+    Parse a ``$readmemh`` style image: one hexadecimal word per
+    whitespace separated token, with ``//`` comments.
+
+    Arguments:
+        text (str): contents of the image
+    """
+    words = []
+    for line in text.splitlines():
+        line = line.split("//", 1)[0]
+        for token in line.split():
+            words.append(int(token, 16) & 0xffff_ffff)
+    return words
+
+
+def parse_ihex(text: str) -> List[int]:
+    """
+    Parse an Intel HEX image of little endian words. Bytes that no record
+    covers read as 0.
+
+    Arguments:
+        text (str): contents of the image
+    """
+    memory = bytearray()
+    base = 0
+    for lineno, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] != ":":
+            raise ValueError(f"line {lineno}: not an Intel HEX record")
+        record = bytes.fromhex(line[1:])
+        if len(record) < 5 or len(record) != 5 + record[0] or sum(record) & 0xff:
+            raise ValueError(f"line {lineno}: malformed Intel HEX record")
+        kind = record[3]
+        payload = record[4:-1]
+        if kind == 0:
+            addr = base + (record[1] << 8 | record[2])
+            if len(memory) < addr + len(payload):
+                memory.extend(bytes(addr + len(payload) - len(memory)))
+            memory[addr:addr + len(payload)] = payload
+        elif kind == 1:
+            break
+        elif kind == 4:
+            base = int.from_bytes(payload, "big") << 16
+    return parse_binary(bytes(memory))
+
+
+def parse_binary(data: bytes) -> List[int]:
+    """
+    Parse a flat binary image of little endian words, padding the last
+    word with zeros.
+
+    Arguments:
+        data (bytes): contents of the image
+    """
+    data = bytes(data) + bytes(-len(data) % 4)
+    return [int.from_bytes(data[i:i + 4], "little") for i in range(0, len(data), 4)]
+
+
+def read_image(path: str) -> List[int]:
+    """
+    Read a program image from ``path`` as a list of 32-bit words. Files
+    named ``*.bin`` are flat binaries, text starting with ``:`` is Intel HEX
+    and anything else a ``$readmemh`` image.
+
+    Arguments:
+        path (str): file holding the image
+    """
+    if path.endswith(".bin"):
+        with open(path, "rb") as f:
+            return parse_binary(f.read())
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith(":"):
+        return parse_ihex(text)
+    return parse_hex(text)
+
+
+def to_readmemh(words: List[int]) -> str:
+    """
+    ``$readmemh`` image of ``words``, one word per line.
+
+    Arguments:
+        words (list[int]):  words of the image
+    """
+    return "".join(f"{word & 0xffff_ffff:08x}\n" for word in words)
+
+
+def to_binary(words: List[int]) -> bytes:
+    """
+    Flat binary image of ``words``, little endian.
+
+    Arguments:
+        words (list[int]):  words of the image
+    """
+    return b"".join((word & 0xffff_ffff).to_bytes(4, "little") for word in words)
+
+
+def to_ihex(words: List[int], record: int = 16) -> str:
+    """
+    Intel HEX image of ``words`` as little endian bytes from address 0,
+    with ``record`` bytes per data record and extended linear address
+    records past 64 KiB.
+
+    Arguments:
+        words (list[int]):  words of the image
+        record (int):       bytes per data record, at most 255
+    """
+    def line(kind: int, addr: int, payload: bytes) -> str:
+        body = bytes([len(payload), addr >> 8 & 0xff, addr & 0xff, kind]) + payload
+        return f":{body.hex().upper()}{-sum(body) & 0xff:02X}\n"
+
+    data = to_binary(words)
+    lines = []
+    addr = 0
+    while addr < len(data):
+        if addr and not addr & 0xffff:
+            lines.append(line(4, 0, (addr >> 16).to_bytes(2, "big")))
+        end = min(addr + record, (addr | 0xffff) + 1)
+        lines.append(line(0, addr & 0xffff, data[addr:end]))
+        addr = end
+    lines.append(line(1, 0, b""))
+    return "".join(lines)
+
+
+def write_image(path: str, words: List[int], fmt: Optional[str] = None):
+    """
+    Write ``words`` to ``path`` as an image in format ``fmt``, one of
+    ``FORMATS``. By default the format follows the extension: ``.bin`` is
+    binary, ``.ihex``/``.ihx`` Intel HEX and anything else ``$readmemh``.
+
+    Arguments:
+        path (str):         file to write
+        words (list[int]):  words of the image
+        fmt (str):          image format, or ``None``
+    """
+    if fmt is None:
+        ext = os.path.splitext(path)[1]
+        fmt = {".bin": "bin", ".ihex": "ihex", ".ihx": "ihex"}.get(ext, "readmemh")
+    assert fmt in FORMATS, f"unknown image format {fmt!r}"
+    if fmt == "bin":
+        with open(path, "wb") as f:
+            f.write(to_binary(words))
+    else:
+        with open(path, "w") as f:
+            f.write(to_ihex(words) if fmt == "ihex" else to_readmemh(words))
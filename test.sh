@@ -1,3 +1,16 @@
-#/usr/bin/bash
+#!/usr/bin/bash
 
-python3 -m pytest mips/test/ --html=report.html --self-contained-html;
\ No newline at end of file
+# Tests run on every CPU (JOBS overrides it), a test file at a time per
+# worker so that the designs it elaborates are cached and reused within
+# the worker. Without pytest-xdist they run serially, and without
+# pytest-html no report is written.
+options=()
+if python3 -c "import xdist" 2>/dev/null; then
+    options+=(-n "${JOBS:-auto}" --dist loadfile)
+else
+    echo "pytest-xdist is not installed, running the tests serially" >&2
+fi
+if python3 -c "import pytest_html" 2>/dev/null; then
+    options+=(--html=report.html --self-contained-html)
+fi
+python3 -m pytest mips/test/ "${options[@]}" "$@"